@@ -9,6 +9,7 @@ import json
 import uuid
 import asyncio
 import logging
+import sys
 import psutil
 import subprocess
 from datetime import datetime
@@ -19,7 +20,16 @@ from pathlib import Path
 
 # Import configuration and encryption
 from config import ClientBotConfig
-from llama_cpp_wrapper import LlamaCppWrapper
+from llama_cpp_wrapper import LlamaServerBackend
+from inference_scheduler import InferenceCancelled, InferenceScheduler, SchedulerFullError
+from inference_telemetry import InferenceTelemetry, request_metrics
+from prompt_cache import CacheBudget, PromptCache
+from stream_coalescer import StreamCoalescer
+from direct_transport import DIRECT_FRAME_CHARS, DirectLinkClient
+
+# Shared libraries live at the repository root
+sys.path.append(str(Path(__file__).parent.parent))
+from shared_lib.system_sampler import SystemSampler
 
 # Configure logging
 logging.basicConfig(
@@ -58,38 +68,66 @@ class ModelManager:
     
     def __init__(self, config: ClientBotConfig):
         self.config = config
-        self.models: Dict[str, LlamaCppWrapper] = {}
+        self.models: Dict[str, LlamaServerBackend] = {}
+        self.schedulers: Dict[str, InferenceScheduler] = {}
         self.max_loaded_models = 2
         self.model_usage = {}  # Track usage for LRU
+        self._load_lock = asyncio.Lock()
+        # Saved per-session KV states of all models share one memory budget
+        self.prompt_cache_budget = CacheBudget(config.llama_cpp.prompt_cache_budget_mb * 1024 * 1024)
+        # Per model; kept when a model is unloaded so its histograms carry on
+        self.telemetry: Dict[str, InferenceTelemetry] = {}
     
-    async def get_model(self, alias: str) -> LlamaCppWrapper:
+    async def get_model(self, alias: str) -> LlamaServerBackend:
         """Get or load a model by alias."""
         if alias not in self.config.models:
             raise ValueError(f"Unknown model alias: {alias}")
         
-        if alias not in self.models:
-            if len(self.models) >= self.max_loaded_models:
-                await self._unload_lru_model()
-            
-            await self._load_model(alias)
+        async with self._load_lock:
+            if alias not in self.models:
+                if len(self.models) >= self.max_loaded_models:
+                    await self._unload_lru_model()
+                
+                await self._load_model(alias)
         
         # Update usage
         self.model_usage[alias] = datetime.utcnow()
         return self.models[alias]
     
+    async def get_scheduler(self, alias: str) -> InferenceScheduler:
+        """Get the slot scheduler of a model, loading the model if needed."""
+        await self.get_model(alias)
+        return self.schedulers[alias]
+    
+    def cancel_session(self, session_id: str) -> int:
+        """Cancel a closed session's requests on every model."""
+        return sum(scheduler.cancel_session(session_id) for scheduler in self.schedulers.values())
+    
+    def scheduler_metrics(self) -> Dict[str, Dict[str, float]]:
+        return {alias: scheduler.metrics() for alias, scheduler in self.schedulers.items()}
+    
+    def telemetry_metrics(self, buckets: bool = True) -> Dict[str, Dict[str, Any]]:
+        return {alias: telemetry.snapshot(buckets) for alias, telemetry in self.telemetry.items()}
+    
     async def _load_model(self, alias: str):
-        """Load a model from disk."""
+        """Start a warm llama.cpp server for a model."""
         model_config = self.config.models[alias]
         logger.info(f"Loading model {alias} from {model_config['path']}")
         
         try:
-            wrapper = LlamaCppWrapper(
-                model_path=model_config["path"],
-                n_ctx=self.config.llama_cpp.n_ctx,
-                n_threads=self.config.llama_cpp.threads,
-                n_gpu_layers=self.config.llama_cpp.n_gpu_layers
+            backend = LlamaServerBackend(self.config.llama_cpp, model_path=model_config["path"])
+            await backend.start()
+            self.models[alias] = backend
+            prompt_cache = None
+            if backend.slot_save_path:
+                prompt_cache = PromptCache(backend, self.prompt_cache_budget)
+            self.schedulers[alias] = InferenceScheduler(
+                backend,
+                slots=self.config.llama_cpp.parallel_slots,
+                max_queue_depth=self.config.llama_cpp.max_queue_depth,
+                prompt_cache=prompt_cache,
+                telemetry=self.telemetry.setdefault(alias, InferenceTelemetry())
             )
-            self.models[alias] = wrapper
             self.model_usage[alias] = datetime.utcnow()
             logger.info(f"Successfully loaded model {alias}")
         except Exception as e:
@@ -97,45 +135,80 @@ class ModelManager:
             raise
     
     async def _unload_lru_model(self):
-        """Unload the least recently used model."""
-        if not self.model_usage:
+        """Unload the least recently used model that has no requests in flight."""
+        idle = [
+            alias for alias in self.model_usage
+            if alias not in self.schedulers or self.schedulers[alias].idle
+        ]
+        if not idle:
+            logger.warning("All loaded models are busy; loading another without unloading")
             return
         
-        lru_alias = min(self.model_usage.keys(), key=lambda k: self.model_usage[k])
+        lru_alias = min(idle, key=lambda k: self.model_usage[k])
         logger.info(f"Unloading LRU model: {lru_alias}")
         
+        scheduler = self.schedulers.pop(lru_alias, None)
+        if scheduler and scheduler.prompt_cache:
+            scheduler.prompt_cache.clear()
         if lru_alias in self.models:
-            del self.models[lru_alias]
+            await self.models.pop(lru_alias).stop()
         del self.model_usage[lru_alias]
+    
+    async def close(self):
+        """Stop every model server."""
+        for backend in self.models.values():
+            await backend.stop()
+        for scheduler in self.schedulers.values():
+            if scheduler.prompt_cache:
+                scheduler.prompt_cache.clear()
+        self.models.clear()
+        self.schedulers.clear()
+        self.model_usage.clear()
 
 class SystemMonitor:
     """Monitor system resources and performance."""
     
     def __init__(self):
         self.start_time = datetime.utcnow()
+        # Sampled on a background thread; GPU details barely change, so
+        # system_profiler runs rarely
+        self.sampler = SystemSampler(
+            interval=5.0,
+            history=720,
+            probes={
+                "gpu": (self._get_gpu_metrics, 600.0),
+                "battery": (self._get_battery_metrics, 60.0)
+            }
+        )
+    
+    def start(self):
+        self.sampler.start()
+    
+    def stop(self):
+        self.sampler.stop(timeout=1)
     
     def get_system_metrics(self) -> Dict[str, Any]:
-        """Get current system metrics."""
+        """Get the latest system metrics without blocking."""
         try:
-            # CPU and memory
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            
-            # GPU metrics (macOS Metal)
-            gpu_metrics = self._get_gpu_metrics()
-            
-            # Battery (if available)
-            battery_metrics = self._get_battery_metrics()
+            sample = self.sampler.latest()
+            if sample is None:
+                return {"error": "system sampler not started"}
+            extra = {
+                key: value for key, value in sample.items()
+                if key.startswith(("gpu_", "battery_"))
+            }
             
             return {
-                "timestamp": datetime.utcnow().isoformat(),
-                "cpu_usage_percent": cpu_percent,
-                "memory_usage_percent": memory.percent,
-                "memory_used_mb": memory.used / (1024 * 1024),
-                "memory_total_mb": memory.total / (1024 * 1024),
+                "timestamp": datetime.utcfromtimestamp(sample["timestamp"]).isoformat(),
+                "cpu_usage_percent": sample["cpu_percent"],
+                "memory_usage_percent": sample["memory_percent"],
+                "memory_used_mb": sample["memory_used_mb"],
+                "memory_total_mb": sample["memory_total_mb"],
+                "process_rss_mb": sample["process_rss_mb"],
                 "uptime_seconds": (datetime.utcnow() - self.start_time).total_seconds(),
-                **gpu_metrics,
-                **battery_metrics
+                "cpu_usage_p95": self.sampler.percentiles("cpu_percent", seconds=300).get("p95", 0.0),
+                **self.sampler.rates(seconds=300),
+                **extra
             }
         except Exception as e:
             logger.error(f"Error getting system metrics: {e}")
@@ -230,17 +303,41 @@ class MeatLizardClientBot(commands.Bot):
         self.inference_count = 0
         self.total_inference_time = 0.0
         self.error_count = 0
+        
+        # Session ids seen per session channel, for cancelling on channel delete
+        self.session_channels: Dict[int, set] = {}
+        
+        # Optional WebSocket link to the server bot, used instead of
+        # session channel messages while it is up
+        self.direct_link: Optional[DirectLinkClient] = None
+        if self.config.direct_link_url:
+            self.direct_link = DirectLinkClient(
+                self.encryptor, self.config.direct_link_url, self._handle_direct_frame
+            )
+        self._inference_tasks: set = set()
     
     async def setup_hook(self):
         """Initialize bot components."""
         logger.info("Setting up MeatLizard Client Bot...")
         
         # Start background tasks
+        self.system_monitor.start()
         self.health_reporter.start()
         self.performance_monitor.start()
         
+        if self.direct_link:
+            self.direct_link.start()
+        
         logger.info("Client Bot setup complete")
     
+    async def close(self):
+        """Stop the direct link and model servers before disconnecting."""
+        if self.direct_link:
+            await self.direct_link.stop()
+        await self.model_manager.close()
+        self.system_monitor.stop()
+        await super().close()
+    
     async def on_ready(self):
         """Bot ready event handler."""
         logger.info(f"Client Bot logged in as {self.user}")
@@ -279,29 +376,82 @@ class MeatLizardClientBot(commands.Bot):
         
         await self.process_commands(message)
     
+    async def on_guild_channel_delete(self, channel):
+        """Cancel queued and running inference of a closed session channel."""
+        for session_id in self.session_channels.pop(channel.id, ()):
+            self.model_manager.cancel_session(session_id)
+    
+    async def _handle_direct_frame(self, kind: str, payload: Dict):
+        """Handle a frame from the server bot's direct link."""
+        if kind == "request":
+            # Responses finish in the session channel if the link drops mid-request
+            channel = self.get_channel(payload["channel_id"]) if payload.get("channel_id") else None
+            fallback = self._channel_sender(channel) if channel else None
+            # Inference runs in its own task so the link keeps reading
+            task = asyncio.create_task(self._run_inference(payload, self._send_direct, direct=True, fallback=fallback))
+            self._inference_tasks.add(task)
+            task.add_done_callback(self._inference_tasks.discard)
+        elif kind == "cancel":
+            self.model_manager.cancel_session(payload["session_id"])
+        else:
+            logger.warning(f"Unknown direct link frame: {kind}")
+    
+    async def _send_direct(self, payload: Dict):
+        if not await self.direct_link.send("response", payload):
+            raise ConnectionError("direct link to server bot is down")
+    
+    def _with_fallback(self, send, fallback):
+        async def send_or_fall_back(payload: Dict):
+            try:
+                await send(payload)
+            except ConnectionError:
+                if fallback is None:
+                    raise
+                await fallback(payload)
+        return send_or_fall_back
+    
+    def _channel_sender(self, channel: discord.TextChannel):
+        async def send(payload: Dict):
+            await channel.send(self.encryptor.encrypt(payload))
+        return send
+    
     async def _handle_inference_request(self, message: discord.Message):
         """Handle AI inference request from server bot."""
         try:
             # Decrypt request
             request_data = self.encryptor.decrypt(message.content)
-            
+        except Exception as e:
+            logger.error(f"Error decrypting inference request: {e}")
+            self.error_count += 1
+            return
+        
+        # Audit record of a request sent over the direct link
+        if "audit" in request_data:
+            return
+        
+        self.session_channels.setdefault(message.channel.id, set()).add(request_data.get("session_id"))
+        await self._run_inference(request_data, self._channel_sender(message.channel))
+    
+    async def _run_inference(self, request_data: Dict, send, direct: bool = False, fallback=None):
+        """Run one inference request, replying through `send`, or `fallback` once `send` fails."""
+        stream_send, send = send, self._with_fallback(send, fallback)
+        try:
             session_id = request_data["session_id"]
             request_id = request_data["request_id"]
-            prompt = request_data["prompt"]
             
             logger.info(f"Processing inference request {request_id} for session {session_id}")
             
             # Get model
             model_alias = request_data.get("model_alias", "default")
-            model = await self.model_manager.get_model(model_alias)
+            scheduler = await self.model_manager.get_scheduler(model_alias)
             
             # Perform inference
             start_time = datetime.utcnow()
             
             if request_data.get("stream", True):
-                await self._stream_inference(message.channel, request_data, model)
+                await self._stream_inference(stream_send, request_data, scheduler, direct, fallback)
             else:
-                await self._batch_inference(message.channel, request_data, model)
+                await self._batch_inference(send, request_data, scheduler)
             
             # Update performance metrics
             inference_time = (datetime.utcnow() - start_time).total_seconds()
@@ -313,101 +463,124 @@ class MeatLizardClientBot(commands.Bot):
         except Exception as e:
             logger.error(f"Error handling inference request: {e}")
             self.error_count += 1
-            await self._send_error_response(message.channel, request_data, str(e))
+            await self._send_error_response(send, request_data, str(e))
     
-    async def _stream_inference(self, channel: discord.TextChannel, request_data: Dict, model: LlamaCppWrapper):
+    async def _stream_inference(
+        self, send, request_data: Dict, scheduler: InferenceScheduler, direct: bool = False, fallback=None
+    ):
         """Perform streaming inference."""
         session_id = request_data["session_id"]
         request_id = request_data["request_id"]
         
+        # Tokens go out in coalesced, sequence-numbered frames rather than
+        # one Discord message each; the server bot reassembles them
+        if direct:
+            coalescer = StreamCoalescer(
+                send,
+                {"session_id": session_id, "request_id": request_id},
+                flush_interval=self.config.direct_link_flush_interval,
+                max_chars=DIRECT_FRAME_CHARS,
+                fallback=fallback
+            )
+        else:
+            coalescer = StreamCoalescer(
+                send,
+                {"session_id": session_id, "request_id": request_id},
+                flush_interval=self.config.stream_flush_interval
+            )
+        
+        reply = self._with_fallback(send, fallback)
+        stats = {}
         try:
-            response_chunks = []
-            token_count = 0
-            
-            async for chunk in model.generate_stream(
+            async for chunk in scheduler.stream(
+                session_id,
                 prompt=request_data["prompt"],
+                priority=request_data.get("priority", 0),
+                stats=stats,
                 temperature=request_data.get("temperature", 0.7),
                 max_tokens=request_data.get("max_tokens", 2048)
             ):
-                response_chunks.append(chunk)
-                token_count += 1
-                
-                # Send chunk
-                response_data = {
-                    "session_id": session_id,
-                    "request_id": request_id,
-                    "response": chunk,
-                    "is_complete": False,
-                    "metrics": {
-                        "tokens_generated": token_count
-                    }
-                }
-                
-                encrypted_response = self.encryptor.encrypt(response_data)
-                await channel.send(encrypted_response)
+                await coalescer.add(chunk)
             
-            # Send completion marker
-            final_response = {
-                "session_id": session_id,
-                "request_id": request_id,
-                "response": "",
-                "is_complete": True,
-                "metrics": {
-                    "total_tokens": token_count,
-                    "full_response": "".join(response_chunks)
-                }
-            }
-            
-            encrypted_final = self.encryptor.encrypt(final_response)
-            await channel.send(encrypted_final)
+            # The final frame is size-limited; full figures go in the health report
+            metrics = request_metrics(stats)
+            await coalescer.close({
+                "total_tokens": metrics["generated_tokens"] or coalescer.tokens,
+                "frames": coalescer.frames_sent + 1,
+                "time_to_first_token_ms": metrics["time_to_first_token_ms"],
+                "inference_time_ms": round(metrics["total_ms"]),
+                "tokens_per_second": metrics["generation_tokens_per_second"]
+            })
             
+        except InferenceCancelled:
+            logger.info(f"Dropped request {request_id}: session {session_id} closed")
+        except SchedulerFullError as e:
+            logger.warning(f"Rejected request {request_id}: {e}")
+            await self._send_error_response(reply, request_data, str(e), error_type="queue_full")
         except Exception as e:
             logger.error(f"Error in streaming inference: {e}")
-            await self._send_error_response(channel, request_data, str(e))
+            await self._send_error_response(reply, request_data, str(e))
+        finally:
+            coalescer.cancel()
     
-    async def _batch_inference(self, channel: discord.TextChannel, request_data: Dict, model: LlamaCppWrapper):
+    async def _batch_inference(self, send, request_data: Dict, scheduler: InferenceScheduler):
         """Perform batch inference."""
         session_id = request_data["session_id"]
         request_id = request_data["request_id"]
         
+        stats = {}
         try:
-            response_text = await model.generate(
+            response_text = await scheduler.generate(
+                session_id,
                 prompt=request_data["prompt"],
+                priority=request_data.get("priority", 0),
+                stats=stats,
                 temperature=request_data.get("temperature", 0.7),
                 max_tokens=request_data.get("max_tokens", 2048)
             )
             
+            metrics = request_metrics(stats)
             response_data = {
                 "session_id": session_id,
                 "request_id": request_id,
                 "response": response_text,
                 "is_complete": True,
                 "metrics": {
-                    "total_tokens": len(response_text.split()),
-                    "inference_time_ms": 0  # TODO: Track actual time
+                    **metrics,
+                    "total_tokens": metrics["generated_tokens"],
+                    "inference_time_ms": round(metrics["total_ms"])
                 }
             }
             
-            encrypted_response = self.encryptor.encrypt(response_data)
-            await channel.send(encrypted_response)
+            await send(response_data)
             
+        except InferenceCancelled:
+            logger.info(f"Dropped request {request_id}: session {session_id} closed")
+        except SchedulerFullError as e:
+            logger.warning(f"Rejected request {request_id}: {e}")
+            await self._send_error_response(send, request_data, str(e), error_type="queue_full")
         except Exception as e:
             logger.error(f"Error in batch inference: {e}")
-            await self._send_error_response(channel, request_data, str(e))
+            await self._send_error_response(send, request_data, str(e))
     
-    async def _send_error_response(self, channel: discord.TextChannel, request_data: Dict, error_message: str):
+    async def _send_error_response(
+        self,
+        send,
+        request_data: Dict,
+        error_message: str,
+        error_type: str = "inference_error"
+    ):
         """Send error response."""
         try:
             error_response = {
                 "session_id": request_data.get("session_id", "unknown"),
                 "request_id": request_data.get("request_id", "unknown"),
-                "error_type": "inference_error",
+                "error_type": error_type,
                 "error_message": error_message,
                 "is_complete": True
             }
             
-            encrypted_error = self.encryptor.encrypt(error_response)
-            await channel.send(encrypted_error)
+            await send(error_response)
             
         except Exception as e:
             logger.error(f"Failed to send error response: {e}")
@@ -416,7 +589,7 @@ class MeatLizardClientBot(commands.Bot):
     async def health_reporter(self):
         """Report health metrics to server bot."""
         try:
-            if not self.metrics_channel:
+            if not self.metrics_channel and not self.direct_link:
                 return
             
             metrics = self.system_monitor.get_system_metrics()
@@ -429,11 +602,24 @@ class MeatLizardClientBot(commands.Bot):
                     self.total_inference_time / self.inference_count 
                     if self.inference_count > 0 else 0
                 ),
-                "models_loaded": list(self.model_manager.models.keys())
+                "models_loaded": list(self.model_manager.models.keys()),
+                "scheduler": self.model_manager.scheduler_metrics()
             })
             
-            encrypted_metrics = self.encryptor.encrypt(metrics)
-            await self.metrics_channel.send(encrypted_metrics)
+            if self.direct_link and await self.direct_link.send(
+                "metrics", {**metrics, "inference_telemetry": self.model_manager.telemetry_metrics()}
+            ):
+                return
+            if self.metrics_channel:
+                encrypted_metrics = self.encryptor.encrypt(metrics)
+                await self.metrics_channel.send(encrypted_metrics)
+                # One message per model keeps each under Discord's size limit
+                for alias, telemetry in self.model_manager.telemetry_metrics(buckets=False).items():
+                    await self.metrics_channel.send(self.encryptor.encrypt({
+                        "type": "inference_telemetry",
+                        "model": alias,
+                        **telemetry
+                    }))
             
         except Exception as e:
             logger.error(f"Error reporting health metrics: {e}")
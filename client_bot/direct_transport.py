@@ -0,0 +1,171 @@
+# client_bot/direct_transport.py
+"""
+Client end of the direct WebSocket link to the server bot
+(server/server_bot/direct_transport.py).
+
+The client bot dials out, so it works from behind NAT, and reconnects
+with backoff when the link drops. While it is down `send` returns False
+and the bot falls back to Discord messages. Frames use the same AES-GCM
+encryptor as the Discord payloads; the first frame is a `hello` with a
+timestamp and random nonce, and the link is only considered up once the
+server answers a `welcome` echoing that nonce. Later frames carry the
+nonce as `link` and a per-direction `seq` counting up from 1; a frame
+from another connection or out of sequence drops the link.
+
+Received frames are handled one at a time through a bounded queue, so a
+slow handler pushes back on the server over TCP rather than buffering.
+Handlers that start long work (inference) should spawn a task.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import aiohttp
+
+logger = logging.getLogger(__name__)
+
+MAX_MESSAGE_BYTES = 8 * 1024 * 1024
+
+# Frames over the link are not limited by Discord's message size
+DIRECT_FRAME_CHARS = 16384
+
+
+class DirectLinkClient:
+    """
+    Usage:
+        link = DirectLinkClient(encryptor, "ws://server:8765/bot-link", on_frame)
+        link.start()
+        await link.send("response", frame)
+        await link.stop()
+    """
+
+    def __init__(
+        self,
+        encryptor,
+        url: str,
+        on_frame: Callable[[str, Dict[str, Any]], Awaitable[None]],
+        max_pending: int = 64,
+        reconnect_delay: float = 1.0,
+        max_reconnect_delay: float = 30.0,
+        heartbeat: float = 20.0
+    ):
+        self.encryptor = encryptor
+        self.url = url
+        self.on_frame = on_frame
+        self.max_pending = max_pending
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self.heartbeat = heartbeat
+        self.connects = 0
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._link_nonce: Optional[str] = None
+        self._send_seq = 0
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._task: Optional[asyncio.Task] = None
+        self._send_lock = asyncio.Lock()
+        self._connected = asyncio.Event()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        if self._ws is not None:
+            await self._ws.close()
+            self._ws = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    async def wait_connected(self, timeout: Optional[float] = None):
+        await asyncio.wait_for(self._connected.wait(), timeout)
+
+    async def send(self, kind: str, payload: Dict[str, Any]) -> bool:
+        """Send one frame; False if the link is down."""
+        ws = self._ws
+        if ws is None or ws.closed:
+            return False
+        try:
+            async with self._send_lock:
+                if ws is not self._ws:
+                    return False
+                self._send_seq += 1
+                await ws.send_str(self.encryptor.encrypt({
+                    "kind": kind, "payload": payload, "link": self._link_nonce, "seq": self._send_seq
+                }))
+        except ConnectionError:
+            return False
+        return True
+
+    async def _run(self):
+        delay = self.reconnect_delay
+        self._session = aiohttp.ClientSession()
+        while True:
+            try:
+                await self._connect_and_receive()
+                delay = self.reconnect_delay
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.warning(f"Direct link to {self.url} failed: {e}")
+            self._connected.clear()
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def _connect_and_receive(self):
+        async with self._session.ws_connect(
+            self.url, heartbeat=self.heartbeat, max_msg_size=MAX_MESSAGE_BYTES
+        ) as ws:
+            nonce = os.urandom(16).hex()
+            await ws.send_str(self.encryptor.encrypt({
+                "kind": "hello",
+                "payload": {"ts": time.time(), "nonce": nonce}
+            }))
+            msg = await ws.receive(timeout=10)
+            welcome = self.encryptor.decrypt(msg.data) if msg.type == aiohttp.WSMsgType.TEXT else {}
+            if welcome.get("kind") != "welcome" or welcome.get("payload", {}).get("nonce") != nonce:
+                raise ConnectionError("server bot refused the direct link")
+
+            async with self._send_lock:
+                self._ws, self._link_nonce, self._send_seq = ws, nonce, 0
+            self.connects += 1
+            self._connected.set()
+            logger.info(f"Direct link to server bot established ({self.url})")
+
+            pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+            dispatcher = asyncio.create_task(self._dispatch(pending))
+            expected_seq = 1
+            try:
+                async for msg in ws:
+                    if msg.type != aiohttp.WSMsgType.TEXT:
+                        continue
+                    frame = self.encryptor.decrypt(msg.data)
+                    if frame.get("link") != nonce or frame.get("seq") != expected_seq:
+                        raise ConnectionError("direct link frame out of sequence")
+                    expected_seq += 1
+                    await pending.put(frame)
+            finally:
+                self._ws = None
+                await pending.put(None)
+                await dispatcher
+        logger.info("Direct link to server bot closed")
+
+    async def _dispatch(self, pending: asyncio.Queue):
+        while True:
+            frame = await pending.get()
+            if frame is None:
+                return
+            try:
+                await self.on_frame(frame.get("kind", ""), frame.get("payload", {}))
+            except Exception as e:
+                logger.error(f"Error handling direct link frame: {e}")
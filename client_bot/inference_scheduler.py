@@ -0,0 +1,265 @@
+# client_bot/inference_scheduler.py
+"""
+Multiplexes concurrent chat sessions onto the decoding slots of one
+persistent llama.cpp server.
+
+The server batches every in-flight request into each decode step
+(continuous batching), so a long generation no longer blocks other
+sessions as long as a slot is free. The scheduler decides who gets the
+next free slot: lower priority values first, round-robin between sessions
+within a priority so one busy session cannot starve the rest. Requests
+beyond `max_queue_depth` are rejected up front instead of waiting
+indefinitely.
+
+Each running request is pinned to a server slot. With a PromptCache the
+slot is chosen to keep sessions on the slot that already holds their
+conversation (see prompt_cache.py).
+
+Every request's queue wait, time to first token and total time go into
+its stats dict next to the backend's token counts and timings; with an
+InferenceTelemetry they are also recorded into its histograms (see
+inference_telemetry.py).
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import AsyncIterator, Deque, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SchedulerFullError(Exception):
+    """The scheduler's queue is at max_queue_depth."""
+
+
+class InferenceCancelled(Exception):
+    """The request's session was closed while it waited for a slot."""
+
+
+class _Ticket:
+    __slots__ = ("session_id", "priority", "granted", "task", "enqueued_at", "slot")
+
+    def __init__(self, session_id: str, priority: int):
+        self.session_id = session_id
+        self.priority = priority
+        self.slot = None
+        self.granted: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.task = asyncio.current_task()
+        self.enqueued_at = time.perf_counter()
+
+
+class InferenceScheduler:
+    """
+    Slot scheduler in front of a streaming backend exposing
+    `generate_stream(prompt, **params)`.
+
+    Usage:
+        async for chunk in scheduler.stream(session_id, prompt, max_tokens=256):
+            ...
+    """
+
+    def __init__(
+        self,
+        backend,
+        slots: int = 4,
+        max_queue_depth: int = 32,
+        stats_window: int = 256,
+        prompt_cache=None,
+        telemetry=None
+    ):
+        self.backend = backend
+        self.slots = slots
+        self.max_queue_depth = max_queue_depth
+        self.prompt_cache = prompt_cache
+        self.telemetry = telemetry
+        self._free_slots = list(range(slots))
+        # priority -> session id -> waiting tickets; session order is the round-robin order
+        self._queues: Dict[int, "OrderedDict[str, Deque[_Ticket]]"] = {}
+        self._queued = 0
+        self._running: Dict[str, set] = {}
+        self._active = 0
+
+        self._queue_waits: Deque[float] = deque(maxlen=stats_window)
+        self._token_rates: Deque[float] = deque(maxlen=stats_window)
+        self.completed = 0
+        self.rejected = 0
+        self.cancelled = 0
+        self.failed = 0
+        self.total_tokens = 0
+
+    @property
+    def active(self) -> int:
+        return self._active
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def idle(self) -> bool:
+        return self._active == 0 and self._queued == 0
+
+    async def stream(
+        self, session_id: str, prompt: str, priority: int = 0, stats: Optional[dict] = None, **params
+    ) -> AsyncIterator[str]:
+        """
+        Wait for a slot, then yield the completion as it is generated.
+        `stats` is filled with the request's timings and token counts.
+        """
+        stats = {} if stats is None else stats
+        ticket = await self._acquire(session_id, priority)
+        started = time.perf_counter()
+        stats["queue_wait_ms"] = (started - ticket.enqueued_at) * 1000
+        tokens = 0
+        chunks = []
+        try:
+            if self.prompt_cache:
+                await self.prompt_cache.prepare(ticket.slot, session_id, prompt)
+            async for chunk in self.backend.generate_stream(prompt, slot_id=ticket.slot, stats=stats, **params):
+                if not tokens:
+                    stats["time_to_first_token_ms"] = (time.perf_counter() - ticket.enqueued_at) * 1000
+                tokens += 1
+                chunks.append(chunk)
+                yield chunk
+            stats["total_ms"] = (time.perf_counter() - ticket.enqueued_at) * 1000
+            stats["generated_tokens"] = stats.get("predicted_tokens") or tokens
+            if self.telemetry:
+                self.telemetry.record(stats)
+            if self.prompt_cache:
+                await self.prompt_cache.store(ticket.slot, session_id, prompt + "".join(chunks), stats)
+        except BaseException as e:
+            if self.prompt_cache:
+                self.prompt_cache.forget_slot(ticket.slot)
+            if isinstance(e, Exception):
+                self.failed += 1
+            elif isinstance(e, asyncio.CancelledError):
+                self.cancelled += 1
+            raise
+        else:
+            self.completed += 1
+        finally:
+            elapsed = time.perf_counter() - started
+            self.total_tokens += tokens
+            if tokens and elapsed > 0:
+                self._token_rates.append(tokens / elapsed)
+            self._release(ticket)
+
+    async def generate(
+        self, session_id: str, prompt: str, priority: int = 0, stats: Optional[dict] = None, **params
+    ) -> str:
+        """Wait for a slot and return the full completion."""
+        return "".join([chunk async for chunk in self.stream(session_id, prompt, priority, stats, **params)])
+
+    def cancel_session(self, session_id: str) -> int:
+        """
+        Drop a closed session's queued requests and cancel its running ones.
+        Returns the number of requests affected.
+        """
+        affected = 0
+        for sessions in self._queues.values():
+            waiting = sessions.pop(session_id, None)
+            for ticket in waiting or ():
+                self._queued -= 1
+                self.cancelled += 1
+                affected += 1
+                if not ticket.granted.done():
+                    ticket.granted.set_exception(InferenceCancelled(f"Session {session_id} closed"))
+        for ticket in self._running.get(session_id, ()):
+            if ticket.task is not None and ticket.task is not asyncio.current_task():
+                ticket.task.cancel()
+                affected += 1
+        if self.prompt_cache:
+            self.prompt_cache.drop_session(session_id)
+        if affected:
+            logger.info(f"Cancelled {affected} inference requests for closed session {session_id}")
+        return affected
+
+    def metrics(self) -> Dict[str, float]:
+        """Queue wait and throughput figures for the health report."""
+        waits = sorted(self._queue_waits)
+        metrics = {
+            "slots": self.slots,
+            "active": self._active,
+            "queued": self._queued,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "cancelled": self.cancelled,
+            "failed": self.failed,
+            "total_tokens": self.total_tokens,
+            "avg_queue_wait_ms": sum(waits) / len(waits) * 1000 if waits else 0.0,
+            "p95_queue_wait_ms": waits[min(len(waits) - 1, int(len(waits) * 0.95))] * 1000 if waits else 0.0,
+            "avg_tokens_per_second": sum(self._token_rates) / len(self._token_rates) if self._token_rates else 0.0,
+        }
+        if self.prompt_cache:
+            metrics.update(self.prompt_cache.metrics())
+        return metrics
+
+    async def _acquire(self, session_id: str, priority: int) -> _Ticket:
+        ticket = _Ticket(session_id, priority)
+        if self._active < self.slots and self._queued == 0:
+            self._start(ticket)
+            return ticket
+        if self._queued >= self.max_queue_depth:
+            self.rejected += 1
+            raise SchedulerFullError(f"Inference queue is full ({self.max_queue_depth} waiting)")
+
+        self._queues.setdefault(priority, OrderedDict()).setdefault(session_id, deque()).append(ticket)
+        self._queued += 1
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                # Granted in the same instant the waiter was cancelled
+                self._release(ticket)
+            else:
+                self._discard(ticket)
+            raise
+        return ticket
+
+    def _start(self, ticket: _Ticket):
+        if self.prompt_cache:
+            ticket.slot = self.prompt_cache.choose_slot(ticket.session_id, self._free_slots)
+        else:
+            ticket.slot = self._free_slots[0]
+        self._free_slots.remove(ticket.slot)
+        self._active += 1
+        self._running.setdefault(ticket.session_id, set()).add(ticket)
+        self._queue_waits.append(time.perf_counter() - ticket.enqueued_at)
+
+    def _release(self, ticket: _Ticket):
+        running = self._running.get(ticket.session_id)
+        if running is None or ticket not in running:
+            return
+        running.discard(ticket)
+        if not running:
+            del self._running[ticket.session_id]
+        self._free_slots.append(ticket.slot)
+        self._active -= 1
+        self._dispatch()
+
+    def _discard(self, ticket: _Ticket):
+        sessions = self._queues.get(ticket.priority, {})
+        waiting = sessions.get(ticket.session_id)
+        if waiting and ticket in waiting:
+            waiting.remove(ticket)
+            self._queued -= 1
+            if not waiting:
+                del sessions[ticket.session_id]
+
+    def _dispatch(self):
+        """Hand free slots to waiting requests."""
+        while self._active < self.slots and self._queued:
+            priority = min(p for p, sessions in self._queues.items() if sessions)
+            sessions = self._queues[priority]
+            session_id, waiting = next(iter(sessions.items()))
+            ticket = waiting.popleft()
+            self._queued -= 1
+            # Rotate the session to the back of its priority
+            del sessions[session_id]
+            if waiting:
+                sessions[session_id] = waiting
+            if not sessions:
+                del self._queues[priority]
+            self._start(ticket)
+            ticket.granted.set_result(None)
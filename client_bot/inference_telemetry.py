@@ -0,0 +1,142 @@
+# client_bot/inference_telemetry.py
+"""
+Per-model inference telemetry for the health report.
+
+The scheduler fills a stats dict for every request: queue wait, time to
+first token and total time measured around the request, plus the token
+counts and prompt/generation timings llama.cpp reports for it (see
+`server_timings` and `parse_llama_timings` in llama_cpp_wrapper.py).
+InferenceTelemetry folds those into fixed-bucket histograms, so memory
+stays constant and the snapshot sent to the server bot is the same size
+however many requests were served.
+"""
+from bisect import bisect_left
+from typing import Dict, Iterable
+
+# Upper bounds of the histogram buckets; one overflow bucket follows
+LATENCY_MS_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+TOKEN_RATE_BUCKETS = (1, 2, 5, 10, 15, 20, 30, 40, 50, 75, 100, 150, 200, 300, 500, 1000, 2000)
+
+
+def tokens_per_second(tokens: float, ms: float) -> float:
+    return tokens / ms * 1000 if tokens and ms and ms > 0 else 0.0
+
+
+class Histogram:
+    """Counts per bucket with sum, min and max; quantiles are interpolated within a bucket."""
+
+    def __init__(self, bounds: Iterable[float]):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.min = value if not self.count else min(self.min, value)
+        self.max = max(self.max, value)
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for i, count in enumerate(self.counts):
+            if count and seen + count >= target:
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = self.bounds[i] if i < len(self.bounds) else self.max
+                estimate = lower + (upper - lower) * (target - seen) / count
+                return max(self.min, min(estimate, self.max))
+            seen += count
+        return self.max
+
+    def to_dict(self, buckets: bool = True) -> Dict[str, object]:
+        summary = {
+            "count": self.count,
+            "mean": round(self.sum / self.count, 2) if self.count else 0.0,
+            "max": round(self.max, 2),
+            "p50": round(self.quantile(0.5), 2),
+            "p95": round(self.quantile(0.95), 2),
+            "p99": round(self.quantile(0.99), 2),
+        }
+        if buckets:
+            summary["le"] = list(self.bounds)
+            summary["buckets"] = list(self.counts)
+        return summary
+
+
+def request_metrics(stats: Dict[str, float]) -> Dict[str, float]:
+    """
+    Timings and rates of one request from the stats dict the scheduler
+    filled. Rates come from llama.cpp's own timings when it reported them,
+    otherwise from the time between the first token and the end.
+    """
+    generated = stats.get("predicted_tokens") or stats.get("generated_tokens", 0)
+    generation_ms = stats.get("predicted_ms")
+    if not generation_ms and "time_to_first_token_ms" in stats:
+        generation_ms = stats.get("total_ms", 0) - stats["time_to_first_token_ms"]
+    # Rounded, as these travel in size-limited Discord frames
+    return {
+        "prompt_tokens": stats.get("prompt_tokens", 0),
+        "cached_tokens": stats.get("cached_tokens", 0),
+        "generated_tokens": generated,
+        "queue_wait_ms": round(stats.get("queue_wait_ms", 0.0), 1),
+        "time_to_first_token_ms": round(stats.get("time_to_first_token_ms", 0.0), 1),
+        "total_ms": round(stats.get("total_ms", 0.0), 1),
+        "prompt_tokens_per_second": round(
+            tokens_per_second(stats.get("prompt_eval_tokens", 0), stats.get("prompt_ms", 0)), 2
+        ),
+        "generation_tokens_per_second": round(tokens_per_second(generated, generation_ms), 2),
+    }
+
+
+class InferenceTelemetry:
+    """
+    Usage:
+        telemetry = InferenceTelemetry()
+        telemetry.record(stats)
+        telemetry.snapshot()
+    """
+
+    LATENCIES = ("queue_wait_ms", "time_to_first_token_ms", "total_ms")
+    RATES = ("prompt_tokens_per_second", "generation_tokens_per_second")
+
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {
+            **{name: Histogram(LATENCY_MS_BUCKETS) for name in self.LATENCIES},
+            **{name: Histogram(TOKEN_RATE_BUCKETS) for name in self.RATES},
+        }
+        self.requests = 0
+        self.prompt_tokens = 0
+        self.cached_tokens = 0
+        self.generated_tokens = 0
+
+    def record(self, stats: Dict[str, float]) -> Dict[str, float]:
+        """Add a completed request; returns its request_metrics."""
+        metrics = request_metrics(stats)
+        self.requests += 1
+        self.prompt_tokens += metrics["prompt_tokens"]
+        self.cached_tokens += metrics["cached_tokens"]
+        self.generated_tokens += metrics["generated_tokens"]
+        for name in self.LATENCIES:
+            if name in stats:
+                self.histograms[name].observe(metrics[name])
+        # A rate of 0 means llama.cpp did not report that phase
+        for name in self.RATES:
+            if metrics[name] > 0:
+                self.histograms[name].observe(metrics[name])
+        return metrics
+
+    def snapshot(self, buckets: bool = True) -> Dict[str, object]:
+        """Totals and histogram summaries; `buckets=False` leaves out the bucket counts."""
+        return {
+            "requests": self.requests,
+            "prompt_tokens": self.prompt_tokens,
+            "cached_tokens": self.cached_tokens,
+            "generated_tokens": self.generated_tokens,
+            **{name: histogram.to_dict(buckets) for name, histogram in self.histograms.items()},
+        }
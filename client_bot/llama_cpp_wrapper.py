@@ -1,11 +1,26 @@
 # client_bot/llama_cpp_wrapper.py
+import asyncio
+import json
+import logging
+import socket
 import subprocess
 import threading
 import queue
 import platform
 import os
+import re
+import time
+import aiohttp
 from pydantic import BaseModel, Field
-from typing import Optional
+from pathlib import Path
+from typing import AsyncIterator, Optional
+
+try:
+    from inference_telemetry import tokens_per_second
+except ImportError:  # imported as client_bot.llama_cpp_wrapper
+    from client_bot.inference_telemetry import tokens_per_second
+
+logger = logging.getLogger(__name__)
 
 # --- Configuration Models ---
 class LlamaCppConfig(BaseModel):
@@ -22,6 +37,18 @@ class LlamaCppConfig(BaseModel):
     n_ctx: int = 4096
     # Additional flags to pass to the executable
     extra_flags: list[str] = []
+    # Path to the llama.cpp HTTP server used by LlamaServerBackend
+    server_executable_path: str = "./llama.cpp/llama-server"
+    # Requests the server decodes concurrently (llama-server -np)
+    parallel_slots: int = 4
+    # Seconds to wait for the server to load a model
+    startup_timeout: float = 120.0
+    # Requests allowed to wait for a slot before new ones are rejected
+    max_queue_depth: int = 32
+    # Directory the server saves and restores slot KV states through; None disables prompt caching
+    prompt_cache_dir: Optional[str] = None
+    # Memory budget for saved KV states across all loaded models
+    prompt_cache_budget_mb: int = 4096
 
 class InferenceRequest(BaseModel):
     """Represents a single request for LLM inference."""
@@ -34,8 +61,59 @@ class InferenceRequest(BaseModel):
 class InferenceResult(BaseModel):
     """The result of an LLM inference."""
     text: str
+    # Generation rate, from llama.cpp's eval timing
     tokens_per_second: float = 0.0
     inference_time_ms: int = 0
+    prompt_tokens: int = 0
+    generated_tokens: int = 0
+    prompt_tokens_per_second: float = 0.0
+
+# --- Timing Parsing ---
+# After a run the llama.cpp executable prints lines like
+#   llama_print_timings: prompt eval time =   234.56 ms /    12 tokens (...)
+#   llama_print_timings:        eval time =  1234.56 ms /    63 runs   (...)
+# to stderr (llama_perf_context_print / llama_perf_sampler_print in newer
+# builds, where "sample time" reads "sampling time").
+_TIMING_LINE = re.compile(
+    r"^\s*llama_(?:print_timings|perf_\w+_print):\s*"
+    r"(?P<name>load|sample|sampling|prompt eval|eval|total) time\s*=\s*(?P<ms>[\d.]+) ms"
+    r"(?:\s*/\s*(?P<count>\d+) (?:runs|tokens))?"
+)
+_TIMING_KEYS = {
+    "load": ("load_ms", None),
+    "sample": ("sample_ms", "sampled_tokens"),
+    "sampling": ("sample_ms", "sampled_tokens"),
+    "prompt eval": ("prompt_ms", "prompt_eval_tokens"),
+    "eval": ("predicted_ms", "predicted_tokens"),
+    "total": ("total_ms", None),
+}
+
+
+def parse_llama_timings(output: str) -> dict:
+    """Timings and token counts from llama.cpp's stderr, keyed like server_timings."""
+    timings = {}
+    for line in output.splitlines():
+        match = _TIMING_LINE.match(line)
+        if not match:
+            continue
+        ms_key, count_key = _TIMING_KEYS[match["name"]]
+        timings[ms_key] = float(match["ms"])
+        if count_key and match["count"] is not None:
+            timings[count_key] = int(match["count"])
+    return timings
+
+
+def server_timings(data: dict) -> dict:
+    """Timings and token counts from the `timings` of a llama.cpp server response."""
+    timings = data.get("timings") or {}
+    keys = {
+        "prompt_n": "prompt_eval_tokens",
+        "prompt_ms": "prompt_ms",
+        "predicted_n": "predicted_tokens",
+        "predicted_ms": "predicted_ms",
+    }
+    return {ours: timings[theirs] for theirs, ours in keys.items() if theirs in timings}
+
 
 class LlamaCppWrapper:
     """
@@ -95,6 +173,7 @@ class LlamaCppWrapper:
             request, result_queue = item
             
             try:
+                started = time.perf_counter()
                 command = self._build_command(request)
                 print(f"Running command: {' '.join(command)}")
 
@@ -110,24 +189,25 @@ class LlamaCppWrapper:
                     encoding='utf-8'
                 )
 
-                # Write the prompt to stdin
-                process.stdin.write(request.prompt)
-                process.stdin.close()
-
-                # Read the output
-                stdout, stderr = process.communicate()
+                # Write the prompt to stdin and read the output
+                stdout, stderr = process.communicate(request.prompt)
 
                 if process.returncode != 0:
                     raise RuntimeError(f"llama.cpp process failed:\n{stderr}")
 
-                # --- Result Parsing (Simplified) ---
-                # A real implementation would parse the stderr stream for metrics
-                # like tokens/sec that llama.cpp prints during generation.
+                timings = parse_llama_timings(stderr)
+                wall_ms = (time.perf_counter() - started) * 1000
                 result = InferenceResult(
                     text=stdout.strip(),
-                    # Dummy metrics for now
-                    tokens_per_second=50.0,
-                    inference_time_ms=1500
+                    tokens_per_second=tokens_per_second(
+                        timings.get("predicted_tokens", 0), timings.get("predicted_ms", 0)
+                    ),
+                    inference_time_ms=int(timings.get("total_ms", wall_ms)),
+                    prompt_tokens=timings.get("prompt_eval_tokens", 0),
+                    generated_tokens=timings.get("predicted_tokens", 0),
+                    prompt_tokens_per_second=tokens_per_second(
+                        timings.get("prompt_eval_tokens", 0), timings.get("prompt_ms", 0)
+                    )
                 )
                 result_queue.put(result)
 
@@ -136,6 +216,20 @@ class LlamaCppWrapper:
                 result_queue.put(e)
 
 
+    async def generate(self, prompt: str, temperature: float = 0.8, top_p: float = 0.95, max_tokens: int = 2048) -> str:
+        """Run one request on the worker thread without blocking the event loop."""
+        request = InferenceRequest(prompt=prompt, temperature=temperature, top_p=top_p, max_tokens=max_tokens)
+        result = await asyncio.to_thread(self.submit_request(request).get)
+        if isinstance(result, Exception):
+            raise result
+        return result.text
+
+    async def generate_stream(
+        self, prompt: str, temperature: float = 0.8, top_p: float = 0.95, max_tokens: int = 2048
+    ) -> AsyncIterator[str]:
+        """The spawned process only returns complete output, so this yields once."""
+        yield await self.generate(prompt, temperature=temperature, top_p=top_p, max_tokens=max_tokens)
+
     def _build_command(self, request: InferenceRequest) -> list[str]:
         """Constructs the command-line arguments for llama.cpp."""
         model_path = request.model_path or self.config.default_model_path
@@ -161,6 +255,224 @@ class LlamaCppWrapper:
         return command
 
 
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class LlamaServerBackend:
+    """
+    Keeps one long-lived llama.cpp server process per model and talks to it
+    over HTTP, so the model is loaded once instead of on every request and
+    concurrent requests share the server's decoding slots.
+
+    Usage:
+        backend = LlamaServerBackend(config, model_path)
+        await backend.start()
+        async for chunk in backend.generate_stream(prompt):
+            ...
+        await backend.stop()
+    """
+    def __init__(self, config: LlamaCppConfig, model_path: Optional[str] = None, port: Optional[int] = None):
+        self.config = config
+        self.model_path = model_path or config.default_model_path
+        self.host = "127.0.0.1"
+        self.port = port
+        self.process: Optional[asyncio.subprocess.Process] = None
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._start_lock = asyncio.Lock()
+
+    @property
+    def base_url(self) -> str:
+        return f"http://{self.host}:{self.port}"
+
+    @property
+    def slot_save_path(self) -> Optional[str]:
+        """Where the server saves slot KV states, one directory per model"""
+        if not self.config.prompt_cache_dir:
+            return None
+        return os.path.join(self.config.prompt_cache_dir, Path(self.model_path).stem)
+
+    @property
+    def is_running(self) -> bool:
+        return self.process is not None and self.process.returncode is None
+
+    def _build_command(self) -> list[str]:
+        command = [
+            self.config.server_executable_path,
+            "-m", self.model_path,
+            "--host", self.host,
+            "--port", str(self.port),
+            "-t", str(self.config.threads),
+            "-c", str(self.config.n_ctx),
+            "-np", str(self.config.parallel_slots),
+        ]
+        if self.slot_save_path:
+            command.extend(["--slot-save-path", self.slot_save_path])
+        if platform.system() == "Darwin":
+            command.extend(["-ngl", str(self.config.n_gpu_layers)])
+        command.extend(self.config.extra_flags)
+        return command
+
+    async def start(self):
+        """Spawn the server and wait until the model is loaded."""
+        async with self._start_lock:
+            if self.is_running:
+                return
+            if not os.path.exists(self.config.server_executable_path):
+                raise FileNotFoundError(
+                    f"llama.cpp server not found at: {self.config.server_executable_path}"
+                )
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(f"Model not found at: {self.model_path}")
+
+            self.port = self.port or _free_port()
+            if self.slot_save_path:
+                os.makedirs(self.slot_save_path, exist_ok=True)
+            command = self._build_command()
+            logger.info(f"Starting llama.cpp server: {' '.join(command)}")
+            self.process = await asyncio.create_subprocess_exec(
+                *command,
+                stdin=asyncio.subprocess.DEVNULL,
+                stdout=asyncio.subprocess.DEVNULL,
+                stderr=asyncio.subprocess.DEVNULL
+            )
+            self._session = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=None, sock_connect=5))
+            try:
+                await self._wait_until_ready()
+            except Exception:
+                await self.stop()
+                raise
+
+    async def _wait_until_ready(self):
+        deadline = asyncio.get_running_loop().time() + self.config.startup_timeout
+        while asyncio.get_running_loop().time() < deadline:
+            if self.process.returncode is not None:
+                raise RuntimeError(f"llama.cpp server exited with code {self.process.returncode}")
+            try:
+                async with self._session.get(f"{self.base_url}/health") as response:
+                    # 503 while the model is still loading
+                    if response.status == 200:
+                        logger.info(f"llama.cpp server ready on port {self.port} ({self.model_path})")
+                        return
+            except aiohttp.ClientConnectionError:
+                pass
+            await asyncio.sleep(0.05)
+        raise TimeoutError(f"llama.cpp server did not load {self.model_path} in {self.config.startup_timeout}s")
+
+    async def stop(self):
+        """Terminate the server process."""
+        if self._session:
+            await self._session.close()
+            self._session = None
+        if self.process and self.process.returncode is None:
+            self.process.terminate()
+            try:
+                await asyncio.wait_for(self.process.wait(), timeout=10)
+            except asyncio.TimeoutError:
+                self.process.kill()
+                await self.process.wait()
+        self.process = None
+
+    def _payload(
+        self, prompt: str, temperature: float, top_p: float, max_tokens: int, stream: bool, slot_id: Optional[int]
+    ) -> dict:
+        payload = {
+            "prompt": prompt,
+            "n_predict": max_tokens,
+            "temperature": temperature,
+            "top_p": top_p,
+            "stream": stream,
+            # Only evaluate the prompt past the prefix already in the slot's KV cache
+            "cache_prompt": True,
+        }
+        if slot_id is not None:
+            payload["id_slot"] = slot_id
+        return payload
+
+    def _record_stats(self, stats: Optional[dict], data: dict):
+        """Token counts and timings from a final completion response"""
+        if stats is None:
+            return
+        stats.update(server_timings(data))
+        prompt_tokens = data.get("tokens_evaluated", 0)
+        evaluated = data.get("timings", {}).get("prompt_n", prompt_tokens)
+        stats["prompt_tokens"] = prompt_tokens
+        stats["cached_tokens"] = max(prompt_tokens - evaluated, 0)
+        stats["predicted_tokens"] = data.get("tokens_predicted", 0)
+
+    async def _post(self, path: str, payload: dict) -> aiohttp.ClientResponse:
+        if not self.is_running:
+            await self.start()
+        response = await self._session.post(f"{self.base_url}{path}", json=payload)
+        if response.status != 200:
+            detail = await response.text()
+            response.release()
+            raise RuntimeError(f"llama.cpp server error {response.status}: {detail}")
+        return response
+
+    async def generate(
+        self,
+        prompt: str,
+        temperature: float = 0.8,
+        top_p: float = 0.95,
+        max_tokens: int = 2048,
+        slot_id: Optional[int] = None,
+        stats: Optional[dict] = None
+    ) -> str:
+        """Return the full completion for a prompt."""
+        payload = self._payload(prompt, temperature, top_p, max_tokens, stream=False, slot_id=slot_id)
+        async with await self._post("/completion", payload) as response:
+            data = await response.json()
+        self._record_stats(stats, data)
+        return data["content"]
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        temperature: float = 0.8,
+        top_p: float = 0.95,
+        max_tokens: int = 2048,
+        slot_id: Optional[int] = None,
+        stats: Optional[dict] = None
+    ) -> AsyncIterator[str]:
+        """
+        Yield completion text as the server produces it. `slot_id` pins the
+        request to a decoding slot; `stats` is filled with token counts and
+        the server's prompt/generation timings.
+        """
+        payload = self._payload(prompt, temperature, top_p, max_tokens, stream=True, slot_id=slot_id)
+        async with await self._post("/completion", payload) as response:
+            # Server-sent events: "data: {json}" lines separated by blank lines
+            async for line in response.content:
+                line = line.strip()
+                if not line.startswith(b"data:"):
+                    continue
+                event = json.loads(line[5:])
+                if event.get("content"):
+                    yield event["content"]
+                if event.get("stop"):
+                    self._record_stats(stats, event)
+                    break
+
+    async def _slot_action(self, slot_id: int, action: str, filename: Optional[str] = None):
+        payload = {"filename": filename} if filename else {}
+        async with await self._post(f"/slots/{slot_id}?action={action}", payload) as response:
+            return await response.json()
+
+    async def save_slot(self, slot_id: int, filename: str):
+        """Write a slot's KV state to `filename` under slot_save_path."""
+        return await self._slot_action(slot_id, "save", filename)
+
+    async def restore_slot(self, slot_id: int, filename: str):
+        """Load a KV state saved by save_slot into a slot."""
+        return await self._slot_action(slot_id, "restore", filename)
+
+    async def erase_slot(self, slot_id: int):
+        return await self._slot_action(slot_id, "erase")
+
+
 # --- Example Usage ---
 if __name__ == "__main__":
     # This demonstrates how the wrapper would be used by the client-bot.
@@ -0,0 +1,226 @@
+# client_bot/prompt_cache.py
+"""
+Session-affine prompt (KV) cache for the llama.cpp server.
+
+Every chat turn resends the whole conversation. The server keeps the KV
+state of the last prompt in each decoding slot and, with `cache_prompt`,
+only evaluates the tokens after the longest common prefix. This module
+makes that prefix belong to the right session: a session goes back to the
+slot still holding its conversation when it is free. When a slot is handed
+to another session, the state it holds is saved first and later restored
+into whichever slot its session gets next.
+
+Saved states are held in memory; the server's slot save directory is only
+used to pass them in and out. They are evicted least-recently-used when
+their total size exceeds a memory budget shared by all loaded models
+(CacheBudget, owned by ModelManager).
+"""
+import asyncio
+import hashlib
+import logging
+import os
+import re
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def _read_and_remove(path: str) -> bytes:
+    with open(path, "rb") as f:
+        data = f.read()
+    os.remove(path)
+    return data
+
+
+def _write(path: str, data: bytes):
+    with open(path, "wb") as f:
+        f.write(data)
+
+
+def prefix_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class CachedPrefix:
+    """Conversation text whose KV state is held in a slot or a saved file."""
+    hash: str
+    length: int
+
+    @classmethod
+    def of(cls, text: str) -> "CachedPrefix":
+        return cls(prefix_hash(text), len(text))
+
+    def is_prefix_of(self, prompt: str) -> bool:
+        return len(prompt) >= self.length and prefix_hash(prompt[:self.length]) == self.hash
+
+
+class CacheBudget:
+    """Memory budget in bytes for saved KV states across every model's PromptCache."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.used_bytes = 0
+        # (cache, session id) -> size, least recently used first
+        self._entries: "OrderedDict[Tuple[PromptCache, str], int]" = OrderedDict()
+
+    def charge(self, cache: "PromptCache", session_id: str, size: int):
+        """Record a saved state's size and evict others to stay in budget."""
+        key = (cache, session_id)
+        self.used_bytes -= self._entries.pop(key, 0)
+        self._entries[key] = size
+        self.used_bytes += size
+        while self.used_bytes > self.max_bytes and len(self._entries) > 1:
+            (victim, victim_session), _ = next(iter(self._entries.items()))
+            if (victim, victim_session) == key:
+                break
+            victim.evict_saved(victim_session)
+
+    def touch(self, cache: "PromptCache", session_id: str):
+        key = (cache, session_id)
+        if key in self._entries:
+            self._entries.move_to_end(key)
+
+    def release(self, cache: "PromptCache", session_id: str):
+        self.used_bytes -= self._entries.pop((cache, session_id), 0)
+
+
+class PromptCache:
+    """
+    Tracks which session's conversation each server slot holds and the
+    saved states of the others. Works with a backend exposing save_slot,
+    restore_slot and a slot_save_path directory.
+    """
+
+    def __init__(self, backend, budget: CacheBudget):
+        self.backend = backend
+        self.budget = budget
+        self._resident: Dict[int, Tuple[str, CachedPrefix]] = {}
+        self._saved: Dict[str, Tuple[CachedPrefix, bytes]] = {}
+        self._slot_last_used: Dict[int, int] = {}
+        self._clock = 0
+
+        self.lookups = 0
+        self.slot_hits = 0
+        self.restores = 0
+        self.saves = 0
+        self.prompt_tokens = 0
+        self.prompt_tokens_skipped = 0
+
+    def _filename(self, session_id: str) -> str:
+        return re.sub(r"[^A-Za-z0-9_.-]", "_", session_id) + ".bin"
+
+    def choose_slot(self, session_id: str, free_slots: List[int]) -> int:
+        """The free slot already holding the session, else the least recently used one."""
+        for slot in free_slots:
+            resident = self._resident.get(slot)
+            if resident and resident[0] == session_id:
+                return slot
+        return min(free_slots, key=lambda slot: self._slot_last_used.get(slot, -1))
+
+    async def prepare(self, slot: int, session_id: str, prompt: str) -> bool:
+        """
+        Get the session's cached prefix into `slot` before generation,
+        saving the state of another session the slot still holds.
+        Returns whether the prompt will reuse cached state.
+        """
+        self.lookups += 1
+        self._clock += 1
+        self._slot_last_used[slot] = self._clock
+
+        resident = self._resident.pop(slot, None)
+        if resident and resident[0] == session_id and resident[1].is_prefix_of(prompt):
+            self._resident[slot] = resident
+            self.slot_hits += 1
+            self.budget.touch(self, session_id)
+            return True
+        if resident and resident[0] != session_id:
+            await self._save(slot, *resident)
+
+        saved = self._saved.get(session_id)
+        if saved and saved[0].is_prefix_of(prompt):
+            try:
+                await self._restore(slot, session_id, saved[1])
+            except Exception as e:
+                logger.warning(f"Could not restore prompt cache of session {session_id}: {e}")
+                self.evict_saved(session_id)
+            else:
+                self._resident[slot] = (session_id, saved[0])
+                self.restores += 1
+                self.budget.touch(self, session_id)
+                return True
+
+        # The slot's KV no longer matches any session once this prompt runs
+        return False
+
+    async def store(self, slot: int, session_id: str, conversation: str, stats: Optional[dict] = None):
+        """Record that the slot holds the session after a turn; `conversation` is prompt plus completion."""
+        if stats:
+            self.prompt_tokens += stats.get("prompt_tokens", 0)
+            self.prompt_tokens_skipped += stats.get("cached_tokens", 0)
+        self._resident[slot] = (session_id, CachedPrefix.of(conversation))
+
+    async def _save(self, slot: int, session_id: str, cached: CachedPrefix):
+        """Copy a slot's state into memory before the slot is reused."""
+        saved = self._saved.get(session_id)
+        if saved and saved[0].length >= cached.length:
+            return
+        filename = self._filename(session_id)
+        try:
+            await self.backend.save_slot(slot, filename)
+            state = await asyncio.to_thread(
+                _read_and_remove, os.path.join(self.backend.slot_save_path, filename)
+            )
+        except Exception as e:
+            logger.warning(f"Could not save prompt cache of session {session_id}: {e}")
+            return
+        self._saved[session_id] = (cached, state)
+        self.saves += 1
+        self.budget.charge(self, session_id, len(state))
+
+    async def _restore(self, slot: int, session_id: str, state: bytes):
+        path = os.path.join(self.backend.slot_save_path, self._filename(session_id))
+        await asyncio.to_thread(_write, path, state)
+        try:
+            await self.backend.restore_slot(slot, self._filename(session_id))
+        finally:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def forget_slot(self, slot: int):
+        """The slot's KV state is unknown (the request failed or was cancelled)."""
+        self._resident.pop(slot, None)
+
+    def evict_saved(self, session_id: str):
+        """Drop a session's saved state; a slot may still hold it."""
+        self._saved.pop(session_id, None)
+        self.budget.release(self, session_id)
+
+    def drop_session(self, session_id: str):
+        """Forget everything cached for a session, e.g. when its channel is closed."""
+        self.evict_saved(session_id)
+        for slot, (resident, _) in list(self._resident.items()):
+            if resident == session_id:
+                del self._resident[slot]
+
+    def clear(self):
+        """Drop every saved state, e.g. when the model is unloaded."""
+        for session_id in list(self._saved):
+            self.evict_saved(session_id)
+        self._resident.clear()
+
+    def metrics(self) -> Dict[str, float]:
+        hits = self.slot_hits + self.restores
+        return {
+            "prompt_cache_hit_ratio": hits / self.lookups if self.lookups else 0.0,
+            "prompt_cache_slot_hits": self.slot_hits,
+            "prompt_cache_restores": self.restores,
+            "prompt_cache_saves": self.saves,
+            "prompt_cache_sessions": len(self._saved),
+            "prompt_tokens": self.prompt_tokens,
+            "prompt_tokens_skipped": self.prompt_tokens_skipped,
+        }
@@ -0,0 +1,143 @@
+# client_bot/stream_coalescer.py
+"""
+Batches generated tokens into sequence-numbered frames for Discord.
+
+Sending one message per token hits Discord's per-channel rate limit
+(5 messages / 5 s) almost immediately at 30-50 tokens/s. The coalescer
+buffers tokens and sends a frame when the oldest buffered token is
+`flush_interval` seconds old or the buffer reaches `max_chars`. While a
+send is held up by rate limiting, tokens keep accumulating, so frames
+grow instead of queueing up behind each other.
+
+Frames carry a `seq` number so the server bot can put them back in order
+(server/server_bot/stream_assembler.py); the last frame has
+`is_complete: True`.
+
+With a `fallback` sender, a send that raises ConnectionError (the direct
+link dropped) switches the rest of the stream to the fallback, re-split
+to `fallback_max_chars`; the sequence numbers carry on, so the server bot
+reassembles frames from both transports into one response.
+"""
+import asyncio
+import json
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# An encrypted frame must fit in one 2000-character Discord message;
+# base64 and the JSON envelope leave room for about this much text,
+# counted as JSON-escaped characters (non-ASCII expands to \uXXXX).
+MAX_FRAME_CHARS = 900
+
+
+def escaped_len(text: str) -> int:
+    return len(json.dumps(text)) - 2
+
+
+def split_text(text: str, max_chars: int) -> List[str]:
+    """Split text into pieces whose JSON-escaped length is at most max_chars."""
+    if escaped_len(text) <= max_chars:
+        return [text]
+    pieces, start, size = [], 0, 0
+    for i, ch in enumerate(text):
+        width = escaped_len(ch)
+        if size + width > max_chars and i > start:
+            pieces.append(text[start:i])
+            start, size = i, 0
+        size += width
+    pieces.append(text[start:])
+    return pieces
+
+
+class StreamCoalescer:
+    """
+    Usage:
+        coalescer = StreamCoalescer(send, {"session_id": ..., "request_id": ...})
+        async for chunk in stream:
+            await coalescer.add(chunk)
+        await coalescer.close({"total_tokens": n})
+    """
+
+    def __init__(
+        self,
+        send: Callable[[Dict[str, Any]], Awaitable[Any]],
+        envelope: Dict[str, Any],
+        flush_interval: float = 0.35,
+        max_chars: int = MAX_FRAME_CHARS,
+        fallback: Optional[Callable[[Dict[str, Any]], Awaitable[Any]]] = None,
+        fallback_max_chars: int = MAX_FRAME_CHARS
+    ):
+        self.send = send
+        self.envelope = envelope
+        self.flush_interval = flush_interval
+        self.max_chars = max_chars
+        self.fallback = fallback
+        self.fallback_max_chars = fallback_max_chars
+        self.frames_sent = 0
+        self.tokens = 0
+        self._buffer: List[str] = []
+        self._chars = 0
+        self._seq = 0
+        self._lock = asyncio.Lock()
+        self._timer: Optional[asyncio.Task] = None
+
+    async def add(self, text: str):
+        """Buffer one generated chunk, flushing if the buffer is full."""
+        self._buffer.append(text)
+        self._chars += escaped_len(text)
+        self.tokens += 1
+        if self._chars >= self.max_chars:
+            await self.flush()
+        elif self._timer is None:
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        # Past this point the timer must not be cancelled mid-send
+        self._timer = None
+        await self.flush()
+
+    async def flush(self, is_complete: bool = False, metrics: Optional[Dict[str, Any]] = None):
+        """Send buffered text; with is_complete, send the final frame even if empty."""
+        self.cancel()
+        async with self._lock:
+            text = "".join(self._buffer)
+            self._buffer.clear()
+            self._chars = 0
+            if not text and not is_complete:
+                return
+            pieces = split_text(text, self.max_chars)
+            for i, piece in enumerate(pieces):
+                last = is_complete and i == len(pieces) - 1
+                await self._send_frame(piece, last, metrics if last else None)
+
+    async def close(self, metrics: Optional[Dict[str, Any]] = None):
+        """Flush the remaining text as the final frame."""
+        await self.flush(is_complete=True, metrics=metrics)
+
+    def cancel(self):
+        """Stop a pending timed flush, e.g. when generation failed."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+    async def _send_frame(self, text: str, is_complete: bool, metrics: Optional[Dict[str, Any]]):
+        frame = {
+            **self.envelope,
+            "seq": self._seq,
+            "response": text,
+            "is_complete": is_complete,
+            "metrics": metrics or {"tokens_generated": self.tokens},
+        }
+        try:
+            await self.send(frame)
+        except ConnectionError:
+            if self.fallback is None:
+                raise
+            self.send, self.fallback = self.fallback, None
+            self.max_chars = self.fallback_max_chars
+            pieces = split_text(text, self.max_chars)
+            for i, piece in enumerate(pieces):
+                last = i == len(pieces) - 1
+                await self._send_frame(piece, is_complete and last, metrics if last else None)
+            return
+        self._seq += 1
+        self.frames_sent += 1
@@ -38,15 +38,29 @@ async def main():
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
     s3_bucket = os.getenv("S3_BUCKET_NAME", "meatlizard-video-storage")
     temp_dir = os.getenv("TRANSCODING_TEMP_DIR", "/tmp/transcoding")
+    video_encoder = os.getenv("VIDEO_ENCODER", "libx264")
+    chunked_min_duration = int(os.getenv("CHUNKED_ENCODING_MIN_DURATION", "600"))
+    chunk_seconds = int(os.getenv("CHUNKED_ENCODING_CHUNK_SECONDS", "60"))
+    max_parallel_chunks = int(os.getenv("CHUNKED_ENCODING_MAX_PARALLEL", "0")) or None
+    direct_hls = os.getenv("HLS_DIRECT_ENCODE", "true").lower() == "true"
+    hls_single_file = os.getenv("HLS_SINGLE_FILE", "true").lower() == "true"
+    keep_progressive_mp4 = os.getenv("HLS_KEEP_PROGRESSIVE_MP4", "true").lower() == "true"
     
     logger.info(f"Configuration:")
     logger.info(f"  Database URL: {database_url}")
     logger.info(f"  Redis URL: {redis_url}")
     logger.info(f"  S3 Bucket: {s3_bucket}")
     logger.info(f"  Temp Directory: {temp_dir}")
+    logger.info(f"  Video Encoder: {video_encoder}")
+    logger.info(f"  Chunked Encoding: >= {chunked_min_duration}s in {chunk_seconds}s chunks")
+    logger.info(f"  Direct HLS: {direct_hls} (single file: {hls_single_file}, progressive MP4: {keep_progressive_mp4})")
     
     # Create and start worker
-    worker = TranscodingWorker(database_url, redis_url, s3_bucket, temp_dir)
+    worker = TranscodingWorker(
+        database_url, redis_url, s3_bucket, temp_dir, video_encoder,
+        chunked_min_duration, chunk_seconds, max_parallel_chunks,
+        direct_hls, hls_single_file, keep_progressive_mp4
+    )
     
     try:
         await worker.start()
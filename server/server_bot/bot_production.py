@@ -9,10 +9,12 @@ import os
 import asyncio
 import json
 import uuid
+import functools
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Optional, Any
 import base64
+import boto3
 
 # Import shared libraries
 import sys
@@ -20,7 +22,13 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent))
 
 from server.shared_lib.encryption import PayloadEncryptor
+from shared_lib.crypto import get_encryptor
 from server.shared_lib.config import ServerBotConfig
+from server.server_bot.stream_assembler import StreamAssembler
+from server.server_bot.direct_transport import DirectLinkServer
+from server.server_bot.session_dispatcher import SessionDispatcher, WarmChannelPool
+from server.server_bot.transcript_archiver import TranscriptArchiver, log_chat_message
+from server.web.app.services.chat_bus import ChatBus
 from server.web.app.models import (
     User, AIChatSession, AIChatMessage, SystemMetrics, 
     UptimeRecord, BackupLog
@@ -36,6 +44,10 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+SESSION_CATEGORY = "AI Chat Sessions"
+# Pooled channels are still "session-" channels, so both bots accept them
+WARM_CHANNEL_PREFIX = "session-warm-"
+
 class MeatLizardServerBot(commands.Bot):
     """Production Discord Server Bot for MeatLizard AI Platform."""
     
@@ -64,6 +76,29 @@ class MeatLizardServerBot(commands.Bot):
         self.message_queue: Optional[asyncio.Queue] = None
         self.response_queues: Dict[str, asyncio.Queue] = {}
         
+        # Redis Streams bus replacing the queues when web workers run out of process
+        self.chat_bus: Optional[ChatBus] = None
+        if self.config.CHAT_BUS_URL:
+            self.chat_bus = ChatBus.from_url(self.config.CHAT_BUS_URL)
+        self.chat_bus_consumer = f"server-bot-{os.getpid()}"
+        
+        # Web messages run in per-session order, sessions concurrently
+        self.dispatcher = SessionDispatcher(
+            self._handle_web_message,
+            max_concurrency=self.config.MAX_CONCURRENT_WEB_MESSAGES
+        )
+        self.channel_pool: Optional[WarmChannelPool] = None
+        
+        # Reorders the client bot's response frames per request
+        self.stream_assembler = StreamAssembler()
+        
+        # Optional WebSocket link the client bot dials into
+        self.direct_link: Optional[DirectLinkServer] = None
+        self._background_tasks: set = set()
+        
+        # Uploads closed sessions' transcripts off the close path
+        self.transcript_archiver: Optional[TranscriptArchiver] = None
+        
         # Database session
         self.db_session: Optional[AsyncSession] = None
     
@@ -77,6 +112,31 @@ class MeatLizardServerBot(commands.Bot):
         # Load cogs
         await self._load_cogs()
         
+        # Transcript archival
+        if self.config.S3_BUCKET_NAME:
+            self.transcript_archiver = TranscriptArchiver(
+                self.db_session,
+                boto3.client(
+                    "s3",
+                    aws_access_key_id=self.config.S3_ACCESS_KEY_ID or None,
+                    aws_secret_access_key=self.config.S3_SECRET_ACCESS_KEY or None,
+                    region_name=self.config.S3_REGION
+                ),
+                self.config.S3_BUCKET_NAME,
+                codec=self.config.TRANSCRIPT_CODEC or None
+            )
+            self.transcript_archiver.start()
+        
+        # Direct link to the client bot
+        if self.config.DIRECT_LINK_PORT:
+            self.direct_link = DirectLinkServer(
+                self.encryptor,
+                self._handle_direct_frame,
+                host=self.config.DIRECT_LINK_HOST,
+                port=self.config.DIRECT_LINK_PORT
+            )
+            await self.direct_link.start()
+        
         # Start background tasks
         self.health_monitor.start()
         self.session_cleanup.start()
@@ -87,6 +147,19 @@ class MeatLizardServerBot(commands.Bot):
         
         logger.info("Server Bot setup complete")
     
+    async def close(self):
+        """Stop background work before disconnecting."""
+        await self.dispatcher.close()
+        if self.transcript_archiver:
+            await self.transcript_archiver.close()
+        if self.channel_pool:
+            await self.channel_pool.close()
+        if self.direct_link:
+            await self.direct_link.stop()
+        if self.chat_bus:
+            await self.chat_bus.close()
+        await super().close()
+    
     async def _setup_database(self):
         """Setup database connection."""
         try:
@@ -146,6 +219,17 @@ class MeatLizardServerBot(commands.Bot):
             else:
                 logger.warning(f"Client bot {self.config.CLIENT_BOT_ID} not found in guild")
         
+        # Keep session channels ready ahead of new sessions
+        if self.channel_pool is None and self.guild:
+            self.channel_pool = WarmChannelPool(self._create_warm_channel, size=self.config.WARM_SESSION_CHANNELS)
+            category = discord.utils.get(self.guild.categories, name=SESSION_CATEGORY)
+            if category:
+                self.channel_pool.adopt([
+                    channel for channel in category.text_channels
+                    if channel.name.startswith(WARM_CHANNEL_PREFIX)
+                ])
+            self.channel_pool.start()
+        
         # Start message processing
         self.loop.create_task(self._process_message_queue())
         
@@ -170,35 +254,81 @@ class MeatLizardServerBot(commands.Bot):
         await self.process_commands(message)
     
     async def _handle_client_response(self, message: discord.Message):
-        """Handle response from client bot."""
+        """Handle a response frame from the client bot."""
         try:
-            session_id = message.channel.name.replace("session-", "")
-            
-            if session_id not in self.response_queues:
-                logger.warning(f"No response queue for session {session_id}")
-                return
-            
             # Decrypt response
             decrypted_data = self.encryptor.decrypt(message.content)
+            await self._handle_response_frame(decrypted_data)
+        except Exception as e:
+            logger.error(f"Error handling client response: {e}")
+    
+    async def _handle_direct_frame(self, kind: str, payload: Dict[str, Any]):
+        """Handle a frame from the client bot's direct link."""
+        if kind == "response":
+            await self._handle_response_frame(payload)
+        elif kind == "metrics":
+            await self._store_metrics(str(self.client_bot_id), payload)
+        else:
+            logger.warning(f"Unknown direct link frame: {kind}")
+    
+    async def _handle_response_frame(self, decrypted_data: Dict[str, Any]):
+        """Route one decrypted response frame to its session."""
+        try:
+            # Channel names only carry a prefix of the session id
+            session_id = decrypted_data.get("session_id", "")
+            request_id = decrypted_data.get("request_id")
+            if session_id not in self.active_sessions:
+                logger.warning(f"No active session {session_id} for response")
+                return
             
-            # Put response in queue
-            await self.response_queues[session_id].put(decrypted_data["response"])
+            if "error_type" in decrypted_data:
+                self.stream_assembler.discard(request_id)
+                await self._deliver_response(
+                    session_id, request_id, decrypted_data.get("error_message", ""), True, error=True
+                )
+                return
             
-            # Log to database
-            await self._log_ai_message(session_id, decrypted_data)
+            # Forward frames in sequence order
+            texts, full_response = self.stream_assembler.add(decrypted_data)
+            for i, text in enumerate(texts):
+                is_complete = full_response is not None and i == len(texts) - 1
+                await self._deliver_response(session_id, request_id, text, is_complete)
+            
+            # One message row per completed response
+            if full_response is not None:
+                await self._log_ai_message(session_id, request_id, "assistant", full_response)
             
         except Exception as e:
             logger.error(f"Error handling client response: {e}")
     
+    async def _deliver_response(
+        self, session_id: str, request_id: Optional[str], text: str, is_complete: bool, error: bool = False
+    ):
+        """Hand response text to the web side."""
+        if self.chat_bus:
+            await self.chat_bus.publish_response(session_id, {
+                "request_id": request_id,
+                "text": text,
+                "is_complete": is_complete,
+                "error": error
+            })
+        elif session_id in self.response_queues:
+            await self.response_queues[session_id].put(text)
+    
     async def _handle_metrics_message(self, message: discord.Message):
         """Handle metrics from client bot."""
         try:
             decrypted_data = self.encryptor.decrypt(message.content)
-            
-            # Store metrics in database
+            await self._store_metrics(str(message.author.id), decrypted_data)
+        except Exception as e:
+            logger.error(f"Error handling metrics: {e}")
+    
+    async def _store_metrics(self, client_bot_id: str, decrypted_data: Dict[str, Any]):
+        """Store client bot metrics in the database."""
+        try:
             async with self.db_session() as db:
                 metric = SystemMetrics(
-                    client_bot_id=str(message.author.id),
+                    client_bot_id=client_bot_id,
                     timestamp=datetime.utcnow(),
                     data=decrypted_data
                 )
@@ -214,9 +344,18 @@ class MeatLizardServerBot(commands.Bot):
         """Process messages from FastAPI web server."""
         while True:
             try:
-                if self.message_queue:
+                if self.chat_bus:
+                    # Acknowledged once handled; unacknowledged entries are
+                    # re-delivered if this process dies
+                    for entry_id, message in await self.chat_bus.read_requests(self.chat_bus_consumer):
+                        await self.dispatcher.submit(
+                            message.get("session_id"),
+                            message,
+                            on_done=functools.partial(self.chat_bus.ack_request, entry_id)
+                        )
+                elif self.message_queue:
                     message = await self.message_queue.get()
-                    await self._handle_web_message(message)
+                    await self.dispatcher.submit(message.get("session_id"), message)
                 else:
                     await asyncio.sleep(1)
             except Exception as e:
@@ -254,7 +393,8 @@ class MeatLizardServerBot(commands.Bot):
             }
             
             # Create response queue
-            self.response_queues[session_id] = asyncio.Queue()
+            if not self.chat_bus:
+                self.response_queues[session_id] = asyncio.Queue()
             
             # Log to database
             await self._log_session_creation(session_id, channel.id, user_id)
@@ -265,15 +405,39 @@ class MeatLizardServerBot(commands.Bot):
             logger.error(f"Error creating session: {e}")
     
     async def _create_session_channel(self, session_id: str) -> discord.TextChannel:
-        """Create a private Discord channel for the session."""
+        """Get a private Discord channel for the session, from the warm pool if possible."""
+        channel = self.channel_pool.acquire() if self.channel_pool else None
+        if channel is None:
+            return await self._create_private_channel(
+                f"session-{session_id[:8]}", f"AI Chat Session {session_id}"
+            )
+        
+        # Both bots identify sessions by payload, so the rename is only for
+        # people reading the channel list and need not hold up the session
+        self._spawn(self._label_session_channel(channel, session_id))
+        return channel
+    
+    async def _create_warm_channel(self) -> discord.TextChannel:
+        """Create a channel for the warm pool."""
+        return await self._create_private_channel(
+            f"{WARM_CHANNEL_PREFIX}{uuid.uuid4().hex[:8]}", "Reserved for a new AI chat session"
+        )
+    
+    async def _label_session_channel(self, channel: discord.TextChannel, session_id: str):
+        try:
+            await channel.edit(name=f"session-{session_id[:8]}", topic=f"AI Chat Session {session_id}")
+        except Exception as e:
+            logger.warning(f"Could not rename channel for session {session_id}: {e}")
+    
+    async def _create_private_channel(self, name: str, topic: str) -> discord.TextChannel:
+        """Create a channel only the bots and admins can read."""
         if not self.guild:
             raise RuntimeError("Guild not available")
         
         # Get or create category
-        category_name = "AI Chat Sessions"
-        category = discord.utils.get(self.guild.categories, name=category_name)
+        category = discord.utils.get(self.guild.categories, name=SESSION_CATEGORY)
         if not category:
-            category = await self.guild.create_category(category_name)
+            category = await self.guild.create_category(SESSION_CATEGORY)
         
         # Set permissions
         overwrites = {
@@ -297,10 +461,10 @@ class MeatLizardServerBot(commands.Bot):
         
         # Create channel
         channel = await self.guild.create_text_channel(
-            name=f"session-{session_id[:8]}",
+            name=name,
             category=category,
             overwrites=overwrites,
-            topic=f"AI Chat Session {session_id}"
+            topic=topic
         )
         
         return channel
@@ -336,12 +500,23 @@ class MeatLizardServerBot(commands.Bot):
                 "stream": options.get("stream", True)
             }
             
-            # Encrypt and send
-            encrypted_request = self.encryptor.encrypt(request_data)
-            await channel.send(encrypted_request)
+            # The channel id lets the client bot finish on Discord if the link drops
+            if self.direct_link and await self.direct_link.send("request", {**request_data, "channel_id": channel_id}):
+                # The channel keeps an audit record; the client bot skips it
+                self._spawn(channel.send(self.encryptor.encrypt({
+                    "audit": "direct_link",
+                    "session_id": session_id,
+                    "request_id": request_id
+                })))
+            else:
+                # Encrypt and send
+                encrypted_request = self.encryptor.encrypt(request_data)
+                await channel.send(encrypted_request)
             
             # Update session stats
             self.active_sessions[session_id]["message_count"] += 1
+            # User turn for the transcript
+            await self._log_user_prompt(session_id, prompt)
             
             logger.info(f"Sent AI request for session {session_id}")
             
@@ -362,53 +537,35 @@ class MeatLizardServerBot(commands.Bot):
             channel_id = self.active_sessions[session_id]["channel_id"]
             channel = self.guild.get_channel(channel_id)
             
-            # Archive transcript
             if channel:
-                await self._archive_transcript(session_id, channel)
                 await channel.delete(reason=f"Session ended: {reason}")
             
             # Clean up
             if session_id in self.response_queues:
                 del self.response_queues[session_id]
+            self.stream_assembler.discard_session(session_id)
+            if self.direct_link:
+                await self.direct_link.send("cancel", {"session_id": session_id})
             
             del self.active_sessions[session_id]
             
             # Log closure
             await self._log_session_closure(session_id, reason)
             
+            # Transcript comes from the stored messages, not the channel
+            if self.transcript_archiver:
+                await self.transcript_archiver.enqueue(session_id)
+            
             logger.info(f"Closed session {session_id}")
             
         except Exception as e:
             logger.error(f"Error closing session: {e}")
     
-    async def _archive_transcript(self, session_id: str, channel: discord.TextChannel):
-        """Archive session transcript to S3."""
-        try:
-            messages = []
-            async for message in channel.history(limit=None, oldest_first=True):
-                if not message.author.bot:
-                    continue
-                
-                messages.append({
-                    "timestamp": message.created_at.isoformat(),
-                    "author": str(message.author),
-                    "content": message.content,
-                    "message_id": str(message.id)
-                })
-            
-            transcript = {
-                "session_id": session_id,
-                "created_at": datetime.utcnow().isoformat(),
-                "message_count": len(messages),
-                "messages": messages
-            }
-            
-            # TODO: Upload to S3
-            # For now, just log
-            logger.info(f"Archived transcript for session {session_id} ({len(messages)} messages)")
-            
-        except Exception as e:
-            logger.error(f"Error archiving transcript: {e}")
+    def _spawn(self, coro):
+        """Run a coroutine in the background, keeping a reference to it."""
+        task = asyncio.create_task(coro)
+        self._background_tasks.add(task)
+        task.add_done_callback(self._background_tasks.discard)
     
     async def _log_session_creation(self, session_id: str, channel_id: int, user_id: Optional[str]):
         """Log session creation to database."""
@@ -439,19 +596,20 @@ class MeatLizardServerBot(commands.Bot):
         except Exception as e:
             logger.error(f"Error logging session closure: {e}")
     
-    async def _log_ai_message(self, session_id: str, message_data: Dict[str, Any]):
-        """Log AI message to database."""
+    async def _log_user_prompt(self, session_id: str, prompt: str):
+        """Log a prompt's plaintext; the web side encrypts prompts for the client bot."""
         try:
-            async with self.db_session() as db:
-                message = AIChatMessage(
-                    session_id=uuid.UUID(session_id),
-                    request_id=uuid.UUID(message_data.get("request_id", str(uuid.uuid4()))),
-                    role="assistant",
-                    content=message_data["response"],
-                    timestamp=datetime.utcnow()
-                )
-                db.add(message)
-                await db.commit()
+            text = get_encryptor().decrypt(base64.b64decode(prompt))
+        except Exception as e:
+            logger.error(f"Error decrypting prompt for session {session_id}: {e}")
+            return
+        # request_id is unique per row; the assistant turn carries it
+        await self._log_ai_message(session_id, None, "user", text)
+    
+    async def _log_ai_message(self, session_id: str, request_id: Optional[str], role: str, content: str):
+        """Log one chat turn to the database; session transcripts are built from these rows."""
+        try:
+            await log_chat_message(self.db_session, session_id, role, content, request_id)
         except Exception as e:
             logger.error(f"Error logging AI message: {e}")
     
@@ -459,13 +617,21 @@ class MeatLizardServerBot(commands.Bot):
     async def health_monitor(self):
         """Monitor system health."""
         try:
+            archive_pending = (
+                self.transcript_archiver.metrics()["archive_pending"] if self.transcript_archiver else 0
+            )
+            
             # Record uptime
             async with self.db_session() as db:
                 uptime_record = UptimeRecord(
                     service_name="server_bot",
                     is_online=True,
                     timestamp=datetime.utcnow(),
-                    details=f"Active sessions: {len(self.active_sessions)}"
+                    details=(
+                        f"Active sessions: {len(self.active_sessions)}, "
+                        f"pending web messages: {self.dispatcher.metrics()['dispatch_pending']}, "
+                        f"pending transcripts: {archive_pending}"
+                    )
                 )
                 db.add(uptime_record)
                 await db.commit()
@@ -491,6 +657,10 @@ class MeatLizardServerBot(commands.Bot):
             
             if stale_sessions:
                 logger.info(f"Cleaned up {len(stale_sessions)} stale sessions")
+            
+            # Responses that stopped mid-stream (a frame was lost)
+            for request_id, session_id, _ in self.stream_assembler.expire(max_age=600):
+                logger.warning(f"Dropped incomplete response {request_id} for session {session_id}")
                 
         except Exception as e:
             logger.error(f"Error in session cleanup: {e}")
@@ -0,0 +1,200 @@
+"""
+Direct WebSocket link between the server bot and the client bot.
+
+Discord text messages cap every payload at 2000 characters and are rate
+limited per channel, which bounds how fast tokens can be streamed back.
+When the client bot is configured with a `direct_link` URL it dials this
+endpoint instead, and inference requests, response frames and metrics go
+over the WebSocket; Discord keeps the session channels, commands and an
+audit record of each request (see MeatLizardServerBot).
+
+Every WebSocket message is `encryptor.encrypt({"kind": ..., "payload": ...})`,
+the same AES-GCM framing as the Discord messages, so a peer without the
+shared key cannot produce a frame that decrypts. The client's first frame
+must be a fresh `hello` (timestamp within HELLO_MAX_SKEW, nonce not seen
+before), answered with a `welcome` echoing its nonce; anything else closes
+the connection. After that every frame carries the hello nonce as `link`
+and a per-direction `seq` counting up from 1, so a frame replayed from
+another connection, repeated or dropped closes the connection as well.
+
+Backpressure: received frames go through a bounded queue. While the
+handler is behind, the reader stops reading the socket, TCP fills up and
+the sender's `send` waits, instead of frames piling up in memory.
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+HELLO_MAX_SKEW = 60
+MAX_MESSAGE_BYTES = 8 * 1024 * 1024
+
+FrameHandler = Callable[[str, Dict[str, Any]], Awaitable[None]]
+
+
+class DirectLinkServer:
+    """
+    Usage:
+        link = DirectLinkServer(encryptor, on_frame, host="0.0.0.0", port=8765)
+        await link.start()
+        if not await link.send("request", request_data):
+            ...  # client bot not connected, fall back to Discord
+    """
+
+    def __init__(
+        self,
+        encryptor,
+        on_frame: FrameHandler,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        path: str = "/bot-link",
+        max_pending: int = 64,
+        heartbeat: float = 20.0
+    ):
+        self.encryptor = encryptor
+        self.on_frame = on_frame
+        self.host = host
+        self.port = port
+        self.path = path
+        self.max_pending = max_pending
+        self.heartbeat = heartbeat
+        self.frames_received = 0
+        self.frames_sent = 0
+        self.rejected = 0
+        self._ws: Optional[web.WebSocketResponse] = None
+        self._link_nonce: Optional[str] = None
+        self._send_seq = 0
+        self._runner: Optional[web.AppRunner] = None
+        self._send_lock = asyncio.Lock()
+        self._seen_nonces: "OrderedDict[str, float]" = OrderedDict()
+
+    @property
+    def connected(self) -> bool:
+        return self._ws is not None and not self._ws.closed
+
+    async def start(self):
+        app = web.Application()
+        app.router.add_get(self.path, self._handle)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        await web.TCPSite(self._runner, self.host, self.port).start()
+        # Port 0 binds an ephemeral port
+        self.port = self._runner.addresses[0][1]
+        logger.info(f"Direct link listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        if self._ws is not None:
+            await self._ws.close()
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    async def send(self, kind: str, payload: Dict[str, Any]) -> bool:
+        """Send one frame; False if the client bot is not connected."""
+        ws = self._ws
+        if ws is None or ws.closed:
+            return False
+        try:
+            async with self._send_lock:
+                if ws is not self._ws:
+                    return False
+                self._send_seq += 1
+                await ws.send_str(self.encryptor.encrypt({
+                    "kind": kind, "payload": payload, "link": self._link_nonce, "seq": self._send_seq
+                }))
+        except ConnectionError:
+            return False
+        self.frames_sent += 1
+        return True
+
+    def metrics(self) -> Dict[str, Any]:
+        return {
+            "direct_link_connected": self.connected,
+            "direct_link_frames_received": self.frames_received,
+            "direct_link_frames_sent": self.frames_sent,
+            "direct_link_rejected": self.rejected,
+        }
+
+    def _fresh_hello(self, frame: Dict[str, Any]) -> bool:
+        if frame.get("kind") != "hello":
+            return False
+        payload = frame.get("payload", {})
+        now = time.time()
+        nonce = payload.get("nonce")
+        if not nonce or abs(now - payload.get("ts", 0)) > HELLO_MAX_SKEW:
+            return False
+        # A captured hello must not open a second connection
+        while self._seen_nonces and next(iter(self._seen_nonces.values())) < now - 2 * HELLO_MAX_SKEW:
+            self._seen_nonces.popitem(last=False)
+        if nonce in self._seen_nonces:
+            return False
+        self._seen_nonces[nonce] = now
+        return True
+
+    async def _handle(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse(heartbeat=self.heartbeat, max_msg_size=MAX_MESSAGE_BYTES)
+        await ws.prepare(request)
+
+        try:
+            msg = await ws.receive(timeout=10)
+            hello = self.encryptor.decrypt(msg.data) if msg.type == WSMsgType.TEXT else {}
+            if not self._fresh_hello(hello):
+                raise ValueError("expected a fresh hello")
+        except Exception as e:
+            self.rejected += 1
+            logger.warning(f"Rejected direct link connection from {request.remote}: {e}")
+            await ws.close(code=4401, message=b"unauthorized")
+            return ws
+
+        if self.connected:
+            logger.info("Direct link replaced by a new connection")
+            await self._ws.close()
+        nonce = hello["payload"]["nonce"]
+        await ws.send_str(self.encryptor.encrypt({"kind": "welcome", "payload": {"nonce": nonce}}))
+        async with self._send_lock:
+            self._ws, self._link_nonce, self._send_seq = ws, nonce, 0
+        logger.info(f"Client bot connected over direct link from {request.remote}")
+
+        pending: asyncio.Queue = asyncio.Queue(maxsize=self.max_pending)
+        dispatcher = asyncio.create_task(self._dispatch(pending))
+        expected_seq = 1
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                try:
+                    frame = self.encryptor.decrypt(msg.data)
+                except Exception:
+                    logger.warning("Dropping direct link connection: undecryptable frame")
+                    break
+                if frame.get("link") != nonce or frame.get("seq") != expected_seq:
+                    self.rejected += 1
+                    logger.warning("Dropping direct link connection: frame out of sequence")
+                    break
+                expected_seq += 1
+                # Blocks while the handler is behind: backpressure
+                await pending.put(frame)
+        finally:
+            await pending.put(None)
+            await dispatcher
+            if self._ws is ws:
+                self._ws = None
+            await ws.close()
+            logger.info("Client bot direct link closed")
+        return ws
+
+    async def _dispatch(self, pending: asyncio.Queue):
+        while True:
+            frame = await pending.get()
+            if frame is None:
+                return
+            self.frames_received += 1
+            try:
+                await self.on_frame(frame.get("kind", ""), frame.get("payload", {}))
+            except Exception as e:
+                logger.error(f"Error handling direct link frame: {e}")
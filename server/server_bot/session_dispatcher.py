@@ -0,0 +1,156 @@
+"""
+Per-session dispatch of web messages and a pool of warm session channels.
+
+SessionDispatcher runs each session's messages in order on its own lane
+while lanes of different sessions run concurrently, so a slow Discord
+round trip (creating or deleting a channel) only holds up the session it
+belongs to. A semaphore bounds how many handlers run at once
+across all lanes, and `submit` waits once `max_pending` messages are
+queued so a burst cannot grow memory without limit.
+
+WarmChannelPool keeps a few session channels created ahead of time, so
+starting a session takes a channel from the pool instead of waiting for
+Discord to create one.
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+Handler = Callable[[Dict[str, Any]], Awaitable[None]]
+Callback = Optional[Callable[[], Awaitable[Any]]]
+
+
+class SessionDispatcher:
+    """
+    Usage:
+        dispatcher = SessionDispatcher(handle_message, max_concurrency=16)
+        await dispatcher.submit(session_id, message, on_done=ack)
+    """
+
+    def __init__(self, handler: Handler, max_concurrency: int = 16, max_pending: int = 1000):
+        self.handler = handler
+        self.max_pending = max_pending
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._lanes: Dict[str, Deque[Tuple[Dict[str, Any], Callback]]] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._pending = 0
+        self._space = asyncio.Condition()
+        self.active = 0
+        self.handled = 0
+        self.failed = 0
+
+    async def submit(self, session_id: Optional[str], message: Dict[str, Any], on_done: Callback = None):
+        """
+        Queue a message behind earlier ones of the same session. `on_done`
+        is awaited after the handler ran (e.g. to acknowledge the message).
+        """
+        async with self._space:
+            await self._space.wait_for(lambda: self._pending < self.max_pending)
+            self._pending += 1
+
+        key = session_id or ""
+        lane = self._lanes.setdefault(key, deque())
+        lane.append((message, on_done))
+        if key not in self._tasks:
+            self._tasks[key] = asyncio.create_task(self._run_lane(key))
+
+    async def _run_lane(self, key: str):
+        lane = self._lanes[key]
+        try:
+            while lane:
+                message, on_done = lane.popleft()
+                async with self._semaphore:
+                    self.active += 1
+                    try:
+                        await self.handler(message)
+                        self.handled += 1
+                    except Exception as e:
+                        self.failed += 1
+                        logger.error(f"Error handling web message for session {key}: {e}")
+                    finally:
+                        self.active -= 1
+                if on_done is not None:
+                    try:
+                        await on_done()
+                    except Exception as e:
+                        logger.error(f"Error completing web message for session {key}: {e}")
+                async with self._space:
+                    self._pending -= 1
+                    self._space.notify_all()
+        finally:
+            del self._lanes[key]
+            del self._tasks[key]
+
+    async def drain(self):
+        """Wait until every submitted message has been handled."""
+        while self._tasks:
+            await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    async def close(self):
+        for task in list(self._tasks.values()):
+            task.cancel()
+        await asyncio.gather(*list(self._tasks.values()), return_exceptions=True)
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "dispatch_lanes": len(self._tasks),
+            "dispatch_pending": self._pending,
+            "dispatch_active": self.active,
+            "dispatch_handled": self.handled,
+            "dispatch_failed": self.failed,
+        }
+
+
+class WarmChannelPool:
+    """
+    Channels created by `create_channel` ahead of need. `acquire` returns
+    one immediately, or None when the pool is empty (the caller then creates
+    a channel itself); either way the pool refills in the background.
+    """
+
+    def __init__(self, create_channel: Callable[[], Awaitable[Any]], size: int = 3):
+        self.create_channel = create_channel
+        self.size = size
+        self._channels: List[Any] = []
+        self._refill: Optional[asyncio.Task] = None
+        self.hits = 0
+        self.misses = 0
+
+    def adopt(self, channels: List[Any]):
+        """Reuse warm channels left over from a previous run."""
+        self._channels.extend(channels)
+
+    def start(self):
+        self._schedule_refill()
+
+    def acquire(self) -> Optional[Any]:
+        channel = self._channels.pop() if self._channels else None
+        if channel is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        self._schedule_refill()
+        return channel
+
+    def _schedule_refill(self):
+        if len(self._channels) < self.size and (self._refill is None or self._refill.done()):
+            self._refill = asyncio.create_task(self._fill())
+
+    async def _fill(self):
+        while len(self._channels) < self.size:
+            try:
+                self._channels.append(await self.create_channel())
+            except Exception as e:
+                logger.error(f"Failed to create warm session channel: {e}")
+                return
+
+    async def close(self):
+        if self._refill is not None:
+            self._refill.cancel()
+            await asyncio.gather(self._refill, return_exceptions=True)
+
+    def __len__(self):
+        return len(self._channels)
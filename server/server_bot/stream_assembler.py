@@ -0,0 +1,83 @@
+"""
+Reassembles the client bot's sequence-numbered response frames.
+
+The client bot coalesces generated tokens into frames numbered from 0
+(client_bot/stream_coalescer.py). Frames are released in sequence order
+even if they arrive out of order, and the full response text is returned
+once, when the frame marked `is_complete` and every frame before it have
+arrived, so the caller writes a single message row per response.
+Frames without `seq` (older client bots, non-streamed replies) are taken
+in arrival order.
+"""
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+
+
+@dataclass
+class _PendingResponse:
+    session_id: Optional[str]
+    next_seq: int = 0
+    parts: List[str] = field(default_factory=list)
+    early: Dict[int, Dict[str, Any]] = field(default_factory=dict)
+    updated_at: float = field(default_factory=time.monotonic)
+
+
+class StreamAssembler:
+
+    def __init__(self):
+        self._responses: Dict[str, _PendingResponse] = {}
+
+    def add(self, frame: Dict[str, Any]) -> Tuple[List[str], Optional[str]]:
+        """
+        Take one frame. Returns the texts now deliverable in order and, if
+        the response just completed, its full text.
+        """
+        request_id = frame.get("request_id", "unknown")
+        pending = self._responses.get(request_id)
+        if pending is None:
+            pending = self._responses[request_id] = _PendingResponse(frame.get("session_id"))
+        pending.updated_at = time.monotonic()
+
+        seq = frame.get("seq", pending.next_seq + len(pending.early))
+        if seq < pending.next_seq or seq in pending.early:
+            # Duplicate delivery
+            return [], None
+        pending.early[seq] = frame
+
+        delivered = []
+        while pending.next_seq in pending.early:
+            ready = pending.early.pop(pending.next_seq)
+            pending.next_seq += 1
+            text = ready.get("response", "")
+            pending.parts.append(text)
+            delivered.append(text)
+            if ready.get("is_complete"):
+                del self._responses[request_id]
+                return delivered, "".join(pending.parts)
+        return delivered, None
+
+    def discard(self, request_id: str):
+        """Forget a response, e.g. after the client bot reported an error."""
+        self._responses.pop(request_id, None)
+
+    def discard_session(self, session_id: str):
+        for request_id, pending in list(self._responses.items()):
+            if pending.session_id == session_id:
+                del self._responses[request_id]
+
+    def expire(self, max_age: float) -> List[Tuple[str, Optional[str], str]]:
+        """
+        Drop responses with no frame for `max_age` seconds (a frame was
+        lost). Returns (request id, session id, text received in order).
+        """
+        cutoff = time.monotonic() - max_age
+        expired = []
+        for request_id, pending in list(self._responses.items()):
+            if pending.updated_at < cutoff:
+                del self._responses[request_id]
+                expired.append((request_id, pending.session_id, "".join(pending.parts)))
+        return expired
+
+    def __len__(self):
+        return len(self._responses)
@@ -0,0 +1,303 @@
+"""
+Streaming archival of session transcripts to S3.
+
+A closed session's messages are read from the database a batch at a time,
+written as newline-delimited JSON through a streaming compressor (zstd when
+`zstandard` is installed, gzip otherwise) and sent to S3 as a multipart
+upload, one part whenever enough compressed output has built up. At most
+one part is held in memory however long the session ran.
+
+TranscriptArchiver runs archival jobs on background workers, so closing a
+session only queues the job instead of waiting on the database and S3.
+Shutting the archiver down still archives what is queued.
+
+Transcripts hold the session's AIChatMessage rows: the server bot logs
+each prompt's plaintext as a `user` turn when it dispatches it and each
+completed response as an `assistant` turn (log_chat_message).
+"""
+import asyncio
+import json
+import logging
+import uuid
+import zlib
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from sqlalchemy import select
+
+from server.web.app.models import AIChatMessage, Transcript
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+# Smallest part S3 accepts for every part except the last one
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
+# Codec names double as the Transcript.format value and the key suffix
+CODECS = ("zst", "gz")
+
+
+def default_codec() -> str:
+    return "zst" if zstandard is not None else "gz"
+
+
+def open_compressor(codec: str):
+    """A streaming compressor with `compress(data)` and `flush()`."""
+    if codec == "zst":
+        if zstandard is None:
+            raise ValueError("zstd transcripts need the zstandard package")
+        return zstandard.ZstdCompressor(level=3).compressobj()
+    if codec == "gz":
+        # wbits=31 writes a gzip header and trailer
+        return zlib.compressobj(6, zlib.DEFLATED, 31)
+    raise ValueError(f"Unknown transcript codec: {codec}")
+
+
+class MultipartWriter:
+    """
+    Buffers written bytes and uploads them as S3 multipart parts of at
+    least `part_size` bytes. `s3_client` is a boto3 S3 client; its blocking
+    calls run in a thread.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, part_size: int = S3_MIN_PART_SIZE):
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.upload_id: Optional[str] = None
+        self.parts: List[Dict[str, Any]] = []
+        self.bytes_written = 0
+        self.peak_buffer = 0
+        self._buffer = bytearray()
+
+    async def start(self):
+        response = await asyncio.to_thread(
+            self.s3_client.create_multipart_upload, Bucket=self.bucket, Key=self.key
+        )
+        self.upload_id = response["UploadId"]
+
+    async def write(self, data: bytes):
+        self._buffer += data
+        self.bytes_written += len(data)
+        self.peak_buffer = max(self.peak_buffer, len(self._buffer))
+        if len(self._buffer) >= self.part_size:
+            await self._upload_part()
+
+    async def _upload_part(self):
+        part_number = len(self.parts) + 1
+        body = bytes(self._buffer)
+        self._buffer.clear()
+        response = await asyncio.to_thread(
+            self.s3_client.upload_part,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            PartNumber=part_number,
+            Body=body,
+        )
+        self.parts.append({"PartNumber": part_number, "ETag": response["ETag"]})
+
+    async def finish(self):
+        # The last part may be smaller than part_size, but there must be one
+        if self._buffer or not self.parts:
+            await self._upload_part()
+        await asyncio.to_thread(
+            self.s3_client.complete_multipart_upload,
+            Bucket=self.bucket,
+            Key=self.key,
+            UploadId=self.upload_id,
+            MultipartUpload={"Parts": self.parts},
+        )
+
+    async def abort(self):
+        self._buffer.clear()
+        if self.upload_id is None:
+            return
+        try:
+            await asyncio.to_thread(
+                self.s3_client.abort_multipart_upload,
+                Bucket=self.bucket,
+                Key=self.key,
+                UploadId=self.upload_id,
+            )
+        except Exception as e:
+            logger.error(f"Failed to abort transcript upload {self.key}: {e}")
+
+
+async def log_chat_message(
+    session_factory: Callable,
+    session_id: str,
+    role: str,
+    content: str,
+    request_id: Optional[str] = None,
+):
+    """
+    Store one chat turn as an AIChatMessage row. `request_id` is unique
+    per row, so a request's user turn is stored without it and only the
+    assistant turn carries it.
+    """
+    async with session_factory() as db:
+        db.add(AIChatMessage(
+            session_id=uuid.UUID(session_id),
+            request_id=uuid.UUID(request_id) if request_id else None,
+            role=role,
+            content=content,
+            timestamp=datetime.utcnow(),
+        ))
+        await db.commit()
+
+
+def transcript_key(session_id: str, codec: str) -> str:
+    return f"transcripts/{session_id}.jsonl.{codec}"
+
+
+async def archive_session(
+    session_factory: Callable,
+    s3_client,
+    bucket: str,
+    session_id: str,
+    codec: Optional[str] = None,
+    part_size: int = S3_MIN_PART_SIZE,
+    batch_size: int = 500,
+) -> Transcript:
+    """
+    Stream a session's messages into a compressed S3 object and record it
+    as a Transcript row. The upload is aborted if anything fails.
+    """
+    codec = codec or default_codec()
+    compressor = open_compressor(codec)
+    writer = MultipartWriter(s3_client, bucket, transcript_key(session_id, codec), part_size)
+    session_uuid = uuid.UUID(session_id)
+
+    # Columns rather than ORM objects, so rows are not kept by the session
+    query = (
+        select(AIChatMessage.request_id, AIChatMessage.role, AIChatMessage.content, AIChatMessage.timestamp)
+        .where(AIChatMessage.session_id == session_uuid)
+        .order_by(AIChatMessage.timestamp, AIChatMessage.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+    async with session_factory() as db:
+        await writer.start()
+        try:
+            result = await db.stream(query)
+            async for request_id, role, content, timestamp in result:
+                line = json.dumps({
+                    "request_id": str(request_id) if request_id else None,
+                    "role": role,
+                    "content": content,
+                    "timestamp": timestamp.isoformat(),
+                })
+                await writer.write(compressor.compress(line.encode("utf-8") + b"\n"))
+            await writer.write(compressor.flush())
+            await writer.finish()
+        except BaseException:
+            await writer.abort()
+            raise
+
+        transcript = Transcript(
+            session_id=session_uuid,
+            s3_key=writer.key,
+            format=codec,
+            created_at=datetime.utcnow(),
+        )
+        db.add(transcript)
+        await db.commit()
+
+    logger.info(
+        f"Archived transcript for session {session_id} "
+        f"({writer.bytes_written} bytes in {len(writer.parts)} parts)"
+    )
+    return transcript
+
+
+class TranscriptArchiver:
+    """
+    Usage:
+        archiver = TranscriptArchiver(session_factory, s3_client, bucket)
+        archiver.start()
+        await archiver.enqueue(session_id)
+    """
+
+    def __init__(
+        self,
+        session_factory: Callable,
+        s3_client,
+        bucket: str,
+        codec: Optional[str] = None,
+        part_size: int = S3_MIN_PART_SIZE,
+        workers: int = 2,
+        max_pending: int = 100,
+    ):
+        self.session_factory = session_factory
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.codec = codec or default_codec()
+        open_compressor(self.codec)  # fail at startup on an unusable codec
+        self.part_size = part_size
+        self.workers = workers
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_pending)
+        self._tasks: List[asyncio.Task] = []
+        self.archived = 0
+        self.failed = 0
+
+    def start(self):
+        for _ in range(self.workers - len(self._tasks)):
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def enqueue(self, session_id: str):
+        """Queue a session for archival; waits only if `max_pending` jobs are queued."""
+        await self._queue.put(session_id)
+
+    async def _work(self):
+        while True:
+            session_id = await self._queue.get()
+            try:
+                await archive_session(
+                    self.session_factory, self.s3_client, self.bucket, session_id,
+                    codec=self.codec, part_size=self.part_size
+                )
+                self.archived += 1
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error archiving transcript for session {session_id}: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def drain(self):
+        """Wait until every queued session has been archived."""
+        await self._queue.join()
+
+    async def close(self, timeout: float = 60.0) -> List[str]:
+        """
+        Archive the sessions still queued, waiting up to `timeout`, then
+        stop the workers. Returns (and logs) the sessions left unarchived.
+        """
+        unarchived: List[str] = []
+        if self._tasks:
+            try:
+                await asyncio.wait_for(self._queue.join(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        while not self._queue.empty():
+            unarchived.append(self._queue.get_nowait())
+            self._queue.task_done()
+        if unarchived:
+            logger.error(f"Transcripts not archived for sessions: {', '.join(unarchived)}")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks.clear()
+        return unarchived
+
+    def metrics(self) -> Dict[str, int]:
+        return {
+            "archive_pending": self._queue.qsize(),
+            "archive_done": self.archived,
+            "archive_failed": self.failed,
+        }
@@ -0,0 +1,48 @@
+"""add_content_hash_dedup
+
+Revision ID: 012_add_content_hash_dedup
+Revises: 011_add_media_import_models
+Create Date: 2024-01-20 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '012_add_content_hash_dedup'
+down_revision = '011_add_media_import_models'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Content hash of each video's original
+    op.add_column('videos', sa.Column('content_hash', sa.String(length=64), nullable=True))
+    op.create_index(op.f('ix_videos_content_hash'), 'videos', ['content_hash'], unique=False)
+    
+    # Create video_contents table
+    op.create_table('video_contents',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content_hash', sa.String(length=64), nullable=False),
+        sa.Column('fingerprint', sa.String(length=64), nullable=True),
+        sa.Column('original_s3_key', sa.String(length=500), nullable=False),
+        sa.Column('file_size', sa.BigInteger(), nullable=False),
+        sa.Column('ref_count', sa.Integer(), nullable=False),
+        sa.Column('source_video_id', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['source_video_id'], ['videos.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_video_contents_content_hash'), 'video_contents', ['content_hash'], unique=True)
+    op.create_index(op.f('ix_video_contents_fingerprint'), 'video_contents', ['fingerprint'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_video_contents_fingerprint'), table_name='video_contents')
+    op.drop_index(op.f('ix_video_contents_content_hash'), table_name='video_contents')
+    op.drop_table('video_contents')
+    
+    op.drop_index(op.f('ix_videos_content_hash'), table_name='videos')
+    op.drop_column('videos', 'content_hash')
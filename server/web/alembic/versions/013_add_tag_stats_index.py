@@ -0,0 +1,64 @@
+"""add_tag_stats_index
+
+Revision ID: 013_add_tag_stats_index
+Revises: 012_add_content_hash_dedup
+Create Date: 2024-01-22 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '013_add_tag_stats_index'
+down_revision = '012_add_content_hash_dedup'
+branch_labels = None
+depends_on = None
+
+# Videos left out of the index; same as tag_index_service.UNINDEXED_STATUSES
+UNINDEXED_STATUSES = "('deleted', 'failed')"
+
+
+def upgrade() -> None:
+    # Create tag_stats table
+    op.create_table('tag_stats',
+        sa.Column('tag', sa.String(length=50), nullable=False),
+        sa.Column('usage_count', sa.Integer(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint('tag')
+    )
+    op.create_index(op.f('ix_tag_stats_usage_count'), 'tag_stats', ['usage_count'], unique=False)
+
+    # Create tag_cooccurrences table
+    op.create_table('tag_cooccurrences',
+        sa.Column('tag', sa.String(length=50), nullable=False),
+        sa.Column('related_tag', sa.String(length=50), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('tag', 'related_tag')
+    )
+    op.create_index('ix_tag_cooccurrences_tag_count', 'tag_cooccurrences', ['tag', 'count'], unique=False)
+
+    # Backfill from existing videos
+    op.execute(f"""
+        INSERT INTO tag_stats (tag, usage_count, updated_at)
+        SELECT t.tag, COUNT(DISTINCT v.id), NOW()
+        FROM videos v, jsonb_array_elements_text(v.tags) AS t(tag)
+        WHERE v.status NOT IN {UNINDEXED_STATUSES} AND jsonb_typeof(v.tags) = 'array'
+        GROUP BY t.tag
+    """)
+    op.execute(f"""
+        INSERT INTO tag_cooccurrences (tag, related_tag, count)
+        SELECT a.tag, b.tag, COUNT(DISTINCT v.id)
+        FROM videos v,
+             jsonb_array_elements_text(v.tags) AS a(tag),
+             jsonb_array_elements_text(v.tags) AS b(tag)
+        WHERE v.status NOT IN {UNINDEXED_STATUSES} AND jsonb_typeof(v.tags) = 'array' AND a.tag != b.tag
+        GROUP BY a.tag, b.tag
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_tag_cooccurrences_tag_count', table_name='tag_cooccurrences')
+    op.drop_table('tag_cooccurrences')
+
+    op.drop_index(op.f('ix_tag_stats_usage_count'), table_name='tag_stats')
+    op.drop_table('tag_stats')
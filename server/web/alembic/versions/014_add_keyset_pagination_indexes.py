@@ -0,0 +1,45 @@
+"""add_keyset_pagination_indexes
+
+Revision ID: 014_add_keyset_pagination_indexes
+Revises: 013_add_tag_stats_index
+Create Date: 2024-01-24 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '014_add_keyset_pagination_indexes'
+down_revision = '013_add_tag_stats_index'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Videos: browse, channel and creator listings, admin sorts
+    op.create_index('ix_videos_status_visibility_created_at_id', 'videos', ['status', 'visibility', 'created_at', 'id'], unique=False)
+    op.create_index('ix_videos_channel_created_at_id', 'videos', ['channel_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_videos_creator_created_at_id', 'videos', ['creator_id', 'created_at', 'id'], unique=False)
+    op.create_index('ix_videos_created_at_id', 'videos', ['created_at', 'id'], unique=False)
+    op.create_index('ix_videos_duration_id', 'videos', ['duration_seconds', 'id'], unique=False)
+    op.create_index('ix_videos_title_id', 'videos', ['title', 'id'], unique=False)
+
+    # Viewing history
+    op.create_index('ix_view_sessions_user_heartbeat_id', 'view_sessions', ['user_id', 'last_heartbeat', 'id'], unique=False)
+
+    # Top-level comment pages
+    op.create_index(
+        'ix_video_comments_top_level_created_at_id', 'video_comments', ['video_id', 'created_at', 'id'],
+        unique=False, postgresql_where=sa.text('parent_comment_id IS NULL AND NOT is_deleted')
+    )
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_comments_top_level_created_at_id', table_name='video_comments')
+    op.drop_index('ix_view_sessions_user_heartbeat_id', table_name='view_sessions')
+    op.drop_index('ix_videos_title_id', table_name='videos')
+    op.drop_index('ix_videos_duration_id', table_name='videos')
+    op.drop_index('ix_videos_created_at_id', table_name='videos')
+    op.drop_index('ix_videos_creator_created_at_id', table_name='videos')
+    op.drop_index('ix_videos_channel_created_at_id', table_name='videos')
+    op.drop_index('ix_videos_status_visibility_created_at_id', table_name='videos')
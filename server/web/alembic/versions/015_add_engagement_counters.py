@@ -0,0 +1,45 @@
+"""add_engagement_counters
+
+Revision ID: 015_add_engagement_counters
+Revises: 014_add_keyset_pagination_indexes
+Create Date: 2024-01-25 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '015_add_engagement_counters'
+down_revision = '014_add_keyset_pagination_indexes'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column('videos', sa.Column('like_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('videos', sa.Column('dislike_count', sa.Integer(), server_default='0', nullable=False))
+    op.add_column('video_comments', sa.Column('reply_count', sa.Integer(), server_default='0', nullable=False))
+    op.create_index('ix_videos_like_count_id', 'videos', ['like_count', 'id'], unique=False)
+
+    # Backfill from the source rows
+    op.execute("""
+        UPDATE videos SET
+            like_count = (SELECT count(*) FROM video_likes WHERE video_likes.video_id = videos.id AND video_likes.is_like),
+            dislike_count = (SELECT count(*) FROM video_likes WHERE video_likes.video_id = videos.id AND NOT video_likes.is_like)
+        WHERE EXISTS (SELECT 1 FROM video_likes WHERE video_likes.video_id = videos.id)
+    """)
+    op.execute("""
+        UPDATE video_comments SET
+            reply_count = (
+                SELECT count(*) FROM video_comments AS replies
+                WHERE replies.parent_comment_id = video_comments.id AND NOT replies.is_deleted
+            )
+        WHERE EXISTS (SELECT 1 FROM video_comments AS replies WHERE replies.parent_comment_id = video_comments.id)
+    """)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_videos_like_count_id', table_name='videos')
+    op.drop_column('video_comments', 'reply_count')
+    op.drop_column('videos', 'dislike_count')
+    op.drop_column('videos', 'like_count')
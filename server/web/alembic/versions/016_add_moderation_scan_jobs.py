@@ -0,0 +1,64 @@
+"""add_moderation_scan_jobs
+
+Revision ID: 016_add_moderation_scan_jobs
+Revises: 015_add_engagement_counters
+Create Date: 2024-01-26 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = '016_add_moderation_scan_jobs'
+down_revision = '015_add_engagement_counters'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('moderation_scan_jobs',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content_type', sa.String(length=50), nullable=False),
+        sa.Column('status', sa.String(length=50), nullable=False),
+        sa.Column('batch_size', sa.Integer(), nullable=False),
+        sa.Column('checkpoint', sa.String(length=500), nullable=True),
+        sa.Column('total_estimate', sa.Integer(), nullable=True),
+        sa.Column('scanned_count', sa.Integer(), nullable=False),
+        sa.Column('flagged_count', sa.Integer(), nullable=False),
+        sa.Column('elapsed_seconds', sa.Float(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_by', postgresql.UUID(as_uuid=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.Column('started_at', sa.DateTime(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=False),
+        sa.Column('completed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['created_by'], ['users.id'], ),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_moderation_scan_jobs_status'), 'moderation_scan_jobs', ['status'], unique=False)
+
+    op.create_table('moderation_scan_results',
+        sa.Column('id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('job_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('content_type', sa.String(length=50), nullable=False),
+        sa.Column('content_id', postgresql.UUID(as_uuid=True), nullable=False),
+        sa.Column('risk_level', sa.String(length=20), nullable=False),
+        sa.Column('recommended_action', sa.String(length=50), nullable=False),
+        sa.Column('flags', postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+        sa.Column('created_at', sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(['job_id'], ['moderation_scan_jobs.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index(op.f('ix_moderation_scan_results_job_id'), 'moderation_scan_results', ['job_id'], unique=False)
+    op.create_index(op.f('ix_moderation_scan_results_content_id'), 'moderation_scan_results', ['content_id'], unique=False)
+    op.create_index(op.f('ix_moderation_scan_results_risk_level'), 'moderation_scan_results', ['risk_level'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f('ix_moderation_scan_results_risk_level'), table_name='moderation_scan_results')
+    op.drop_index(op.f('ix_moderation_scan_results_content_id'), table_name='moderation_scan_results')
+    op.drop_index(op.f('ix_moderation_scan_results_job_id'), table_name='moderation_scan_results')
+    op.drop_table('moderation_scan_results')
+    op.drop_index(op.f('ix_moderation_scan_jobs_status'), table_name='moderation_scan_jobs')
+    op.drop_table('moderation_scan_jobs')
@@ -0,0 +1,72 @@
+"""add_playlist_rank_keys
+
+Revision ID: 017_add_playlist_rank_keys
+Revises: 016_add_moderation_scan_jobs
+Create Date: 2024-01-27 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '017_add_playlist_rank_keys'
+down_revision = '016_add_moderation_scan_jobs'
+branch_labels = None
+depends_on = None
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def _rank_keys(count):
+    """The keys rank_keys.spread_keys() produces: a0..az, b00..bzz, c000.."""
+    keys, length = [], 1
+    while len(keys) < count:
+        head = chr(ord('a') + length - 1)
+        for n in range(min(len(DIGITS) ** length, count - len(keys))):
+            digits = ''
+            for _ in range(length):
+                n, digit = divmod(n, len(DIGITS))
+                digits = DIGITS[digit] + digits
+            keys.append(head + digits)
+        length += 1
+    return keys
+
+
+def upgrade() -> None:
+    op.add_column('video_playlist_items', sa.Column('rank', sa.String(length=255, collation='C'), nullable=True))
+
+    # Give every playlist short, evenly spaced keys in its current order
+    items = sa.table('video_playlist_items', sa.column('id'), sa.column('playlist_id'), sa.column('position'), sa.column('rank'))
+    conn = op.get_bind()
+    rows = conn.execute(
+        sa.select(items.c.id, items.c.playlist_id).order_by(items.c.playlist_id, items.c.position)
+    ).all()
+    by_playlist = {}
+    for item_id, playlist_id in rows:
+        by_playlist.setdefault(playlist_id, []).append(item_id)
+    for item_ids in by_playlist.values():
+        conn.execute(
+            items.update().where(items.c.id == sa.bindparam('item_id')).values(rank=sa.bindparam('new_rank')),
+            [{'item_id': item_id, 'new_rank': rank} for item_id, rank in zip(item_ids, _rank_keys(len(item_ids)))]
+        )
+
+    op.alter_column('video_playlist_items', 'rank', nullable=False)
+    op.drop_constraint('uq_playlist_position', 'video_playlist_items', type_='unique')
+    op.drop_column('video_playlist_items', 'position')
+    op.create_index('ix_video_playlist_items_playlist_rank_id', 'video_playlist_items', ['playlist_id', 'rank', 'id'], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index('ix_video_playlist_items_playlist_rank_id', table_name='video_playlist_items')
+    op.add_column('video_playlist_items', sa.Column('position', sa.Integer(), nullable=True))
+    op.execute("""
+        UPDATE video_playlist_items SET position = ordered.position
+        FROM (
+            SELECT id, row_number() OVER (PARTITION BY playlist_id ORDER BY rank, id) AS position
+            FROM video_playlist_items
+        ) AS ordered
+        WHERE video_playlist_items.id = ordered.id
+    """)
+    op.alter_column('video_playlist_items', 'position', nullable=False)
+    op.create_unique_constraint('uq_playlist_position', 'video_playlist_items', ['playlist_id', 'position'])
+    op.drop_column('video_playlist_items', 'rank')
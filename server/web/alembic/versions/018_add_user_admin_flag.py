@@ -0,0 +1,24 @@
+"""add_user_admin_flag
+
+Revision ID: 018_add_user_admin_flag
+Revises: 017_add_playlist_rank_keys
+Create Date: 2024-01-28 10:00:00.000000
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+# revision identifiers, used by Alembic.
+revision = '018_add_user_admin_flag'
+down_revision = '017_add_playlist_rank_keys'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing users start without admin rights; grant them explicitly
+    op.add_column('users', sa.Column('is_admin', sa.Boolean(), nullable=False, server_default=sa.false()))
+
+
+def downgrade() -> None:
+    op.drop_column('users', 'is_admin')
@@ -7,7 +7,8 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from ..dependencies import get_db, get_current_user
+from ..db import get_read_db
+from ..dependencies import get_db, get_current_user, require_admin_user
 from ..models import User, VideoStatus, VideoVisibility
 from ..services.admin_video_service import AdminVideoService
 
@@ -24,18 +25,9 @@ class TranscodingJobRetryRequest(BaseModel):
     job_id: str
 
 
-# Dependency to check admin permissions
-async def require_admin_user(current_user: User = Depends(get_current_user)) -> User:
-    """Ensure the current user has admin permissions."""
-    # TODO: Implement proper admin role checking
-    # For now, we'll assume all authenticated users are admins
-    # In production, this should check for admin role/permissions
-    return current_user
-
-
 @router.get("/dashboard/stats")
 async def get_dashboard_stats(
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
     current_user: User = Depends(require_admin_user)
 ):
     """Get comprehensive video platform statistics for admin dashboard."""
@@ -54,6 +46,7 @@ async def get_videos_list(
     search: Optional[str] = Query(None),
     sort_by: str = Query("created_at"),
     sort_order: str = Query("desc"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: AsyncSession = Depends(get_db),
     current_user: User = Depends(require_admin_user)
 ):
@@ -92,7 +85,8 @@ async def get_videos_list(
         creator_filter=creator,
         search_query=search,
         sort_by=sort_by,
-        sort_order=sort_order
+        sort_order=sort_order,
+        cursor=cursor
     )
     
     return result
@@ -9,7 +9,7 @@ from sqlalchemy.orm import Session
 from datetime import datetime, timedelta
 from pydantic import BaseModel
 
-from ..db import get_db
+from ..db import get_db, get_read_db
 from ..models import User, UserTier
 from ..middleware.permissions import get_current_user_dep, get_tier_manager_dep
 from ..services.analytics_collector import AnalyticsCollector, EventType, EventSeverity
@@ -96,7 +96,7 @@ async def get_user_metrics(
     request: Request,
     metrics_request: MetricsRequest = Depends(),
     current_user: Optional[User] = Depends(get_current_user_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get comprehensive metrics for the current user.
@@ -172,7 +172,7 @@ async def get_system_metrics(
     metrics_request: MetricsRequest = Depends(),
     current_user: Optional[User] = Depends(get_current_user_dep),
     tier_manager: TierManager = Depends(get_tier_manager_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get system-wide metrics (admin only).
@@ -245,7 +245,7 @@ async def get_tier_metrics(
     metrics_request: MetricsRequest = Depends(),
     current_user: Optional[User] = Depends(get_current_user_dep),
     tier_manager: TierManager = Depends(get_tier_manager_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get metrics for a specific user tier.
@@ -329,7 +329,7 @@ async def get_conversion_metrics(
     metrics_request: MetricsRequest = Depends(),
     current_user: Optional[User] = Depends(get_current_user_dep),
     tier_manager: TierManager = Depends(get_tier_manager_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get conversion metrics between tiers.
@@ -409,7 +409,7 @@ async def generate_usage_report(
     format: str = "json",
     current_user: Optional[User] = Depends(get_current_user_dep),
     tier_manager: TierManager = Depends(get_tier_manager_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Generate comprehensive usage report.
@@ -484,7 +484,7 @@ async def get_dashboard_data(
     request: Request,
     current_user: Optional[User] = Depends(get_current_user_dep),
     tier_manager: TierManager = Depends(get_tier_manager_dep),
-    db: Session = Depends(get_db)
+    db: Session = Depends(get_read_db)
 ):
     """
     Get dashboard data for analytics visualization.
@@ -161,19 +161,21 @@ async def get_channel_videos(
     channel_id: uuid.UUID,
     limit: int = Query(20, ge=1, le=100),
     offset: int = Query(0, ge=0),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user = Depends(get_current_user, use_cache=False),
     channel_service: ChannelService = Depends()
 ):
     """Get videos in a channel."""
-    videos = await channel_service.get_channel_videos(
+    page = await channel_service.get_channel_videos(
         channel_id=channel_id,
         viewer_user_id=current_user.id if current_user else None,
         limit=limit,
-        offset=offset
+        offset=offset,
+        cursor=cursor
     )
     
     # Convert to response format (would need VideoResponse model)
-    return {"videos": videos, "total": len(videos)}
+    return {"videos": page.items, "total": len(page.items), "next_cursor": page.next_cursor}
 
 
 @router.get("/{channel_id}/playlists")
@@ -66,11 +66,13 @@ class PlaylistSummaryResponse(BaseModel):
 
 class BrowseVideosResponse(BaseModel):
     videos: List[VideoSummaryResponse]
-    total: int
+    total: Optional[int]
+    total_is_estimate: bool = False
     page: int
     per_page: int
     has_next: bool
     has_prev: bool
+    next_cursor: Optional[str] = None
 
 
 class SearchResponse(BaseModel):
@@ -99,13 +101,14 @@ async def browse_videos(
     date_to: Optional[datetime] = Query(None),
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user = Depends(get_current_user, use_cache=False),
     discovery_service: ContentDiscoveryService = Depends()
 ):
     """Browse videos with filtering and sorting."""
     offset = (page - 1) * per_page
     
-    videos, total = await discovery_service.browse_videos(
+    result = await discovery_service.browse_videos(
         viewer_user_id=current_user.id if current_user else None,
         channel_id=channel_id,
         category=category,
@@ -116,12 +119,13 @@ async def browse_videos(
         date_from=date_from,
         date_to=date_to,
         limit=per_page,
-        offset=offset
+        offset=offset,
+        cursor=cursor
     )
     
     # Convert to response format
     video_responses = []
-    for video in videos:
+    for video in result.items:
         video_responses.append(VideoSummaryResponse(
             id=video.id,
             title=video.title,
@@ -141,11 +145,13 @@ async def browse_videos(
     
     return BrowseVideosResponse(
         videos=video_responses,
-        total=total,
+        total=result.total,
+        total_is_estimate=result.total_is_estimate,
         page=page,
         per_page=per_page,
-        has_next=offset + per_page < total,
-        has_prev=page > 1
+        has_next=result.next_cursor is not None,
+        has_prev=page > 1 or cursor is not None,
+        next_cursor=result.next_cursor
     )
 
 
@@ -3,18 +3,20 @@ Content Moderation API Endpoints
 
 Provides REST API for content moderation, reporting, and safety features.
 """
+import asyncio
 import uuid
-from typing import Optional, List
+from typing import Dict, Optional, List
 from fastapi import APIRouter, Depends, HTTPException, Query
 from pydantic import BaseModel, Field
 
-from ..dependencies import get_current_user, get_db_session
+from ..dependencies import get_current_user, get_db_session, require_admin_user
 from ..services.content_moderation_service import (
     ContentModerationService, 
     ModerationAction, 
     ModerationReason, 
     ReportType
 )
+from ..services.moderation_backfill import ModerationBackfillService, get_backfill_executor
 from ..models import User
 
 
@@ -46,6 +48,11 @@ class ModerationActionRequest(BaseModel):
     duration_hours: Optional[int] = Field(None, ge=1, le=8760)  # Max 1 year
 
 
+class BackfillRequest(BaseModel):
+    content_type: str = Field(..., pattern="^(video|comment)$")
+    batch_size: int = Field(500, ge=10, le=5000)
+
+
 class ResolveReportRequest(BaseModel):
     action: ModerationAction
     reason: Optional[ModerationReason] = None
@@ -412,4 +419,96 @@ async def apply_bulk_moderation_action(
         "successful": successful,
         "failed": len(content_ids) - successful,
         "results": results
-    }
\ No newline at end of file
+    }
+
+
+# Bulk re-scans running in this process, by job id
+_backfill_tasks: Dict[uuid.UUID, asyncio.Task] = {}
+
+
+async def _primary_pool_load() -> float:
+    from ..db import get_pool_load
+    return get_pool_load()
+
+
+def _backfill_service() -> ModerationBackfillService:
+    return ModerationBackfillService(executor=get_backfill_executor(), load_probe=_primary_pool_load)
+
+
+def _start_backfill(job_id: uuid.UUID):
+    task = _backfill_tasks.get(job_id)
+    if task is None or task.done():
+        task = asyncio.create_task(_backfill_service().run_job(job_id))
+        _backfill_tasks[job_id] = task
+        task.add_done_callback(lambda _: _backfill_tasks.pop(job_id, None))
+
+
+@router.post("/backfill")
+async def start_moderation_backfill(
+    request: BackfillRequest,
+    current_user: User = Depends(require_admin_user)
+):
+    """
+    Start a bulk re-scan of all video metadata or comments
+    Requires admin privileges
+    """
+    job = await _backfill_service().create_job(
+        content_type=request.content_type,
+        batch_size=request.batch_size,
+        created_by=current_user.id
+    )
+    _start_backfill(uuid.UUID(job["job_id"]))
+    return job
+
+
+@router.get("/backfill")
+async def list_moderation_backfills(
+    current_user: User = Depends(require_admin_user),
+    limit: int = Query(20, ge=1, le=100)
+):
+    """
+    Recent bulk re-scan jobs with progress and ETA
+    Requires admin privileges
+    """
+    return {"jobs": await _backfill_service().list_jobs(limit=limit)}
+
+
+@router.get("/backfill/{job_id}")
+async def get_moderation_backfill(
+    job_id: uuid.UUID,
+    current_user: User = Depends(require_admin_user)
+):
+    """
+    Progress, scan rate and ETA of a bulk re-scan job
+    Requires admin privileges
+    """
+    progress = await _backfill_service().get_progress(job_id)
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return progress
+
+
+@router.post("/backfill/{job_id}/{command}")
+async def control_moderation_backfill(
+    job_id: uuid.UUID,
+    command: str,
+    current_user: User = Depends(require_admin_user)
+):
+    """
+    Pause, cancel or resume a bulk re-scan job; it resumes from its last checkpoint
+    Requires admin privileges
+    """
+    service = _backfill_service()
+    if command == "resume":
+        progress = await service.get_progress(job_id)
+        # Also takes over a running job whose worker stopped sending heartbeats
+        if progress is not None and progress["resumable"]:
+            _start_backfill(job_id)
+    elif command in ("pause", "cancel"):
+        progress = await service.request_status(job_id, "paused" if command == "pause" else "cancelled")
+    else:
+        raise HTTPException(status_code=400, detail="Command must be pause, cancel or resume")
+    
+    if progress is None:
+        raise HTTPException(status_code=404, detail="Backfill job not found")
+    return progress
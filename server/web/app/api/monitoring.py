@@ -15,10 +15,12 @@ from sqlalchemy import text
 from prometheus_client import Counter, Histogram, Gauge, generate_latest, CONTENT_TYPE_LATEST
 from starlette.responses import Response
 
-from server.web.app.db import get_db
+from server.web.app.db import get_db, get_pool_metrics, get_read_router
 from server.web.app.dependencies import get_current_user
 from server.web.app.models import User
 from server.web.app.services.redis_client import get_redis_client
+from shared_lib.moderation import get_moderation_engine
+from shared_lib.system_sampler import get_system_sampler
 
 router = APIRouter(prefix="/api/monitoring", tags=["monitoring"])
 
@@ -30,6 +32,11 @@ system_memory_usage = Gauge('system_memory_usage_percent', 'System memory usage
 system_disk_usage = Gauge('system_disk_usage_percent', 'System disk usage percentage', ['mountpoint'])
 active_connections = Gauge('database_connections_active', 'Active database connections')
 redis_connections = Gauge('redis_connections_active', 'Active Redis connections')
+db_pool_checked_out = Gauge('database_pool_checked_out', 'Connections checked out of the pool', ['role'])
+db_pool_overflow = Gauge('database_pool_overflow', 'Overflow connections open beyond pool_size', ['role'])
+db_pool_timeouts = Gauge('database_pool_checkout_timeouts', 'Checkouts that timed out waiting for a connection', ['role'])
+db_pool_wait = Gauge('database_pool_checkout_wait_max_ms', 'Longest checkout wait in milliseconds', ['role'])
+moderation_rule_hits = Gauge('moderation_rule_hits', 'Texts matched by each moderation rule since start-up', ['ruleset', 'rule'])
 
 class HealthCheckService:
     """Service for performing comprehensive health checks"""
@@ -242,48 +249,29 @@ class HealthCheckService:
             }
     
     async def _check_system_resources(self, db: AsyncSession) -> Dict[str, Any]:
-        """Check system resource usage"""
+        """Check system resource usage from the background sampler's latest sample"""
         try:
-            # CPU usage
-            cpu_percent = psutil.cpu_percent(interval=1)
+            sample = get_system_sampler().latest()
+            cpu_percent = sample['cpu_percent']
+            memory_percent = sample['memory_percent']
             system_cpu_usage.set(cpu_percent)
-            
-            # Memory usage
-            memory = psutil.virtual_memory()
-            memory_percent = memory.percent
             system_memory_usage.set(memory_percent)
-            
-            # Disk usage
-            disk_usage = {}
-            for partition in psutil.disk_partitions():
-                try:
-                    usage = psutil.disk_usage(partition.mountpoint)
-                    usage_percent = (usage.used / usage.total) * 100
-                    disk_usage[partition.mountpoint] = {
-                        'total_gb': round(usage.total / 1024**3, 2),
-                        'used_gb': round(usage.used / 1024**3, 2),
-                        'free_gb': round(usage.free / 1024**3, 2),
-                        'usage_percent': round(usage_percent, 2)
-                    }
-                    system_disk_usage.labels(mountpoint=partition.mountpoint).set(usage_percent)
-                except PermissionError:
-                    continue
-            
-            # Network I/O
-            network = psutil.net_io_counters()
+            for mountpoint, usage in sample['disk_usage'].items():
+                system_disk_usage.labels(mountpoint=mountpoint).set(usage['usage_percent'])
             
             return {
                 'healthy': cpu_percent < 80 and memory_percent < 85,
                 'cpu_percent': cpu_percent,
                 'memory_percent': memory_percent,
-                'memory_available_gb': round(memory.available / 1024**3, 2),
-                'disk_usage': disk_usage,
+                'memory_available_gb': round(sample['memory_available_mb'] / 1024, 2),
+                'disk_usage': sample['disk_usage'],
                 'network': {
-                    'bytes_sent': network.bytes_sent,
-                    'bytes_recv': network.bytes_recv,
-                    'packets_sent': network.packets_sent,
-                    'packets_recv': network.packets_recv
+                    'bytes_sent': sample.get('net_bytes_sent', 0),
+                    'bytes_recv': sample.get('net_bytes_recv', 0),
+                    'packets_sent': sample.get('net_packets_sent', 0),
+                    'packets_recv': sample.get('net_packets_recv', 0)
                 },
+                'sampled_at': datetime.utcfromtimestamp(sample['timestamp']).isoformat(),
                 'timestamp': datetime.utcnow().isoformat()
             }
             
@@ -323,8 +311,25 @@ async def specific_health_check(check_name: str, db: AsyncSession = Depends(get_
 @router.get("/metrics")
 async def prometheus_metrics():
     """Prometheus metrics endpoint"""
+    for role, stats in get_pool_metrics().items():
+        db_pool_checked_out.labels(role=role).set(stats['checked_out'])
+        db_pool_overflow.labels(role=role).set(stats['overflow'])
+        db_pool_timeouts.labels(role=role).set(stats['timeouts'])
+        db_pool_wait.labels(role=role).set(stats['max_wait_ms'])
+    for key, hits in get_moderation_engine().hit_counts().items():
+        ruleset, rule = key.split(':', 1)
+        moderation_rule_hits.labels(ruleset=ruleset, rule=rule).set(hits)
     return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
+@router.get("/database/pool")
+async def database_pool_stats():
+    """Connection pool usage per database role and replica lag"""
+    return {
+        'pools': get_pool_metrics(),
+        'replicas': get_read_router().status(),
+        'timestamp': datetime.utcnow().isoformat()
+    }
+
 @router.get("/status")
 async def system_status(db: AsyncSession = Depends(get_db)):
     """Comprehensive system status"""
@@ -337,6 +342,11 @@ async def system_status(db: AsyncSession = Depends(get_db)):
     
     return result
 
+@router.get("/system")
+async def system_resources(window: float = 60.0):
+    """Latest host sample with rates and percentiles over the last `window` seconds"""
+    return get_system_sampler().summary(window)
+
 @router.post("/alerts/webhook")
 async def alert_webhook(alert_data: Dict[str, Any], background_tasks: BackgroundTasks):
     """Webhook endpoint for receiving alerts from AlertManager"""
@@ -37,6 +37,12 @@ class PlaylistUpdateRequest(BaseModel):
 class AddVideoRequest(BaseModel):
     video_id: uuid.UUID
     position: Optional[int] = None
+    after_video_id: Optional[uuid.UUID] = None
+
+
+class MoveVideoRequest(BaseModel):
+    after_video_id: Optional[uuid.UUID] = None
+    before_video_id: Optional[uuid.UUID] = None
 
 
 class ReorderRequest(BaseModel):
@@ -64,7 +70,8 @@ class PlaylistItemResponse(BaseModel):
     id: uuid.UUID
     playlist_id: uuid.UUID
     video_id: uuid.UUID
-    position: int
+    rank: str
+    position: Optional[int] = None
     added_at: str
     
     class Config:
@@ -180,7 +187,8 @@ async def add_video_to_playlist(
             playlist_id=playlist_id,
             video_id=request.video_id,
             user_id=current_user.id,
-            position=request.position
+            position=request.position,
+            after_video_id=request.after_video_id
         )
         
         if not item:
@@ -211,6 +219,32 @@ async def remove_video_from_playlist(
     return {"message": "Video removed from playlist"}
 
 
+@router.post("/{playlist_id}/videos/{video_id}/move", response_model=PlaylistItemResponse)
+async def move_playlist_item(
+    playlist_id: uuid.UUID,
+    video_id: uuid.UUID,
+    request: MoveVideoRequest,
+    current_user = Depends(get_current_user),
+    playlist_service: PlaylistService = Depends()
+):
+    """Move a video after or before another one; neither moves it to the start."""
+    try:
+        item = await playlist_service.move_playlist_item(
+            playlist_id=playlist_id,
+            video_id=video_id,
+            user_id=current_user.id,
+            after_video_id=request.after_video_id,
+            before_video_id=request.before_video_id
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    if not item:
+        raise HTTPException(status_code=404, detail="Video not found in playlist or playlist not owned by user")
+    
+    return PlaylistItemResponse.from_orm(item)
+
+
 @router.put("/{playlist_id}/reorder")
 async def reorder_playlist_items(
     playlist_id: uuid.UUID,
@@ -6,7 +6,7 @@ from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic import BaseModel
 
-from ..dependencies import get_db, get_current_user
+from ..dependencies import get_db, get_current_user, require_admin_user
 from ..models import User
 from ..services.system_config_service import SystemConfigService
 
@@ -34,15 +34,6 @@ class BackupRestoreRequest(BaseModel):
     backup_data: Dict[str, Any]
 
 
-# Dependency to check admin permissions
-async def require_admin_user(current_user: User = Depends(get_current_user)) -> User:
-    """Ensure the current user has admin permissions."""
-    # TODO: Implement proper admin role checking
-    # For now, we'll assume all authenticated users are admins
-    # In production, this should check for admin role/permissions
-    return current_user
-
-
 @router.get("/config")
 async def get_all_config(
     db: AsyncSession = Depends(get_db),
@@ -69,6 +69,7 @@ async def get_video_comments(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Comments per page"),
     sort: str = Query("newest", regex="^(newest|oldest|top)$", description="Sort order"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
     """Get comments for a video with pagination."""
@@ -85,7 +86,8 @@ async def get_video_comments(
         video_id=video_uuid,
         page=page,
         limit=limit,
-        sort_by=sort
+        sort_by=sort,
+        cursor=cursor
     )
     
     if result is None:
@@ -138,7 +138,7 @@ async def initiate_upload(
         return InitiateUploadResponse(
             session_id=session.session_id,
             video_id=session.video_id,
-            chunk_size=5242880  # 5MB chunks
+            chunk_size=session.chunk_size
         )
         
     except HTTPException:
@@ -164,11 +164,8 @@ async def upload_chunk(
     Requirements: 1.3, 1.4
     """
     try:
-        # Read chunk data
-        chunk_data = await chunk.read()
-        
-        # Process chunk
-        result = await service.process_chunk(session_id, chunk_data, chunk_number)
+        # Stream the spooled chunk body instead of reading it into memory
+        result = await service.process_chunk(session_id, chunk.file, chunk_number)
         
         return ChunkUploadResponse(
             chunk_number=result.chunk_number,
@@ -256,7 +253,9 @@ async def get_upload_progress(
     Requirements: 1.3
     """
     try:
-        progress = service.get_upload_progress(session_id)
+        # Sessions may have received chunks on other workers
+        session = await service.load_session(session_id, refresh=True)
+        progress = service.get_upload_progress(session_id) if session else None
         
         if progress is None:
             raise HTTPException(status_code=404, detail="Upload session not found")
@@ -297,11 +296,14 @@ async def simple_upload(
             tags=tag_list
         )
         
-        # Get file info
-        file_content = await file.read()
+        # Get file info without reading the spooled body into memory
+        file.file.seek(0, os.SEEK_END)
+        file_size = file.file.tell()
+        file.file.seek(0)
         file_info = {
             'filename': file.filename,
-            'size': len(file_content),
+            'size': file_size,
+            'chunk_size': max(file_size, 1),
             'mime_type': file.content_type or 'video/mp4',
             'total_chunks': 1,
             'extension': file.filename.split('.')[-1].lower()
@@ -311,7 +313,7 @@ async def simple_upload(
         session = await service.initiate_upload(str(user.id), metadata, file_info)
         
         # Upload single chunk
-        await service.process_chunk(session.session_id, file_content, 1)
+        await service.process_chunk(session.session_id, file.file, 1)
         
         # Complete upload
         video = await service.complete_upload(session.session_id, ["720p_30fps"])
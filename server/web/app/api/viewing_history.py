@@ -21,6 +21,7 @@ class HistoryPrivacyUpdate(BaseModel):
 async def get_user_viewing_history(
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: User = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
@@ -30,7 +31,8 @@ async def get_user_viewing_history(
     result = await service.get_user_viewing_history(
         user_id=current_user.id,
         page=page,
-        limit=limit
+        limit=limit,
+        cursor=cursor
     )
     
     return result
@@ -40,6 +42,7 @@ async def get_public_viewing_history(
     user_id: str,
     page: int = Query(1, ge=1, description="Page number"),
     limit: int = Query(20, ge=1, le=100, description="Items per page"),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
     current_user: Optional[User] = Depends(get_current_active_user),
     db: AsyncSession = Depends(get_db)
 ) -> Dict[str, Any]:
@@ -61,6 +64,7 @@ async def get_public_viewing_history(
         user_id=target_user_id,
         page=page,
         limit=limit,
+        cursor=cursor,
         public_only=not is_own_history
     )
     
@@ -15,6 +15,7 @@ class Settings(BaseSettings):
     
     # Redis settings
     REDIS_URL: str = "redis://localhost:6379"
+    CHAT_BUS_URL: str = ""  # Redis for chat traffic; required with more than one web worker
     
     # Discord Bot settings
     DISCORD_BOT_TOKEN: str = ""
@@ -43,6 +44,9 @@ class Settings(BaseSettings):
     MAX_VIDEO_SIZE: int = 10 * 1024 * 1024 * 1024  # 10GB
     MAX_VIDEO_DURATION: int = 4 * 60 * 60  # 4 hours in seconds
     CHUNK_SIZE: int = 5 * 1024 * 1024  # 5MB chunks
+    UPLOAD_PART_SIZE: int = 5 * 1024 * 1024  # S3 multipart part size, raised to the 5MB S3 minimum
+    UPLOAD_PART_CONCURRENCY: int = 4  # Concurrent S3 part uploads per web worker
+    UPLOAD_STAGING_PATH: str = ""  # Shared dir for partial parts; defaults to MEDIA_STORAGE_PATH/temp/uploads
     
     # S3 settings
     S3_BUCKET_NAME: str = "meatlizard-storage"
@@ -55,6 +59,16 @@ class Settings(BaseSettings):
     TRANSCODING_TEMP_DIR: str = "/tmp/transcoding"
     FFMPEG_PATH: str = "ffmpeg"
     FFPROBE_PATH: str = "ffprobe"
+    VIDEO_ENCODER: str = "libx264"  # libx264, h264_nvenc, h264_qsv, h264_vaapi, h264_videotoolbox
+    PER_TITLE_ENCODING_ENABLED: bool = True
+    ENCODING_PROBE_SAMPLES: int = 3
+    ENCODING_PROBE_SAMPLE_SECONDS: int = 4
+    CHUNKED_ENCODING_MIN_DURATION: int = 10 * 60  # Videos at least this long are encoded in parallel chunks
+    CHUNKED_ENCODING_CHUNK_SECONDS: int = 60
+    CHUNKED_ENCODING_MAX_PARALLEL: int = 0  # 0 = one slot per CPU core
+    HLS_DIRECT_ENCODE: bool = True  # Encode straight to fMP4 HLS instead of MP4 then segment
+    HLS_SINGLE_FILE: bool = True  # Byte-range playlists over one media file per rendition
+    HLS_KEEP_PROGRESSIVE_MP4: bool = True  # Also write a progressive MP4 from the same encode
     
     # AI/LLM settings
     LLAMA_CPP_PATH: str = "/usr/local/bin/llama-cpp"
@@ -84,6 +98,7 @@ class Settings(BaseSettings):
     SESSION_TIMEOUT_HOURS: int = 24
     MAX_LOGIN_ATTEMPTS: int = 5
     LOCKOUT_DURATION_MINUTES: int = 15
+    VIDEO_ACCESS_LOG_SAMPLE_RATE: float = 0.1  # Fraction of granted video access checks logged; denials always are
     
     # Content moderation
     ENABLE_CONTENT_MODERATION: bool = True
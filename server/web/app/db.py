@@ -1,11 +1,218 @@
-from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker, declarative_base
+"""
+Database engine and session factories.
+
+Every process shares one async engine per role: "primary" for reads and
+writes, and "replica:N" for each configured read replica URL. Read-only,
+staleness-tolerant queries (analytics, discovery, dashboards) go through the
+ReadRouter, which picks a caught-up replica or falls back to the primary. Pools are sized from
+settings.database, pre-ping connections, recycle them periodically and record
+checkout wait times so pool pressure shows up in monitoring.
+"""
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from sqlalchemy import exc
+from sqlalchemy.ext.asyncio import create_async_engine, AsyncEngine, AsyncSession, async_sessionmaker
+from sqlalchemy.orm import declarative_base
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 from server.shared_lib.config import settings
+from .read_routing import ReadRouter, set_read_router_provider
+
+PRIMARY = "primary"
+REPLICA = "replica"
+
+
+class PoolMetrics:
+    """Checkout counters and wait times for one connection pool"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def record_checkout(self, wait_seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+    def snapshot(self, pool) -> Dict[str, Any]:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "pool_size": pool.size(),
+                "checked_out": pool.checkedout(),
+                "checked_in": pool.checkedin(),
+                "overflow": max(pool.overflow(), 0),
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(self.total_wait_seconds / attempts * 1000, 3) if attempts else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 3),
+            }
+
+
+class InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Async queue pool that times how long each checkout waits for a connection"""
+
+    metrics: Optional[PoolMetrics] = None
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            if self.metrics:
+                self.metrics.record_checkout(time.perf_counter() - start, timed_out=True)
+            raise
+        if self.metrics:
+            self.metrics.record_checkout(time.perf_counter() - start)
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.metrics = self.metrics
+        return pool
+
+
+def _connect_args(url: str, config) -> Dict[str, Any]:
+    if "+asyncpg" not in url:
+        return {}
+    return {
+        # Statements cached per connection by the asyncpg dialect; set to 0
+        # behind transaction-pooling PgBouncer
+        "prepared_statement_cache_size": config.prepared_statement_cache_size,
+        "server_settings": {
+            "statement_timeout": str(config.statement_timeout_ms),
+            "application_name": config.application_name,
+        },
+    }
+
+
+def create_engine_for_url(url: str, config=None) -> AsyncEngine:
+    """Create an async engine with the tuned pool settings"""
+    config = config or settings.database
+    kwargs: Dict[str, Any] = {"connect_args": _connect_args(url, config)}
+    if not url.startswith("sqlite"):
+        kwargs.update(
+            poolclass=InstrumentedQueuePool,
+            pool_size=config.pool_size,
+            max_overflow=config.max_overflow,
+            pool_timeout=config.pool_timeout,
+            pool_recycle=config.pool_recycle,
+            pool_pre_ping=config.pool_pre_ping,
+            pool_use_lifo=True,  # lets idle connections beyond the working set age out
+        )
+
+    engine = create_async_engine(url, **kwargs)
+    if isinstance(engine.pool, InstrumentedQueuePool):
+        engine.pool.metrics = PoolMetrics()
+    return engine
+
+
+_engines: Dict[str, AsyncEngine] = {}
+_session_factories: Dict[str, async_sessionmaker] = {}
+
+
+def _role_url(role: str) -> str:
+    if role.startswith(REPLICA):
+        urls = settings.database.replica_urls
+        index = int(role.partition(":")[2] or 0)
+        if index < len(urls):
+            return urls[index]
+    return settings.database.get_url()
 
-engine = create_async_engine(settings.database.get_url())
-AsyncSessionLocal = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+def replica_roles():
+    return [f"{REPLICA}:{index}" for index in range(len(settings.database.replica_urls))]
+
+
+def get_engine(role: str = PRIMARY) -> AsyncEngine:
+    """Shared engine for a role"""
+    url = _role_url(role)
+    if role != PRIMARY and url == settings.database.get_url():
+        role = PRIMARY
+    if role not in _engines:
+        _engines[role] = create_engine_for_url(url)
+    return _engines[role]
+
+
+def get_session_factory(role: str = PRIMARY) -> async_sessionmaker:
+    """Shared session factory for a role"""
+    if role not in _session_factories:
+        _session_factories[role] = async_sessionmaker(
+            get_engine(role), class_=AsyncSession, expire_on_commit=False
+        )
+    return _session_factories[role]
+
+
+def get_pool_metrics() -> Dict[str, Dict[str, Any]]:
+    """Pool statistics per role for the monitoring API"""
+    stats = {}
+    for role, engine in _engines.items():
+        metrics = getattr(engine.pool, "metrics", None)
+        if metrics is not None:
+            stats[role] = metrics.snapshot(engine.pool)
+    return stats
+
+
+def get_pool_load(role: str = PRIMARY) -> float:
+    """Checked-out connections as a fraction of pool_size; above 1.0 means overflow is in use"""
+    engine = get_engine(role)
+    size = engine.pool.size() if hasattr(engine.pool, "size") else 0
+    return engine.pool.checkedout() / size if size else 0.0
+
+
+_read_router: Optional[ReadRouter] = None
+
+
+def get_read_router() -> ReadRouter:
+    """Shared router for replica reads"""
+    global _read_router
+    if _read_router is None:
+        from .config import get_settings
+        config = settings.database
+        _read_router = ReadRouter(
+            primary=get_session_factory(PRIMARY),
+            replicas={role: get_session_factory(role) for role in replica_roles()},
+            max_lag_seconds=config.replica_max_lag_seconds,
+            pin_seconds=config.read_your_writes_seconds,
+            lag_check_interval=config.replica_lag_check_interval,
+            redis_url=get_settings().REDIS_URL
+        )
+    return _read_router
+
+
+set_read_router_provider(get_read_router)
+
+
+async def dispose_engines():
+    """Close every pooled connection, e.g. on shutdown"""
+    global _read_router
+    for engine in _engines.values():
+        await engine.dispose()
+    _engines.clear()
+    _session_factories.clear()
+    _read_router = None
+
+
+engine = get_engine()
+AsyncSessionLocal = get_session_factory()
 Base = declarative_base()
 
 async def get_db() -> AsyncSession:
     async with AsyncSessionLocal() as session:
         yield session
+
+async def get_read_db() -> AsyncSession:
+    """Session on a caught-up replica (or the primary), for staleness-tolerant reads"""
+    async with get_read_router().session() as session:
+        yield session
+
+# Routers written against the older name
+get_db_session = get_db
@@ -25,3 +25,13 @@ async def get_current_active_user(db: AsyncSession = Depends(get_db)) -> User:
             detail="Not authenticated",
         )
     return user
+
+
+async def require_admin_user(current_user: User = Depends(get_current_active_user)) -> User:
+    """The current user, if they are an admin; 403 otherwise."""
+    if not current_user.is_admin:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Admin access required",
+        )
+    return current_user
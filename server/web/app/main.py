@@ -6,6 +6,8 @@ from fastapi.responses import RedirectResponse
 import asyncio
 
 from server.web.app.config import get_settings
+from server.web.app.services.chat_bus import ChatBus
+from server.web.app.services.video_access_control_service import close_access_log_sink
 
 # Import frontend routes
 from server.web.app.api.frontend import (
@@ -107,6 +109,17 @@ app.include_router(reporting.router, prefix="/api")
 app.state.message_queue = asyncio.Queue()
 app.state.response_queues = {}
 
+# With CHAT_BUS_URL set, chats go through Redis Streams instead, so requests
+# and responses meet regardless of which worker serves them
+app.state.chat_bus = ChatBus.from_url(settings.CHAT_BUS_URL) if settings.CHAT_BUS_URL else None
+
+@app.on_event("shutdown")
+async def shutdown():
+    """Write out access log events still buffered in this worker and close the chat bus."""
+    await close_access_log_sink()
+    if app.state.chat_bus is not None:
+        await app.state.chat_bus.close()
+
 @app.get("/")
 async def root():
     """Redirect root to landing page."""
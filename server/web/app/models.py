@@ -7,7 +7,7 @@ from datetime import datetime
 
 from sqlalchemy import (
     Column, String, BigInteger, DateTime, Enum as SAEnum, ForeignKey, Text, 
-    Boolean, Integer
+    Boolean, Integer, Float
 )
 import sqlalchemy as sa
 from sqlalchemy.orm import relationship, declarative_base
@@ -77,6 +77,7 @@ class User(Base):
     display_label = Column(String(255), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
+    is_admin = Column(Boolean, default=False, nullable=False)
     
     content = relationship("Content", back_populates="user")
 
@@ -316,7 +317,7 @@ class VideoPlaylist(Base):
     # Relationships
     creator = relationship("User")
     channel = relationship("Channel", back_populates="playlists")
-    items = relationship("VideoPlaylistItem", back_populates="playlist", cascade="all, delete-orphan", order_by="VideoPlaylistItem.position")
+    items = relationship("VideoPlaylistItem", back_populates="playlist", cascade="all, delete-orphan", order_by="[VideoPlaylistItem.rank, VideoPlaylistItem.id]")
 
 class VideoPlaylistItem(Base):
     __tablename__ = "video_playlist_items"
@@ -325,16 +326,21 @@ class VideoPlaylistItem(Base):
     playlist_id = Column(UUID(as_uuid=True), ForeignKey("video_playlists.id"), nullable=False, index=True)
     video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id"), nullable=False, index=True)
     
-    position = Column(Integer, nullable=False)
+    # Fractional rank key (services/rank_keys.py); items sort by (rank, id).
+    # Collation "C" compares bytes, the order the keys are generated in
+    # (SQLite's default BINARY collation already does).
+    rank = Column(String(255).with_variant(String(255, collation="C"), "postgresql"), nullable=False)
     added_at = Column(DateTime, default=datetime.utcnow, nullable=False)
     
+    # 1-based ordinal, filled in by PlaylistService when it is known
+    position = None
+    
     # Relationships
     playlist = relationship("VideoPlaylist", back_populates="items")
     video = relationship("Video")
     
-    # Ensure unique position per playlist
     __table_args__ = (
-        sa.UniqueConstraint('playlist_id', 'position', name='uq_playlist_position'),
+        sa.Index('ix_video_playlist_items_playlist_rank_id', 'playlist_id', 'rank', 'id'),
     )
 
 class Video(Base):
@@ -366,9 +372,14 @@ class Video(Base):
     
     # Metadata
     thumbnail_s3_key = Column(String(500))
+    content_hash = Column(String(64), nullable=True, index=True)  # SHA-256 of the original file
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     
+    # Denormalized engagement counters, maintained by VideoLikesService
+    like_count = Column(Integer, default=0, server_default='0', nullable=False)
+    dislike_count = Column(Integer, default=0, server_default='0', nullable=False)
+    
     # Relationships
     creator = relationship("User")
     channel = relationship("Channel", back_populates="videos")
@@ -377,6 +388,17 @@ class Video(Base):
     comments = relationship("VideoComment", back_populates="video", cascade="all, delete-orphan")
     likes = relationship("VideoLike", back_populates="video", cascade="all, delete-orphan")
 
+    # Keyset pagination indexes: (filter, sort key, id)
+    __table_args__ = (
+        sa.Index('ix_videos_status_visibility_created_at_id', 'status', 'visibility', 'created_at', 'id'),
+        sa.Index('ix_videos_channel_created_at_id', 'channel_id', 'created_at', 'id'),
+        sa.Index('ix_videos_creator_created_at_id', 'creator_id', 'created_at', 'id'),
+        sa.Index('ix_videos_created_at_id', 'created_at', 'id'),
+        sa.Index('ix_videos_duration_id', 'duration_seconds', 'id'),
+        sa.Index('ix_videos_title_id', 'title', 'id'),
+        sa.Index('ix_videos_like_count_id', 'like_count', 'id'),
+    )
+
 class TranscodingJob(Base):
     __tablename__ = "transcoding_jobs"
     
@@ -407,6 +429,47 @@ class TranscodingJob(Base):
     # Relationships
     video = relationship("Video", back_populates="transcoding_jobs")
 
+class VideoContent(Base):
+    """Content-addressed original shared by every video with identical source bytes"""
+    __tablename__ = "video_contents"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_hash = Column(String(64), unique=True, nullable=False, index=True)
+    fingerprint = Column(String(64), nullable=True, index=True)  # duration/resolution/codec fingerprint
+    original_s3_key = Column(String(500), nullable=False)
+    file_size = Column(BigInteger, nullable=False)
+    ref_count = Column(Integer, default=1, nullable=False)
+    
+    # Video whose renditions new duplicates are cloned from
+    source_video_id = Column(UUID(as_uuid=True), ForeignKey("videos.id", ondelete="SET NULL"), nullable=True)
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+    
+    # Relationships
+    source_video = relationship("Video")
+
+class TagStat(Base):
+    """Number of live videos carrying each tag, maintained as tags change"""
+    __tablename__ = "tag_stats"
+
+    tag = Column(String(50), primary_key=True)
+    usage_count = Column(Integer, default=0, nullable=False, index=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
+
+class TagCooccurrence(Base):
+    """Number of live videos carrying both tags; stored once per direction"""
+    __tablename__ = "tag_cooccurrences"
+
+    tag = Column(String(50), primary_key=True)
+    related_tag = Column(String(50), primary_key=True)
+    count = Column(Integer, default=0, nullable=False)
+
+    # Related-tag lookups read the top counts for a single tag
+    __table_args__ = (
+        sa.Index('ix_tag_cooccurrences_tag_count', 'tag', 'count'),
+    )
+
 class ViewSession(Base):
     __tablename__ = "view_sessions"
     
@@ -438,6 +501,10 @@ class ViewSession(Base):
     video = relationship("Video", back_populates="view_sessions")
     user = relationship("User")
 
+    __table_args__ = (
+        sa.Index('ix_view_sessions_user_heartbeat_id', 'user_id', 'last_heartbeat', 'id'),
+    )
+
 class VideoComment(Base):
     __tablename__ = "video_comments"
     
@@ -448,6 +515,7 @@ class VideoComment(Base):
     
     content = Column(Text, nullable=False)
     is_deleted = Column(Boolean, default=False, nullable=False)
+    reply_count = Column(Integer, default=0, server_default='0', nullable=False)  # undeleted replies
     
     created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
@@ -458,6 +526,13 @@ class VideoComment(Base):
     parent_comment = relationship("VideoComment", remote_side=[id])
     replies = relationship("VideoComment", back_populates="parent_comment")
 
+    __table_args__ = (
+        sa.Index(
+            'ix_video_comments_top_level_created_at_id', 'video_id', 'created_at', 'id',
+            postgresql_where=sa.text('parent_comment_id IS NULL AND NOT is_deleted')
+        ),
+    )
+
 class VideoLike(Base):
     __tablename__ = "video_likes"
     
@@ -546,6 +621,44 @@ class ModerationRecord(Base):
     # Relationships
     moderator = relationship("User")
 
+class ModerationScanJob(Base):
+    """Resumable bulk re-scan of video metadata or comments"""
+    __tablename__ = "moderation_scan_jobs"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    content_type = Column(String(50), nullable=False)  # video, comment
+    status = Column(String(50), default="pending", nullable=False, index=True)  # pending, running, paused, cancelled, completed, failed
+    batch_size = Column(Integer, default=500, nullable=False)
+    
+    # Keyset cursor after the last committed batch
+    checkpoint = Column(String(500), nullable=True)
+    total_estimate = Column(Integer, nullable=True)
+    scanned_count = Column(Integer, default=0, nullable=False)
+    flagged_count = Column(Integer, default=0, nullable=False)
+    elapsed_seconds = Column(Float, default=0.0, nullable=False)  # time spent running, across resumes
+    error = Column(Text, nullable=True)
+    
+    created_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+    started_at = Column(DateTime, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow, nullable=False)  # heartbeat while running
+    completed_at = Column(DateTime, nullable=True)
+
+class ModerationScanResult(Base):
+    """Flagged item found by a moderation scan job"""
+    __tablename__ = "moderation_scan_results"
+    
+    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
+    job_id = Column(UUID(as_uuid=True), ForeignKey("moderation_scan_jobs.id", ondelete="CASCADE"), nullable=False, index=True)
+    content_type = Column(String(50), nullable=False)
+    content_id = Column(UUID(as_uuid=True), nullable=False, index=True)
+    
+    risk_level = Column(String(20), nullable=False, index=True)
+    recommended_action = Column(String(50), nullable=False)
+    flags = Column(JSONB, default=lambda: [])
+    
+    created_at = Column(DateTime, default=datetime.utcnow, nullable=False)
+
 class ImportJob(Base):
     """Model for media import jobs using yt-dlp"""
     __tablename__ = "import_jobs"
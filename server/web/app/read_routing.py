@@ -0,0 +1,195 @@
+"""
+Read Routing
+
+Sends read-only, staleness-tolerant queries (analytics, discovery, admin
+dashboards) to streaming replicas instead of the primary:
+
+- each replica's replay lag is probed at most every lag_check_interval
+  seconds; replicas lagging more than max_lag_seconds, or failing the probe,
+  are skipped until a later probe finds them caught up
+- healthy replicas are used round-robin; with none healthy, reads fall back
+  to the primary
+- after a user's own write, that user's reads are pinned to the primary for
+  pin_seconds so they see what they just wrote (read-your-writes). Pins are
+  kept in Redis so they apply on every web worker, with a process-local
+  fallback when Redis is unavailable.
+"""
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from dataclasses import dataclass
+from typing import AsyncIterator, Callable, Dict, Optional
+
+import redis.asyncio as redis
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+logger = logging.getLogger(__name__)
+
+# Seconds since the last replayed transaction, or 0 when everything received
+# has been replayed (an idle primary would otherwise look like growing lag)
+LAG_QUERY = text("""
+    SELECT CASE
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+""")
+
+
+@dataclass
+class ReplicaState:
+    """Last lag probe result for one replica"""
+    lag_seconds: Optional[float] = None  # None: unreachable or not probed yet
+    checked_at: float = 0.0
+
+
+class ReadRouter:
+    """Chooses the primary or a replica session for each read"""
+
+    PIN_KEY_PREFIX = "db:read_pin"
+    RETRY_INTERVAL = 30  # seconds before retrying Redis after a failure
+
+    def __init__(
+        self,
+        primary: async_sessionmaker,
+        replicas: Optional[Dict[str, async_sessionmaker]] = None,
+        max_lag_seconds: float = 5.0,
+        pin_seconds: float = 10.0,
+        lag_check_interval: float = 2.0,
+        redis_url: Optional[str] = None
+    ):
+        self.primary = primary
+        self.replicas = dict(replicas or {})
+        self.max_lag_seconds = max_lag_seconds
+        self.pin_seconds = pin_seconds
+        self.lag_check_interval = lag_check_interval
+        self.redis_url = redis_url
+        self.redis_client = None
+        self._retry_at = 0.0
+        self._states = {name: ReplicaState() for name in self.replicas}
+        self._next = 0
+        self._pins: Dict[str, float] = {}
+
+    async def _get_redis_client(self) -> Optional[redis.Redis]:
+        """Get Redis client, or None while Redis is disabled or backing off."""
+        if not self.redis_url or time.monotonic() < self._retry_at:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _redis_failed(self, operation: str, error: Exception):
+        logger.warning(f"Read pin {operation} failed, using local pins: {error}")
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    def _pin_key(self, user_id) -> str:
+        return f"{self.PIN_KEY_PREFIX}:{user_id}"
+
+    async def record_write(self, user_id):
+        """Pin user_id's reads to the primary until replicas have caught up"""
+        if user_id is None or not self.replicas:
+            return
+        self._pins[str(user_id)] = time.monotonic() + self.pin_seconds
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(self._pin_key(user_id), "1", px=int(self.pin_seconds * 1000))
+        except Exception as e:
+            self._redis_failed("set", e)
+
+    async def is_pinned(self, user_id) -> bool:
+        if user_id is None:
+            return False
+        expires = self._pins.get(str(user_id))
+        if expires is not None:
+            if expires > time.monotonic():
+                return True
+            del self._pins[str(user_id)]
+
+        client = await self._get_redis_client()
+        if client is None:
+            return False
+        try:
+            return bool(await client.exists(self._pin_key(user_id)))
+        except Exception as e:
+            self._redis_failed("get", e)
+            return False
+
+    async def _measure_lag(self, name: str) -> Optional[float]:
+        """Replay lag of a replica in seconds, or None if it cannot be reached"""
+        try:
+            async with self.replicas[name]() as session:
+                lag = await session.scalar(LAG_QUERY)
+            return float(lag or 0)
+        except Exception as e:
+            logger.warning(f"Replica {name} lag probe failed: {e}")
+            return None
+
+    async def _refresh(self, name: str):
+        state = self._states[name]
+        if time.monotonic() - state.checked_at < self.lag_check_interval:
+            return
+        # Claim the probe before awaiting so concurrent reads do not all probe
+        state.checked_at = time.monotonic()
+        state.lag_seconds = await self._measure_lag(name)
+
+    def _healthy(self, name: str) -> bool:
+        lag = self._states[name].lag_seconds
+        return lag is not None and lag <= self.max_lag_seconds
+
+    async def choose(self, user_id=None) -> str:
+        """Name of the replica to read from, or "primary" """
+        if not self.replicas or await self.is_pinned(user_id):
+            return "primary"
+
+        names = list(self.replicas)
+        await asyncio.gather(*(self._refresh(name) for name in names))
+        for offset in range(len(names)):
+            name = names[(self._next + offset) % len(names)]
+            if self._healthy(name):
+                self._next = (self._next + offset + 1) % len(names)
+                return name
+        return "primary"
+
+    @asynccontextmanager
+    async def session(self, user_id=None) -> AsyncIterator[AsyncSession]:
+        """
+        Read-only session on a caught-up replica, or on the primary when no
+        replica is usable or user_id has written recently.
+        """
+        name = await self.choose(user_id)
+        factory = self.replicas.get(name, self.primary)
+        async with factory() as session:
+            yield session
+
+    def status(self):
+        """Replica lag and health for the monitoring API"""
+        return {
+            name: {
+                "lag_seconds": state.lag_seconds,
+                "healthy": self._healthy(name),
+                "checked_at_age_seconds": round(time.monotonic() - state.checked_at, 3) if state.checked_at else None,
+            }
+            for name, state in self._states.items()
+        }
+
+
+# Set by server.web.app.db once the engines are configured
+_read_router_provider: Optional[Callable[[], ReadRouter]] = None
+
+
+def set_read_router_provider(provider: Callable[[], ReadRouter]):
+    global _read_router_provider
+    _read_router_provider = provider
+
+
+async def record_user_write(user_id):
+    """
+    Route user_id's next reads to the primary so they see their own write.
+    A no-op in processes without configured database routing.
+    """
+    if _read_router_provider is not None:
+        await _read_router_provider().record_write(user_id)
@@ -9,6 +9,10 @@ from sqlalchemy.orm import selectinload, joinedload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_service import BaseService
+from .content_dedup_service import ContentDedupService, delete_released_objects
+from .pagination import KeysetPaginator, count_rows, default_count_mode
+from .tag_index_service import TagIndexService, UNINDEXED_STATUSES
+from .video_access_cache import invalidate_video_access
 from ..models import (
     Video, TranscodingJob, User, Channel, ViewSession, VideoComment, VideoLike,
     VideoStatus, TranscodingStatus, VideoVisibility, ContentReport, ModerationRecord
@@ -89,9 +93,16 @@ class AdminVideoService(BaseService):
         creator_filter: Optional[str] = None,
         search_query: Optional[str] = None,
         sort_by: str = 'created_at',
-        sort_order: str = 'desc'
+        sort_order: str = 'desc',
+        cursor: Optional[str] = None,
+        count_mode: Optional[str] = None
     ) -> Dict[str, Any]:
-        """Get paginated list of videos with filtering and sorting."""
+        """
+        Get paginated list of videos with filtering and sorting.
+
+        Pass the previous response's next_cursor to continue; page is only
+        used when no cursor is given.
+        """
         
         # Build base query
         query = select(Video).options(
@@ -123,27 +134,24 @@ class AdminVideoService(BaseService):
                 )
             )
         
-        # Apply sorting
-        sort_column = getattr(Video, sort_by, Video.created_at)
-        if sort_order == 'desc':
-            query = query.order_by(desc(sort_column))
-        else:
-            query = query.order_by(asc(sort_column))
-        
         # Get total count
-        count_query = select(func.count()).select_from(query.subquery())
-        total_count = await db.scalar(count_query)
+        total_count, is_estimate = await count_rows(db, query, count_mode or default_count_mode(cursor))
         
-        # Apply pagination
-        offset = (page - 1) * per_page
-        query = query.offset(offset).limit(per_page)
+        # Apply sorting and pagination
+        sort_column = getattr(Video, sort_by, Video.created_at)
+        paginator = KeysetPaginator(
+            f"{sort_column.key}:{sort_order}", sort_column, Video.id, descending=sort_order == 'desc'
+        )
+        query = paginator.apply(query, cursor, per_page)
+        if not cursor:
+            query = query.offset((page - 1) * per_page)
         
         result = await db.execute(query)
-        videos = result.scalars().all()
+        video_page = paginator.page(result.unique().scalars().all(), per_page)
         
         # Format video data
         video_data = []
-        for video in videos:
+        for video in video_page.items:
             # Get transcoding job summary
             transcoding_summary = {
                 'total_jobs': len(video.transcoding_jobs),
@@ -179,7 +187,9 @@ class AdminVideoService(BaseService):
                 'page': page,
                 'per_page': per_page,
                 'total_count': total_count,
-                'total_pages': (total_count + per_page - 1) // per_page
+                'total_is_estimate': is_estimate,
+                'total_pages': (total_count + per_page - 1) // per_page if total_count is not None else None,
+                'next_cursor': video_page.next_cursor
             }
         }
     
@@ -311,6 +321,7 @@ class AdminVideoService(BaseService):
         
         result = await db.execute(stmt)
         await db.commit()
+        await invalidate_video_access(video_ids)
         
         return result.rowcount
     
@@ -319,6 +330,14 @@ class AdminVideoService(BaseService):
         
         from sqlalchemy import update
         
+        # Drop the tags of videos going from live to deleted from the tag index
+        tag_index = TagIndexService(db)
+        live_tags = await db.execute(
+            select(Video.tags).where(Video.id.in_(video_ids), Video.status.notin_(UNINDEXED_STATUSES))
+        )
+        for (tags,) in live_tags.all():
+            await tag_index.apply_change(tags, None)
+        
         stmt = update(Video).where(
             Video.id.in_(video_ids)
         ).values(
@@ -328,9 +347,18 @@ class AdminVideoService(BaseService):
         
         result = await db.execute(stmt)
         await db.commit()
-        
-        # TODO: Trigger cleanup of S3 files
-        # This would typically involve sending messages to a cleanup queue
+        await invalidate_video_access(video_ids)
+        
+        # Release shared originals and renditions; objects still referenced
+        # by other videos are kept
+        dedup_service = ContentDedupService(db)
+        released_keys = []
+        videos = await db.execute(select(Video).where(Video.id.in_(video_ids)))
+        for video in videos.scalars().all():
+            released_keys.extend(await dedup_service.release(video))
+        
+        if released_keys:
+            await delete_released_objects(released_keys)
         
         return result.rowcount
     
@@ -31,7 +31,7 @@ class AnalyticsDashboardService(BaseService):
         timeframe: str = "30d"
     ) -> Dict[str, Any]:
         """Get comprehensive dashboard data for a creator"""
-        async with self.get_db_session() as db:
+        async with self.get_read_session(creator_id) as db:
             # Get basic creator analytics
             creator_analytics = await self.analytics_service.get_creator_analytics(creator_id, timeframe)
             
@@ -52,7 +52,7 @@ class AnalyticsDashboardService(BaseService):
         timeframe: str = "7d"
     ) -> Dict[str, Any]:
         """Get detailed dashboard data for a specific video"""
-        async with self.get_db_session() as db:
+        async with self.get_read_session() as db:
             # Get basic video analytics
             video_analytics = await self.analytics_service.get_video_analytics(video_id, timeframe)
             
@@ -72,7 +72,7 @@ class AnalyticsDashboardService(BaseService):
     
     async def get_platform_overview(self, timeframe: str = "30d") -> Dict[str, Any]:
         """Get platform-wide analytics overview for administrators"""
-        async with self.get_db_session() as db:
+        async with self.get_read_session() as db:
             end_date = datetime.utcnow()
             if timeframe == "7d":
                 start_date = end_date - timedelta(days=7)
@@ -4,4 +4,20 @@ class BaseService(ABC):
     """
     Abstract base class for all services.
     """
-    pass
+    
+    def get_db_session(self, role: str = "primary"):
+        """
+        Open a session from the shared pool for the given engine role.
+        Use as `async with self.get_db_session() as db`.
+        """
+        from server.web.app.db import get_session_factory
+        return get_session_factory(role)()
+
+    def get_read_session(self, user_id=None):
+        """
+        Open a read-only session that may be served by a replica a few
+        seconds behind the primary. Pass the requesting user's id so reads
+        right after their own writes stay on the primary.
+        """
+        from server.web.app.db import get_read_router
+        return get_read_router().session(user_id)
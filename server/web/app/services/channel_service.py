@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_service import BaseService
+from .pagination import KeysetPaginator, Page
 from ..models import Channel, Video, VideoPlaylist, User, VideoVisibility
 from ..dependencies import get_db
 
@@ -151,9 +152,13 @@ class ChannelService(BaseService):
         channel_id: uuid.UUID,
         viewer_user_id: Optional[uuid.UUID] = None,
         limit: int = 20,
-        offset: int = 0
-    ) -> List[Video]:
-        """Get videos in a channel with visibility filtering."""
+        offset: int = 0,
+        cursor: Optional[str] = None
+    ) -> Page:
+        """
+        Get videos in a channel with visibility filtering, newest first.
+        Pass the previous page's next_cursor to continue.
+        """
         async with self.get_db_session() as db:
             query = (
                 select(Video)
@@ -174,15 +179,13 @@ class ChannelService(BaseService):
                 # Anonymous users can only see public videos
                 query = query.where(Video.visibility == VideoVisibility.public)
             
-            query = (
-                query
-                .order_by(Video.created_at.desc())
-                .limit(limit)
-                .offset(offset)
-            )
+            paginator = KeysetPaginator("newest", Video.created_at, Video.id)
+            query = paginator.apply(query, cursor, limit)
+            if offset and not cursor:
+                query = query.offset(offset)
             
             result = await db.execute(query)
-            return result.scalars().all()
+            return paginator.page(result.scalars().all(), limit)
     
     async def get_channel_playlists(
         self,
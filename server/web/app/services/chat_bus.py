@@ -0,0 +1,187 @@
+"""
+Chat Bus
+
+Carries AI chat traffic between the web workers and the server bot over
+Redis Streams, so a chat works no matter which uvicorn worker handles the
+HTTP request or WebSocket.
+
+- Requests (`create_session`, `send_message`, `close_session`) go to one
+  stream read by the server bot through a consumer group; an entry is
+  acknowledged once handled and re-delivered to another consumer if its
+  reader died before acknowledging it.
+- Responses go to one stream per session. Readers use plain XREAD from a
+  last-seen entry id, so any number of WebSockets can follow a session and
+  a reconnecting client resumes where it stopped. Response streams expire
+  RESPONSE_TTL seconds after their last entry.
+
+Entries hold a single `data` field with the JSON-encoded message.
+"""
+import json
+import logging
+import time
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
+
+import redis.asyncio as redis
+from redis.exceptions import ResponseError
+
+logger = logging.getLogger(__name__)
+
+Entry = Tuple[str, Dict[str, Any]]
+
+
+class ChatResponseTimeout(Exception):
+    """No complete response arrived in time"""
+
+
+class ChatBus:
+    """Redis Streams transport for chat requests and responses"""
+
+    REQUEST_STREAM = "chat:requests"
+    RESPONSE_PREFIX = "chat:responses"
+    CONSUMER_GROUP = "server_bot"
+    RESPONSE_TTL = 24 * 60 * 60  # matches the server bot's stale session cleanup
+    REQUEST_MAXLEN = 10000
+    RESPONSE_MAXLEN = 2000
+    CLAIM_IDLE_MS = 60 * 1000  # unacknowledged this long: the consumer is gone
+    PENDING_PAGE = 100
+
+    def __init__(self, client: redis.Redis):
+        self.client = client
+        self._group_ready = False
+
+    @classmethod
+    def from_url(cls, redis_url: str) -> "ChatBus":
+        return cls(redis.from_url(redis_url, decode_responses=True))
+
+    async def close(self):
+        await self.client.close()
+
+    def _response_stream(self, session_id: str) -> str:
+        return f"{self.RESPONSE_PREFIX}:{session_id}"
+
+    @staticmethod
+    def _decode(entries) -> List[Entry]:
+        decoded = []
+        for entry_id, fields in entries:
+            # Entries trimmed while pending come back without fields
+            if fields:
+                decoded.append((entry_id, json.loads(fields["data"])))
+        return decoded
+
+    # --- Requests: web workers -> server bot ---
+
+    async def publish_request(self, message: Dict[str, Any]) -> str:
+        return await self.client.xadd(
+            self.REQUEST_STREAM,
+            {"data": json.dumps(message)},
+            maxlen=self.REQUEST_MAXLEN,
+            approximate=True
+        )
+
+    async def _ensure_group(self):
+        if self._group_ready:
+            return
+        try:
+            await self.client.xgroup_create(self.REQUEST_STREAM, self.CONSUMER_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    async def read_requests(self, consumer: str, count: int = 10, block_ms: int = 5000) -> List[Entry]:
+        """
+        Next requests for this consumer: first any left unacknowledged by a
+        dead consumer, then new ones (waiting up to block_ms). Entries this
+        consumer still has pending are never claimed back, however long
+        their handler takes.
+        """
+        await self._ensure_group()
+        stale = await self._stale_requests(consumer, count)
+        if stale:
+            # XCLAIM re-checks the idle time, so two consumers cannot both take an entry
+            claimed = self._decode(await self.client.xclaim(
+                self.REQUEST_STREAM, self.CONSUMER_GROUP, consumer, self.CLAIM_IDLE_MS, stale
+            ))
+            if claimed:
+                logger.info(f"Chat bus consumer {consumer} reclaimed {len(claimed)} requests")
+                return claimed
+
+        result = await self.client.xreadgroup(
+            self.CONSUMER_GROUP, consumer, {self.REQUEST_STREAM: ">"}, count=count, block=block_ms
+        )
+        return [entry for _, entries in result or [] for entry in self._decode(entries)]
+
+    async def _stale_requests(self, consumer: str, count: int) -> List[str]:
+        """Ids of requests idle past CLAIM_IDLE_MS in other consumers' pending lists."""
+        stale: List[str] = []
+        start = "-"
+        while len(stale) < count:
+            page = await self.client.xpending_range(
+                self.REQUEST_STREAM, self.CONSUMER_GROUP, min=start, max="+",
+                count=self.PENDING_PAGE, idle=self.CLAIM_IDLE_MS
+            )
+            stale.extend(entry["message_id"] for entry in page if entry["consumer"] != consumer)
+            if len(page) < self.PENDING_PAGE:
+                break
+            start = f"({page[-1]['message_id']}"
+        return stale[:count]
+
+    async def ack_request(self, entry_id: str):
+        await self.client.xack(self.REQUEST_STREAM, self.CONSUMER_GROUP, entry_id)
+
+    # --- Responses: server bot -> web workers ---
+
+    async def publish_response(self, session_id: str, frame: Dict[str, Any]) -> str:
+        stream = self._response_stream(session_id)
+        async with self.client.pipeline(transaction=False) as pipe:
+            pipe.xadd(stream, {"data": json.dumps(frame)}, maxlen=self.RESPONSE_MAXLEN, approximate=True)
+            pipe.expire(stream, self.RESPONSE_TTL)
+            entry_id, _ = await pipe.execute()
+        return entry_id
+
+    async def latest_response_id(self, session_id: str) -> str:
+        """Id of the newest response entry; read after it to get only new ones."""
+        entries = await self.client.xrevrange(self._response_stream(session_id), count=1)
+        return entries[0][0] if entries else "0-0"
+
+    async def read_responses(
+        self, session_id: str, last_id: str, count: int = 100, block_ms: Optional[int] = 5000
+    ) -> List[Entry]:
+        result = await self.client.xread(
+            {self._response_stream(session_id): last_id}, count=count, block=block_ms
+        )
+        return [entry for _, entries in result or [] for entry in self._decode(entries)]
+
+    async def follow_responses(self, session_id: str, last_id: str, block_ms: int = 5000) -> AsyncIterator[Entry]:
+        """Yield response entries after last_id as they arrive."""
+        while True:
+            for entry_id, frame in await self.read_responses(session_id, last_id, block_ms=block_ms):
+                last_id = entry_id
+                yield entry_id, frame
+
+    async def wait_for_response(
+        self, session_id: str, request_id: str, after_id: str, timeout: float = 300
+    ) -> Dict[str, Any]:
+        """
+        Collect one request's response frames after `after_id` until the
+        frame marked complete. Returns the last frame with the joined text.
+        """
+        deadline = time.monotonic() + timeout
+        parts = []
+        last_id = after_id
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise ChatResponseTimeout(f"No response for request {request_id}")
+            for entry_id, frame in await self.read_responses(
+                session_id, last_id, block_ms=max(1, int(min(remaining, 5) * 1000))
+            ):
+                last_id = entry_id
+                if frame.get("request_id") != request_id:
+                    continue
+                parts.append(frame.get("text", ""))
+                if frame.get("is_complete"):
+                    return {**frame, "text": "".join(parts)}
+
+    async def delete_session(self, session_id: str):
+        await self.client.delete(self._response_stream(session_id))
@@ -1,20 +1,34 @@
 # server/web/app/services/chat_service.py
 import asyncio
+import base64
 import uuid
+from typing import Optional
 from fastapi import Request as FastAPIRequest
-from fastapi import WebSocket
+from fastapi import WebSocket, WebSocketDisconnect
 from sqlalchemy.orm import Session
 
 from shared_lib.audit import log_audit_event
 from shared_lib.crypto import get_encryptor
 from shared_lib.moderation import moderate_prompt
 from shared_lib.schemas import Request, Response
+from server.web.app.services.chat_bus import ChatBus, ChatResponseTimeout
 
 
 class ChatService:
     def __init__(self, request: FastAPIRequest):
         self.request = request
 
+    @property
+    def chat_bus(self) -> Optional[ChatBus]:
+        # Set in main.py when CHAT_BUS_URL is configured; otherwise chats use
+        # the process-local queues shared with an in-process server bot
+        return getattr(self.request.app.state, "chat_bus", None)
+
+    @staticmethod
+    def _encrypt_prompt(prompt: str) -> str:
+        # Text, so the message can be JSON-encoded on the bus and by the server bot
+        return base64.b64encode(get_encryptor().encrypt(prompt)).decode("ascii")
+
     async def create_session(self, db: Session):
         session_id = uuid.uuid4()
         # In a real app, you'd create a User and Session in the DB here
@@ -27,9 +41,13 @@ class ChatService:
             old_values={},
             new_values={"session_id": str(session_id)},
         )
-        message_queue = self.request.app.state.message_queue
-        self.request.app.state.response_queues[str(session_id)] = asyncio.Queue()
-        await message_queue.put({"action": "create_session", "session_id": str(session_id)})
+        message = {"action": "create_session", "session_id": str(session_id)}
+        if self.chat_bus:
+            await self.chat_bus.publish_request(message)
+        else:
+            message_queue = self.request.app.state.message_queue
+            self.request.app.state.response_queues[str(session_id)] = asyncio.Queue()
+            await message_queue.put(message)
         return {"session_id": str(session_id)}
 
     async def send_message(self, db: Session, request: Request):
@@ -48,20 +66,31 @@ class ChatService:
             old_values={},
             new_values={"prompt": request.prompt},
         )
-        encryptor = get_encryptor()
-        encrypted_prompt = encryptor.encrypt(request.prompt)
-
-        message_queue = self.request.app.state.message_queue
-        await message_queue.put(
-            {
-                "action": "send_message",
-                "session_id": str(request.session_id),
-                "prompt": encrypted_prompt,
-            }
-        )
+        encrypted_prompt = self._encrypt_prompt(request.prompt)
+        message = {
+            "action": "send_message",
+            "session_id": str(request.session_id),
+            "request_id": str(request.request_id),
+            "prompt": encrypted_prompt,
+        }
 
-        response_queue = self.request.app.state.response_queues[str(request.session_id)]
-        response = await response_queue.get()
+        if self.chat_bus:
+            # Only frames published after this point can belong to the request
+            after_id = await self.chat_bus.latest_response_id(str(request.session_id))
+            await self.chat_bus.publish_request(message)
+            try:
+                frame = await self.chat_bus.wait_for_response(
+                    str(request.session_id), str(request.request_id), after_id
+                )
+                response = frame["text"]
+            except ChatResponseTimeout:
+                response = "The AI did not respond in time."
+        else:
+            message_queue = self.request.app.state.message_queue
+            await message_queue.put(message)
+
+            response_queue = self.request.app.state.response_queues[str(request.session_id)]
+            response = await response_queue.get()
 
         return Response(
             session_id=request.session_id,
@@ -70,6 +99,10 @@ class ChatService:
         )
 
     async def handle_websocket(self, websocket: WebSocket, session_id: str, db: Session):
+        if self.chat_bus:
+            await self._handle_websocket_bus(websocket, session_id, db)
+            return
+
         await websocket.accept()
         response_queue = self.request.app.state.response_queues[session_id]
         while True:
@@ -77,7 +110,7 @@ class ChatService:
             if not moderate_prompt(data):
                 await websocket.send_text("Your prompt contains inappropriate content.")
                 continue
-            
+
             log_audit_event(
                 db,
                 user_id="anonymous",
@@ -88,17 +121,76 @@ class ChatService:
                 new_values={"prompt": data},
             )
 
-            encryptor = get_encryptor()
-            encrypted_prompt = encryptor.encrypt(data)
+            encrypted_prompt = self._encrypt_prompt(data)
 
             message_queue = self.request.app.state.message_queue
             await message_queue.put(
                 {
                     "action": "send_message",
                     "session_id": session_id,
+                    "request_id": str(uuid.uuid4()),
                     "prompt": encrypted_prompt,
                 }
             )
-            
+
             response = await response_queue.get()
             await websocket.send_text(response)
+
+    async def _handle_websocket_bus(self, websocket: WebSocket, session_id: str, db: Session):
+        """
+        Prompts are published as they arrive while a separate task follows
+        the session's response stream, so every socket open on the session
+        sees every response. A reconnecting client passes the `id` of the
+        last frame it received as `?last_id=` and gets what it missed.
+        """
+        await websocket.accept()
+        last_id = websocket.query_params.get("last_id") or await self.chat_bus.latest_response_id(session_id)
+        forwarder = asyncio.create_task(self._forward_responses(websocket, session_id, last_id))
+        try:
+            while True:
+                data = await websocket.receive_text()
+                if not moderate_prompt(data):
+                    await websocket.send_json(
+                        {"type": "error", "message": "Your prompt contains inappropriate content."}
+                    )
+                    continue
+
+                request_id = str(uuid.uuid4())
+                log_audit_event(
+                    db,
+                    user_id="anonymous",
+                    action="send_message_ws",
+                    resource_type="message",
+                    resource_id=request_id,
+                    old_values={},
+                    new_values={"prompt": data},
+                )
+
+                await self.chat_bus.publish_request(
+                    {
+                        "action": "send_message",
+                        "session_id": session_id,
+                        "request_id": request_id,
+                        "prompt": self._encrypt_prompt(data),
+                    }
+                )
+        except WebSocketDisconnect:
+            pass
+        finally:
+            forwarder.cancel()
+            await asyncio.gather(forwarder, return_exceptions=True)
+
+    async def _forward_responses(self, websocket: WebSocket, session_id: str, last_id: str):
+        async for entry_id, frame in self.chat_bus.follow_responses(session_id, last_id):
+            if frame.get("error"):
+                await websocket.send_json({"type": "error", "id": entry_id, "message": frame.get("text", "")})
+            else:
+                await websocket.send_json(
+                    {
+                        "type": "response",
+                        "id": entry_id,
+                        "request_id": frame.get("request_id"),
+                        "content": frame.get("text", ""),
+                        "is_complete": frame.get("is_complete", False),
+                    }
+                )
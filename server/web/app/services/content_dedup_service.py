@@ -0,0 +1,291 @@
+"""
+Content Dedup Service
+
+Content-addressed index of video originals. Every original is keyed by the
+SHA-256 of its bytes; a new upload or import with a known hash references the
+existing S3 original and gets copies of the finished rendition rows instead of
+being stored and transcoded again. Originals are reference counted and their
+objects are only released once the last video using them is deleted.
+"""
+import asyncio
+import hashlib
+import logging
+import os
+from datetime import datetime
+from typing import List, Optional, BinaryIO
+
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.models import Video, VideoContent, VideoStatus, TranscodingJob, TranscodingStatus
+from server.web.app.services.base_service import BaseService
+
+logger = logging.getLogger(__name__)
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def new_content_hasher():
+    """Hasher used for content hashes; streamed into as data arrives"""
+    return hashlib.sha256()
+
+
+def hash_stream(stream: BinaryIO, hasher=None):
+    """Feed a stream into a hasher one block at a time and return the hasher"""
+    hasher = hasher or new_content_hasher()
+    for block in iter(lambda: stream.read(HASH_BLOCK_SIZE), b''):
+        hasher.update(block)
+    return hasher
+
+
+def _hash_file(file_path: str) -> str:
+    with open(file_path, 'rb') as f:
+        return hash_stream(f).hexdigest()
+
+
+class ContentDedupService(BaseService):
+    """Service for content-addressed deduplication of video originals"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def hash_file(self, file_path: str) -> str:
+        """Hash a file without blocking the event loop"""
+        return await asyncio.to_thread(_hash_file, file_path)
+
+    @staticmethod
+    def compute_fingerprint(duration_seconds: Optional[float], resolution: Optional[str],
+                            codec: Optional[str], file_size: int) -> str:
+        """
+        Cheap metadata fingerprint for spotting likely duplicates (e.g. remuxes)
+        whose bytes differ. Only exact hash matches are reused automatically.
+        """
+        duration = int(round(duration_seconds or 0))
+        size_bucket = file_size >> 20  # MiB
+        key = f"{duration}|{resolution or ''}|{(codec or '').lower()}|{size_bucket}"
+        return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+    async def find_by_hash(self, content_hash: str) -> Optional[VideoContent]:
+        result = await self.db.execute(
+            select(VideoContent).where(VideoContent.content_hash == content_hash)
+        )
+        return result.scalar_one_or_none()
+
+    async def find_similar(self, fingerprint: str, limit: int = 10) -> List[VideoContent]:
+        """Originals sharing a metadata fingerprint"""
+        result = await self.db.execute(
+            select(VideoContent).where(VideoContent.fingerprint == fingerprint).limit(limit)
+        )
+        return list(result.scalars().all())
+
+    async def register(self, video: Video, content_hash: str,
+                       fingerprint: Optional[str] = None) -> VideoContent:
+        """Record a newly stored original; the video becomes its rendition source"""
+        content = VideoContent(
+            content_hash=content_hash,
+            fingerprint=fingerprint,
+            original_s3_key=video.original_s3_key,
+            file_size=video.file_size,
+            ref_count=1,
+            source_video_id=video.id
+        )
+        video.content_hash = content_hash
+        self.db.add(content)
+        await self.db.commit()
+        return content
+
+    async def settle_hash(self, video: Video, content_hash: str,
+                          fingerprint: Optional[str] = None) -> Optional[str]:
+        """
+        Register or reference the original of a video hashed after upload.
+
+        S3 uploads are hashed by the transcoding worker from the source it
+        downloads, and every rung of a video may run on a different worker,
+        so only the first caller to record the hash on the video settles it.
+        Returns the video's own object key when an identical original was
+        already stored, for the caller to delete.
+        """
+        claimed = await self.db.execute(
+            update(Video)
+            .where(Video.id == video.id, Video.content_hash.is_(None))
+            .values(content_hash=content_hash)
+        )
+        if claimed.rowcount == 0:
+            await self.db.commit()
+            return None
+
+        existing = await self.find_by_hash(content_hash)
+        if existing is None:
+            await self.register(video, content_hash, fingerprint)
+            return None
+
+        uploaded_key = video.original_s3_key
+        await self.add_reference(existing, video)
+        return uploaded_key if uploaded_key != existing.original_s3_key else None
+
+    async def add_reference(self, content: VideoContent, video: Video):
+        """Point a video at an existing original"""
+        await self.db.execute(
+            update(VideoContent)
+            .where(VideoContent.id == content.id)
+            .values(ref_count=VideoContent.ref_count + 1, updated_at=datetime.utcnow())
+        )
+        video.content_hash = content.content_hash
+        video.original_s3_key = content.original_s3_key
+        if content.source_video_id is None:
+            content.source_video_id = video.id
+        await self.db.commit()
+
+    async def clone_renditions(self, content: VideoContent, video: Video,
+                               quality_presets: List[str]) -> List[str]:
+        """
+        Copy the source video's completed renditions onto a duplicate video.
+
+        Returns the presets that were cloned; the rest still need transcoding.
+        """
+        if content.source_video_id is None:
+            return []
+
+        result = await self.db.execute(
+            select(TranscodingJob).where(
+                TranscodingJob.video_id == content.source_video_id,
+                TranscodingJob.status == TranscodingStatus.completed,
+                TranscodingJob.quality_preset.in_(quality_presets)
+            )
+        )
+
+        source = await self.db.get(Video, content.source_video_id)
+        if source and source.thumbnail_s3_key and not video.thumbnail_s3_key:
+            video.thumbnail_s3_key = source.thumbnail_s3_key
+
+        cloned = []
+        for job in result.scalars().all():
+            self.db.add(TranscodingJob(
+                video_id=video.id,
+                quality_preset=job.quality_preset,
+                target_resolution=job.target_resolution,
+                target_framerate=job.target_framerate,
+                target_bitrate=job.target_bitrate,
+                status=TranscodingStatus.completed,
+                progress_percent=100,
+                output_s3_key=job.output_s3_key,
+                hls_manifest_s3_key=job.hls_manifest_s3_key,
+                output_file_size=job.output_file_size,
+                started_at=job.started_at,
+                completed_at=datetime.utcnow()
+            ))
+            cloned.append(job.quality_preset)
+
+        await self.db.commit()
+        logger.info(f"Reused renditions {cloned} from video {content.source_video_id} for {video.id}")
+        return cloned
+
+    async def completed_rendition(self, content: VideoContent, video: Video,
+                                  quality_preset: str) -> Optional[TranscodingJob]:
+        """The source video's finished rendition of a preset, for a duplicate to reuse"""
+        if content.source_video_id is None or content.source_video_id == video.id:
+            return None
+
+        result = await self.db.execute(
+            select(TranscodingJob).where(
+                TranscodingJob.video_id == content.source_video_id,
+                TranscodingJob.status == TranscodingStatus.completed,
+                TranscodingJob.quality_preset == quality_preset
+            ).limit(1)
+        )
+        return result.scalar_one_or_none()
+
+    async def release(self, video: Video) -> List[str]:
+        """
+        Drop a video's reference to its original and renditions.
+
+        Returns the S3 keys no other live video uses any more, which the
+        caller deletes: rendition outputs (HLS manifests stand for their
+        directory) not shared with another video, plus the original once its
+        reference count reaches zero. Soft-deleted videos do not count as
+        users.
+        """
+        orphaned: List[str] = []
+
+        result = await self.db.execute(
+            select(TranscodingJob).where(TranscodingJob.video_id == video.id)
+        )
+        for job in result.scalars().all():
+            for key in (job.output_s3_key, job.hls_manifest_s3_key):
+                if key and not await self._key_shared(key, video.id):
+                    orphaned.append(key)
+
+        if not video.content_hash:
+            # Originals stored before content hashing are only shared by key
+            shared = await self.db.execute(
+                select(Video.id).where(
+                    Video.original_s3_key == video.original_s3_key,
+                    Video.id != video.id,
+                    Video.status != VideoStatus.deleted
+                ).limit(1)
+            )
+            if video.original_s3_key and shared.scalar_one_or_none() is None:
+                orphaned.append(video.original_s3_key)
+            return orphaned
+
+        content = await self.find_by_hash(video.content_hash)
+        video.content_hash = None
+        if content is None:
+            await self.db.commit()
+            return orphaned
+
+        await self.db.execute(
+            update(VideoContent)
+            .where(VideoContent.id == content.id)
+            .values(ref_count=VideoContent.ref_count - 1, updated_at=datetime.utcnow())
+        )
+        await self.db.refresh(content)
+
+        if content.ref_count <= 0:
+            orphaned.append(content.original_s3_key)
+            await self.db.delete(content)
+        elif content.source_video_id == video.id:
+            # Hand rendition reuse over to another video sharing this original
+            next_source = await self.db.execute(
+                select(Video.id).where(
+                    Video.content_hash == content.content_hash,
+                    Video.id != video.id
+                ).limit(1)
+            )
+            content.source_video_id = next_source.scalar_one_or_none()
+
+        await self.db.commit()
+        return orphaned
+
+    async def _key_shared(self, key: str, video_id) -> bool:
+        result = await self.db.execute(
+            select(TranscodingJob.id)
+            .join(Video, Video.id == TranscodingJob.video_id)
+            .where(
+                TranscodingJob.video_id != video_id,
+                Video.status != VideoStatus.deleted,
+                (TranscodingJob.output_s3_key == key) | (TranscodingJob.hls_manifest_s3_key == key)
+            ).limit(1)
+        )
+        return result.scalar_one_or_none() is not None
+
+
+async def delete_released_objects(keys: List[str], s3_service=None):
+    """
+    Delete objects returned by ContentDedupService.release.
+
+    Failures are logged rather than raised; the database side of the delete
+    has already happened and leftover objects are only wasted storage.
+    """
+    try:
+        if s3_service is None:
+            from server.web.app.services.video_s3_service import VideoS3Service
+            s3_service = VideoS3Service()
+
+        for key in keys:
+            if key.endswith('.m3u8'):
+                await s3_service.delete_prefix(os.path.dirname(key) + '/')
+            else:
+                await s3_service.delete_video(key)
+    except Exception as e:
+        logger.warning(f"Failed to delete released objects {keys}: {e}")
@@ -9,6 +9,7 @@ from sqlalchemy.orm import selectinload
 from enum import Enum
 
 from .base_service import BaseService
+from .pagination import CountMode, KeysetPaginator, Page, count_rows, decode_cursor, default_count_mode, encode_cursor
 from ..models import Video, Channel, VideoPlaylist, User, VideoVisibility, ViewSession, VideoLike
 
 
@@ -37,10 +38,18 @@ class ContentDiscoveryService(BaseService):
         date_from: Optional[datetime] = None,
         date_to: Optional[datetime] = None,
         limit: int = 20,
-        offset: int = 0
-    ) -> Tuple[List[Video], int]:
-        """Browse videos with comprehensive filtering and sorting."""
-        async with self.get_db_session() as db:
+        offset: int = 0,
+        cursor: Optional[str] = None,
+        count_mode: Optional[str] = None
+    ) -> Page:
+        """
+        Browse videos with comprehensive filtering and sorting.
+
+        Pass the previous page's next_cursor to continue; offset is only
+        used for the first request. count_mode defaults to an exact total for
+        the first page and a planner estimate after that.
+        """
+        async with self.get_read_session(viewer_user_id) as db:
             # Base query with visibility filtering
             query = select(Video).options(
                 selectinload(Video.creator),
@@ -94,22 +103,33 @@ class ContentDiscoveryService(BaseService):
             if date_to:
                 query = query.where(Video.created_at <= date_to)
             
-            # Get total count before applying limit/offset
-            count_query = select(func.count()).select_from(query.subquery())
-            count_result = await db.execute(count_query)
-            total_count = count_result.scalar()
-            
-            # Apply sorting
-            query = self._apply_video_sorting(query, sort_order)
-            
-            # Apply pagination
-            query = query.limit(limit).offset(offset)
-            
-            # Execute query
-            result = await db.execute(query)
-            videos = result.scalars().all()
+            # Get total count before applying sorting and pagination
+            total_count, is_estimate = await count_rows(
+                db, query, count_mode or default_count_mode(cursor)
+            )
             
-            return videos, total_count
+            paginator = self._video_paginator(sort_order)
+            if paginator:
+                query = paginator.apply(query, cursor, limit)
+                if offset and not cursor:
+                    query = query.offset(offset)
+                result = await db.execute(query)
+                page = paginator.page(result.scalars().all(), limit)
+            else:
+                # Aggregate sorts have no stable column to seek on; their
+                # cursors carry an offset instead
+                if cursor:
+                    offset = decode_cursor(cursor, sort_order.value)[0]
+                query = self._apply_video_sorting(query, sort_order)
+                result = await db.execute(query.limit(limit + 1).offset(offset))
+                videos = result.scalars().all()
+                page = Page(items=videos[:limit])
+                if len(videos) > limit:
+                    page.next_cursor = encode_cursor(sort_order.value, (offset + limit,))
+            
+            page.total = total_count
+            page.total_is_estimate = is_estimate
+            return page
     
     async def search_content(
         self,
@@ -128,15 +148,16 @@ class ContentDiscoveryService(BaseService):
         async with self.get_db_session() as db:
             # Search videos
             if 'videos' in content_types:
-                videos, video_count = await self.browse_videos(
+                video_page = await self.browse_videos(
                     viewer_user_id=viewer_user_id,
                     search_query=search_query,
                     limit=limit,
                     offset=offset
                 )
                 results['videos'] = {
-                    'items': videos,
-                    'total': video_count
+                    'items': video_page.items,
+                    'total': video_page.total,
+                    'next_cursor': video_page.next_cursor
                 }
             
             # Search channels
@@ -598,6 +619,21 @@ class ContentDiscoveryService(BaseService):
             
             return recommended_videos
     
+    def _video_paginator(self, sort_order: SortOrder) -> Optional[KeysetPaginator]:
+        """Keyset paginator for column sorts, None for aggregate sorts"""
+        keys = {
+            SortOrder.newest: (Video.created_at, True),
+            SortOrder.oldest: (Video.created_at, False),
+            SortOrder.duration_asc: (Video.duration_seconds, False),
+            SortOrder.duration_desc: (Video.duration_seconds, True),
+            SortOrder.alphabetical: (Video.title, False),
+            SortOrder.most_liked: (Video.like_count, True),
+        }
+        if sort_order not in keys:
+            return None
+        sort_key, descending = keys[sort_order]
+        return KeysetPaginator(sort_order.value, sort_key, Video.id, descending=descending)
+    
     def _apply_video_sorting(self, query, sort_order: SortOrder):
         """Apply sorting to video query."""
         if sort_order == SortOrder.newest:
@@ -623,18 +659,7 @@ class ContentDiscoveryService(BaseService):
                 .order_by(desc(view_count_subquery.c.view_count))
             )
         elif sort_order == SortOrder.most_liked:
-            # This requires a subquery to count likes
-            like_count_subquery = (
-                select(VideoLike.video_id, func.count().label('like_count'))
-                .where(VideoLike.is_like == True)
-                .group_by(VideoLike.video_id)
-                .subquery()
-            )
-            return (
-                query
-                .outerjoin(like_count_subquery, Video.id == like_count_subquery.c.video_id)
-                .order_by(desc(like_count_subquery.c.like_count))
-            )
+            return query.order_by(Video.like_count.desc())
         else:
             return query.order_by(Video.created_at.desc())
     
@@ -646,12 +671,13 @@ class ContentDiscoveryService(BaseService):
         offset: int = 0
     ) -> Tuple[List[Video], int]:
         """Get videos in a specific category."""
-        return await self.browse_videos(
+        page = await self.browse_videos(
             viewer_user_id=viewer_user_id,
             category=category,
             limit=limit,
             offset=offset
         )
+        return page.items, page.total
     
     async def get_latest_videos(
         self,
@@ -659,13 +685,14 @@ class ContentDiscoveryService(BaseService):
         limit: int = 20
     ) -> List[Video]:
         """Get the latest uploaded videos."""
-        videos, _ = await self.browse_videos(
+        page = await self.browse_videos(
             viewer_user_id=viewer_user_id,
             sort_order=SortOrder.newest,
             limit=limit,
-            offset=0
+            offset=0,
+            count_mode=CountMode.NONE
         )
-        return videos
+        return page.items
     
     async def get_videos_by_creator(
         self,
@@ -771,29 +798,11 @@ class ContentDiscoveryService(BaseService):
             )
             view_count = view_count_result.scalar() or 0
             
-            # Like count
-            like_count_result = await db.execute(
-                select(func.count(VideoLike.id))
-                .where(
-                    and_(
-                        VideoLike.video_id == video_id,
-                        VideoLike.is_like == True
-                    )
-                )
-            )
-            like_count = like_count_result.scalar() or 0
-            
-            # Dislike count
-            dislike_count_result = await db.execute(
-                select(func.count(VideoLike.id))
-                .where(
-                    and_(
-                        VideoLike.video_id == video_id,
-                        VideoLike.is_like == False
-                    )
-                )
+            # Like and dislike counts
+            counts_result = await db.execute(
+                select(Video.like_count, Video.dislike_count).where(Video.id == video_id)
             )
-            dislike_count = dislike_count_result.scalar() or 0
+            like_count, dislike_count = counts_result.one_or_none() or (0, 0)
             
             # Average watch time
             avg_watch_time_result = await db.execute(
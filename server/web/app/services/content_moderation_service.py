@@ -13,10 +13,14 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_, func
 from sqlalchemy.orm import selectinload
 
-from ..models import Video, VideoComment, User, AnalyticsEvent
+from shared_lib.moderation import get_moderation_engine
+from ..models import Video, VideoComment, User, AnalyticsEvent, ContentReport, ModerationRecord
 from .base_service import BaseService
 
 
+REPEATED_CHARS = re.compile(r'(.)\1{4,}')
+
+
 class ModerationAction(str, Enum):
     """Types of moderation actions"""
     APPROVED = "approved"
@@ -54,8 +58,7 @@ class ContentModerationService(BaseService):
     
     def __init__(self):
         super().__init__()
-        self.profanity_patterns = self._load_profanity_patterns()
-        self.spam_patterns = self._load_spam_patterns()
+        self.engine = get_moderation_engine()
         
     async def scan_video_content(
         self,
@@ -532,39 +535,42 @@ class ContentModerationService(BaseService):
     
     async def _scan_metadata(self, video: Video) -> Dict[str, Any]:
         """Scan video metadata for inappropriate content"""
-        flags = []
-        risk_level = "low"
-        
-        # Scan title
-        title_scan = self._scan_text_content(video.title)
-        if title_scan["flags"]:
-            flags.extend([f"title_{flag}" for flag in title_scan["flags"]])
-            risk_level = max(risk_level, title_scan["risk_level"], key=self._risk_priority)
-        
-        # Scan description
-        if video.description:
-            desc_scan = self._scan_text_content(video.description)
-            if desc_scan["flags"]:
-                flags.extend([f"description_{flag}" for flag in desc_scan["flags"]])
-                risk_level = max(risk_level, desc_scan["risk_level"], key=self._risk_priority)
-        
-        # Scan tags
-        if video.tags:
-            for tag in video.tags:
-                tag_scan = self._scan_text_content(tag)
-                if tag_scan["flags"]:
-                    flags.extend([f"tag_{flag}" for flag in tag_scan["flags"]])
-                    risk_level = max(risk_level, tag_scan["risk_level"], key=self._risk_priority)
+        return self.scan_metadata_batch([(video.title, video.description, video.tags)])[0]
+    
+    def scan_metadata_batch(
+        self,
+        videos: List[Tuple[str, Optional[str], Optional[List[str]]]]
+    ) -> List[Dict[str, Any]]:
+        """Scan (title, description, tags) of many videos in one text batch"""
+        texts, spans = [], []
+        for title, description, tags in videos:
+            tags = list(tags or [])
+            spans.append((len(texts), len(tags)))
+            texts.extend([title, description or ""] + tags)
+        scans = self.scan_text_batch(texts)
         
-        return {
-            "risk_level": risk_level,
-            "flags": flags,
-            "scan_details": {
-                "title_clean": not title_scan["flags"],
-                "description_clean": not desc_scan["flags"] if video.description else True,
-                "tags_clean": not any(self._scan_text_content(tag)["flags"] for tag in (video.tags or []))
-            }
-        }
+        results = []
+        for start, tag_count in spans:
+            title_scan, desc_scan = scans[start], scans[start + 1]
+            tag_scans = scans[start + 2:start + 2 + tag_count]
+            
+            flags = []
+            risk_level = "low"
+            for prefix, scan in [("title", title_scan), ("description", desc_scan)] + [("tag", s) for s in tag_scans]:
+                if scan["flags"]:
+                    flags.extend([f"{prefix}_{flag}" for flag in scan["flags"]])
+                    risk_level = max(risk_level, scan["risk_level"], key=self._risk_priority)
+            
+            results.append({
+                "risk_level": risk_level,
+                "flags": flags,
+                "scan_details": {
+                    "title_clean": not title_scan["flags"],
+                    "description_clean": not desc_scan["flags"],
+                    "tags_clean": not any(scan["flags"] for scan in tag_scans)
+                }
+            })
+        return results
     
     async def _scan_visual_content(self, video: Video) -> Dict[str, Any]:
         """Scan video visual content (placeholder for AI integration)"""
@@ -599,81 +605,43 @@ class ContentModerationService(BaseService):
     
     def _scan_text_content(self, text: str) -> Dict[str, Any]:
         """Scan text content for inappropriate material"""
-        if not text:
-            return {"risk_level": "low", "flags": []}
-        
-        text_lower = text.lower()
-        flags = []
-        risk_level = "low"
-        
-        # Check for profanity
-        for pattern in self.profanity_patterns:
-            if re.search(pattern, text_lower):
-                flags.append("profanity")
-                risk_level = "medium"
-                break
-        
-        # Check for spam patterns
-        for pattern in self.spam_patterns:
-            if re.search(pattern, text_lower):
-                flags.append("spam")
-                risk_level = "medium"
-                break
-        
-        # Check for hate speech indicators
-        hate_indicators = [
-            r'\b(hate|kill|die|death)\s+(all|every)\s+\w+',
-            r'\b(nazi|hitler|genocide)\b',
-            r'\b(terrorist|terrorism)\b'
-        ]
-        
-        for pattern in hate_indicators:
-            if re.search(pattern, text_lower):
-                flags.append("hate_speech")
-                risk_level = "high"
-                break
-        
-        # Check for personal information
-        personal_info_patterns = [
-            r'\b\d{3}-\d{2}-\d{4}\b',  # SSN
-            r'\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b',  # Credit card
-            r'\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Z|a-z]{2,}\b'  # Email
-        ]
-        
-        for pattern in personal_info_patterns:
-            if re.search(pattern, text):
-                flags.append("personal_info")
-                risk_level = "medium"
-                break
-        
-        # Check for excessive caps (shouting)
-        if len(text) > 20 and sum(1 for c in text if c.isupper()) / len(text) > 0.7:
-            flags.append("excessive_caps")
-        
-        # Check for repeated characters (spam indicator)
-        if re.search(r'(.)\1{4,}', text):
-            flags.append("repeated_chars")
-        
-        return {
-            "risk_level": risk_level,
-            "flags": flags
-        }
+        return self.scan_text_batch([text])[0]
+    
+    def scan_text_batch(self, texts: List[str]) -> List[Dict[str, Any]]:
+        """
+        Scan many texts at once (comment backlogs, bulk metadata re-scans).
+        Rule matching runs over the whole batch in a single pass.
+        """
+        results = []
+        for text, scan in zip(texts, self.engine.scan_many(texts, "content")):
+            flags = list(scan.flags)
+            if text:
+                # Check for excessive caps (shouting)
+                if len(text) > 20 and sum(1 for c in text if c.isupper()) / len(text) > 0.7:
+                    flags.append("excessive_caps")
+                
+                # Check for repeated characters (spam indicator)
+                if REPEATED_CHARS.search(text):
+                    flags.append("repeated_chars")
+            
+            results.append({
+                "risk_level": scan.risk_level,
+                "flags": flags
+            })
+        return results
     
     def _load_profanity_patterns(self) -> List[str]:
         """Load profanity detection patterns"""
-        # In production, this would load from a comprehensive database
-        return [
-            r'\b(fuck|shit|damn|hell|bitch|asshole)\b',
-            r'\b(stupid|idiot|moron|retard)\b',
-        ]
+        return self._rule_patterns("profanity")
     
     def _load_spam_patterns(self) -> List[str]:
         """Load spam detection patterns"""
+        return self._rule_patterns("spam")
+    
+    def _rule_patterns(self, category: str) -> List[str]:
         return [
-            r'(click here|buy now|limited time|act now)',
-            r'(free money|make money|earn \$\d+)',
-            r'(viagra|cialis|pharmacy)',
-            r'(www\.|http://|https://)',
+            rule.as_regex() for rule in self.engine.ruleset("content").rules
+            if rule.category == category
         ]
     
     def _risk_priority(self, risk_level: str) -> int:
@@ -728,57 +696,3 @@ class ContentModerationService(BaseService):
             
             db.add(event)
             await db.commit()
-
-
-# Additional models needed for content moderation
-from sqlalchemy import Column, String, DateTime, ForeignKey, Text, Integer, Boolean
-from sqlalchemy.orm import relationship
-from sqlalchemy.dialects.postgresql import UUID, ARRAY
-from ..models import Base
-
-class ContentReport(Base):
-    """Model for user-submitted content reports"""
-    __tablename__ = "content_reports"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    reporter_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=False, index=True)
-    content_type = Column(String(50), nullable=False)  # video, comment, user, channel
-    content_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    
-    reason = Column(String(100), nullable=False)
-    description = Column(Text)
-    evidence_urls = Column(ARRAY(String), default=lambda: [])
-    
-    status = Column(String(50), default="pending", nullable=False, index=True)  # pending, resolved, dismissed
-    resolved_by = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)
-    resolved_at = Column(DateTime, nullable=True)
-    resolution_action = Column(String(50), nullable=True)
-    resolution_notes = Column(Text, nullable=True)
-    
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    
-    # Relationships
-    reporter = relationship("User", foreign_keys=[reporter_id])
-    resolver = relationship("User", foreign_keys=[resolved_by])
-
-
-class ModerationRecord(Base):
-    """Model for moderation actions taken on content"""
-    __tablename__ = "moderation_records"
-    
-    id = Column(UUID(as_uuid=True), primary_key=True, default=uuid.uuid4)
-    content_type = Column(String(50), nullable=False)
-    content_id = Column(UUID(as_uuid=True), nullable=False, index=True)
-    
-    action = Column(String(50), nullable=False)  # approved, flagged, hidden, removed, etc.
-    reason = Column(String(100), nullable=False)
-    moderator_id = Column(UUID(as_uuid=True), ForeignKey("users.id"), nullable=True)  # None for automated
-    
-    notes = Column(Text)
-    duration_hours = Column(Integer, nullable=True)  # For temporary actions
-    
-    created_at = Column(DateTime, default=datetime.utcnow, nullable=False, index=True)
-    expires_at = Column(DateTime, nullable=True)
-    
-    # Relationships
-    moderator = relationship("User")
\ No newline at end of file
@@ -0,0 +1,226 @@
+"""
+Encoding Profile Service
+
+Per-title encoding engine. Runs a fast complexity probe (low-resolution CRF
+trial encodes on sampled segments of the source), derives a bitrate ceiling and
+CRF for each rung of the quality ladder, drops rungs that would not add visible
+quality, and picks the encoder speed preset from current queue pressure.
+"""
+import logging
+import math
+from dataclasses import dataclass, asdict
+from typing import Dict, List, Optional, Any
+
+from server.web.app.services.base_service import BaseService
+from server.web.app.services.ffmpeg_service import FFmpegService, DEFAULT_CRF
+from server.web.app.services.quality_preset_service import QualityPresetService, FrameRate
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ComplexityProbe:
+    """Result of the complexity probe pass"""
+    sample_count: int
+    probe_width: int
+    probe_height: int
+    bits_per_pixel: float
+    complexity: float  # 1.0 == reference content
+
+
+@dataclass
+class EncodingRung:
+    """Per-title encoding settings for one quality preset"""
+    quality_preset: str
+    width: int
+    height: int
+    framerate: int
+    crf: int
+    max_bitrate_kbps: int
+
+    @property
+    def resolution(self) -> str:
+        return f"{self.width}x{self.height}"
+
+    def to_dict(self) -> Dict[str, Any]:
+        return asdict(self)
+
+
+class EncodingProfileService(BaseService):
+    """Service for building per-title encoding ladders"""
+
+    PROBE_WIDTH = 640
+    PROBE_CRF = DEFAULT_CRF
+
+    # Bits per pixel an x264 CRF 23 trial encode produces for "typical" content
+    # at probe resolution. Probe results are normalised against this.
+    REFERENCE_BPP = 0.08
+    MIN_COMPLEXITY = 0.3
+    MAX_COMPLEXITY = 2.5
+
+    # Higher resolutions need fewer bits per pixel for the same perceived quality
+    RESOLUTION_BPP_EXPONENT = 0.25
+
+    # A rung must carry at least this much more bitrate than the previous kept
+    # rung (same framerate family) to be worth storing and serving.
+    MIN_RUNG_GAIN = 1.35
+
+    MIN_CRF = 18
+    MAX_CRF = 28
+
+    # (queued jobs threshold, encoder speed preset), checked in order
+    SPEED_PRESET_THRESHOLDS = [
+        (50, "veryfast"),
+        (20, "fast"),
+        (5, "medium"),
+        (0, "slow"),
+    ]
+
+    def __init__(self, ffmpeg_service: Optional[FFmpegService] = None,
+                 probe_samples: int = 3, probe_sample_seconds: int = 4):
+        self.ffmpeg_service = ffmpeg_service or FFmpegService()
+        self.probe_samples = max(1, probe_samples)
+        self.probe_sample_seconds = max(1, probe_sample_seconds)
+
+    def _sample_offsets(self, duration_seconds: float) -> List[float]:
+        """Pick evenly spaced sample start times, skipping intros and credits."""
+        if duration_seconds <= self.probe_sample_seconds * self.probe_samples:
+            return [0.0]
+
+        usable_start = duration_seconds * 0.05
+        usable_span = duration_seconds * 0.9 - self.probe_sample_seconds
+        step = usable_span / self.probe_samples
+
+        return [usable_start + step * (i + 0.5) for i in range(self.probe_samples)]
+
+    async def probe_complexity(self, input_path: str, duration_seconds: float,
+                               source_width: int, source_height: int) -> ComplexityProbe:
+        """Run low-resolution trial encodes and score content complexity."""
+        probe_width = min(self.PROBE_WIDTH, source_width)
+        probe_height = max(2, int(round(probe_width * source_height / source_width / 2)) * 2)
+
+        total_bytes = 0
+        total_frames = 0
+        sample_seconds = min(self.probe_sample_seconds, duration_seconds)
+
+        for offset in self._sample_offsets(duration_seconds):
+            encoded_bytes, frames = await self.ffmpeg_service.measure_encoded_bitrate(
+                input_path, offset, sample_seconds, probe_width, self.PROBE_CRF
+            )
+            total_bytes += encoded_bytes
+            total_frames += frames
+
+        if total_frames == 0:
+            raise ValueError("Complexity probe encoded no frames")
+
+        bits_per_pixel = (total_bytes * 8) / (probe_width * probe_height * total_frames)
+        complexity = min(self.MAX_COMPLEXITY,
+                         max(self.MIN_COMPLEXITY, bits_per_pixel / self.REFERENCE_BPP))
+
+        return ComplexityProbe(
+            sample_count=len(self._sample_offsets(duration_seconds)),
+            probe_width=probe_width,
+            probe_height=probe_height,
+            bits_per_pixel=bits_per_pixel,
+            complexity=complexity
+        )
+
+    def _crf_for_complexity(self, complexity: float) -> int:
+        """Spend fewer bits on hard content and more on easy content."""
+        crf = DEFAULT_CRF + round(2 * math.log2(complexity))
+        return min(self.MAX_CRF, max(self.MIN_CRF, crf))
+
+    def build_ladder(self, preset_names: List[str], probe: ComplexityProbe,
+                     source_bitrate_kbps: Optional[int] = None) -> List[EncodingRung]:
+        """
+        Build the per-title ladder for the requested presets.
+
+        Each rung's bitrate ceiling is the probe's bits-per-pixel scaled to the
+        rung's resolution and framerate, clamped to the preset's nominal range
+        and the source bitrate. Rungs that do not clear MIN_RUNG_GAIN over the
+        previous kept rung are dropped; the lowest rung is always kept.
+        """
+        presets = [QualityPresetService.QUALITY_PRESETS[name] for name in preset_names
+                   if name in QualityPresetService.QUALITY_PRESETS]
+        presets.sort(key=lambda p: (p.framerate.value, p.height))
+
+        probe_pixels = probe.probe_width * probe.probe_height
+        crf = self._crf_for_complexity(probe.complexity)
+
+        ladder: List[EncodingRung] = []
+        last_kept_bitrate: Dict[FrameRate, int] = {}
+
+        for preset in presets:
+            framerate = 60 if preset.framerate == FrameRate.FPS60 else 30
+            pixels = preset.width * preset.height
+            rung_bpp = probe.bits_per_pixel * (probe_pixels / pixels) ** self.RESOLUTION_BPP_EXPONENT
+            needed_kbps = rung_bpp * pixels * framerate / 1000
+
+            floor_kbps = preset.target_bitrate * 0.35 / 1000
+            ceiling_kbps = preset.max_bitrate / 1000
+            bitrate_kbps = min(ceiling_kbps, max(floor_kbps, needed_kbps))
+            if source_bitrate_kbps:
+                bitrate_kbps = min(bitrate_kbps, source_bitrate_kbps)
+            bitrate_kbps = int(bitrate_kbps)
+
+            previous = last_kept_bitrate.get(preset.framerate)
+            if previous is not None and bitrate_kbps < previous * self.MIN_RUNG_GAIN:
+                logger.info(
+                    f"Skipping rung {preset.name}: {bitrate_kbps}kbps adds too little "
+                    f"over previous {previous}kbps"
+                )
+                continue
+
+            last_kept_bitrate[preset.framerate] = bitrate_kbps
+            ladder.append(EncodingRung(
+                quality_preset=preset.name,
+                width=preset.width,
+                height=preset.height,
+                framerate=framerate,
+                crf=crf,
+                max_bitrate_kbps=bitrate_kbps
+            ))
+
+        return ladder
+
+    def default_ladder(self, preset_names: List[str]) -> List[EncodingRung]:
+        """Static ladder used when probing is disabled or fails."""
+        ladder = []
+        for name in preset_names:
+            preset = QualityPresetService.QUALITY_PRESETS.get(name)
+            if not preset:
+                continue
+            ladder.append(EncodingRung(
+                quality_preset=preset.name,
+                width=preset.width,
+                height=preset.height,
+                framerate=60 if preset.framerate == FrameRate.FPS60 else 30,
+                crf=DEFAULT_CRF,
+                max_bitrate_kbps=preset.max_bitrate // 1000
+            ))
+        return ladder
+
+    async def plan_ladder(self, input_path: str, preset_names: List[str]) -> List[EncodingRung]:
+        """Probe the source and build its ladder, falling back to static presets."""
+        try:
+            info = await self.ffmpeg_service.analyze_video(input_path)
+            probe = await self.probe_complexity(
+                input_path, info["duration"], info["width"], info["height"]
+            )
+            source_kbps = info["bitrate"] // 1000 if info.get("bitrate") else None
+            ladder = self.build_ladder(preset_names, probe, source_kbps)
+
+            logger.info(
+                f"Per-title ladder for {input_path}: complexity={probe.complexity:.2f}, "
+                f"rungs={[r.quality_preset for r in ladder]}"
+            )
+            return ladder
+        except Exception as e:
+            logger.warning(f"Complexity probe failed for {input_path}, using static ladder: {e}")
+            return self.default_ladder(preset_names)
+
+    def select_speed_preset(self, queue_depth: int) -> str:
+        """Trade compression efficiency for encode speed as the queue backs up."""
+        for threshold, preset in self.SPEED_PRESET_THRESHOLDS:
+            if queue_depth >= threshold:
+                return preset
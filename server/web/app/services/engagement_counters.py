@@ -0,0 +1,123 @@
+"""
+Engagement Counters
+
+Denormalized reply, like and dislike counts. Counters are changed with
+`UPDATE ... SET n = n + delta` inside the writer's transaction, so they
+commit or roll back together with the comment or like row and concurrent
+writers never overwrite each other's increments.
+
+The batched loaders compute the same counts from the source tables for a
+whole page in one grouped query; the same grouped queries back the rebuild
+used after migrations or to repair drift.
+"""
+import uuid
+from typing import Dict, Iterable, Tuple
+
+from sqlalchemy import select, update, func, case, and_, or_
+from sqlalchemy.orm import aliased
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import Video, VideoComment, VideoLike
+
+
+async def adjust_like_counts(db: AsyncSession, video_id: uuid.UUID, likes: int = 0, dislikes: int = 0) -> Tuple[int, int]:
+    """Apply like/dislike deltas to a video, returning the new (likes, dislikes)"""
+    result = await db.execute(
+        update(Video)
+        .where(Video.id == video_id)
+        .values(like_count=Video.like_count + likes, dislike_count=Video.dislike_count + dislikes)
+        .returning(Video.like_count, Video.dislike_count)
+        .execution_options(synchronize_session=False)
+    )
+    row = result.one_or_none()
+    return (row[0], row[1]) if row else (0, 0)
+
+
+async def adjust_reply_count(db: AsyncSession, comment_id: uuid.UUID, delta: int):
+    await db.execute(
+        update(VideoComment)
+        .where(VideoComment.id == comment_id)
+        .values(reply_count=VideoComment.reply_count + delta)
+        .execution_options(synchronize_session=False)
+    )
+
+
+
+def _like_totals(video_ids):
+    """(video id, likes, dislikes) per video, zero for videos without likes"""
+    return (
+        select(
+            Video.id.label("video_id"),
+            func.coalesce(func.sum(case((VideoLike.is_like == True, 1), else_=0)), 0).label("likes"),
+            func.coalesce(func.sum(case((VideoLike.is_like == False, 1), else_=0)), 0).label("dislikes")
+        )
+        .outerjoin(VideoLike, VideoLike.video_id == Video.id)
+        .where(Video.id.in_(video_ids))
+        .group_by(Video.id)
+    )
+
+
+def _reply_totals(comments_filter):
+    """(comment id, undeleted replies) per comment matching the filter"""
+    reply = aliased(VideoComment)
+    return (
+        select(VideoComment.id.label("comment_id"), func.count(reply.id).label("replies"))
+        .outerjoin(reply, and_(reply.parent_comment_id == VideoComment.id, reply.is_deleted == False))
+        .where(comments_filter)
+        .group_by(VideoComment.id)
+    )
+
+
+async def load_reply_counts(db: AsyncSession, comment_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, int]:
+    """Undeleted reply counts for many comments in one grouped query"""
+    comment_ids = list(comment_ids)
+    if not comment_ids:
+        return {}
+    result = await db.execute(_reply_totals(VideoComment.id.in_(comment_ids)))
+    counts = dict.fromkeys(comment_ids, 0)
+    counts.update({comment_id: replies for comment_id, replies in result.all()})
+    return counts
+
+
+async def load_like_counts(db: AsyncSession, video_ids: Iterable[uuid.UUID]) -> Dict[uuid.UUID, Tuple[int, int]]:
+    """(likes, dislikes) for many videos in one grouped query"""
+    video_ids = list(video_ids)
+    if not video_ids:
+        return {}
+    result = await db.execute(_like_totals(video_ids))
+    counts = dict.fromkeys(video_ids, (0, 0))
+    counts.update({video_id: (int(likes), int(dislikes)) for video_id, likes, dislikes in result.all()})
+    return counts
+
+
+async def rebuild_counters(db: AsyncSession, video_ids: Iterable[uuid.UUID]) -> int:
+    """
+    Recompute the stored counters of the given videos and their comments
+    from the source rows, with one grouped UPDATE ... FROM per table that
+    only touches drifted rows. Returns the number of rows that had drifted.
+    The caller commits.
+    """
+    video_ids = list(video_ids)
+    if not video_ids:
+        return 0
+
+    likes = _like_totals(video_ids).subquery()
+    videos = await db.execute(
+        update(Video)
+        .where(
+            Video.id == likes.c.video_id,
+            or_(Video.like_count != likes.c.likes, Video.dislike_count != likes.c.dislikes)
+        )
+        .values(like_count=likes.c.likes, dislike_count=likes.c.dislikes)
+        .execution_options(synchronize_session=False)
+    )
+
+    replies = _reply_totals(VideoComment.video_id.in_(video_ids)).subquery()
+    comments = await db.execute(
+        update(VideoComment)
+        .where(VideoComment.id == replies.c.comment_id, VideoComment.reply_count != replies.c.replies)
+        .values(reply_count=replies.c.replies)
+        .execution_options(synchronize_session=False)
+    )
+
+    return videos.rowcount + comments.rowcount
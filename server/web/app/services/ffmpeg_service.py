@@ -6,6 +6,7 @@ import json
 import logging
 import os
 import re
+import shutil
 import subprocess
 from pathlib import Path
 from typing import Dict, List, Optional, Tuple, AsyncIterator
@@ -14,12 +15,49 @@ from server.web.app.services.base_service import BaseService
 
 logger = logging.getLogger(__name__)
 
+# Rate-control and speed options per H.264 encoder. Speed presets are expressed
+# with x264 names throughout the codebase and translated here, so callers never
+# need to know which encoder the host actually has.
+ENCODER_PROFILES = {
+    "libx264": {
+        "quality_flag": "-crf",
+        "presets": {"ultrafast": "ultrafast", "veryfast": "veryfast", "fast": "fast",
+                    "medium": "medium", "slow": "slow"},
+    },
+    "h264_nvenc": {
+        "quality_flag": "-cq",
+        "extra_args": ["-rc", "vbr"],
+        "presets": {"ultrafast": "p1", "veryfast": "p2", "fast": "p3",
+                    "medium": "p4", "slow": "p6"},
+    },
+    "h264_qsv": {
+        "quality_flag": "-global_quality",
+        "presets": {"ultrafast": "veryfast", "veryfast": "veryfast", "fast": "fast",
+                    "medium": "medium", "slow": "slow"},
+    },
+    "h264_vaapi": {
+        "quality_flag": "-qp",
+        "presets": {},
+    },
+    "h264_videotoolbox": {
+        "quality_flag": None,  # bitrate-driven only
+        "presets": {},
+    },
+}
+
+DEFAULT_CRF = 23
+
+
 class FFmpegService(BaseService):
     """Service for FFmpeg video processing operations."""
     
-    def __init__(self, ffmpeg_path: str = "ffmpeg", ffprobe_path: str = "ffprobe"):
+    def __init__(self, ffmpeg_path: str = "ffmpeg", ffprobe_path: str = "ffprobe",
+                 video_encoder: str = "libx264"):
+        if video_encoder not in ENCODER_PROFILES:
+            raise ValueError(f"Unsupported video encoder: {video_encoder}")
         self.ffmpeg_path = ffmpeg_path
         self.ffprobe_path = ffprobe_path
+        self.video_encoder = video_encoder
         
     async def analyze_video(self, input_path: str) -> Dict[str, any]:
         """Analyze video file and extract metadata."""
@@ -92,36 +130,97 @@ class FFmpegService(BaseService):
             logger.error(f"Failed to analyze video {input_path}: {e}")
             raise
     
+    def _build_encoder_args(self, crf: int, preset: str) -> List[str]:
+        """Build video encoder arguments for the configured encoder."""
+        profile = ENCODER_PROFILES[self.video_encoder]
+        args = ["-c:v", self.video_encoder]
+        
+        encoder_preset = profile["presets"].get(preset)
+        if encoder_preset:
+            args.extend(["-preset", encoder_preset])
+        
+        args.extend(profile.get("extra_args", []))
+        
+        if profile["quality_flag"]:
+            args.extend([profile["quality_flag"], str(crf)])
+        
+        return args
+    
     def _build_ffmpeg_command(self, input_path: str, output_path: str, 
                              target_resolution: str, target_framerate: int, 
-                             target_bitrate: int, preset: str = "medium") -> List[str]:
+                             target_bitrate: int, preset: str = "medium",
+                             crf: int = DEFAULT_CRF, include_audio: bool = True,
+                             threads: Optional[int] = None) -> List[str]:
         """Build FFmpeg command for transcoding."""
         width, height = map(int, target_resolution.split("x"))
         
         cmd = [
             self.ffmpeg_path,
             "-i", input_path,
-            "-c:v", "libx264",
-            "-preset", preset,
-            "-crf", "23",
+            *self._build_encoder_args(crf, preset),
             "-maxrate", f"{target_bitrate}k",
             "-bufsize", f"{target_bitrate * 2}k",
             "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
             "-r", str(target_framerate),
-            "-c:a", "aac",
-            "-b:a", "128k",
-            "-ac", "2",
+        ]
+        
+        if threads:
+            cmd.extend(["-threads", str(threads)])
+        
+        if include_audio:
+            cmd.extend(["-c:a", "aac", "-b:a", "128k", "-ac", "2"])
+        else:
+            cmd.append("-an")
+        
+        cmd.extend([
             "-movflags", "+faststart",
             "-f", "mp4",
             "-y",  # Overwrite output file
             output_path
-        ]
+        ])
         
         return cmd
     
+    async def _run_with_progress(self, cmd: List[str], total_duration: float) -> AsyncIterator[int]:
+        """Run an FFmpeg command and yield progress percentage parsed from stderr."""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        # Monitor progress
+        progress_pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2}\.\d{2})")
+        
+        try:
+            while True:
+                line = await process.stderr.readline()
+                if not line:
+                    break
+                
+                line_str = line.decode().strip()
+                
+                # Parse progress from FFmpeg output
+                match = progress_pattern.search(line_str)
+                if match and total_duration > 0:
+                    hours, minutes, seconds = match.groups()
+                    current_time = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
+                    progress = min(100, int((current_time / total_duration) * 100))
+                    yield progress
+            
+            await process.wait()
+        finally:
+            if process.returncode is None:
+                process.kill()
+        
+        if process.returncode != 0:
+            stderr_output = await process.stderr.read()
+            raise Exception(f"FFmpeg failed with code {process.returncode}: {stderr_output.decode()}")
+    
     async def transcode_video(self, input_path: str, output_path: str,
                             target_resolution: str, target_framerate: int,
-                            target_bitrate: int) -> AsyncIterator[int]:
+                            target_bitrate: int, preset: str = "medium",
+                            crf: int = DEFAULT_CRF) -> AsyncIterator[int]:
         """
         Transcode video and yield progress percentage.
         """
@@ -135,50 +234,280 @@ class FFmpegService(BaseService):
             
             cmd = self._build_ffmpeg_command(
                 input_path, output_path, target_resolution, 
-                target_framerate, target_bitrate
+                target_framerate, target_bitrate, preset=preset, crf=crf
             )
             
             logger.info(f"Starting transcoding: {' '.join(cmd)}")
             
-            process = await asyncio.create_subprocess_exec(
-                *cmd,
-                stdout=asyncio.subprocess.PIPE,
-                stderr=asyncio.subprocess.PIPE
-            )
+            async for progress in self._run_with_progress(cmd, total_duration):
+                yield progress
             
-            # Monitor progress
-            progress_pattern = re.compile(r"time=(\d{2}):(\d{2}):(\d{2}\.\d{2})")
+            # Verify output file exists and has content
+            if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
+                raise Exception("Output file was not created or is empty")
             
-            while True:
-                line = await process.stderr.readline()
-                if not line:
-                    break
-                
-                line_str = line.decode().strip()
-                
-                # Parse progress from FFmpeg output
-                match = progress_pattern.search(line_str)
-                if match and total_duration > 0:
-                    hours, minutes, seconds = match.groups()
-                    current_time = int(hours) * 3600 + int(minutes) * 60 + float(seconds)
-                    progress = min(100, int((current_time / total_duration) * 100))
-                    yield progress
+            yield 100  # Final progress
             
-            await process.wait()
+        except Exception as e:
+            logger.error(f"Transcoding failed for {input_path}: {e}")
+            raise
+    
+    async def get_keyframe_times(self, input_path: str) -> List[float]:
+        """List keyframe timestamps of the first video stream without decoding."""
+        cmd = [
+            self.ffprobe_path,
+            "-v", "quiet",
+            "-select_streams", "v:0",
+            "-show_entries", "packet=pts_time,flags",
+            "-of", "csv=print_section=0",
+            input_path
+        ]
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        stdout, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"FFprobe failed: {stderr.decode()}")
+        
+        keyframes = []
+        for line in stdout.decode().splitlines():
+            parts = line.strip().split(",")
+            if len(parts) >= 2 and "K" in parts[1]:
+                try:
+                    keyframes.append(float(parts[0]))
+                except ValueError:
+                    continue
+        
+        return sorted(keyframes)
+    
+    def _plan_chunks(self, keyframe_times: List[float], total_duration: float,
+                     chunk_seconds: float) -> List[Tuple[float, float]]:
+        """
+        Group the source into GOP-aligned chunks of roughly chunk_seconds.
+        Returns list of (start, end) times; every boundary is a keyframe.
+        """
+        boundaries = [0.0]
+        for keyframe in keyframe_times:
+            if keyframe - boundaries[-1] >= chunk_seconds and total_duration - keyframe >= chunk_seconds / 2:
+                boundaries.append(keyframe)
+        boundaries.append(total_duration)
+        
+        return list(zip(boundaries[:-1], boundaries[1:]))
+    
+    async def _run_command(self, cmd: List[str], error_prefix: str) -> None:
+        """Run an FFmpeg command to completion."""
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        try:
+            _, stderr = await process.communicate()
+        except asyncio.CancelledError:
+            process.kill()
+            raise
+        
+        if process.returncode != 0:
+            raise Exception(f"{error_prefix}: {stderr.decode(errors='replace')}")
+    
+    async def transcode_video_chunked(self, input_path: str, output_path: str,
+                                      target_resolution: str, target_framerate: int,
+                                      target_bitrate: int, preset: str = "medium",
+                                      crf: int = DEFAULT_CRF, chunk_seconds: int = 60,
+                                      max_parallel: Optional[int] = None) -> AsyncIterator[int]:
+        """
+        Transcode video by splitting it at keyframes and encoding chunks in parallel.
+        
+        The video stream is stream-copied into GOP-aligned chunks, each chunk is
+        encoded by its own FFmpeg process (bounded by max_parallel), audio is
+        encoded once in parallel with the chunks, and the results are joined
+        with the concat demuxer. The cores are divided between the concurrent
+        chunk encoders so they do not oversubscribe the CPU. Yields overall
+        progress percentage.
+        """
+        work_dir = f"{output_path}.chunks"
+        tasks: List[asyncio.Task] = []
+        
+        try:
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            os.makedirs(work_dir, exist_ok=True)
             
-            if process.returncode != 0:
-                stderr_output = await process.stderr.read()
-                raise Exception(f"FFmpeg failed with code {process.returncode}: {stderr_output.decode()}")
+            video_info = await self.analyze_video(input_path)
+            total_duration = video_info["duration"]
+            
+            keyframes = await self.get_keyframe_times(input_path)
+            chunks = self._plan_chunks(keyframes, total_duration, chunk_seconds)
+            
+            logger.info(f"Chunked transcoding {input_path}: {len(chunks)} chunks")
+            
+            # Split video stream at the planned keyframes without re-encoding
+            split_times = ",".join(f"{start:.6f}" for start, _ in chunks[1:])
+            split_cmd = [
+                self.ffmpeg_path,
+                "-i", input_path,
+                "-map", "0:v:0",
+                "-c", "copy",
+                "-f", "segment",
+                "-reset_timestamps", "1",
+            ]
+            if split_times:
+                split_cmd.extend(["-segment_times", split_times])
+            split_cmd.extend(["-y", os.path.join(work_dir, "source_%05d.mkv")])
+            await self._run_command(split_cmd, "Chunk split failed")
+            
+            cpu_count = os.cpu_count() or 1
+            workers = max(1, min(max_parallel or cpu_count, len(chunks)))
+            threads = max(1, cpu_count // workers)
+            semaphore = asyncio.Semaphore(workers)
+            progress_queue: asyncio.Queue = asyncio.Queue()
+            encoded_paths = []
+            
+            async def encode_chunk(index: int, chunk_duration: float) -> None:
+                source = os.path.join(work_dir, f"source_{index:05d}.mkv")
+                encoded = os.path.join(work_dir, f"encoded_{index:05d}.mp4")
+                cmd = self._build_ffmpeg_command(
+                    source, encoded, target_resolution, target_framerate,
+                    target_bitrate, preset=preset, crf=crf, include_audio=False,
+                    threads=threads
+                )
+                async with semaphore:
+                    async for progress in self._run_with_progress(cmd, chunk_duration):
+                        await progress_queue.put((index, progress))
+                await progress_queue.put((index, 100))
+            
+            for index, (start, end) in enumerate(chunks):
+                encoded_paths.append(os.path.join(work_dir, f"encoded_{index:05d}.mp4"))
+                tasks.append(asyncio.create_task(encode_chunk(index, end - start)))
+            
+            audio_path = None
+            if video_info.get("has_audio"):
+                audio_path = os.path.join(work_dir, "audio.m4a")
+                tasks.append(asyncio.create_task(self._run_command([
+                    self.ffmpeg_path,
+                    "-i", input_path,
+                    "-vn",
+                    "-c:a", "aac", "-b:a", "128k", "-ac", "2",
+                    "-y", audio_path
+                ], "Audio encode failed")))
+            
+            # Aggregate per-chunk progress weighted by chunk duration
+            weights = [(end - start) / total_duration if total_duration > 0 else 1 / len(chunks)
+                       for start, end in chunks]
+            chunk_progress = [0] * len(chunks)
+            last_reported = -1
+            gathered = asyncio.gather(*tasks)
+            
+            while not gathered.done() or not progress_queue.empty():
+                try:
+                    index, progress = await asyncio.wait_for(progress_queue.get(), timeout=1)
+                except asyncio.TimeoutError:
+                    continue
+                chunk_progress[index] = max(chunk_progress[index], progress)
+                overall = int(sum(p * w for p, w in zip(chunk_progress, weights)))
+                # Leave headroom for the concat step
+                overall = min(99, overall)
+                if overall > last_reported:
+                    last_reported = overall
+                    yield overall
+            
+            await gathered
+            
+            # Join encoded chunks and mux audio without re-encoding
+            list_path = os.path.join(work_dir, "chunks.txt")
+            with open(list_path, "w") as f:
+                for path in encoded_paths:
+                    f.write(f"file '{path}'\n")
+            
+            concat_cmd = [
+                self.ffmpeg_path,
+                "-f", "concat",
+                "-safe", "0",
+                "-i", list_path,
+            ]
+            if audio_path:
+                concat_cmd.extend(["-i", audio_path, "-map", "0:v", "-map", "1:a"])
+            concat_cmd.extend([
+                "-c", "copy",
+                "-movflags", "+faststart",
+                "-f", "mp4",
+                "-y", output_path
+            ])
+            await self._run_command(concat_cmd, "Chunk concat failed")
             
-            # Verify output file exists and has content
             if not os.path.exists(output_path) or os.path.getsize(output_path) == 0:
                 raise Exception("Output file was not created or is empty")
             
-            yield 100  # Final progress
+            yield 100
             
         except Exception as e:
-            logger.error(f"Transcoding failed for {input_path}: {e}")
+            logger.error(f"Chunked transcoding failed for {input_path}: {e}")
             raise
+        finally:
+            # Stop sibling encodes if one chunk failed or the caller gave up
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+            shutil.rmtree(work_dir, ignore_errors=True)
+    
+    def _build_probe_command(self, input_path: str, start_seconds: float,
+                             duration_seconds: float, probe_width: int,
+                             crf: int = DEFAULT_CRF) -> List[str]:
+        """Build FFmpeg command for a low-resolution complexity trial encode."""
+        return [
+            self.ffmpeg_path,
+            "-ss", f"{start_seconds:.2f}",
+            "-t", f"{duration_seconds:.2f}",
+            "-i", input_path,
+            "-an",
+            "-vf", f"scale={probe_width}:-2",
+            # Trial encodes always use x264 so complexity scores stay comparable
+            # across hosts with different hardware encoders.
+            "-c:v", "libx264",
+            "-preset", "veryfast",
+            "-crf", str(crf),
+            "-f", "null",
+            "-"
+        ]
+    
+    async def measure_encoded_bitrate(self, input_path: str, start_seconds: float,
+                                      duration_seconds: float, probe_width: int = 640,
+                                      crf: int = DEFAULT_CRF) -> Tuple[int, int]:
+        """
+        Trial-encode a sample of the input and report its size.
+        Returns tuple of (encoded_video_bytes, frames_encoded).
+        """
+        cmd = self._build_probe_command(
+            input_path, start_seconds, duration_seconds, probe_width, crf
+        )
+        
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        
+        _, stderr = await process.communicate()
+        
+        if process.returncode != 0:
+            raise Exception(f"Probe encode failed: {stderr.decode(errors='replace')}")
+        
+        return self._parse_encode_stats(stderr.decode(errors="replace"))
+    
+    def _parse_encode_stats(self, stderr_output: str) -> Tuple[int, int]:
+        """Parse encoded video size and frame count from FFmpeg's final stats."""
+        size_match = re.search(r"video:\s*(\d+)\s*(?:kB|KiB)", stderr_output)
+        frame_matches = re.findall(r"frame=\s*(\d+)", stderr_output)
+        
+        if not size_match or not frame_matches:
+            raise Exception("Could not parse probe encode statistics")
+        
+        return int(size_match.group(1)) * 1024, int(frame_matches[-1])
     
     def _build_hls_command(self, input_path: str, output_dir: str, 
                           segment_duration: int = 6) -> List[str]:
@@ -249,6 +578,130 @@ class FFmpegService(BaseService):
             logger.error(f"HLS generation failed for {input_path}: {e}")
             raise
     
+    def _build_direct_hls_command(self, input_path: str, output_dir: str,
+                                  target_resolution: str, target_framerate: int,
+                                  target_bitrate: int, preset: str = "medium",
+                                  crf: int = DEFAULT_CRF, segment_duration: int = 6,
+                                  single_file: bool = True,
+                                  mp4_output_path: Optional[str] = None) -> List[str]:
+        """
+        Build FFmpeg command that encodes straight to fMP4/CMAF HLS.
+        
+        Keyframes are forced on segment boundaries so every segment starts with
+        an IDR frame. With single_file the media segments are written as byte
+        ranges of one file. When mp4_output_path is given, the tee muxer writes
+        a progressive MP4 from the same encode.
+        """
+        width, height = map(int, target_resolution.split("x"))
+        playlist_path = os.path.join(output_dir, "playlist.m3u8")
+        segment_path = os.path.join(
+            output_dir, "stream.m4s" if single_file else "segment_%03d.m4s"
+        )
+        
+        hls_options = {
+            "hls_time": str(segment_duration),
+            "hls_playlist_type": "vod",
+            "hls_segment_type": "fmp4",
+            "hls_fmp4_init_filename": "init.mp4",
+            "hls_segment_filename": segment_path,
+        }
+        if single_file:
+            hls_options["hls_flags"] = "single_file"
+        
+        cmd = [
+            self.ffmpeg_path,
+            "-i", input_path,
+            "-map", "0:v:0",
+            "-map", "0:a:0?",
+            *self._build_encoder_args(crf, preset),
+            "-maxrate", f"{target_bitrate}k",
+            "-bufsize", f"{target_bitrate * 2}k",
+            "-force_key_frames", f"expr:gte(t,n_forced*{segment_duration})",
+            "-vf", f"scale={width}:{height}:force_original_aspect_ratio=decrease,pad={width}:{height}:(ow-iw)/2:(oh-ih)/2",
+            "-r", str(target_framerate),
+            "-c:a", "aac",
+            "-b:a", "128k",
+            "-ac", "2",
+        ]
+        
+        if mp4_output_path:
+            hls_target = ":".join(f"{key}={value}" for key, value in hls_options.items())
+            cmd.extend([
+                # The tee muxer cannot ask the encoder for global headers per
+                # output; MP4 needs them out of band for its avcC/esds boxes
+                "-flags", "+global_header",
+                "-f", "tee",
+                "-y",
+                f"[f=hls:{hls_target}]{playlist_path}|"
+                f"[f=mp4:movflags=+faststart]{mp4_output_path}"
+            ])
+        else:
+            cmd.extend(["-f", "hls"])
+            for key, value in hls_options.items():
+                cmd.extend([f"-{key}", value])
+            cmd.extend(["-y", playlist_path])
+        
+        return cmd
+    
+    async def transcode_to_hls(self, input_path: str, output_dir: str,
+                               target_resolution: str, target_framerate: int,
+                               target_bitrate: int, preset: str = "medium",
+                               crf: int = DEFAULT_CRF, segment_duration: int = 6,
+                               single_file: bool = True,
+                               mp4_output_path: Optional[str] = None) -> AsyncIterator[int]:
+        """
+        Encode a rendition directly into HLS segments and yield progress percentage.
+        Use collect_hls_outputs afterwards to list the files written.
+        """
+        try:
+            os.makedirs(output_dir, exist_ok=True)
+            
+            video_info = await self.analyze_video(input_path)
+            
+            cmd = self._build_direct_hls_command(
+                input_path, output_dir, target_resolution, target_framerate,
+                target_bitrate, preset=preset, crf=crf,
+                segment_duration=segment_duration, single_file=single_file,
+                mp4_output_path=mp4_output_path
+            )
+            
+            logger.info(f"Starting direct HLS encode: {' '.join(cmd)}")
+            
+            async for progress in self._run_with_progress(cmd, video_info["duration"]):
+                yield progress
+            
+            self.collect_hls_outputs(output_dir)
+            if mp4_output_path and (not os.path.exists(mp4_output_path)
+                                    or os.path.getsize(mp4_output_path) == 0):
+                raise Exception("Progressive MP4 was not created or is empty")
+            
+            yield 100
+            
+        except Exception as e:
+            logger.error(f"Direct HLS encode failed for {input_path}: {e}")
+            raise
+    
+    def collect_hls_outputs(self, output_dir: str) -> Tuple[str, List[str]]:
+        """
+        List the manifest and media files of an HLS output directory.
+        Returns tuple of (manifest_path, media_paths) with init segments first.
+        """
+        manifest_path = os.path.join(output_dir, "playlist.m3u8")
+        
+        if not os.path.exists(manifest_path):
+            raise Exception("HLS manifest was not created")
+        
+        media_paths = sorted(
+            os.path.join(output_dir, file) for file in os.listdir(output_dir)
+            if file.endswith((".ts", ".m4s", ".mp4"))
+        )
+        media_paths.sort(key=lambda path: not os.path.basename(path).startswith("init"))
+        
+        if not media_paths:
+            raise Exception("No HLS segments were created")
+        
+        return manifest_path, media_paths
+    
     async def generate_thumbnails(self, input_path: str, output_dir: str,
                                 timestamps: List[float], width: int = 320, 
                                 height: int = 180) -> List[str]:
@@ -2,6 +2,7 @@
 HLS (HTTP Live Streaming) service for adaptive video streaming.
 """
 import os
+import re
 import logging
 from typing import Dict, List, Optional, Tuple
 from pathlib import Path
@@ -35,20 +36,9 @@ class HLSService(BaseService):
                 input_path, temp_dir, segment_duration
             )
             
-            # Upload manifest and segments to S3
-            base_s3_key = f"transcoded/{video_id}/{quality_preset}/segments"
-            
-            # Upload manifest
-            manifest_s3_key = f"{base_s3_key}/playlist.m3u8"
-            await self.s3_service.upload_file(manifest_path, manifest_s3_key)
-            
-            # Upload segments
-            segment_s3_keys = []
-            for segment_path in segment_paths:
-                segment_name = os.path.basename(segment_path)
-                segment_s3_key = f"{base_s3_key}/{segment_name}"
-                await self.s3_service.upload_file(segment_path, segment_s3_key)
-                segment_s3_keys.append(segment_s3_key)
+            manifest_s3_key, segment_s3_keys = await self.upload_hls_output(
+                manifest_path, segment_paths, video_id, quality_preset
+            )
             
             # Clean up temporary files
             await self._cleanup_temp_directory(temp_dir)
@@ -62,6 +52,44 @@ class HLSService(BaseService):
             logger.error(f"Failed to generate HLS for video {video_id}: {e}")
             raise
     
+    async def upload_hls_output(self, manifest_path: str, segment_paths: List[str],
+                                video_id: str, quality_preset: str) -> Tuple[str, List[str]]:
+        """
+        Upload a rendition's manifest and media files to S3.
+        Returns tuple of (manifest_s3_key, segment_s3_keys).
+        """
+        base_s3_key = f"transcoded/{video_id}/{quality_preset}/segments"
+        
+        # Upload media before the manifest so players never see dangling references
+        segment_s3_keys = []
+        for segment_path in segment_paths:
+            segment_name = os.path.basename(segment_path)
+            segment_s3_key = f"{base_s3_key}/{segment_name}"
+            await self.s3_service.upload_file(segment_path, segment_s3_key)
+            segment_s3_keys.append(segment_s3_key)
+        
+        manifest_s3_key = f"{base_s3_key}/playlist.m3u8"
+        await self.s3_service.upload_file(manifest_path, manifest_s3_key)
+        
+        return manifest_s3_key, segment_s3_keys
+    
+    async def upload_hls_directory(self, output_dir: str, video_id: str,
+                                   quality_preset: str) -> Tuple[str, List[str]]:
+        """
+        Upload HLS output that the encoder wrote directly (see FFmpegService.transcode_to_hls).
+        Returns tuple of (manifest_s3_key, segment_s3_keys).
+        """
+        manifest_path, segment_paths = self.ffmpeg_service.collect_hls_outputs(output_dir)
+        
+        manifest_s3_key, segment_s3_keys = await self.upload_hls_output(
+            manifest_path, segment_paths, video_id, quality_preset
+        )
+        
+        logger.info(f"Uploaded direct HLS for video {video_id}, quality {quality_preset}: "
+                   f"manifest and {len(segment_s3_keys)} media files")
+        
+        return manifest_s3_key, segment_s3_keys
+    
     async def create_master_playlist(self, video_id: str, quality_manifests: List[Dict[str, any]]) -> str:
         """
         Create master playlist that references multiple quality variants.
@@ -127,9 +155,22 @@ class HLSService(BaseService):
             
             for line in manifest_content.split('\n'):
                 line = line.strip()
-                if line and not line.startswith('#'):
+                if line.startswith('#EXT-X-MAP:'):
+                    # fMP4 init segment
+                    uri_match = re.search(r'URI="([^"]+)"', line)
+                    if uri_match:
+                        segment_name = uri_match.group(1)
+                    else:
+                        continue
+                elif line and not line.startswith('#'):
                     # This is a segment reference
-                    segment_key = f"{base_path}/{line}"
+                    segment_name = line
+                else:
+                    continue
+                
+                # Byte-range playlists reference the same file many times
+                segment_key = f"{base_path}/{segment_name}"
+                if segment_key not in segment_keys:
                     segment_keys.append(segment_key)
             
             # Check if all segments exist
@@ -11,6 +11,9 @@ from sqlalchemy.orm import selectinload
 
 from ..models import Video, ImportJob, User, VideoStatus, VideoVisibility, ImportStatus
 from .base_service import BaseService
+from .content_dedup_service import ContentDedupService, delete_released_objects
+from .tag_index_service import TagIndexService, UNINDEXED_STATUSES
+from .video_access_cache import invalidate_video_access
 
 logger = logging.getLogger(__name__)
 
@@ -18,7 +21,7 @@ class ImportedContentService(BaseService):
     """Service for managing imported content attribution and organization"""
     
     def __init__(self, db: AsyncSession):
-        super().__init__(db)
+        self.db = db
     
     async def get_imported_videos(self, user_id: Optional[str] = None, 
                                 platform: Optional[str] = None,
@@ -169,35 +172,38 @@ class ImportedContentService(BaseService):
                                            user_id: Optional[str] = None) -> bool:
         """Update metadata for imported video"""
         try:
-            # Build update data
-            update_data = {}
-            if title is not None:
-                update_data["title"] = title
-            if description is not None:
-                update_data["description"] = description
-            if tags is not None:
-                update_data["tags"] = tags
-            if category is not None:
-                update_data["category"] = category
-            if visibility is not None:
-                update_data["visibility"] = visibility
-            
-            if not update_data:
+            if all(value is None for value in (title, description, tags, category, visibility)):
                 return False
             
-            update_data["updated_at"] = datetime.utcnow()
-            
-            # Build query
-            query = update(Video).where(Video.id == video_id)
+            # Load the row so tag changes go through the tag index
+            query = select(Video).where(Video.id == video_id).with_for_update()
             
             # Add user authorization if provided
             if user_id:
                 query = query.where(Video.creator_id == user_id)
             
-            result = await self.db.execute(query.values(**update_data))
+            result = await self.db.execute(query)
+            video = result.scalar_one_or_none()
+            if not video:
+                return False
+            
+            if title is not None:
+                video.title = title
+            if description is not None:
+                video.description = description
+            if tags is not None:
+                await TagIndexService(self.db).set_tags(video, tags)
+            if category is not None:
+                video.category = category
+            if visibility is not None:
+                video.visibility = visibility
+            
+            video.updated_at = datetime.utcnow()
             await self.db.commit()
+            if visibility is not None:
+                await invalidate_video_access([video.id])
             
-            return result.rowcount > 0
+            return True
             
         except Exception as e:
             await self.db.rollback()
@@ -230,6 +236,8 @@ class ImportedContentService(BaseService):
             
             result = await self.db.execute(query.values(**update_data))
             await self.db.commit()
+            if visibility is not None:
+                await invalidate_video_access(video_ids)
             
             logger.info(f"Bulk updated {result.rowcount} imported videos")
             return result.rowcount
@@ -253,17 +261,26 @@ class ImportedContentService(BaseService):
             if not video:
                 return False
             
+            # Release the shared original and renditions before the row goes
+            released_keys = await ContentDedupService(self.db).release(video)
+            
             # Delete associated import job first (due to foreign key)
             await self.db.execute(
                 delete(ImportJob).where(ImportJob.video_id == video_id)
             )
             
             # Delete video
+            if video.status not in UNINDEXED_STATUSES:
+                await TagIndexService(self.db).remove_video(video)
             await self.db.execute(
                 delete(Video).where(Video.id == video_id)
             )
             
             await self.db.commit()
+            await invalidate_video_access([video_id])
+            
+            if released_keys:
+                await delete_released_objects(released_keys)
             
             logger.info(f"Deleted imported video {video_id}")
             return True
@@ -87,7 +87,8 @@ class MetricsAggregator:
         Initialize metrics aggregator.
         
         Args:
-            db: Database session
+            db: Database session; only read from, so a replica session
+                from get_read_db is fine
             tier_manager: TierManager instance for tier-related metrics
         """
         self.db = db
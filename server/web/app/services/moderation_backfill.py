@@ -0,0 +1,396 @@
+"""
+Moderation Backfill
+
+Re-scans the whole catalog of video metadata or comments, e.g. after the
+moderation rules change. A job walks its table in keyset order
+(created_at, id) in batches:
+
+- the next batch is read while the current one is scanned in a process pool,
+- flagged items are bulk-inserted into moderation_scan_results in the same
+  transaction that advances the job's checkpoint, so a paused, cancelled or
+  crashed job resumes exactly after its last committed batch,
+- between batches the job sleeps to keep its share of database time under a
+  duty cycle, and waits while the connection pool is busier than max_load,
+  refreshing its heartbeat so the wait is not mistaken for a dead runner.
+
+Progress, rate and ETA are read back with get_progress().
+"""
+import asyncio
+import logging
+import time
+import uuid
+from concurrent.futures import Executor, ProcessPoolExecutor
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..models import ModerationScanJob, ModerationScanResult, Video, VideoComment
+from .base_service import BaseService
+from .pagination import CountMode, KeysetPaginator, count_rows
+
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 500
+DB_DUTY_CYCLE = 0.5  # at most this share of wall time spent in the database
+MAX_LOAD = 0.8  # pool checked-out fraction above which the job waits
+LOAD_BACKOFF_SECONDS = 5.0
+STALE_AFTER = timedelta(minutes=5)  # a running job without a heartbeat this long can be taken over
+RESUMABLE_STATUSES = ("pending", "paused", "failed")
+
+CONTENT_TYPES = ("video", "comment")
+ACTIVE_STATUSES = ("pending", "running")
+
+
+def scan_video_rows(rows: List[tuple]) -> List[Dict[str, Any]]:
+    """Process pool entry point: rows of (title, description, tags)"""
+    from .content_moderation_service import ContentModerationService
+    return ContentModerationService().scan_metadata_batch(rows)
+
+
+def scan_comment_rows(texts: List[str]) -> List[Dict[str, Any]]:
+    """Process pool entry point: comment texts"""
+    from .content_moderation_service import ContentModerationService
+    return ContentModerationService().scan_text_batch(texts)
+
+
+def _recommended_action(risk_level: str) -> str:
+    return {
+        "critical": "removed",
+        "high": "hidden",
+        "medium": "flagged",
+    }.get(risk_level, "approved")
+
+
+class ModerationBackfillService(BaseService):
+    """Creates, runs and reports on bulk moderation scan jobs"""
+
+    def __init__(
+        self,
+        session_factory: Optional[Callable[[], AsyncSession]] = None,
+        executor: Optional[Executor] = None,
+        db_duty_cycle: float = DB_DUTY_CYCLE,
+        load_probe: Optional[Callable[[], Awaitable[float]]] = None,
+        max_load: float = MAX_LOAD,
+        load_backoff: float = LOAD_BACKOFF_SECONDS
+    ):
+        self.session_factory = session_factory
+        self.executor = executor
+        self.db_duty_cycle = db_duty_cycle
+        self.load_probe = load_probe
+        self.max_load = max_load
+        self.load_backoff = load_backoff
+
+    def _session(self):
+        return self.session_factory() if self.session_factory else self.get_db_session()
+
+    def _source(self, content_type: str):
+        """Base query, and a function turning fetched rows into (scanner, payload)"""
+        if content_type == "video":
+            query = select(Video.id, Video.created_at, Video.title, Video.description, Video.tags)
+            return query, lambda rows: (scan_video_rows, [(r.title, r.description, r.tags) for r in rows])
+        query = select(VideoComment.id, VideoComment.created_at, VideoComment.content).where(
+            VideoComment.is_deleted == False
+        )
+        return query, lambda rows: (scan_comment_rows, [r.content for r in rows])
+
+    def _paginator(self, content_type: str) -> KeysetPaginator:
+        model = Video if content_type == "video" else VideoComment
+        return KeysetPaginator(f"moderation_backfill:{content_type}", model.created_at, model.id, descending=False)
+
+    async def create_job(
+        self,
+        content_type: str,
+        batch_size: int = BATCH_SIZE,
+        created_by: Optional[uuid.UUID] = None
+    ) -> Dict[str, Any]:
+        """Create a job; a content type has at most one pending or running job"""
+        if content_type not in CONTENT_TYPES:
+            raise ValueError(f"Unsupported content type: {content_type}")
+
+        async with self._session() as db:
+            existing = await db.scalar(
+                select(ModerationScanJob).where(
+                    and_(
+                        ModerationScanJob.content_type == content_type,
+                        ModerationScanJob.status.in_(ACTIVE_STATUSES)
+                    )
+                )
+            )
+            if existing:
+                return self._progress(existing)
+
+            query, _ = self._source(content_type)
+            total, _ = await count_rows(db, query, CountMode.ESTIMATE)
+            job = ModerationScanJob(
+                content_type=content_type,
+                batch_size=batch_size,
+                total_estimate=total,
+                created_by=created_by
+            )
+            db.add(job)
+            await db.commit()
+            await db.refresh(job)
+            return self._progress(job)
+
+    async def _claim(self, job_id: uuid.UUID) -> Optional[ModerationScanJob]:
+        """Mark the job running unless another live runner holds it"""
+        now = datetime.utcnow()
+        async with self._session() as db:
+            result = await db.execute(
+                update(ModerationScanJob)
+                .where(
+                    and_(
+                        ModerationScanJob.id == job_id,
+                        or_(
+                            ModerationScanJob.status.in_(RESUMABLE_STATUSES),
+                            and_(
+                                ModerationScanJob.status == "running",
+                                ModerationScanJob.updated_at < now - STALE_AFTER
+                            )
+                        )
+                    )
+                )
+                .values(status="running", error=None, updated_at=now)
+            )
+            await db.commit()
+            if result.rowcount != 1:
+                return None
+            job = await db.get(ModerationScanJob, job_id)
+            if job.started_at is None:
+                job.started_at = now
+                await db.commit()
+                await db.refresh(job)
+            db.expunge(job)
+            return job
+
+    async def _fetch(self, content_type: str, checkpoint: Optional[str], batch_size: int):
+        query, _ = self._source(content_type)
+        paginator = self._paginator(content_type)
+        async with self._session() as db:
+            result = await db.execute(paginator.apply(query, checkpoint, batch_size))
+            rows = result.all()
+        return rows[:batch_size], len(rows) > batch_size
+
+    async def _scan(self, content_type: str, rows) -> List[Dict[str, Any]]:
+        _, prepare = self._source(content_type)
+        scanner, payload = prepare(rows)
+        if self.executor is None:
+            return scanner(payload)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self.executor, scanner, payload)
+
+    async def _commit_batch(self, job: ModerationScanJob, rows, scans, checkpoint: str, elapsed: float) -> str:
+        """Store flagged results and advance the checkpoint; returns the job's current status"""
+        now = datetime.utcnow()
+        flagged = [
+            {
+                "id": uuid.uuid4(),
+                "job_id": job.id,
+                "content_type": job.content_type,
+                "content_id": row.id,
+                "risk_level": scan["risk_level"],
+                "recommended_action": _recommended_action(scan["risk_level"]),
+                "flags": scan["flags"],
+                "created_at": now,
+            }
+            for row, scan in zip(rows, scans) if scan["flags"]
+        ]
+        async with self._session() as db:
+            if flagged:
+                await db.execute(insert(ModerationScanResult), flagged)
+            await db.execute(
+                update(ModerationScanJob)
+                .where(ModerationScanJob.id == job.id)
+                .values(
+                    checkpoint=checkpoint,
+                    scanned_count=ModerationScanJob.scanned_count + len(rows),
+                    flagged_count=ModerationScanJob.flagged_count + len(flagged),
+                    elapsed_seconds=ModerationScanJob.elapsed_seconds + elapsed,
+                    updated_at=now
+                )
+            )
+            status = await db.scalar(select(ModerationScanJob.status).where(ModerationScanJob.id == job.id))
+            await db.commit()
+        return status
+
+    async def _set_status(
+        self, job_id: uuid.UUID, status: str, error: Optional[str] = None, only_from: Optional[str] = None
+    ):
+        values = {"status": status, "error": error, "updated_at": datetime.utcnow()}
+        if status == "completed":
+            values["completed_at"] = values["updated_at"]
+        condition = ModerationScanJob.id == job_id
+        if only_from is not None:
+            condition = and_(condition, ModerationScanJob.status == only_from)
+        async with self._session() as db:
+            await db.execute(update(ModerationScanJob).where(condition).values(**values))
+            await db.commit()
+
+    async def _heartbeat(self, job_id: uuid.UUID) -> str:
+        """Refresh a running job's updated_at so it is not taken over; returns its status"""
+        async with self._session() as db:
+            await db.execute(
+                update(ModerationScanJob)
+                .where(and_(ModerationScanJob.id == job_id, ModerationScanJob.status == "running"))
+                .values(updated_at=datetime.utcnow())
+            )
+            status = await db.scalar(select(ModerationScanJob.status).where(ModerationScanJob.id == job_id))
+            await db.commit()
+        return status
+
+    async def _throttle(self, job_id: uuid.UUID, db_seconds: float) -> str:
+        """Sleep between batches, keeping the job's heartbeat fresh; returns its status"""
+        if self.db_duty_cycle < 1.0 and db_seconds > 0:
+            await asyncio.sleep(db_seconds * (1 - self.db_duty_cycle) / self.db_duty_cycle)
+        status = "running"
+        if self.load_probe is not None:
+            while status == "running" and await self.load_probe() > self.max_load:
+                logger.debug("Moderation backfill waiting for database load to drop")
+                await asyncio.sleep(self.load_backoff)
+                status = await self._heartbeat(job_id)
+        return status
+
+    async def run_job(self, job_id: uuid.UUID) -> Dict[str, Any]:
+        """
+        Run or resume a job until it completes or is paused/cancelled through
+        request_status(). Returns the final progress.
+        """
+        job = await self._claim(job_id)
+        if job is None:
+            return await self.get_progress(job_id)
+
+        logger.info(f"Moderation backfill {job.id} ({job.content_type}) starting from {job.checkpoint or 'the beginning'}")
+        paginator = self._paginator(job.content_type)
+        checkpoint = job.checkpoint
+        status = "running"
+
+        try:
+            started = time.monotonic()
+            db_start = time.monotonic()
+            rows, more = await self._fetch(job.content_type, checkpoint, job.batch_size)
+            db_seconds = time.monotonic() - db_start
+
+            while rows:
+                batch_checkpoint = paginator.cursor_for(rows[-1])
+
+                # Read the next batch while this one is scanned
+                scan = asyncio.ensure_future(self._scan(job.content_type, rows))
+                db_start = time.monotonic()
+                if more:
+                    next_rows, next_more = await self._fetch(job.content_type, batch_checkpoint, job.batch_size)
+                else:
+                    next_rows, next_more = [], False
+                db_seconds += time.monotonic() - db_start
+                scans = await scan
+
+                db_start = time.monotonic()
+                status = await self._commit_batch(job, rows, scans, batch_checkpoint, db_start - started)
+                db_seconds += time.monotonic() - db_start
+
+                if status != "running":
+                    logger.info(f"Moderation backfill {job.id} stopped: {status}")
+                    return await self.get_progress(job_id)
+
+                # Time spent throttled does not count towards the scan rate
+                status = await self._throttle(job.id, db_seconds)
+                if status != "running":
+                    logger.info(f"Moderation backfill {job.id} stopped: {status}")
+                    return await self.get_progress(job_id)
+                db_seconds = 0.0
+                started = time.monotonic()
+                rows, more = next_rows, next_more
+
+            await self._set_status(job.id, "completed")
+            logger.info(f"Moderation backfill {job.id} completed")
+        except asyncio.CancelledError:
+            # A pause or cancel requested meanwhile stands
+            await self._set_status(job.id, "paused", only_from="running")
+            raise
+        except Exception as e:
+            logger.error(f"Moderation backfill {job.id} failed: {e}")
+            await self._set_status(job.id, "failed", error=str(e))
+
+        return await self.get_progress(job_id)
+
+    async def request_status(self, job_id: uuid.UUID, status: str) -> Optional[Dict[str, Any]]:
+        """Pause or cancel a job; its runner stops after the current batch"""
+        if status not in ("paused", "cancelled"):
+            raise ValueError(f"Cannot request status {status}")
+        async with self._session() as db:
+            job = await db.get(ModerationScanJob, job_id)
+            if job is None:
+                return None
+            if job.status in ("pending", "running", "paused", "failed"):
+                job.status = status
+                job.updated_at = datetime.utcnow()
+                await db.commit()
+                await db.refresh(job)
+            return self._progress(job)
+
+    async def get_progress(self, job_id: uuid.UUID) -> Optional[Dict[str, Any]]:
+        async with self._session() as db:
+            job = await db.get(ModerationScanJob, job_id)
+            return self._progress(job) if job else None
+
+    async def list_jobs(self, limit: int = 20) -> List[Dict[str, Any]]:
+        async with self._session() as db:
+            result = await db.execute(
+                select(ModerationScanJob).order_by(ModerationScanJob.created_at.desc()).limit(limit)
+            )
+            return [self._progress(job) for job in result.scalars().all()]
+
+    def _progress(self, job: ModerationScanJob) -> Dict[str, Any]:
+        scanned = job.scanned_count or 0
+        elapsed = job.elapsed_seconds or 0.0
+        rate = scanned / elapsed if elapsed > 0 else None
+        total = job.total_estimate
+        if total is not None:
+            total = max(total, scanned)
+
+        eta = None
+        if job.status == "completed":
+            eta = 0.0
+        elif rate and total is not None:
+            eta = round((total - scanned) / rate, 1)
+
+        return {
+            "job_id": str(job.id),
+            "content_type": job.content_type,
+            "status": job.status,
+            "scanned": scanned,
+            "flagged": job.flagged_count or 0,
+            "total_estimate": total,
+            "percent": 100.0 if job.status == "completed" else (
+                round(scanned / total * 100, 1) if total else None
+            ),
+            "rate_per_second": round(rate, 1) if rate else None,
+            "eta_seconds": eta,
+            "error": job.error,
+            "resumable": _resumable(job),
+            "created_at": job.created_at.isoformat() if job.created_at else None,
+            "started_at": job.started_at.isoformat() if job.started_at else None,
+            "updated_at": job.updated_at.isoformat() if job.updated_at else None,
+            "completed_at": job.completed_at.isoformat() if job.completed_at else None,
+        }
+
+
+def _resumable(job: ModerationScanJob) -> bool:
+    """Whether run_job() would claim the job: stopped, or running without a recent heartbeat"""
+    if job.status in RESUMABLE_STATUSES:
+        return True
+    return job.status == "running" and job.updated_at is not None and (
+        job.updated_at < datetime.utcnow() - STALE_AFTER
+    )
+
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+
+def get_backfill_executor() -> ProcessPoolExecutor:
+    """Process pool shared by backfill jobs in this process"""
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor()
+    return _executor
@@ -0,0 +1,232 @@
+"""
+Pagination
+
+Keyset (cursor) pagination for list endpoints. A page is fetched with
+`WHERE (sort_key, id) < (:last_sort_key, :last_id) ORDER BY sort_key, id
+LIMIT n` instead of `OFFSET`, so page 10,000 costs the same as page 1 when a
+composite (sort_key, id) index exists. Cursors are opaque URL-safe strings
+carrying the last row's key and the sort they belong to.
+
+Totals are optional: exact counts are cached briefly, and on Postgres an
+estimate can be read from the planner instead of running COUNT(*). Cached
+counts are dropped when a session in this process commits a write to one of
+the tables they read.
+"""
+import base64
+import json
+import time
+import uuid
+from dataclasses import dataclass, field
+from datetime import datetime
+from itertools import chain
+from typing import Any, Callable, Dict, FrozenSet, Iterable, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Table, event, func, inspect, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from sqlalchemy.sql.util import find_tables
+
+
+class CountMode:
+    """How a paginated list computes its total"""
+    EXACT = "exact"
+    ESTIMATE = "estimate"
+    NONE = "none"
+
+
+def default_count_mode(cursor: Optional[str]) -> str:
+    """Exact totals for the first page, planner estimates when following a cursor"""
+    return CountMode.ESTIMATE if cursor else CountMode.EXACT
+
+
+@dataclass
+class Page:
+    """One page of results and the cursor for the next one"""
+    items: List[Any]
+    next_cursor: Optional[str] = None
+    total: Optional[int] = None
+    total_is_estimate: bool = False
+
+    def pagination(self, limit: int) -> Dict[str, Any]:
+        return {
+            "limit": limit,
+            "next_cursor": self.next_cursor,
+            "has_next": self.next_cursor is not None,
+            "total": self.total,
+            "total_is_estimate": self.total_is_estimate,
+        }
+
+
+def _encode_value(value):
+    if isinstance(value, datetime):
+        return {"dt": value.isoformat()}
+    if isinstance(value, uuid.UUID):
+        return {"uuid": str(value)}
+    return value
+
+
+def _decode_value(value):
+    if isinstance(value, dict):
+        if "dt" in value:
+            return datetime.fromisoformat(value["dt"])
+        if "uuid" in value:
+            return uuid.UUID(value["uuid"])
+    return value
+
+
+def encode_cursor(sort: str, values: Tuple) -> str:
+    payload = json.dumps({"s": sort, "k": [_encode_value(v) for v in values]}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, sort: str) -> List[Any]:
+    """Key values stored in cursor; 400 if it is malformed or from another sort"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if payload["s"] != sort:
+            raise ValueError("cursor belongs to a different sort order")
+        return [_decode_value(v) for v in payload["k"]]
+    except Exception:
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor")
+
+
+@dataclass
+class KeysetPaginator:
+    """
+    Paginates a query by sort_key then id, both in the same direction.
+
+    `sort` names the ordering so a cursor cannot be replayed against another
+    one; `key` extracts (sort value, id) from a result item and defaults to
+    reading the two columns' attributes.
+    """
+    sort: str
+    sort_key: Any
+    id_column: Any
+    descending: bool = True
+    key: Optional[Callable[[Any], Tuple]] = field(default=None)
+
+    def apply(self, query, cursor: Optional[str], limit: int):
+        if self.descending:
+            query = query.order_by(self.sort_key.desc(), self.id_column.desc())
+        else:
+            query = query.order_by(self.sort_key.asc(), self.id_column.asc())
+
+        if cursor:
+            last = tuple_(*decode_cursor(cursor, self.sort))
+            current = tuple_(self.sort_key, self.id_column)
+            query = query.where(current < last if self.descending else current > last)
+
+        # One extra row tells whether there is a next page
+        return query.limit(limit + 1)
+
+    def cursor_for(self, item) -> str:
+        if self.key is not None:
+            values = self.key(item)
+        else:
+            values = (getattr(item, self.sort_key.key), getattr(item, self.id_column.key))
+        return encode_cursor(self.sort, values)
+
+    def page(self, items, limit: int) -> Page:
+        items = list(items)
+        if len(items) <= limit:
+            return Page(items=items)
+        items = items[:limit]
+        return Page(items=items, next_cursor=self.cursor_for(items[-1]))
+
+
+COUNT_CACHE_TTL = 30  # seconds
+COUNT_CACHE_MAX_ENTRIES = 1000
+# key -> (expires at, total, tables the count read)
+_count_cache: Dict[str, Tuple[float, int, FrozenSet[str]]] = {}
+
+_WRITTEN_TABLES = "pagination_written_tables"
+
+
+def _count_cache_key(query) -> Optional[str]:
+    try:
+        compiled = query.compile()
+        return f"{compiled}|{sorted((k, repr(v)) for k, v in compiled.params.items())}"
+    except Exception:
+        return None  # not renderable without a dialect; count uncached
+
+
+def _query_tables(query) -> FrozenSet[str]:
+    return frozenset(t.name for t in find_tables(query, check_columns=True) if isinstance(t, Table))
+
+
+def invalidate_counts(tables: Iterable[str]) -> None:
+    """Drop cached counts that read any of tables"""
+    tables = set(tables)
+    for key in [key for key, (_, _, read) in list(_count_cache.items()) if read & tables]:
+        _count_cache.pop(key, None)
+
+
+@event.listens_for(Session, "do_orm_execute")
+def _track_statement_writes(state):
+    if state.is_insert or state.is_update or state.is_delete:
+        table = getattr(state.statement, "table", None)
+        if table is not None:
+            state.session.info.setdefault(_WRITTEN_TABLES, set()).add(table.name)
+
+
+@event.listens_for(Session, "after_flush")
+def _track_flushed_writes(session, flush_context):
+    written = session.info.setdefault(_WRITTEN_TABLES, set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        written.update(table.name for table in inspect(obj).mapper.tables)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed_writes(session):
+    written = session.info.pop(_WRITTEN_TABLES, None)
+    if written:
+        invalidate_counts(written)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_writes(session):
+    session.info.pop(_WRITTEN_TABLES, None)
+
+
+async def _exact_count(db: AsyncSession, query) -> int:
+    key = _count_cache_key(query)
+    cached = _count_cache.get(key) if key else None
+    if cached and cached[0] > time.monotonic():
+        return cached[1]
+
+    total = await db.scalar(select(func.count()).select_from(query.order_by(None).subquery())) or 0
+    if key:
+        if len(_count_cache) >= COUNT_CACHE_MAX_ENTRIES:
+            _count_cache.clear()
+        _count_cache[key] = (time.monotonic() + COUNT_CACHE_TTL, total, _query_tables(query))
+    return total
+
+
+async def _estimated_count(db: AsyncSession, query) -> int:
+    """Row estimate from the Postgres planner, without executing the query"""
+    compiled = query.order_by(None).compile(
+        dialect=db.get_bind().dialect, compile_kwargs={"literal_binds": True}
+    )
+    async with db.begin_nested():
+        plan = await db.scalar(text(f"EXPLAIN (FORMAT JSON) {compiled}"))
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]["Plan"]["Plan Rows"])
+
+
+async def count_rows(db: AsyncSession, query, mode: str = CountMode.EXACT) -> Tuple[Optional[int], bool]:
+    """
+    Total rows matched by query as (total, is_estimate). Estimates fall back
+    to the cached exact count on databases other than Postgres or when the
+    query cannot be rendered for EXPLAIN.
+    """
+    if mode == CountMode.NONE:
+        return None, False
+    if mode == CountMode.ESTIMATE and db.get_bind().dialect.name == "postgresql":
+        try:
+            return await _estimated_count(db, query), True
+        except Exception:
+            pass
+    return await _exact_count(db, query), False
@@ -1,16 +1,50 @@
 """
 Playlist management service for video platform.
+
+Items are ordered by fractional rank keys (see rank_keys.py): adding,
+removing or moving an item writes only that item's row, and bulk reorders
+write only the moved rows in a single statement.
 """
+import asyncio
+import logging
 import uuid
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime
-from sqlalchemy import select, func, and_, or_, delete
+from sqlalchemy import select, update, func, and_, or_, delete, tuple_, values, column, String
+from sqlalchemy.dialects.postgresql import UUID
 from sqlalchemy.orm import selectinload
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from .base_service import BaseService
+from .rank_keys import MAX_KEY_LENGTH, key_between, keys_between, spread_keys
 from ..models import VideoPlaylist, VideoPlaylistItem, Video, Channel, User, VideoVisibility
-from ..dependencies import get_db
+
+logger = logging.getLogger(__name__)
+
+# Playlists with a rebalance scheduled in this process
+_pending_rebalances = set()
+# Running rebalance tasks, referenced so they are not garbage collected mid-run
+_rebalance_tasks = set()
+
+
+def rank_update_statements(dialect_name: str, ranks: List[Tuple[uuid.UUID, str]]):
+    """
+    Statement and parameters setting many item ranks at once: one
+    UPDATE ... FROM (VALUES ...) on Postgres, a by-primary-key executemany
+    elsewhere.
+    """
+    if dialect_name == "postgresql":
+        new_ranks = values(
+            column("id", UUID(as_uuid=True)), column("rank", String), name="new_ranks"
+        ).data(ranks)
+        statement = (
+            update(VideoPlaylistItem)
+            .where(VideoPlaylistItem.id == new_ranks.c.id)
+            .values(rank=new_ranks.c.rank)
+            .execution_options(synchronize_session=False)
+        )
+        return statement, None
+    return update(VideoPlaylistItem), [{"id": item_id, "rank": rank} for item_id, rank in ranks]
 
 
 class PlaylistService(BaseService):
@@ -155,9 +189,13 @@ class PlaylistService(BaseService):
         playlist_id: uuid.UUID,
         video_id: uuid.UUID,
         user_id: uuid.UUID,
-        position: Optional[int] = None
+        position: Optional[int] = None,
+        after_video_id: Optional[uuid.UUID] = None
     ) -> Optional[VideoPlaylistItem]:
-        """Add a video to a playlist."""
+        """
+        Add a video to a playlist: after `after_video_id`, at 1-based
+        `position`, or at the end.
+        """
         async with self.get_db_session() as db:
             # Verify playlist ownership
             playlist = await self.get_playlist_by_id(playlist_id)
@@ -184,30 +222,31 @@ class PlaylistService(BaseService):
             if existing_result.scalar_one_or_none():
                 raise ValueError("Video already in playlist")
             
-            # Determine position
-            if position is None:
-                # Add to end
-                max_position_result = await db.execute(
-                    select(func.max(VideoPlaylistItem.position))
+            # Rank between the neighbours; no other row changes
+            if after_video_id is not None:
+                rank = await self._rank_for(db, playlist_id, lambda: self._neighbours_after(db, playlist_id, after_video_id))
+            elif position is not None:
+                rank = await self._rank_for(db, playlist_id, lambda: self._neighbours_at(db, playlist_id, position))
+            else:
+                last_rank = await db.scalar(
+                    select(func.max(VideoPlaylistItem.rank))
                     .where(VideoPlaylistItem.playlist_id == playlist_id)
                 )
-                max_position = max_position_result.scalar() or 0
-                position = max_position + 1
-            else:
-                # Shift existing items if needed
-                await self._shift_playlist_positions(db, playlist_id, position, 1)
+                rank = key_between(last_rank, None)
             
             playlist_item = VideoPlaylistItem(
                 id=uuid.uuid4(),
                 playlist_id=playlist_id,
                 video_id=video_id,
-                position=position,
+                rank=rank,
                 added_at=datetime.utcnow()
             )
             
             db.add(playlist_item)
             await db.commit()
             await db.refresh(playlist_item)
+            playlist_item.position = await self._ordinal(db, playlist_item)
+            self._maybe_rebalance(playlist_id, [rank])
             
             return playlist_item
     
@@ -237,14 +276,47 @@ class PlaylistService(BaseService):
             if not item:
                 return False
             
-            position = item.position
+            # Remaining items keep their ranks
             await db.delete(item)
+            await db.commit()
+            return True
+    
+    async def move_playlist_item(
+        self,
+        playlist_id: uuid.UUID,
+        video_id: uuid.UUID,
+        user_id: uuid.UUID,
+        after_video_id: Optional[uuid.UUID] = None,
+        before_video_id: Optional[uuid.UUID] = None
+    ) -> Optional[VideoPlaylistItem]:
+        """
+        Move one item after `after_video_id`, before `before_video_id`, or to
+        the start when neither is given. Only the moved row is written.
+        """
+        async with self.get_db_session() as db:
+            # Verify playlist ownership
+            playlist = await self.get_playlist_by_id(playlist_id)
+            if not playlist or playlist.creator_id != user_id:
+                return None
             
-            # Shift remaining items down
-            await self._shift_playlist_positions(db, playlist_id, position + 1, -1)
+            item = await self._get_item(db, playlist_id, video_id)
+            if not item:
+                return None
             
+            if after_video_id is not None:
+                locate = lambda: self._neighbours_after(db, playlist_id, after_video_id, exclude_id=item.id)
+            elif before_video_id is not None:
+                locate = lambda: self._neighbours_before(db, playlist_id, before_video_id, exclude_id=item.id)
+            else:
+                locate = lambda: self._neighbours_at(db, playlist_id, 1, exclude_id=item.id)
+            
+            item.rank = await self._rank_for(db, playlist_id, locate)
             await db.commit()
-            return True
+            await db.refresh(item)
+            item.position = await self._ordinal(db, item)
+            self._maybe_rebalance(playlist_id, [item.rank])
+            
+            return item
     
     async def reorder_playlist_items(
         self,
@@ -252,32 +324,55 @@ class PlaylistService(BaseService):
         user_id: uuid.UUID,
         video_positions: List[Dict[str, Any]]
     ) -> bool:
-        """Reorder items in a playlist."""
+        """
+        Move the listed videos to their 1-based positions; unlisted items
+        keep their relative order. Only moved rows get new ranks, written
+        in one statement.
+        """
         async with self.get_db_session() as db:
             # Verify playlist ownership
             playlist = await self.get_playlist_by_id(playlist_id)
             if not playlist or playlist.creator_id != user_id:
                 return False
             
-            # Update positions
-            for item_data in video_positions:
-                video_id = item_data['video_id']
-                new_position = item_data['position']
-                
-                await db.execute(
-                    select(VideoPlaylistItem)
-                    .where(
-                        and_(
-                            VideoPlaylistItem.playlist_id == playlist_id,
-                            VideoPlaylistItem.video_id == video_id
-                        )
-                    )
-                    .update({VideoPlaylistItem.position: new_position})
-                )
+            result = await db.execute(
+                select(VideoPlaylistItem.id, VideoPlaylistItem.video_id, VideoPlaylistItem.rank)
+                .where(VideoPlaylistItem.playlist_id == playlist_id)
+                .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
+            )
+            items = result.all()
+            by_video = {str(item.video_id): item for item in items}
             
+            moves = {}
+            for item_data in video_positions:
+                item = by_video.get(str(item_data['video_id']))
+                if item is not None:
+                    moves[item.id] = int(item_data['position'])
+            if not moves:
+                return True
+            
+            # Lay the moved items into the order of the others
+            order = [item for item in items if item.id not in moves]
+            for item in sorted((item for item in items if item.id in moves), key=lambda i: moves[i.id]):
+                order.insert(min(max(moves[item.id], 1), len(order) + 1) - 1, item)
+            
+            new_ranks = self._ranks_for_moved(order, set(moves))
+            if new_ranks is None:
+                # Duplicate ranks among the unmoved items; rank everything afresh
+                new_ranks = list(zip([item.id for item in order], spread_keys(len(order))))
+            
+            await self._set_ranks(db, new_ranks)
             await db.commit()
+            self._maybe_rebalance(playlist_id, [rank for _, rank in new_ranks])
             return True
     
+    async def rebalance_playlist(self, playlist_id: uuid.UUID) -> int:
+        """Rewrite all ranks of a playlist as short keys; returns the item count"""
+        async with self.get_db_session() as db:
+            count = await self._rebalance(db, playlist_id)
+            await db.commit()
+        return count
+    
     async def get_playlist_items(
         self,
         playlist_id: uuid.UUID,
@@ -291,7 +386,7 @@ class PlaylistService(BaseService):
                     selectinload(VideoPlaylistItem.video).selectinload(Video.creator)
                 )
                 .where(VideoPlaylistItem.playlist_id == playlist_id)
-                .order_by(VideoPlaylistItem.position)
+                .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
             )
             
             result = await db.execute(query)
@@ -299,7 +394,8 @@ class PlaylistService(BaseService):
             
             # Filter videos based on visibility
             filtered_items = []
-            for item in items:
+            for position, item in enumerate(items, start=1):
+                item.position = position
                 video = item.video
                 if viewer_user_id:
                     # User can see their own private videos
@@ -335,30 +431,21 @@ class PlaylistService(BaseService):
                     .limit(1)
                 )
             else:
-                # Get current position
-                current_result = await db.execute(
-                    select(VideoPlaylistItem.position)
-                    .where(
-                        and_(
-                            VideoPlaylistItem.playlist_id == playlist_id,
-                            VideoPlaylistItem.video_id == current_video_id
-                        )
-                    )
-                )
-                current_position = current_result.scalar_one_or_none()
-                if current_position is None:
+                # Get current rank
+                current = await self._get_item(db, playlist_id, current_video_id)
+                if current is None:
                     return None
                 
-                # Get next video by position
+                # Get next video by rank
                 query = (
                     select(VideoPlaylistItem)
                     .where(
                         and_(
                             VideoPlaylistItem.playlist_id == playlist_id,
-                            VideoPlaylistItem.position > current_position
+                            tuple_(VideoPlaylistItem.rank, VideoPlaylistItem.id) > tuple_(current.rank, current.id)
                         )
                     )
-                    .order_by(VideoPlaylistItem.position)
+                    .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
                     .limit(1)
                 )
             
@@ -427,39 +514,169 @@ class PlaylistService(BaseService):
                 'total_duration_seconds': total_duration
             }
     
-    async def _shift_playlist_positions(
+    async def _get_item(
         self,
         db: AsyncSession,
         playlist_id: uuid.UUID,
-        from_position: int,
-        shift_amount: int
-    ) -> None:
-        """Shift playlist item positions."""
-        if shift_amount > 0:
-            # Shifting up (making room)
-            await db.execute(
-                select(VideoPlaylistItem)
-                .where(
-                    and_(
-                        VideoPlaylistItem.playlist_id == playlist_id,
-                        VideoPlaylistItem.position >= from_position
-                    )
+        video_id: uuid.UUID
+    ) -> Optional[VideoPlaylistItem]:
+        # Bulk rank updates bypass the identity map, so reload the row
+        result = await db.execute(
+            select(VideoPlaylistItem).where(
+                and_(
+                    VideoPlaylistItem.playlist_id == playlist_id,
+                    VideoPlaylistItem.video_id == video_id
                 )
-                .update({
-                    VideoPlaylistItem.position: VideoPlaylistItem.position + shift_amount
-                })
             )
-        elif shift_amount < 0:
-            # Shifting down (filling gap)
-            await db.execute(
-                select(VideoPlaylistItem)
-                .where(
-                    and_(
-                        VideoPlaylistItem.playlist_id == playlist_id,
-                        VideoPlaylistItem.position >= from_position
-                    )
+            .execution_options(populate_existing=True)
+        )
+        return result.scalar_one_or_none()
+    
+    def _others(self, playlist_id: uuid.UUID, exclude_id: Optional[uuid.UUID]):
+        query = select(VideoPlaylistItem.rank).where(VideoPlaylistItem.playlist_id == playlist_id)
+        if exclude_id is not None:
+            query = query.where(VideoPlaylistItem.id != exclude_id)
+        return query
+    
+    async def _neighbours_after(
+        self,
+        db: AsyncSession,
+        playlist_id: uuid.UUID,
+        video_id: uuid.UUID,
+        exclude_id: Optional[uuid.UUID] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Ranks of an item and the one following it"""
+        anchor = await self._get_item(db, playlist_id, video_id)
+        if anchor is None:
+            raise ValueError("Video not in playlist")
+        following = await db.scalar(
+            self._others(playlist_id, exclude_id)
+            .where(tuple_(VideoPlaylistItem.rank, VideoPlaylistItem.id) > tuple_(anchor.rank, anchor.id))
+            .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
+            .limit(1)
+        )
+        return anchor.rank, following
+    
+    async def _neighbours_before(
+        self,
+        db: AsyncSession,
+        playlist_id: uuid.UUID,
+        video_id: uuid.UUID,
+        exclude_id: Optional[uuid.UUID] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Ranks of the item preceding an item and of the item itself"""
+        anchor = await self._get_item(db, playlist_id, video_id)
+        if anchor is None:
+            raise ValueError("Video not in playlist")
+        preceding = await db.scalar(
+            self._others(playlist_id, exclude_id)
+            .where(tuple_(VideoPlaylistItem.rank, VideoPlaylistItem.id) < tuple_(anchor.rank, anchor.id))
+            .order_by(VideoPlaylistItem.rank.desc(), VideoPlaylistItem.id.desc())
+            .limit(1)
+        )
+        return preceding, anchor.rank
+    
+    async def _neighbours_at(
+        self,
+        db: AsyncSession,
+        playlist_id: uuid.UUID,
+        position: int,
+        exclude_id: Optional[uuid.UUID] = None
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """Ranks around 1-based `position`"""
+        position = max(position, 1)
+        result = await db.execute(
+            self._others(playlist_id, exclude_id)
+            .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
+            .offset(max(position - 2, 0))
+            .limit(2 if position > 1 else 1)
+        )
+        ranks = result.scalars().all()
+        if position > 1 and not ranks:
+            # Past the end: append
+            last_rank = await db.scalar(
+                self._others(playlist_id, exclude_id)
+                .order_by(VideoPlaylistItem.rank.desc(), VideoPlaylistItem.id.desc())
+                .limit(1)
+            )
+            return last_rank, None
+        if position == 1:
+            return None, ranks[0] if ranks else None
+        return (ranks[0] if ranks else None), (ranks[1] if len(ranks) > 1 else None)
+    
+    async def _rank_for(self, db: AsyncSession, playlist_id: uuid.UUID, locate) -> str:
+        """
+        Key between the neighbours returned by `locate`. Neighbours sharing a
+        rank (concurrent inserts at one spot) trigger a rebalance first.
+        """
+        before, after = await locate()
+        if before is not None and after is not None and before >= after:
+            await self._rebalance(db, playlist_id)
+            before, after = await locate()
+        return key_between(before, after)
+    
+    def _ranks_for_moved(self, order, moved_ids) -> Optional[List[Tuple[uuid.UUID, str]]]:
+        """New ranks for runs of moved items between their unmoved neighbours"""
+        new_ranks, run, previous = [], [], None
+        for item in order + [None]:
+            if item is not None and item.id in moved_ids:
+                run.append(item)
+                continue
+            following = item.rank if item is not None else None
+            if run:
+                if previous is not None and following is not None and previous >= following:
+                    return None
+                new_ranks.extend(zip([i.id for i in run], keys_between(previous, following, len(run))))
+                run = []
+            previous = following
+        return new_ranks
+    
+    async def _ordinal(self, db: AsyncSession, item: VideoPlaylistItem) -> int:
+        """1-based position of an item"""
+        preceding = await db.scalar(
+            select(func.count(VideoPlaylistItem.id)).where(
+                and_(
+                    VideoPlaylistItem.playlist_id == item.playlist_id,
+                    tuple_(VideoPlaylistItem.rank, VideoPlaylistItem.id) < tuple_(item.rank, item.id)
                 )
-                .update({
-                    VideoPlaylistItem.position: VideoPlaylistItem.position + shift_amount
-                })
-            )
\ No newline at end of file
+            )
+        )
+        return (preceding or 0) + 1
+    
+    async def _set_ranks(self, db: AsyncSession, ranks: List[Tuple[uuid.UUID, str]]) -> None:
+        if not ranks:
+            return
+        statement, params = rank_update_statements(db.get_bind().dialect.name, ranks)
+        if params is None:
+            await db.execute(statement)
+        else:
+            await db.execute(statement, params)
+    
+    async def _rebalance(self, db: AsyncSession, playlist_id: uuid.UUID) -> int:
+        result = await db.execute(
+            select(VideoPlaylistItem.id)
+            .where(VideoPlaylistItem.playlist_id == playlist_id)
+            .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
+        )
+        item_ids = result.scalars().all()
+        await self._set_ranks(db, list(zip(item_ids, spread_keys(len(item_ids)))))
+        return len(item_ids)
+    
+    def _maybe_rebalance(self, playlist_id: uuid.UUID, new_ranks: List[str]) -> None:
+        """Schedule a background rebalance once keys have grown long"""
+        if playlist_id in _pending_rebalances or not any(len(rank) > MAX_KEY_LENGTH for rank in new_ranks):
+            return
+        _pending_rebalances.add(playlist_id)
+        
+        async def run():
+            try:
+                count = await self.rebalance_playlist(playlist_id)
+                logger.info(f"Rebalanced {count} rank keys of playlist {playlist_id}")
+            except Exception as e:
+                logger.error(f"Failed to rebalance playlist {playlist_id}: {e}")
+            finally:
+                _pending_rebalances.discard(playlist_id)
+        
+        task = asyncio.create_task(run())
+        _rebalance_tasks.add(task)
+        task.add_done_callback(_rebalance_tasks.discard)
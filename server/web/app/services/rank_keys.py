@@ -0,0 +1,169 @@
+"""
+Rank Keys
+
+Fractional indexing for user-ordered lists. Each item carries a string key
+and the list is sorted by key; a key can always be generated between any
+two others, so inserting or moving an item rewrites only that item's row.
+
+A key is a variable-length integer part followed by an optional fraction,
+all in base-62 digits compared as plain strings (the digits are in ASCII
+order). The integer part's first character encodes its length ("a0".."az",
+then "b00".."bzz", ...; "Z", "Y", ... for keys before "a0"), so appending or
+prepending grows keys logarithmically. Inserting between two adjacent keys
+extends the fraction, about one character per six inserts at the same spot;
+spread_keys() produces short keys again when a list is rebalanced.
+"""
+from typing import List, Optional
+
+DIGITS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+BASE = len(DIGITS)
+_INDEX = {digit: i for i, digit in enumerate(DIGITS)}
+
+FIRST_KEY = "a0"
+SMALLEST_INTEGER = "A" + DIGITS[0] * 26
+
+# Keys longer than this mark a list for rebalancing
+MAX_KEY_LENGTH = 24
+
+
+def _integer_length(head: str) -> int:
+    if "a" <= head <= "z":
+        return ord(head) - ord("a") + 2
+    if "A" <= head <= "Z":
+        return ord("Z") - ord(head) + 2
+    raise ValueError(f"Invalid rank key head: {head!r}")
+
+
+def _split(key: str):
+    """(integer part, fraction) of a valid key"""
+    if not key or key == SMALLEST_INTEGER:
+        raise ValueError(f"Invalid rank key: {key!r}")
+    length = _integer_length(key[0])
+    if len(key) < length or any(c not in _INDEX for c in key):
+        raise ValueError(f"Invalid rank key: {key!r}")
+    fraction = key[length:]
+    if fraction.endswith(DIGITS[0]):
+        raise ValueError(f"Invalid rank key: {key!r}")
+    return key[:length], fraction
+
+
+def _midpoint(a: str, b: Optional[str]) -> str:
+    """Fraction strictly between fractions a and b; b None means unbounded"""
+    if b is not None:
+        # Keep the shared prefix (a padded with the zero digit)
+        n = 0
+        while n < len(b) and (a[n] if n < len(a) else DIGITS[0]) == b[n]:
+            n += 1
+        if n:
+            return b[:n] + _midpoint(a[n:], b[n:])
+
+    low = _INDEX[a[0]] if a else 0
+    high = _INDEX[b[0]] if b is not None else BASE
+    if high - low > 1:
+        return DIGITS[(low + high) // 2]
+    # Adjacent first digits
+    if b is not None and len(b) > 1:
+        return b[0]
+    return DIGITS[low] + _midpoint(a[1:], None)
+
+
+def _increment(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        value = _INDEX[digits[i]] + 1
+        if value < BASE:
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = DIGITS[0]
+    # Carried out of the integer part: move to the next length
+    if head == "Z":
+        return FIRST_KEY
+    if head == "z":
+        return None
+    head = chr(ord(head) + 1)
+    if head > "a":
+        digits.append(DIGITS[0])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def _decrement(integer: str) -> Optional[str]:
+    head, digits = integer[0], list(integer[1:])
+    for i in range(len(digits) - 1, -1, -1):
+        value = _INDEX[digits[i]] - 1
+        if value >= 0:
+            digits[i] = DIGITS[value]
+            return head + "".join(digits)
+        digits[i] = DIGITS[-1]
+    if head == "a":
+        return "Z" + DIGITS[-1]
+    if head == "A":
+        return None
+    head = chr(ord(head) - 1)
+    if head < "Z":
+        digits.append(DIGITS[-1])
+    else:
+        digits.pop()
+    return head + "".join(digits)
+
+
+def key_between(before: Optional[str], after: Optional[str]) -> str:
+    """A key sorting after `before` and before `after` (either may be None)"""
+    if before is None and after is None:
+        return FIRST_KEY
+
+    if before is None:
+        integer, fraction = _split(after)
+        if integer == SMALLEST_INTEGER:
+            return integer + _midpoint("", fraction)
+        if integer < after:
+            return integer
+        smaller = _decrement(integer)
+        if smaller is None:
+            raise ValueError("Cannot create a rank key before the smallest key")
+        return smaller
+
+    if after is None:
+        integer, fraction = _split(before)
+        larger = _increment(integer)
+        return larger if larger is not None else integer + _midpoint(fraction, None)
+
+    if before >= after:
+        raise ValueError(f"Rank keys out of order: {before!r} >= {after!r}")
+    integer_a, fraction_a = _split(before)
+    integer_b, fraction_b = _split(after)
+    if integer_a == integer_b:
+        return integer_a + _midpoint(fraction_a, fraction_b)
+    larger = _increment(integer_a)
+    if larger is not None and larger < after:
+        return larger
+    return integer_a + _midpoint(fraction_a, None)
+
+
+def keys_between(before: Optional[str], after: Optional[str], count: int) -> List[str]:
+    """`count` ascending keys between `before` and `after`"""
+    if count <= 0:
+        return []
+    if after is None:
+        keys = []
+        for _ in range(count):
+            before = key_between(before, None)
+            keys.append(before)
+        return keys
+    if before is None:
+        keys = []
+        for _ in range(count):
+            after = key_between(None, after)
+            keys.append(after)
+        return list(reversed(keys))
+    # Bisect so keys between two neighbours stay short
+    middle = key_between(before, after)
+    left = keys_between(before, middle, (count - 1) // 2)
+    right = keys_between(middle, after, count - 1 - len(left))
+    return left + [middle] + right
+
+
+def spread_keys(count: int) -> List[str]:
+    """`count` short ascending keys for a full rebalance"""
+    return keys_between(None, None, count) if count else []
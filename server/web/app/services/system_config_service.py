@@ -2,18 +2,178 @@
 System Configuration Management Service
 
 Handles system-wide settings, transcoding presets, S3 configuration, and other admin settings.
+
+Reads are served from an immutable per-process snapshot of the merged
+configuration. Every write bumps a version counter in Redis; processes
+compare against it at most every CHECK_INTERVAL seconds and only then
+reload from the database. Without Redis the snapshot is reloaded after
+CHECK_INTERVAL instead, and writes in this process apply immediately.
 """
+import asyncio
+import copy
+import inspect
+import logging
+import time
 import uuid
 import json
-from typing import Dict, Any, List, Optional
+from types import MappingProxyType
+from typing import Dict, Any, List, Optional, Callable, Mapping
 from datetime import datetime
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, update, delete
 from sqlalchemy.orm import selectinload
 
+import redis.asyncio as redis
+
 from .base_service import BaseService
 from ..models import SystemConfig
 
+logger = logging.getLogger(__name__)
+
+
+def _freeze(value: Any) -> Any:
+    if isinstance(value, dict):
+        return MappingProxyType({k: _freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(_freeze(v) for v in value)
+    return value
+
+
+def _thaw(value: Any) -> Any:
+    if isinstance(value, Mapping):
+        return {k: _thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [_thaw(v) for v in value]
+    return value
+
+
+class ConfigSnapshot:
+    """Read-only view of the merged configuration at one version"""
+    
+    def __init__(self, version: Optional[int], config: Dict[str, Any]):
+        self.version = version
+        self.config = _freeze(config)
+        self.loaded_at = datetime.utcnow()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Look up a value using dot notation"""
+        value = self.config
+        for k in key.split('.'):
+            if isinstance(value, Mapping) and k in value:
+                value = value[k]
+            else:
+                return default
+        return value
+    
+    def section(self, section: str) -> Mapping:
+        return self.config.get(section, MappingProxyType({}))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Mutable copy of the whole configuration"""
+        return _thaw(self.config)
+
+
+class ConfigSnapshotStore:
+    """Holds the current config snapshot for this process and tracks its version"""
+    
+    VERSION_KEY = "system_config:version"
+    CHECK_INTERVAL = 5.0  # seconds between version checks
+    RETRY_INTERVAL = 30  # seconds before retrying Redis after a failure
+    
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self.redis_client = None
+        self._retry_at = 0.0
+        self.snapshot: Optional[ConfigSnapshot] = None
+        self._stale = False
+        self._next_check = 0.0
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[ConfigSnapshot], Any]] = []
+    
+    async def _get_redis_client(self) -> Optional[redis.Redis]:
+        """Get Redis client, or None while Redis is disabled or backing off."""
+        if not self.redis_url or time.monotonic() < self._retry_at:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis_client
+    
+    def _redis_failed(self, operation: str, error: Exception):
+        logger.warning(f"Config version {operation} failed, falling back to periodic reload: {error}")
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+    
+    async def _remote_version(self) -> Optional[int]:
+        client = await self._get_redis_client()
+        if client is None:
+            return None
+        try:
+            return int(await client.get(self.VERSION_KEY) or 0)
+        except Exception as e:
+            self._redis_failed("check", e)
+            return None
+    
+    def subscribe(self, listener: Callable[[ConfigSnapshot], Any]) -> None:
+        """Call listener (sync or async) with each new snapshot after a config change"""
+        self._listeners.append(listener)
+    
+    def unsubscribe(self, listener: Callable[[ConfigSnapshot], Any]) -> None:
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+    
+    async def get(self, db: AsyncSession, loader) -> ConfigSnapshot:
+        """Current snapshot, reloaded through loader(db) when the version moved"""
+        if self.snapshot is not None and time.monotonic() < self._next_check:
+            return self.snapshot
+        
+        async with self._lock:
+            if self.snapshot is not None and time.monotonic() < self._next_check:
+                return self.snapshot
+            
+            version = await self._remote_version()
+            previous = self.snapshot
+            if previous is None or self._stale or version is None or version != previous.version:
+                self._stale = False
+                self.snapshot = ConfigSnapshot(version, await loader(db))
+            self._next_check = time.monotonic() + self.CHECK_INTERVAL
+        
+        if previous is not None and self.snapshot is not previous and self.snapshot.config != previous.config:
+            await self._notify(self.snapshot)
+        return self.snapshot
+    
+    async def bump(self) -> None:
+        """Record a config write: mark the local snapshot stale and advance the shared version"""
+        self._next_check = 0.0
+        self._stale = True
+        
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.incr(self.VERSION_KEY)
+        except Exception as e:
+            self._redis_failed("bump", e)
+    
+    async def _notify(self, snapshot: ConfigSnapshot) -> None:
+        for listener in list(self._listeners):
+            try:
+                result = listener(snapshot)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Config change listener {listener!r} failed: {e}")
+
+
+_config_snapshot_store: Optional[ConfigSnapshotStore] = None
+
+
+def get_config_snapshot_store() -> ConfigSnapshotStore:
+    """Shared snapshot store for this process"""
+    global _config_snapshot_store
+    if _config_snapshot_store is None:
+        from ..config import get_settings
+        _config_snapshot_store = ConfigSnapshotStore(get_settings().REDIS_URL)
+    return _config_snapshot_store
+
 
 class SystemConfigService(BaseService):
     """Service for managing system configuration."""
@@ -120,8 +280,11 @@ class SystemConfigService(BaseService):
         }
     }
     
-    async def get_all_config(self, db: AsyncSession) -> Dict[str, Any]:
-        """Get all system configuration."""
+    def __init__(self, snapshot_store: Optional[ConfigSnapshotStore] = None):
+        self.snapshot_store = snapshot_store or get_config_snapshot_store()
+    
+    async def _load_config(self, db: AsyncSession) -> Dict[str, Any]:
+        """Merge database overrides onto the defaults."""
         
         # Get all config from database
         query = select(SystemConfig)
@@ -129,7 +292,7 @@ class SystemConfigService(BaseService):
         config_records = result.scalars().all()
         
         # Start with default config
-        config = self.DEFAULT_CONFIG.copy()
+        config = copy.deepcopy(self.DEFAULT_CONFIG)
         
         # Override with database values
         for record in config_records:
@@ -137,24 +300,33 @@ class SystemConfigService(BaseService):
         
         return config
     
+    async def get_snapshot(self, db: AsyncSession) -> ConfigSnapshot:
+        """Get the current read-only configuration snapshot."""
+        
+        return await self.snapshot_store.get(db, self._load_config)
+    
+    def subscribe(self, listener: Callable[[ConfigSnapshot], Any]) -> None:
+        """Register a callback for configuration changes."""
+        
+        self.snapshot_store.subscribe(listener)
+    
+    async def get_all_config(self, db: AsyncSession) -> Dict[str, Any]:
+        """Get all system configuration."""
+        
+        snapshot = await self.get_snapshot(db)
+        return snapshot.to_dict()
+    
     async def get_config_section(self, db: AsyncSession, section: str) -> Dict[str, Any]:
         """Get a specific configuration section."""
         
-        config = await self.get_all_config(db)
-        return config.get(section, {})
+        snapshot = await self.get_snapshot(db)
+        return _thaw(snapshot.section(section))
     
     async def get_config_value(self, db: AsyncSession, key: str) -> Any:
         """Get a specific configuration value."""
         
-        query = select(SystemConfig).where(SystemConfig.key == key)
-        result = await db.execute(query)
-        config_record = result.scalar_one_or_none()
-        
-        if config_record:
-            return config_record.value
-        
-        # Return default value if exists
-        return self._get_nested_value(self.DEFAULT_CONFIG, key)
+        snapshot = await self.get_snapshot(db)
+        return _thaw(snapshot.get(key))
     
     async def set_config_value(self, db: AsyncSession, key: str, value: Any) -> Dict[str, Any]:
         """Set a specific configuration value."""
@@ -187,6 +359,7 @@ class SystemConfigService(BaseService):
             db.add(config_record)
         
         await db.commit()
+        await self.snapshot_store.bump()
         
         return {
             'success': True,
@@ -250,6 +423,7 @@ class SystemConfigService(BaseService):
             )
             await db.execute(delete_query)
             await db.commit()
+            await self.snapshot_store.bump()
             
             return {
                 'success': True,
@@ -260,6 +434,7 @@ class SystemConfigService(BaseService):
             delete_query = delete(SystemConfig)
             await db.execute(delete_query)
             await db.commit()
+            await self.snapshot_store.bump()
             
             return {
                 'success': True,
@@ -319,6 +494,7 @@ class SystemConfigService(BaseService):
                         restored_keys.append(full_key)
         
         await db.commit()
+        await self.snapshot_store.bump()
         
         return {
             'success': True,
@@ -403,6 +579,7 @@ class SystemConfigService(BaseService):
         delete_query = delete(SystemConfig).where(SystemConfig.key == key)
         await db.execute(delete_query)
         await db.commit()
+        await self.snapshot_store.bump()
         
         return {
             'success': True,
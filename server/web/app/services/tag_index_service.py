@@ -0,0 +1,180 @@
+"""
+Tag Index Service
+
+Maintains per-tag usage counts and tag co-occurrence counts alongside the
+tags stored on each video, so popular and related tag lookups are top-K reads
+instead of scans over every video. Changes are applied as deltas inside the
+caller's transaction; the caller commits them together with the video.
+
+Only live videos count: deleted videos and failed or cancelled uploads are
+left out, so tag and status changes should go through set_tags and
+set_status rather than being written to the video directly.
+"""
+import logging
+from collections import Counter
+from datetime import datetime
+from itertools import permutations
+from typing import Iterable, List, Optional, Tuple
+
+from sqlalchemy import select, delete
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.models import Video, VideoStatus, TagStat, TagCooccurrence
+from server.web.app.services.base_service import BaseService
+
+logger = logging.getLogger(__name__)
+
+
+# Videos in these states contribute nothing to the index
+UNINDEXED_STATUSES = (VideoStatus.deleted, VideoStatus.failed)
+
+
+def _tag_set(tags: Optional[Iterable[str]]) -> set:
+    return set(tags or [])
+
+
+class TagIndexService(BaseService):
+    """Service for the tag usage and co-occurrence index"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def apply_change(self, old_tags: Optional[Iterable[str]], new_tags: Optional[Iterable[str]]):
+        """Move one video's contribution to the index from old_tags to new_tags"""
+        old, new = _tag_set(old_tags), _tag_set(new_tags)
+        if old == new:
+            return
+
+        tag_deltas = Counter()
+        for tag in new - old:
+            tag_deltas[tag] += 1
+        for tag in old - new:
+            tag_deltas[tag] -= 1
+
+        pair_deltas = Counter()
+        for pair in set(permutations(new, 2)) - set(permutations(old, 2)):
+            pair_deltas[pair] += 1
+        for pair in set(permutations(old, 2)) - set(permutations(new, 2)):
+            pair_deltas[pair] -= 1
+
+        await self._apply_deltas(tag_deltas, pair_deltas)
+
+    async def add_video(self, video: Video):
+        await self.apply_change(None, video.tags)
+
+    async def remove_video(self, video: Video):
+        await self.apply_change(video.tags, None)
+
+    async def set_tags(self, video: Video, tags: Optional[List[str]]):
+        """Replace a video's tags, moving its index contribution if it counts"""
+        if video.status not in UNINDEXED_STATUSES:
+            await self.apply_change(video.tags, tags)
+        video.tags = tags
+
+    async def set_status(self, video: Video, status: VideoStatus):
+        """Change a video's status, adding or removing its tags as it enters or leaves the index"""
+        was_indexed = video.status not in UNINDEXED_STATUSES
+        is_indexed = status not in UNINDEXED_STATUSES
+        if was_indexed and not is_indexed:
+            await self.remove_video(video)
+        elif is_indexed and not was_indexed:
+            await self.add_video(video)
+        video.status = status
+
+    async def get_popular_tags(self, limit: int = 50) -> List[Tuple[str, int]]:
+        """Most used tags as (tag, usage_count), most used first"""
+        result = await self.db.execute(
+            select(TagStat.tag, TagStat.usage_count)
+            .order_by(TagStat.usage_count.desc(), TagStat.tag)
+            .limit(limit)
+        )
+        return [(tag, count) for tag, count in result.all()]
+
+    async def get_related_tags(self, tag: str, limit: int = 10) -> List[Tuple[str, int]]:
+        """Tags most often used together with tag as (tag, count)"""
+        result = await self.db.execute(
+            select(TagCooccurrence.related_tag, TagCooccurrence.count)
+            .where(TagCooccurrence.tag == tag)
+            .order_by(TagCooccurrence.count.desc(), TagCooccurrence.related_tag)
+            .limit(limit)
+        )
+        return [(related, count) for related, count in result.all()]
+
+    async def rebuild(self) -> int:
+        """
+        Recompute the whole index from video tags, e.g. after a bulk import
+        that bypassed the service. Returns the number of distinct tags.
+        """
+        tag_counts = Counter()
+        pair_counts = Counter()
+
+        result = await self.db.stream(
+            select(Video.tags).where(Video.status.notin_(UNINDEXED_STATUSES), Video.tags.isnot(None))
+        )
+        async for (tags,) in result:
+            tags = _tag_set(tags)
+            tag_counts.update(tags)
+            pair_counts.update(permutations(tags, 2))
+
+        await self.db.execute(delete(TagCooccurrence))
+        await self.db.execute(delete(TagStat))
+
+        now = datetime.utcnow()
+        if tag_counts:
+            await self.db.execute(TagStat.__table__.insert(), [
+                {'tag': tag, 'usage_count': count, 'updated_at': now}
+                for tag, count in tag_counts.items()
+            ])
+        if pair_counts:
+            await self.db.execute(TagCooccurrence.__table__.insert(), [
+                {'tag': tag, 'related_tag': related, 'count': count}
+                for (tag, related), count in pair_counts.items()
+            ])
+
+        await self.db.commit()
+        logger.info(f"Rebuilt tag index: {len(tag_counts)} tags, {len(pair_counts)} pairs")
+        return len(tag_counts)
+
+    def _insert(self, table):
+        if self.db.get_bind().dialect.name == 'sqlite':
+            return sqlite.insert(table)
+        return postgresql.insert(table)
+
+    async def _apply_deltas(self, tag_deltas: Counter, pair_deltas: Counter):
+        now = datetime.utcnow()
+
+        if tag_deltas:
+            stmt = self._insert(TagStat.__table__)
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['tag'],
+                    set_={
+                        'usage_count': TagStat.__table__.c.usage_count + stmt.excluded.usage_count,
+                        'updated_at': stmt.excluded.updated_at
+                    }
+                ),
+                [{'tag': tag, 'usage_count': delta, 'updated_at': now}
+                 for tag, delta in tag_deltas.items() if delta]
+            )
+            await self.db.execute(
+                delete(TagStat).where(TagStat.tag.in_(list(tag_deltas)), TagStat.usage_count <= 0)
+            )
+
+        if pair_deltas:
+            stmt = self._insert(TagCooccurrence.__table__)
+            await self.db.execute(
+                stmt.on_conflict_do_update(
+                    index_elements=['tag', 'related_tag'],
+                    set_={'count': TagCooccurrence.__table__.c['count'] + stmt.excluded['count']}
+                ),
+                [{'tag': tag, 'related_tag': related, 'count': delta}
+                 for (tag, related), delta in pair_deltas.items() if delta]
+            )
+            removed = {tag for (tag, _), delta in pair_deltas.items() if delta < 0}
+            if removed:
+                await self.db.execute(
+                    delete(TagCooccurrence).where(
+                        TagCooccurrence.tag.in_(list(removed)), TagCooccurrence.count <= 0
+                    )
+                )
@@ -5,42 +5,65 @@ import asyncio
 import logging
 import os
 import tempfile
+from collections import OrderedDict
 from datetime import datetime
 from pathlib import Path
-from typing import Optional
+from typing import Dict, Optional, Tuple
 
-from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
 
 from server.web.app.services.video_transcoding_service import VideoTranscodingService
-from server.web.app.services.ffmpeg_service import FFmpegService
+from server.web.app.services.ffmpeg_service import FFmpegService, DEFAULT_CRF
 from server.web.app.services.video_s3_service import VideoS3Service
 from server.web.app.services.hls_service import HLSService
+from server.web.app.services.encoding_profile_service import EncodingProfileService, EncodingRung
+from server.web.app.services.content_dedup_service import ContentDedupService
 from server.web.app.models import Video, TranscodingJob
-from server.web.app.db import get_db_session
+from server.web.app.db import get_db_session, create_engine_for_url
 
 logger = logging.getLogger(__name__)
 
 class TranscodingWorker:
     """Background worker for processing transcoding jobs."""
     
+    LADDER_CACHE_SIZE = 64
+    
     def __init__(self, database_url: str, redis_url: str = "redis://localhost:6379",
                  s3_bucket: str = "meatlizard-video-storage", 
-                 temp_dir: str = "/tmp/transcoding"):
+                 temp_dir: str = "/tmp/transcoding", video_encoder: str = "libx264",
+                 chunked_min_duration: int = 600, chunk_seconds: int = 60,
+                 max_parallel_chunks: Optional[int] = None, direct_hls: bool = True,
+                 hls_single_file: bool = True, keep_progressive_mp4: bool = True,
+                 per_title_encoding: bool = True, probe_samples: int = 3,
+                 probe_sample_seconds: int = 4):
         self.database_url = database_url
         self.redis_url = redis_url
         self.s3_bucket = s3_bucket
         self.temp_dir = Path(temp_dir)
         self.temp_dir.mkdir(exist_ok=True)
+        self.chunked_min_duration = chunked_min_duration
+        self.chunk_seconds = chunk_seconds
+        self.max_parallel_chunks = max_parallel_chunks
+        self.direct_hls = direct_hls
+        self.hls_single_file = hls_single_file
+        self.keep_progressive_mp4 = keep_progressive_mp4
+        self.per_title_encoding = per_title_encoding
         
         self.transcoding_service: Optional[VideoTranscodingService] = None
-        self.ffmpeg_service = FFmpegService()
+        self.ffmpeg_service = FFmpegService(video_encoder=video_encoder)
+        self.encoding_profile_service = EncodingProfileService(
+            self.ffmpeg_service, probe_samples=probe_samples, probe_sample_seconds=probe_sample_seconds
+        )
+        # Per-title ladders of recently seen videos, so the source is probed
+        # once per video rather than once per rung
+        self._ladders: "OrderedDict[str, Dict[str, EncodingRung]]" = OrderedDict()
         self.s3_service: Optional[VideoS3Service] = None
         self.hls_service = HLSService(s3_bucket)
         self.running = False
         
         # Create async database engine
-        self.engine = create_async_engine(database_url)
+        self.engine = create_engine_for_url(database_url)
         self.async_session = sessionmaker(
             self.engine, class_=AsyncSession, expire_on_commit=False
         )
@@ -111,50 +134,102 @@ class TranscodingWorker:
             temp_input_path = self.temp_dir / f"{job_id}_input.mp4"
             await self.s3_service.download_file(video.original_s3_key, str(temp_input_path))
             
+            # An identical original may already have this rendition
+            rendition = await self._dedup_source(job_data, str(temp_input_path))
+            if rendition is not None:
+                await transcoding_service.complete_job(
+                    job_id, rendition.output_s3_key, rendition.hls_manifest_s3_key,
+                    rendition.output_file_size
+                )
+                return
+            
+            # Per-title settings for this rung, planned from the source we now have
+            ladder = await self._per_title_ladder(job_data, str(temp_input_path))
+            if ladder is not None:
+                rung = ladder.get(job_data["quality_preset"])
+                if rung is None:
+                    # Would add no visible quality over a lower rung
+                    await transcoding_service.discard_job(job_id, "rung dropped by the per-title ladder")
+                    return
+                job_data = {
+                    **job_data,
+                    "target_resolution": rung.resolution,
+                    "target_framerate": rung.framerate,
+                    "target_bitrate": rung.max_bitrate_kbps,
+                    "crf": rung.crf,
+                }
+            
             # Create temporary output paths
             temp_output_path = self.temp_dir / f"{job_id}_output.mp4"
             temp_hls_dir = self.temp_dir / f"{job_id}_hls"
             temp_hls_dir.mkdir(exist_ok=True)
             
-            # Transcode video
-            progress_reported = 0
-            async for progress in self.ffmpeg_service.transcode_video(
+            # Pick encoder speed from current queue pressure
+            queue_stats = await transcoding_service.get_queue_stats()
+            speed_preset = self.encoding_profile_service.select_speed_preset(
+                queue_stats["queued"] + queue_stats["retry_queue"]
+            )
+            
+            transcode_args = (
                 str(temp_input_path),
                 str(temp_output_path),
                 job_data["target_resolution"],
                 job_data["target_framerate"],
                 job_data["target_bitrate"]
-            ):
-                # Report progress every 10%
-                if progress >= progress_reported + 10:
-                    await transcoding_service.update_job_progress(job_id, progress // 2)  # First half is transcoding
-                    progress_reported = progress
-            
-            # Validate transcoded output
-            if not await self.ffmpeg_service.validate_output(str(temp_output_path)):
-                raise Exception("Transcoded video validation failed")
+            )
+            transcode_kwargs = {"preset": speed_preset, "crf": job_data.get("crf", DEFAULT_CRF)}
             
-            # Upload transcoded video to S3
-            await transcoding_service.update_job_progress(job_id, 60)
-            output_s3_key = f"transcoded/{video_id}/{job_data['quality_preset']}/video.mp4"
-            await self.s3_service.upload_file(str(temp_output_path), output_s3_key)
+            is_long_video = bool(video.duration_seconds and video.duration_seconds >= self.chunked_min_duration)
             
-            # Generate and upload HLS segments
-            await transcoding_service.update_job_progress(job_id, 70)
-            manifest_s3_key, segment_s3_keys = await self.hls_service.generate_hls_from_video(
-                str(temp_output_path),
-                video_id,
-                job_data['quality_preset']
-            )
+            if self.direct_hls and not is_long_video:
+                output_s3_key, manifest_s3_key, output_file_size = await self._encode_direct_hls(
+                    job_data, transcoding_service, temp_input_path, temp_output_path,
+                    temp_hls_dir, transcode_kwargs
+                )
+            else:
+                # Long videos are split at keyframes and encoded on all local cores
+                if is_long_video:
+                    transcode = self.ffmpeg_service.transcode_video_chunked(
+                        *transcode_args, **transcode_kwargs,
+                        chunk_seconds=self.chunk_seconds,
+                        max_parallel=self.max_parallel_chunks
+                    )
+                else:
+                    transcode = self.ffmpeg_service.transcode_video(*transcode_args, **transcode_kwargs)
+                
+                # Transcode video
+                progress_reported = 0
+                async for progress in transcode:
+                    # Report progress every 10%
+                    if progress >= progress_reported + 10:
+                        await transcoding_service.update_job_progress(job_id, progress // 2)  # First half is transcoding
+                        progress_reported = progress
+                
+                # Validate transcoded output
+                if not await self.ffmpeg_service.validate_output(str(temp_output_path)):
+                    raise Exception("Transcoded video validation failed")
+                
+                # Upload transcoded video to S3
+                await transcoding_service.update_job_progress(job_id, 60)
+                output_s3_key = f"transcoded/{video_id}/{job_data['quality_preset']}/video.mp4"
+                await self.s3_service.upload_file(str(temp_output_path), output_s3_key)
+                
+                # Generate and upload HLS segments
+                await transcoding_service.update_job_progress(job_id, 70)
+                manifest_s3_key, segment_s3_keys = await self.hls_service.generate_hls_from_video(
+                    str(temp_output_path),
+                    video_id,
+                    job_data['quality_preset']
+                )
+                
+                # Get output file size
+                output_file_size = await self.ffmpeg_service.get_file_size(str(temp_output_path))
             
             # Validate HLS segments
             await transcoding_service.update_job_progress(job_id, 90)
             if not await self.hls_service.validate_hls_segments(manifest_s3_key):
                 raise Exception("HLS segment validation failed")
             
-            # Get output file size
-            output_file_size = await self.ffmpeg_service.get_file_size(str(temp_output_path))
-            
             # Mark job as completed
             await transcoding_service.complete_job(
                 job_id, output_s3_key, manifest_s3_key, output_file_size
@@ -171,6 +246,114 @@ class TranscodingWorker:
             # Clean up temporary files
             await self._cleanup_temp_files(job_id)
     
+    async def _dedup_source(self, job_data: dict, input_path: str) -> Optional[TranscodingJob]:
+        """
+        Hash a source the upload left unhashed (``hash_source`` jobs) and
+        settle its content dedup. Returns a completed rendition of an
+        identical original for this job to reuse, if there is one.
+        
+        Dedup failures are logged and the job is encoded as usual.
+        """
+        if not job_data.get("hash_source"):
+            return None
+        
+        try:
+            async with self.async_session() as db:
+                dedup_service = ContentDedupService(db)
+                video = await db.get(Video, job_data["video_id"])
+                redundant_key = None
+                content_hash = video.content_hash
+                if content_hash is None:
+                    # First rung to get here; the others reuse its hash
+                    content_hash = await dedup_service.hash_file(input_path)
+                    redundant_key = await dedup_service.settle_hash(video, content_hash)
+                content = await dedup_service.find_by_hash(content_hash)
+                rendition = None
+                if content is not None:
+                    rendition = await dedup_service.completed_rendition(
+                        content, video, job_data["quality_preset"]
+                    )
+        except Exception as e:
+            logger.warning(f"Content dedup failed for video {job_data['video_id']}: {e}")
+            return None
+        
+        if redundant_key:
+            # The video now references the identical stored original
+            await self.s3_service.delete_video(redundant_key)
+        return rendition
+    
+    async def _per_title_ladder(self, job_data: dict,
+                                input_path: str) -> Optional[Dict[str, EncodingRung]]:
+        """
+        Per-title ladder, by quality preset, for a job queued with
+        ``ladder_presets``; None when per-title encoding does not apply.
+        """
+        ladder_presets = job_data.get("ladder_presets")
+        if not self.per_title_encoding or not ladder_presets:
+            return None
+        
+        video_id = job_data["video_id"]
+        ladder = self._ladders.get(video_id)
+        if ladder is None:
+            rungs = await self.encoding_profile_service.plan_ladder(input_path, ladder_presets)
+            ladder = {rung.quality_preset: rung for rung in rungs}
+            self._ladders[video_id] = ladder
+            while len(self._ladders) > self.LADDER_CACHE_SIZE:
+                self._ladders.popitem(last=False)
+        else:
+            self._ladders.move_to_end(video_id)
+        
+        return ladder
+    
+    async def _encode_direct_hls(self, job_data: dict, transcoding_service: VideoTranscodingService,
+                                 temp_input_path: Path, temp_output_path: Path,
+                                 temp_hls_dir: Path, transcode_kwargs: dict) -> Tuple[Optional[str], str, int]:
+        """
+        Encode a rendition straight to fMP4 HLS, optionally teeing a progressive MP4.
+        Every output byte is written and uploaded once.
+        Returns tuple of (output_s3_key, manifest_s3_key, output_file_size).
+        """
+        job_id = job_data["job_id"]
+        video_id = job_data["video_id"]
+        mp4_output_path = str(temp_output_path) if self.keep_progressive_mp4 else None
+        
+        progress_reported = 0
+        async for progress in self.ffmpeg_service.transcode_to_hls(
+            str(temp_input_path),
+            str(temp_hls_dir),
+            job_data["target_resolution"],
+            job_data["target_framerate"],
+            job_data["target_bitrate"],
+            single_file=self.hls_single_file,
+            mp4_output_path=mp4_output_path,
+            **transcode_kwargs
+        ):
+            # Report progress every 10%; encoding is most of the work here
+            if progress >= progress_reported + 10:
+                await transcoding_service.update_job_progress(job_id, int(progress * 0.8))
+                progress_reported = progress
+        
+        output_s3_key = None
+        if mp4_output_path:
+            if not await self.ffmpeg_service.validate_output(mp4_output_path):
+                raise Exception("Transcoded video validation failed")
+            output_s3_key = f"transcoded/{video_id}/{job_data['quality_preset']}/video.mp4"
+            await self.s3_service.upload_file(mp4_output_path, output_s3_key)
+        
+        await transcoding_service.update_job_progress(job_id, 85)
+        manifest_s3_key, _ = await self.hls_service.upload_hls_directory(
+            str(temp_hls_dir), video_id, job_data["quality_preset"]
+        )
+        
+        if mp4_output_path:
+            output_file_size = await self.ffmpeg_service.get_file_size(mp4_output_path)
+        else:
+            output_file_size = sum(
+                path.stat().st_size for path in temp_hls_dir.iterdir() if path.is_file()
+            )
+        
+        return output_s3_key, manifest_s3_key, output_file_size
+    
     async def _cleanup_temp_files(self, job_id: str):
         """Clean up temporary files for a job."""
         try:
@@ -228,6 +411,16 @@ async def main():
     redis_url = os.getenv("REDIS_URL", "redis://localhost:6379")
     s3_bucket = os.getenv("S3_BUCKET_NAME", "meatlizard-video-storage")
     temp_dir = os.getenv("TRANSCODING_TEMP_DIR", "/tmp/transcoding")
+    video_encoder = os.getenv("VIDEO_ENCODER", "libx264")
+    chunked_min_duration = int(os.getenv("CHUNKED_ENCODING_MIN_DURATION", "600"))
+    chunk_seconds = int(os.getenv("CHUNKED_ENCODING_CHUNK_SECONDS", "60"))
+    max_parallel_chunks = int(os.getenv("CHUNKED_ENCODING_MAX_PARALLEL", "0")) or None
+    direct_hls = os.getenv("HLS_DIRECT_ENCODE", "true").lower() == "true"
+    hls_single_file = os.getenv("HLS_SINGLE_FILE", "true").lower() == "true"
+    keep_progressive_mp4 = os.getenv("HLS_KEEP_PROGRESSIVE_MP4", "true").lower() == "true"
+    per_title_encoding = os.getenv("PER_TITLE_ENCODING_ENABLED", "true").lower() == "true"
+    probe_samples = int(os.getenv("ENCODING_PROBE_SAMPLES", "3"))
+    probe_sample_seconds = int(os.getenv("ENCODING_PROBE_SAMPLE_SECONDS", "4"))
     
     # Set up logging
     logging.basicConfig(
@@ -236,7 +429,12 @@ async def main():
     )
     
     # Create and start worker
-    worker = TranscodingWorker(database_url, redis_url, s3_bucket, temp_dir)
+    worker = TranscodingWorker(
+        database_url, redis_url, s3_bucket, temp_dir, video_encoder,
+        chunked_min_duration, chunk_seconds, max_parallel_chunks,
+        direct_hls, hls_single_file, keep_progressive_mp4,
+        per_title_encoding, probe_samples, probe_sample_seconds
+    )
     
     try:
         await worker.start()
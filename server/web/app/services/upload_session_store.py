@@ -0,0 +1,217 @@
+"""
+Upload Session Store
+
+Persists multipart upload session state in Redis so chunk requests for one
+upload can land on any web worker and an interrupted upload can be resumed.
+Per session it keeps the serialized session, the set of received chunk
+numbers, a per-part received-chunk counter, the uploaded S3 part ETags and the
+uploaded byte count. When Redis is unreachable the store degrades to
+process-local state so single-worker deployments keep working.
+"""
+import json
+import logging
+import time
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Any, Set
+
+import redis.asyncio as redis
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ChunkReceipt:
+    """Counters after a chunk has been recorded"""
+    part_chunks: int
+    chunks_received: int
+    uploaded_size: int
+
+
+class UploadSessionStore:
+    """Redis-backed store for resumable upload session state"""
+
+    KEY_PREFIX = "upload:session"
+    SESSION_TTL = 7 * 24 * 60 * 60  # matches the S3 multipart upload lifetime
+    RETRY_INTERVAL = 30  # seconds before retrying Redis after a failure
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self.redis_client = None
+        self._retry_at = 0.0
+
+        # Process-local fallback state
+        self._sessions: Dict[str, Dict[str, Any]] = {}
+        self._chunks: Dict[str, Set[int]] = {}
+        self._part_chunks: Dict[str, Dict[int, int]] = {}
+        self._parts: Dict[str, Dict[int, str]] = {}
+        self._bytes: Dict[str, int] = {}
+
+    def _key(self, session_id: str, suffix: str = "") -> str:
+        key = f"{self.KEY_PREFIX}:{session_id}"
+        return f"{key}:{suffix}" if suffix else key
+
+    def _all_keys(self, session_id: str) -> List[str]:
+        return [
+            self._key(session_id),
+            self._key(session_id, "chunks"),
+            self._key(session_id, "part_chunks"),
+            self._key(session_id, "parts"),
+            self._key(session_id, "bytes"),
+        ]
+
+    async def _get_redis_client(self) -> Optional[redis.Redis]:
+        """Get Redis client, or None while Redis is disabled or backing off."""
+        if not self.redis_url or time.monotonic() < self._retry_at:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _redis_failed(self, operation: str, error: Exception):
+        logger.warning(f"Upload session store {operation} failed, using local state: {error}")
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    async def save(self, session_id: str, data: Dict[str, Any]):
+        """Persist serialized session data"""
+        self._sessions[session_id] = data
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(self._key(session_id), json.dumps(data), ex=self.SESSION_TTL)
+        except Exception as e:
+            self._redis_failed("save", e)
+
+    async def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Load serialized session data"""
+        client = await self._get_redis_client()
+        if client is not None:
+            try:
+                raw = await client.get(self._key(session_id))
+                if raw is not None:
+                    return json.loads(raw)
+            except Exception as e:
+                self._redis_failed("load", e)
+
+        return self._sessions.get(session_id)
+
+    async def add_chunk(self, session_id: str, chunk_number: int, part_number: int,
+                        size: int) -> Optional[ChunkReceipt]:
+        """
+        Record a received chunk.
+
+        Returns the updated counters, or None if the chunk had already been
+        recorded (client retry), so callers can treat re-sent chunks as no-ops.
+        """
+        client = await self._get_redis_client()
+        if client is not None:
+            try:
+                added = await client.sadd(self._key(session_id, "chunks"), chunk_number)
+                if not added:
+                    return None
+
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.hincrby(self._key(session_id, "part_chunks"), str(part_number), 1)
+                    pipe.incrby(self._key(session_id, "bytes"), size)
+                    pipe.scard(self._key(session_id, "chunks"))
+                    for key in self._all_keys(session_id)[1:]:
+                        pipe.expire(key, self.SESSION_TTL)
+                    part_chunks, uploaded_size, chunks_received = (await pipe.execute())[:3]
+
+                return ChunkReceipt(int(part_chunks), int(chunks_received), int(uploaded_size))
+            except Exception as e:
+                self._redis_failed("add_chunk", e)
+
+        chunks = self._chunks.setdefault(session_id, set())
+        if chunk_number in chunks:
+            return None
+        chunks.add(chunk_number)
+
+        part_counts = self._part_chunks.setdefault(session_id, {})
+        part_counts[part_number] = part_counts.get(part_number, 0) + 1
+        self._bytes[session_id] = self._bytes.get(session_id, 0) + size
+
+        return ChunkReceipt(part_counts[part_number], len(chunks), self._bytes[session_id])
+
+    async def discard_chunk(self, session_id: str, chunk_number: int, part_number: int, size: int):
+        """Forget a recorded chunk so a client retry processes it again"""
+        client = await self._get_redis_client()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=True) as pipe:
+                    pipe.srem(self._key(session_id, "chunks"), chunk_number)
+                    pipe.hincrby(self._key(session_id, "part_chunks"), str(part_number), -1)
+                    pipe.incrby(self._key(session_id, "bytes"), -size)
+                    await pipe.execute()
+                return
+            except Exception as e:
+                self._redis_failed("discard_chunk", e)
+
+        chunks = self._chunks.get(session_id, set())
+        if chunk_number in chunks:
+            chunks.discard(chunk_number)
+            part_counts = self._part_chunks.setdefault(session_id, {})
+            part_counts[part_number] = part_counts.get(part_number, 1) - 1
+            self._bytes[session_id] = self._bytes.get(session_id, size) - size
+
+    async def record_part(self, session_id: str, part_number: int, etag: str):
+        """Record the ETag of an uploaded S3 part"""
+        self._parts.setdefault(session_id, {})[part_number] = etag
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.hset(self._key(session_id, "parts"), str(part_number), etag)
+            await client.expire(self._key(session_id, "parts"), self.SESSION_TTL)
+        except Exception as e:
+            self._redis_failed("record_part", e)
+
+    async def get_parts(self, session_id: str) -> List[Dict[str, Any]]:
+        """Uploaded parts in the shape S3 CompleteMultipartUpload expects"""
+        parts = dict(self._parts.get(session_id, {}))
+
+        client = await self._get_redis_client()
+        if client is not None:
+            try:
+                stored = await client.hgetall(self._key(session_id, "parts"))
+                parts.update({int(number): etag for number, etag in stored.items()})
+            except Exception as e:
+                self._redis_failed("get_parts", e)
+
+        return [{'ETag': parts[number], 'PartNumber': number} for number in sorted(parts)]
+
+    async def get_progress(self, session_id: str) -> Dict[str, int]:
+        """Received chunk count and uploaded bytes across all workers"""
+        client = await self._get_redis_client()
+        if client is not None:
+            try:
+                async with client.pipeline(transaction=False) as pipe:
+                    pipe.scard(self._key(session_id, "chunks"))
+                    pipe.get(self._key(session_id, "bytes"))
+                    chunks_received, uploaded_size = await pipe.execute()
+                return {
+                    'chunks_received': int(chunks_received or 0),
+                    'uploaded_size': int(uploaded_size or 0)
+                }
+            except Exception as e:
+                self._redis_failed("get_progress", e)
+
+        return {
+            'chunks_received': len(self._chunks.get(session_id, set())),
+            'uploaded_size': self._bytes.get(session_id, 0)
+        }
+
+    async def delete(self, session_id: str):
+        """Remove all state for a session"""
+        for state in (self._sessions, self._chunks, self._part_chunks, self._parts, self._bytes):
+            state.pop(session_id, None)
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.delete(*self._all_keys(session_id))
+        except Exception as e:
+            self._redis_failed("delete", e)
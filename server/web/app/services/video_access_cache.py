@@ -0,0 +1,222 @@
+"""
+Video Access Cache
+
+Caches what VideoAccessControlService needs to decide access so manifest and
+playback requests do not go to Postgres for every check:
+
+- a compact policy per video (status, visibility, creator, channel owner)
+- per (video, user) explicit grants, including negative results, with the
+  grant's own expiry so expired grants stop applying without invalidation
+
+Entries live in a small process-local LRU in front of Redis. Writers
+invalidate both levels; other workers pick up changes once their local entry
+expires (LOCAL_TTL). Without Redis the cache is process-local only.
+"""
+import json
+import logging
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+import redis.asyncio as redis
+
+from ..models import VideoStatus, VideoVisibility
+
+logger = logging.getLogger(__name__)
+
+# Marks a cached "no grant" result
+_NO_GRANT = "none"
+_NEVER_EXPIRES = "never"
+
+
+def _to_uuid(value: Optional[str]) -> Optional[uuid.UUID]:
+    return uuid.UUID(value) if value else None
+
+
+@dataclass
+class VideoAccessPolicy:
+    """Access-relevant fields of a video"""
+    id: uuid.UUID
+    status: VideoStatus
+    visibility: VideoVisibility
+    creator_id: uuid.UUID
+    channel_id: Optional[uuid.UUID] = None
+    channel_owner_id: Optional[uuid.UUID] = None
+
+    @classmethod
+    def from_video(cls, video) -> "VideoAccessPolicy":
+        channel = getattr(video, "channel", None)
+        return cls(
+            id=video.id,
+            status=VideoStatus(video.status),
+            visibility=VideoVisibility(video.visibility),
+            creator_id=video.creator_id,
+            channel_id=video.channel_id,
+            channel_owner_id=channel.creator_id if channel is not None else None
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "id": str(self.id),
+            "status": self.status.value,
+            "visibility": self.visibility.value,
+            "creator_id": str(self.creator_id),
+            "channel_id": str(self.channel_id) if self.channel_id else None,
+            "channel_owner_id": str(self.channel_owner_id) if self.channel_owner_id else None,
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "VideoAccessPolicy":
+        return cls(
+            id=uuid.UUID(data["id"]),
+            status=VideoStatus(data["status"]),
+            visibility=VideoVisibility(data["visibility"]),
+            creator_id=uuid.UUID(data["creator_id"]),
+            channel_id=_to_uuid(data.get("channel_id")),
+            channel_owner_id=_to_uuid(data.get("channel_owner_id")),
+        )
+
+
+class VideoAccessCache:
+    """Two-level (process-local + Redis) cache of access policies and grants"""
+
+    KEY_PREFIX = "video:access"
+    POLICY_TTL = 300  # seconds in Redis
+    GRANT_TTL = 300
+    LOCAL_TTL = 10  # seconds a worker may serve an entry another worker invalidated
+    LOCAL_MAX_ENTRIES = 10000
+    RETRY_INTERVAL = 30  # seconds before retrying Redis after a failure
+
+    def __init__(self, redis_url: Optional[str] = None):
+        self.redis_url = redis_url
+        self.redis_client = None
+        self._retry_at = 0.0
+        self._local: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+
+    def _policy_key(self, video_id) -> str:
+        return f"{self.KEY_PREFIX}:policy:{video_id}"
+
+    def _grant_key(self, video_id, user_id) -> str:
+        return f"{self.KEY_PREFIX}:grant:{video_id}:{user_id}"
+
+    async def _get_redis_client(self) -> Optional[redis.Redis]:
+        """Get Redis client, or None while Redis is disabled or backing off."""
+        if not self.redis_url or time.monotonic() < self._retry_at:
+            return None
+        if self.redis_client is None:
+            self.redis_client = redis.from_url(self.redis_url, decode_responses=True)
+        return self.redis_client
+
+    def _redis_failed(self, operation: str, error: Exception):
+        logger.warning(f"Video access cache {operation} failed, using local cache: {error}")
+        self._retry_at = time.monotonic() + self.RETRY_INTERVAL
+
+    def _local_get(self, key: str) -> Optional[str]:
+        entry = self._local.get(key)
+        if entry is None:
+            return None
+        expires, value = entry
+        if expires < time.monotonic():
+            del self._local[key]
+            return None
+        self._local.move_to_end(key)
+        return value
+
+    def _local_set(self, key: str, value: str):
+        self._local[key] = (time.monotonic() + self.LOCAL_TTL, value)
+        self._local.move_to_end(key)
+        while len(self._local) > self.LOCAL_MAX_ENTRIES:
+            self._local.popitem(last=False)
+
+    async def _get(self, key: str) -> Optional[str]:
+        value = self._local_get(key)
+        if value is not None:
+            return value
+
+        client = await self._get_redis_client()
+        if client is None:
+            return None
+        try:
+            value = await client.get(key)
+        except Exception as e:
+            self._redis_failed("get", e)
+            return None
+        if value is not None:
+            self._local_set(key, value)
+        return value
+
+    async def _set(self, key: str, value: str, ttl: int):
+        self._local_set(key, value)
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.set(key, value, ex=ttl)
+        except Exception as e:
+            self._redis_failed("set", e)
+
+    async def _delete(self, *keys: str):
+        for key in keys:
+            self._local.pop(key, None)
+
+        client = await self._get_redis_client()
+        if client is None:
+            return
+        try:
+            await client.delete(*keys)
+        except Exception as e:
+            self._redis_failed("delete", e)
+
+    async def get_policy(self, video_id) -> Optional[VideoAccessPolicy]:
+        raw = await self._get(self._policy_key(video_id))
+        return VideoAccessPolicy.from_dict(json.loads(raw)) if raw else None
+
+    async def set_policy(self, policy: VideoAccessPolicy):
+        await self._set(self._policy_key(policy.id), json.dumps(policy.to_dict()), self.POLICY_TTL)
+
+    async def get_grant(self, video_id, user_id) -> Optional[bool]:
+        """Cached explicit view grant: True/False, or None when not cached"""
+        raw = await self._get(self._grant_key(video_id, user_id))
+        if raw is None:
+            return None
+        if raw == _NO_GRANT:
+            return False
+        if raw == _NEVER_EXPIRES:
+            return True
+        return datetime.fromisoformat(raw) > datetime.utcnow()
+
+    async def set_grant(self, video_id, user_id, granted: bool, expires_at: Optional[datetime] = None):
+        if not granted:
+            value = _NO_GRANT
+        else:
+            value = expires_at.isoformat() if expires_at else _NEVER_EXPIRES
+        await self._set(self._grant_key(video_id, user_id), value, self.GRANT_TTL)
+
+    async def invalidate_policy(self, video_ids: Iterable):
+        keys = [self._policy_key(video_id) for video_id in video_ids]
+        if keys:
+            await self._delete(*keys)
+
+    async def invalidate_grant(self, video_id, user_id):
+        await self._delete(self._grant_key(video_id, user_id))
+
+
+_video_access_cache: Optional[VideoAccessCache] = None
+
+
+def get_video_access_cache() -> VideoAccessCache:
+    """Shared cache instance for this process"""
+    global _video_access_cache
+    if _video_access_cache is None:
+        from ..config import get_settings
+        _video_access_cache = VideoAccessCache(get_settings().REDIS_URL)
+    return _video_access_cache
+
+
+async def invalidate_video_access(video_ids: Iterable):
+    """Drop cached access policies after a video's status or visibility changed"""
+    await get_video_access_cache().invalidate_policy(video_ids)
@@ -2,21 +2,100 @@
 Video Access Control Service
 
 Handles video visibility, permissions, and authorization for the video platform.
+Access decisions read cached per-video policies and per-user grants (see
+video_access_cache), and access attempts are logged through a sampled,
+batched sink off the request path.
 """
+import asyncio
+import logging
+import random
 import uuid
+from collections import deque
 from typing import Optional, List, Dict, Any
 from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, and_, or_
 from sqlalchemy.orm import selectinload
 
-from ..models import Video, VideoVisibility, User, Channel, VideoPlaylist, VideoPermission
+from ..models import Video, VideoStatus, VideoVisibility, User, Channel, VideoPlaylist, VideoPermission
 from .base_service import BaseService
+from .video_access_cache import VideoAccessCache, VideoAccessPolicy, get_video_access_cache
+
+logger = logging.getLogger(__name__)
+
+
+class AccessLogSink:
+    """
+    Buffers access-attempt events and writes them in batches from a
+    background task. When writes fall behind, the oldest events are dropped.
+    """
+    
+    FLUSH_INTERVAL = 2.0  # seconds
+    BATCH_SIZE = 500
+    MAX_PENDING = 10000
+    
+    def __init__(self, session_factory):
+        self.session_factory = session_factory
+        self._pending = deque(maxlen=self.MAX_PENDING)
+        self._task: Optional[asyncio.Task] = None
+    
+    def record(self, event: Dict[str, Any]) -> None:
+        self._pending.append(event)
+        if self._task is None or self._task.done():
+            self._task = asyncio.get_running_loop().create_task(self._run())
+    
+    async def _run(self) -> None:
+        while self._pending:
+            await asyncio.sleep(self.FLUSH_INTERVAL)
+            await self.flush()
+    
+    async def flush(self) -> None:
+        """Write out everything buffered so far"""
+        from ..models import AnalyticsEvent
+        
+        while self._pending:
+            batch = [self._pending.popleft() for _ in range(min(self.BATCH_SIZE, len(self._pending)))]
+            try:
+                async with self.session_factory() as db:
+                    db.add_all([AnalyticsEvent(**event) for event in batch])
+                    await db.commit()
+            except Exception as e:
+                logger.warning(f"Dropped {len(batch)} video access log events: {e}")
+    
+    async def close(self) -> None:
+        """Stop the background writer and write out what is still buffered"""
+        if self._task is not None and not self._task.done():
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        self._task = None
+        await self.flush()
+
+
+_access_log_sink: Optional[AccessLogSink] = None
+
+
+async def close_access_log_sink() -> None:
+    """Flush buffered access log events, e.g. on shutdown"""
+    global _access_log_sink
+    if _access_log_sink is not None:
+        await _access_log_sink.close()
+        _access_log_sink = None
 
 
 class VideoAccessControlService(BaseService):
     """Service for managing video access control and permissions"""
     
+    def __init__(self, access_cache: Optional[VideoAccessCache] = None,
+                 log_sample_rate: Optional[float] = None):
+        self.access_cache = access_cache or get_video_access_cache()
+        if log_sample_rate is None:
+            from ..config import get_settings
+            log_sample_rate = get_settings().VIDEO_ACCESS_LOG_SAMPLE_RATE
+        self.log_sample_rate = log_sample_rate
+    
     async def check_video_access(
         self, 
         video_id: uuid.UUID, 
@@ -34,10 +113,42 @@ class VideoAccessControlService(BaseService):
         Returns:
             Dict with access status and details
         """
+        policy = await self._get_access_policy(video_id)
+        
+        if not policy:
+            return {
+                "has_access": False,
+                "reason": "video_not_found",
+                "message": "Video not found"
+            }
+        
+        # Check if video is ready for viewing
+        if policy.status != "ready":
+            # Only creator can view non-ready videos
+            if user_id != policy.creator_id:
+                return {
+                    "has_access": False,
+                    "reason": "video_not_ready",
+                    "message": "Video is still processing"
+                }
+        
+        # Check visibility-based access
+        access_result = await self._check_visibility_access(policy, user_id)
+        
+        # Log access attempt
+        await self._log_access_attempt(video_id, user_id, ip_address, access_result["has_access"])
+        
+        return access_result
+    
+    async def _get_access_policy(self, video_id: uuid.UUID) -> Optional[VideoAccessPolicy]:
+        """Access policy for a video, from cache when possible"""
+        policy = await self.access_cache.get_policy(video_id)
+        if policy:
+            return policy
+        
         async with self.get_db_session() as db:
-            # Get video with creator and channel info
+            # Get video with channel info
             stmt = select(Video).options(
-                selectinload(Video.creator),
                 selectinload(Video.channel)
             ).where(Video.id == video_id)
             
@@ -45,33 +156,20 @@ class VideoAccessControlService(BaseService):
             video = result.scalar_one_or_none()
             
             if not video:
-                return {
-                    "has_access": False,
-                    "reason": "video_not_found",
-                    "message": "Video not found"
-                }
-            
-            # Check if video is ready for viewing
-            if video.status != "ready":
-                # Only creator can view non-ready videos
-                if user_id != video.creator_id:
-                    return {
-                        "has_access": False,
-                        "reason": "video_not_ready",
-                        "message": "Video is still processing"
-                    }
-            
-            # Check visibility-based access
-            access_result = await self._check_visibility_access(video, user_id)
+                return None
             
-            # Log access attempt
-            await self._log_access_attempt(video_id, user_id, ip_address, access_result["has_access"])
-            
-            return access_result
+            policy = VideoAccessPolicy.from_video(video)
+        
+        # Only ready videos are cached; status changes during processing
+        # are not invalidated
+        if policy.status == VideoStatus.ready:
+            await self.access_cache.set_policy(policy)
+        
+        return policy
     
     async def _check_visibility_access(
         self, 
-        video: Video, 
+        video: VideoAccessPolicy, 
         user_id: Optional[uuid.UUID]
     ) -> Dict[str, Any]:
         """Check access based on video visibility settings"""
@@ -117,7 +215,9 @@ class VideoAccessControlService(BaseService):
             
             # Check channel-level permissions if video is in a channel
             if video.channel_id:
-                has_channel_access = await self._check_channel_access(video.channel_id, user_id)
+                has_channel_access = await self._check_channel_access(
+                    video.channel_id, user_id, getattr(video, "channel_owner_id", None)
+                )
                 if has_channel_access:
                     return {
                         "has_access": True,
@@ -143,31 +243,43 @@ class VideoAccessControlService(BaseService):
         user_id: uuid.UUID
     ) -> bool:
         """Check if user has explicit permission to view video"""
+        cached = await self.access_cache.get_grant(video_id, user_id)
+        if cached is not None:
+            return cached
+        
         async with self.get_db_session() as db:
-            # Check video permissions table (to be created)
-            stmt = select(VideoPermission).where(
+            # Latest-expiring view grant, expired ones included so the cached
+            # entry records when access ends
+            stmt = select(VideoPermission.expires_at).where(
                 and_(
                     VideoPermission.video_id == video_id,
                     VideoPermission.user_id == user_id,
-                    VideoPermission.permission_type == "view",
-                    or_(
-                        VideoPermission.expires_at.is_(None),
-                        VideoPermission.expires_at > datetime.utcnow()
-                    )
+                    VideoPermission.permission_type == "view"
                 )
             )
             
             result = await db.execute(stmt)
-            permission = result.scalar_one_or_none()
-            
-            return permission is not None
+            expiries = result.scalars().all()
+        
+        if not expiries:
+            await self.access_cache.set_grant(video_id, user_id, False)
+            return False
+        
+        expires_at = None if any(e is None for e in expiries) else max(expiries)
+        await self.access_cache.set_grant(video_id, user_id, True, expires_at)
+        return expires_at is None or expires_at > datetime.utcnow()
     
     async def _check_channel_access(
         self, 
         channel_id: uuid.UUID, 
-        user_id: uuid.UUID
+        user_id: uuid.UUID,
+        channel_owner_id: Optional[uuid.UUID] = None
     ) -> bool:
         """Check if user has access to channel content"""
+        if channel_owner_id is not None:
+            # Owner already known from the cached policy
+            return channel_owner_id == user_id
+        
         async with self.get_db_session() as db:
             # Get channel info
             stmt = select(Channel).where(Channel.id == channel_id)
@@ -228,6 +340,8 @@ class VideoAccessControlService(BaseService):
             db.add(permission)
             await db.commit()
             
+            await self.access_cache.invalidate_grant(video_id, user_id)
+            
             return {
                 "success": True,
                 "message": "Permission granted successfully",
@@ -269,6 +383,8 @@ class VideoAccessControlService(BaseService):
                 await db.delete(permission)
                 await db.commit()
                 
+                await self.access_cache.invalidate_grant(video_id, user_id)
+                
                 return {
                     "success": True,
                     "message": "Permission revoked successfully"
@@ -313,6 +429,8 @@ class VideoAccessControlService(BaseService):
             
             await db.commit()
             
+            await self.access_cache.invalidate_policy([video_id])
+            
             # Log visibility change
             await self._log_visibility_change(video_id, old_visibility, new_visibility, updated_by)
             
@@ -377,25 +495,31 @@ class VideoAccessControlService(BaseService):
         ip_address: Optional[str],
         access_granted: bool
     ) -> None:
-        """Log video access attempt for security and analytics"""
-        # This would typically go to a separate access log table
-        # For now, we'll use the existing analytics events table
-        async with self.get_db_session() as db:
-            from ..models import AnalyticsEvent
-            
-            event = AnalyticsEvent(
-                event_type="video_access_attempt",
-                user_id=user_id,
-                content_id=video_id,
-                timestamp=datetime.utcnow(),
-                data={
-                    "access_granted": access_granted,
-                    "ip_address_hash": self._hash_ip_address(ip_address) if ip_address else None
-                }
-            )
-            
-            db.add(event)
-            await db.commit()
+        """
+        Log video access attempt for security and analytics.
+        
+        Denials are always logged; granted attempts are sampled at
+        log_sample_rate and carry the rate so counts can be scaled back up.
+        Events are queued for a background writer rather than written here.
+        """
+        if access_granted and random.random() >= self.log_sample_rate:
+            return
+        
+        global _access_log_sink
+        if _access_log_sink is None:
+            _access_log_sink = AccessLogSink(self.get_db_session)
+        
+        _access_log_sink.record({
+            "event_type": "video_access_attempt",
+            "user_id": user_id,
+            "content_id": video_id,
+            "timestamp": datetime.utcnow(),
+            "data": {
+                "access_granted": access_granted,
+                "ip_address_hash": self._hash_ip_address(ip_address) if ip_address else None,
+                "sample_rate": 1.0 if not access_granted else self.log_sample_rate
+            }
+        })
     
     async def _log_visibility_change(
         self,
@@ -243,7 +243,7 @@ class VideoAnalyticsService(BaseService):
         timeframe: str = "30d"
     ) -> Dict[str, Any]:
         """Get comprehensive analytics for a content creator"""
-        async with self.get_db_session() as db:
+        async with self.get_read_session(creator_id) as db:
             # Calculate timeframe
             end_date = datetime.utcnow()
             if timeframe == "7d":
@@ -17,6 +17,8 @@ from sqlalchemy import select, func, and_, or_
 from server.web.app.models import Video, User, ViewSession, VideoLike, VideoComment
 from server.web.app.services.redis_client import RedisClient, CacheKeyBuilder, get_redis_client
 from server.web.app.services.base_service import BaseService
+from server.web.app.services.tag_index_service import TagIndexService
+from server.web.app.services.pagination import KeysetPaginator
 
 logger = logging.getLogger(__name__)
 
@@ -260,21 +262,24 @@ class VideoCacheService(BaseService):
         self, 
         user_id: str, 
         page: int = 0, 
-        limit: int = 50
+        limit: int = 50,
+        cursor: Optional[str] = None
     ) -> Optional[List[Dict[str, Any]]]:
         """
-        Get cached user video list
+        Get cached user video list, newest first
         
         Args:
             user_id: User ID
-            page: Page number
+            page: Page number, used only when no cursor is given
             limit: Items per page
+            cursor: 'cursor' of the last video on the previous page
             
         Returns:
-            List of video metadata dictionaries
+            List of video metadata dictionaries, each with the cursor that
+            continues after it
         """
         redis = await self._get_redis()
-        cache_key = CacheKeyBuilder.video_list(user_id, page)
+        cache_key = CacheKeyBuilder.video_list(user_id, cursor or page)
         
         try:
             # Try cache first
@@ -286,18 +291,20 @@ class VideoCacheService(BaseService):
             await self._record_miss()
             
             # Fetch from database
-            offset = page * limit
-            stmt = (
+            paginator = KeysetPaginator(
+                "newest", Video.created_at, Video.id, key=lambda row: (row[0].created_at, row[0].id)
+            )
+            stmt = paginator.apply(
                 select(Video, User)
                 .join(User, Video.creator_id == User.id)
-                .where(Video.creator_id == user_id)
-                .order_by(Video.created_at.desc())
-                .limit(limit)
-                .offset(offset)
+                .where(Video.creator_id == user_id),
+                cursor, limit
             )
+            if not cursor:
+                stmt = stmt.offset(page * limit)
             
             result = await self.db.execute(stmt)
-            rows = result.all()
+            rows = result.all()[:limit]
             
             # Build video list
             video_list = []
@@ -312,7 +319,8 @@ class VideoCacheService(BaseService):
                     'duration_seconds': video.duration_seconds,
                     'thumbnail_s3_key': video.thumbnail_s3_key,
                     'created_at': video.created_at.isoformat(),
-                    'creator_name': creator.display_label
+                    'creator_name': creator.display_label,
+                    'cursor': paginator.cursor_for((video, creator))
                 }
                 video_list.append(video_data)
             
@@ -353,25 +361,12 @@ class VideoCacheService(BaseService):
             
             await self._record_miss()
             
-            # Calculate popular tags from database
-            # This is a simplified implementation - in production you might
-            # want to use a more efficient approach with pre-computed tag counts
-            
-            stmt = select(Video.tags).where(Video.tags.isnot(None))
-            result = await self.db.execute(stmt)
-            
-            tag_counts = {}
-            for (tags,) in result:
-                if tags:
-                    for tag in tags:
-                        tag_counts[tag] = tag_counts.get(tag, 0) + 1
-            
-            # Sort by usage count
-            sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+            # Read the top tags from the maintained tag index
+            top_tags = await TagIndexService(self.db).get_popular_tags(limit)
             
             popular_tags = [
                 {'tag': tag, 'usage_count': count}
-                for tag, count in sorted_tags
+                for tag, count in top_tags
             ]
             
             # Cache the results
@@ -2,15 +2,18 @@
 Video comments service.
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_, or_, desc, asc
-from sqlalchemy.orm import selectinload
+from sqlalchemy import select, update, func, case, and_, or_, desc, asc
+from sqlalchemy.orm import selectinload, joinedload
 from typing import Dict, Any, Optional, List
 import uuid
 from datetime import datetime
 import re
 
+from shared_lib.moderation import get_moderation_engine
 from ..models import Video, VideoComment, User
 from .base_service import BaseService
+from .pagination import KeysetPaginator, count_rows, default_count_mode
+from .engagement_counters import adjust_reply_count
 
 class VideoCommentsService(BaseService):
     """Service for managing video comments."""
@@ -73,6 +76,8 @@ class VideoCommentsService(BaseService):
         )
         
         self.db.add(comment)
+        if parent_comment_id:
+            await adjust_reply_count(self.db, parent_comment_id, 1)
         await self.db.commit()
         await self.db.refresh(comment)
         
@@ -100,9 +105,16 @@ class VideoCommentsService(BaseService):
         video_id: uuid.UUID, 
         page: int = 1, 
         limit: int = 20,
-        sort_by: str = "newest"
+        sort_by: str = "newest",
+        cursor: Optional[str] = None,
+        count_mode: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
-        """Get comments for a video with pagination."""
+        """
+        Get comments for a video with pagination.
+
+        Pass the previous response's next_cursor to continue; page is only
+        used when no cursor is given.
+        """
         # Check if video exists
         video_result = await self.db.execute(
             select(Video).where(Video.id == video_id)
@@ -122,39 +134,30 @@ class VideoCommentsService(BaseService):
                 VideoComment.parent_comment_id.is_(None),
                 VideoComment.is_deleted == False
             )
-        ).options(selectinload(VideoComment.user))
+        )
         
-        # Apply sorting
-        if sort_by == "newest":
-            query = query.order_by(desc(VideoComment.created_at))
-        elif sort_by == "oldest":
-            query = query.order_by(asc(VideoComment.created_at))
-        elif sort_by == "top":
-            # For now, sort by creation time. In future, could sort by likes/engagement
-            query = query.order_by(desc(VideoComment.created_at))
+        # Get total count for pagination
+        total_count, is_estimate = await count_rows(
+            self.db, query, count_mode or default_count_mode(cursor)
+        )
         
-        # Apply pagination
-        query = query.offset(offset).limit(limit)
+        # Apply sorting; "top" sorts by creation time until comments have a score
+        paginator = KeysetPaginator(
+            sort_by, VideoComment.created_at, VideoComment.id, descending=sort_by != "oldest"
+        )
+        # Authors are joined in and reply counts are stored on the row, so a
+        # page costs one query whatever its size
+        query = paginator.apply(query.options(joinedload(VideoComment.user)), cursor, limit)
+        if not cursor:
+            query = query.offset(offset)
         
         # Execute query
         result = await self.db.execute(query)
-        comments = result.scalars().all()
-        
-        # Get total count for pagination
-        count_query = select(func.count(VideoComment.id)).where(
-            and_(
-                VideoComment.video_id == video_id,
-                VideoComment.parent_comment_id.is_(None),
-                VideoComment.is_deleted == False
-            )
-        )
-        count_result = await self.db.execute(count_query)
-        total_count = count_result.scalar() or 0
+        comment_page = paginator.page(result.scalars().all(), limit)
         
         # Format comments with reply counts
         formatted_comments = []
-        for comment in comments:
-            reply_count = await self._get_reply_count(comment.id)
+        for comment in comment_page.items:
             formatted_comments.append({
                 "id": str(comment.id),
                 "video_id": str(comment.video_id),
@@ -165,7 +168,7 @@ class VideoCommentsService(BaseService):
                 "is_deleted": comment.is_deleted,
                 "created_at": comment.created_at.isoformat(),
                 "updated_at": comment.updated_at.isoformat(),
-                "reply_count": reply_count
+                "reply_count": comment.reply_count
             })
         
         return {
@@ -174,7 +177,9 @@ class VideoCommentsService(BaseService):
                 "page": page,
                 "limit": limit,
                 "total": total_count,
-                "pages": (total_count + limit - 1) // limit
+                "total_is_estimate": is_estimate,
+                "pages": (total_count + limit - 1) // limit if total_count is not None else None,
+                "next_cursor": comment_page.next_cursor
             }
         }
     
@@ -210,20 +215,13 @@ class VideoCommentsService(BaseService):
                 VideoComment.parent_comment_id == comment_id,
                 VideoComment.is_deleted == False
             )
-        ).options(selectinload(VideoComment.user)).order_by(asc(VideoComment.created_at)).offset(offset).limit(limit)
+        ).options(joinedload(VideoComment.user)).order_by(asc(VideoComment.created_at)).offset(offset).limit(limit)
         
         result = await self.db.execute(query)
         replies = result.scalars().all()
         
-        # Get total count
-        count_query = select(func.count(VideoComment.id)).where(
-            and_(
-                VideoComment.parent_comment_id == comment_id,
-                VideoComment.is_deleted == False
-            )
-        )
-        count_result = await self.db.execute(count_query)
-        total_count = count_result.scalar() or 0
+        # Total comes from the parent's stored counter
+        total_count = parent_comment.reply_count or 0
         
         # Format replies
         formatted_replies = []
@@ -299,8 +297,6 @@ class VideoCommentsService(BaseService):
         await self.db.commit()
         await self.db.refresh(comment)
         
-        reply_count = await self._get_reply_count(comment.id)
-        
         return {
             "id": str(comment.id),
             "video_id": str(comment.video_id),
@@ -311,7 +307,7 @@ class VideoCommentsService(BaseService):
             "is_deleted": comment.is_deleted,
             "created_at": comment.created_at.isoformat(),
             "updated_at": comment.updated_at.isoformat(),
-            "reply_count": reply_count
+            "reply_count": comment.reply_count
         }
     
     async def delete_comment(
@@ -340,9 +336,15 @@ class VideoCommentsService(BaseService):
         if comment.user_id != user_id:
             return {"error": "unauthorized"}
         
-        # Soft delete the comment
-        comment.is_deleted = True
-        comment.updated_at = datetime.utcnow()
+        # Soft delete the comment; the guard keeps a concurrent delete from
+        # decrementing the parent's reply count twice
+        result = await self.db.execute(
+            update(VideoComment)
+            .where(and_(VideoComment.id == comment.id, VideoComment.is_deleted == False))
+            .values(is_deleted=True, updated_at=datetime.utcnow())
+        )
+        if result.rowcount == 1 and comment.parent_comment_id:
+            await adjust_reply_count(self.db, comment.parent_comment_id, -1)
         
         await self.db.commit()
         
@@ -363,28 +365,21 @@ class VideoCommentsService(BaseService):
         if not video:
             return None
         
-        # Get total comment count (including replies)
-        total_count_result = await self.db.execute(
-            select(func.count(VideoComment.id)).where(
-                and_(
-                    VideoComment.video_id == video_id,
-                    VideoComment.is_deleted == False
-                )
-            )
-        )
-        total_count = total_count_result.scalar() or 0
-        
-        # Get top-level comment count
-        top_level_count_result = await self.db.execute(
-            select(func.count(VideoComment.id)).where(
+        # Get total and top-level comment counts in one pass
+        counts_result = await self.db.execute(
+            select(
+                func.count(VideoComment.id),
+                func.sum(case((VideoComment.parent_comment_id.is_(None), 1), else_=0))
+            ).where(
                 and_(
                     VideoComment.video_id == video_id,
-                    VideoComment.parent_comment_id.is_(None),
                     VideoComment.is_deleted == False
                 )
             )
         )
-        top_level_count = top_level_count_result.scalar() or 0
+        total_count, top_level_count = counts_result.one()
+        total_count = total_count or 0
+        top_level_count = int(top_level_count or 0)
         
         return {
             "video_id": str(video_id),
@@ -393,18 +388,6 @@ class VideoCommentsService(BaseService):
             "replies": total_count - top_level_count
         }
     
-    async def _get_reply_count(self, comment_id: uuid.UUID) -> int:
-        """Get the number of replies to a comment."""
-        count_result = await self.db.execute(
-            select(func.count(VideoComment.id)).where(
-                and_(
-                    VideoComment.parent_comment_id == comment_id,
-                    VideoComment.is_deleted == False
-                )
-            )
-        )
-        return count_result.scalar() or 0
-    
     def _clean_content(self, content: str) -> str:
         """Clean and validate comment content."""
         if not content or not content.strip():
@@ -440,12 +423,9 @@ class VideoCommentsService(BaseService):
         if len(content) > 10 and sum(1 for c in content if c.isupper()) / len(content) > 0.7:
             return {"allowed": False, "reason": "Excessive capitalization"}
         
-        # Basic profanity filter (you would expand this list)
-        profanity_words = ["spam", "scam"]  # Minimal list for demo
-        content_lower = content.lower()
-        for word in profanity_words:
-            if word in content_lower:
-                return {"allowed": False, "reason": "Inappropriate content detected"}
+        # Blocked terms from the shared "comment" moderation rule set
+        if not get_moderation_engine().scan(content, "comment").clean:
+            return {"allowed": False, "reason": "Inappropriate content detected"}
         
         # Rate limiting could be implemented here
         # Check if user has posted too many comments recently
@@ -2,13 +2,14 @@
 Video likes/dislikes service.
 """
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func, and_
+from sqlalchemy import select, update, delete, and_
 from typing import Dict, Any, Optional
 import uuid
 from datetime import datetime
 
 from ..models import Video, VideoLike, User
 from .base_service import BaseService
+from .engagement_counters import adjust_like_counts
 
 class VideoLikesService(BaseService):
     """Service for managing video likes and dislikes."""
@@ -41,12 +42,13 @@ class VideoLikesService(BaseService):
         if existing_like:
             if existing_like.is_like:
                 # User already liked, remove the like
-                await self.db.delete(existing_like)
+                removed = await self._delete_vote(existing_like.id)
+                deltas = (-1, 0) if removed else (0, 0)
                 action = "removed_like"
             else:
                 # User disliked, change to like
-                existing_like.is_like = True
-                existing_like.created_at = datetime.utcnow()
+                changed = await self._change_vote(existing_like.id, is_like=True)
+                deltas = (1, -1) if changed else (0, 0)
                 action = "changed_to_like"
         else:
             # No existing like/dislike, create new like
@@ -56,13 +58,13 @@ class VideoLikesService(BaseService):
                 is_like=True
             )
             self.db.add(new_like)
+            deltas = (1, 0)
             action = "liked"
         
+        # Update the counters in the same transaction as the vote
+        counts = await self._apply_deltas(video_id, *deltas)
         await self.db.commit()
         
-        # Get updated counts
-        counts = await self._get_like_counts(video_id)
-        
         return {
             "action": action,
             "like_count": counts["like_count"],
@@ -95,12 +97,13 @@ class VideoLikesService(BaseService):
         if existing_like:
             if not existing_like.is_like:
                 # User already disliked, remove the dislike
-                await self.db.delete(existing_like)
+                removed = await self._delete_vote(existing_like.id)
+                deltas = (0, -1) if removed else (0, 0)
                 action = "removed_dislike"
             else:
                 # User liked, change to dislike
-                existing_like.is_like = False
-                existing_like.created_at = datetime.utcnow()
+                changed = await self._change_vote(existing_like.id, is_like=False)
+                deltas = (-1, 1) if changed else (0, 0)
                 action = "changed_to_dislike"
         else:
             # No existing like/dislike, create new dislike
@@ -110,13 +113,13 @@ class VideoLikesService(BaseService):
                 is_like=False
             )
             self.db.add(new_dislike)
+            deltas = (0, 1)
             action = "disliked"
         
+        # Update the counters in the same transaction as the vote
+        counts = await self._apply_deltas(video_id, *deltas)
         await self.db.commit()
         
-        # Get updated counts
-        counts = await self._get_like_counts(video_id)
-        
         return {
             "action": action,
             "like_count": counts["like_count"],
@@ -144,15 +147,15 @@ class VideoLikesService(BaseService):
         existing_like = existing_result.scalar_one_or_none()
         
         if existing_like:
-            await self.db.delete(existing_like)
+            removed = await self._delete_vote(existing_like.id)
+            deltas = ((-1, 0) if existing_like.is_like else (0, -1)) if removed else (0, 0)
+            counts = await self._apply_deltas(video_id, *deltas)
             await self.db.commit()
             action = "removed"
         else:
+            counts = self._counts(video)
             action = "no_change"
         
-        # Get updated counts
-        counts = await self._get_like_counts(video_id)
-        
         return {
             "action": action,
             "like_count": counts["like_count"],
@@ -171,7 +174,7 @@ class VideoLikesService(BaseService):
         if not video:
             return None
         
-        counts = await self._get_like_counts(video_id)
+        counts = self._counts(video)
         
         return {
             "video_id": str(video_id),
@@ -198,25 +201,30 @@ class VideoLikesService(BaseService):
             "user_status": status
         }
     
-    async def _get_like_counts(self, video_id: uuid.UUID) -> Dict[str, int]:
-        """Get like and dislike counts for a video."""
-        # Get like count
-        like_result = await self.db.execute(
-            select(func.count(VideoLike.id)).where(
-                and_(VideoLike.video_id == video_id, VideoLike.is_like == True)
-            )
-        )
-        like_count = like_result.scalar() or 0
-        
-        # Get dislike count
-        dislike_result = await self.db.execute(
-            select(func.count(VideoLike.id)).where(
-                and_(VideoLike.video_id == video_id, VideoLike.is_like == False)
-            )
+    async def _delete_vote(self, vote_id: uuid.UUID) -> bool:
+        """Delete a like/dislike; False if a concurrent request already did"""
+        result = await self.db.execute(delete(VideoLike).where(VideoLike.id == vote_id))
+        return result.rowcount == 1
+    
+    async def _change_vote(self, vote_id: uuid.UUID, is_like: bool) -> bool:
+        """Flip a like/dislike; False if a concurrent request already did"""
+        result = await self.db.execute(
+            update(VideoLike)
+            .where(and_(VideoLike.id == vote_id, VideoLike.is_like != is_like))
+            .values(is_like=is_like, created_at=datetime.utcnow())
         )
-        dislike_count = dislike_result.scalar() or 0
-        
+        return result.rowcount == 1
+    
+    async def _apply_deltas(self, video_id: uuid.UUID, likes: int, dislikes: int) -> Dict[str, int]:
+        like_count, dislike_count = await adjust_like_counts(self.db, video_id, likes, dislikes)
         return {
             "like_count": like_count,
             "dislike_count": dislike_count
+        }
+    
+    def _counts(self, video: Video) -> Dict[str, int]:
+        """Get like and dislike counts for a video from its counters."""
+        return {
+            "like_count": video.like_count or 0,
+            "dislike_count": video.dislike_count or 0
         }
\ No newline at end of file
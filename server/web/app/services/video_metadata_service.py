@@ -16,8 +16,10 @@ from fastapi import HTTPException
 from pydantic import BaseModel, validator
 
 from server.web.app.models import Video, User
+from server.web.app.read_routing import record_user_write
 from server.web.app.services.base_service import BaseService
 from server.web.app.services.video_cache_service import VideoCacheService
+from server.web.app.services.tag_index_service import TagIndexService
 
 
 class VideoMetadataInput(BaseModel):
@@ -131,6 +133,7 @@ class VideoMetadataService(BaseService):
     def __init__(self, db: AsyncSession, cache_service: VideoCacheService = None):
         self.db = db
         self.cache_service = cache_service
+        self.tag_index = TagIndexService(db)
     
     async def create_metadata(self, video_id: str, metadata: VideoMetadataInput, creator_id: str) -> VideoMetadataResponse:
         """Create metadata for a new video"""
@@ -145,13 +148,14 @@ class VideoMetadataService(BaseService):
             raise HTTPException(status_code=403, detail="Not authorized to modify this video")
         
         # Update video metadata
+        await self.tag_index.set_tags(video, metadata.tags)
         video.title = metadata.title
         video.description = metadata.description
-        video.tags = metadata.tags
         video.updated_at = datetime.utcnow()
         
         await self.db.commit()
         await self.db.refresh(video)
+        await record_user_write(creator_id)
         
         # Invalidate cache if cache service is available
         if self.cache_service:
@@ -189,12 +193,13 @@ class VideoMetadataService(BaseService):
         if metadata.description is not None:
             video.description = metadata.description
         if metadata.tags is not None:
-            video.tags = metadata.tags
+            await self.tag_index.set_tags(video, metadata.tags)
         
         video.updated_at = datetime.utcnow()
         
         await self.db.commit()
         await self.db.refresh(video)
+        await record_user_write(user_id)
         
         # Invalidate cache if cache service is available
         if self.cache_service:
@@ -374,47 +379,19 @@ class VideoMetadataService(BaseService):
     async def get_popular_tags(self, limit: int = 50) -> List[TagSuggestion]:
         """Get popular tags across all videos"""
         
-        # This is a simplified implementation
-        # In production, you might want to use a more sophisticated approach
-        # with proper tag analytics and caching
-        
-        stmt = select(Video.tags).where(Video.tags.isnot(None))
-        result = await self.db.execute(stmt)
-        
-        # Count tag occurrences
-        tag_counts = {}
-        for (tags,) in result:
-            if tags:
-                for tag in tags:
-                    tag_counts[tag] = tag_counts.get(tag, 0) + 1
-        
-        # Sort by usage count and return top tags
-        sorted_tags = sorted(tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        popular = await self.tag_index.get_popular_tags(limit)
         
         return [
             TagSuggestion(tag=tag, usage_count=count)
-            for tag, count in sorted_tags
+            for tag, count in popular
         ]
     
     async def get_related_tags(self, tag: str, limit: int = 10) -> List[str]:
         """Get tags that are commonly used together with the given tag"""
         
-        # Find videos that contain the given tag
-        stmt = select(Video.tags).where(Video.tags.op('@>')([tag]))
-        result = await self.db.execute(stmt)
-        
-        # Count co-occurring tags
-        related_tag_counts = {}
-        for (tags,) in result:
-            if tags:
-                for related_tag in tags:
-                    if related_tag != tag:
-                        related_tag_counts[related_tag] = related_tag_counts.get(related_tag, 0) + 1
-        
-        # Sort by co-occurrence count and return top related tags
-        sorted_related = sorted(related_tag_counts.items(), key=lambda x: x[1], reverse=True)[:limit]
+        related = await self.tag_index.get_related_tags(tag, limit)
         
-        return [tag for tag, count in sorted_related]
+        return [related_tag for related_tag, count in related]
     
     def parse_tags_from_string(self, tags_string: str) -> List[str]:
         """Parse tags from a comma-separated string"""
@@ -465,7 +442,8 @@ class VideoMetadataService(BaseService):
                     current_tags.discard(tag)
                 
                 # Update video
-                video.tags = list(current_tags)[:20]  # Limit to 20 tags
+                new_tags = list(current_tags)[:20]  # Limit to 20 tags
+                await self.tag_index.set_tags(video, new_tags)
                 video.updated_at = datetime.utcnow()
                 
                 updated_count += 1
@@ -475,6 +453,7 @@ class VideoMetadataService(BaseService):
         
         if updated_count > 0:
             await self.db.commit()
+            await record_user_write(user_id)
         
         return updated_count
 
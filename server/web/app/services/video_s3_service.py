@@ -10,7 +10,7 @@ Handles S3 operations for video files including:
 import os
 import asyncio
 import hashlib
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Union, BinaryIO
 from datetime import datetime, timedelta
 from dataclasses import dataclass
 
@@ -22,6 +22,9 @@ from fastapi import HTTPException
 from server.web.app.services.base_service import BaseService
 from server.web.app.config import settings
 
+# Smallest part S3 accepts for every part except the last one
+S3_MIN_PART_SIZE = 5 * 1024 * 1024
+
 
 @dataclass
 class S3UploadSession:
@@ -165,21 +168,30 @@ class VideoS3Service(BaseService):
             )
     
     async def upload_part(self, session: S3UploadSession, part_number: int, 
-                         data: bytes) -> Dict[str, Any]:
+                         data: Union[bytes, BinaryIO]) -> Dict[str, Any]:
         """
         Upload a single part to S3.
         
+        ``data`` may be bytes or a seekable file object, which boto3 streams
+        from without loading it into memory. The blocking call runs in a
+        worker thread so concurrent parts do not stall the event loop.
+        
         Requirements: 1.4, 1.5
         """
         if not self.is_available():
             raise HTTPException(status_code=503, detail="S3 service not available")
         
+        start_position = data.tell() if hasattr(data, 'seek') else None
+        
         try:
             # Upload part with retry logic
             max_retries = 3
             for attempt in range(max_retries):
                 try:
-                    response = self.s3_client.upload_part(
+                    if start_position is not None:
+                        data.seek(start_position)
+                    response = await asyncio.to_thread(
+                        self.s3_client.upload_part,
                         Bucket=session.bucket,
                         Key=session.key,
                         PartNumber=part_number,
@@ -333,7 +345,34 @@ class VideoS3Service(BaseService):
         except ClientError as e:
             print(f"Failed to delete S3 object {s3_key}: {str(e)}")
             return False
-    
+
+    async def delete_prefix(self, prefix: str) -> int:
+        """
+        Delete every object under a key prefix, e.g. an HLS rendition directory.
+
+        Returns the number of objects deleted.
+        """
+        if not self.is_available():
+            return 0
+
+        deleted = 0
+        try:
+            paginator = self.s3_client.get_paginator('list_objects_v2')
+            for page in paginator.paginate(Bucket=self.bucket_name, Prefix=prefix):
+                objects = [{'Key': obj['Key']} for obj in page.get('Contents', [])]
+                if not objects:
+                    continue
+                self.s3_client.delete_objects(
+                    Bucket=self.bucket_name,
+                    Delete={'Objects': objects, 'Quiet': True}
+                )
+                deleted += len(objects)
+            return deleted
+
+        except ClientError as e:
+            print(f"Failed to delete S3 prefix {prefix}: {str(e)}")
+            return deleted
+
     def generate_presigned_url(self, s3_key: str, expiration: int = 3600) -> Optional[str]:
         """
         Generate presigned URL for video access.
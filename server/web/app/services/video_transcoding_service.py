@@ -13,7 +13,7 @@ from pathlib import Path
 
 import redis.asyncio as redis
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, update
+from sqlalchemy import delete, select, update
 
 from server.web.app.models import Video, TranscodingJob, TranscodingStatus, VideoStatus
 from server.web.app.services.base_service import BaseService
@@ -41,8 +41,17 @@ class VideoTranscodingService(BaseService):
     
     async def queue_transcoding_job(self, video_id: str, quality_preset: str, 
                                   target_resolution: str, target_framerate: int, 
-                                  target_bitrate: int) -> TranscodingJob:
-        """Queue a new transcoding job."""
+                                  target_bitrate: int, crf: Optional[int] = None,
+                                  ladder_presets: Optional[List[str]] = None,
+                                  hash_source: bool = False) -> TranscodingJob:
+        """Queue a new transcoding job.
+        
+        ``crf`` carries a fixed per-title quality; workers fall back to the
+        encoder default when it is absent. ``ladder_presets`` lists every
+        rung queued for the video and asks the worker to plan the per-title
+        ladder from the downloaded source. ``hash_source`` asks the worker
+        to hash the downloaded source for content dedup.
+        """
         # Create transcoding job record
         job = TranscodingJob(
             video_id=video_id,
@@ -68,6 +77,12 @@ class VideoTranscodingService(BaseService):
             "created_at": datetime.utcnow().isoformat(),
             "retry_count": 0
         }
+        if crf is not None:
+            job_data["crf"] = crf
+        if ladder_presets:
+            job_data["ladder_presets"] = list(ladder_presets)
+        if hash_source:
+            job_data["hash_source"] = True
         
         redis_client = await self._get_redis_client()
         await redis_client.lpush(self.job_queue_key, json.dumps(job_data))
@@ -128,7 +143,7 @@ class VideoTranscodingService(BaseService):
             logger.error(f"Failed to update progress for job {job_id}: {e}")
             return False
     
-    async def complete_job(self, job_id: str, output_s3_key: str, 
+    async def complete_job(self, job_id: str, output_s3_key: Optional[str], 
                           hls_manifest_s3_key: str, output_file_size: int) -> bool:
         """Mark a job as completed."""
         try:
@@ -163,6 +178,27 @@ class VideoTranscodingService(BaseService):
             logger.error(f"Failed to complete job {job_id}: {e}")
             return False
     
+    async def discard_job(self, job_id: str, reason: str) -> bool:
+        """Delete a job that no longer needs to run, e.g. a rung the per-title ladder dropped."""
+        try:
+            result = await self.db.execute(delete(TranscodingJob).where(TranscodingJob.id == job_id))
+            await self.db.commit()
+            
+            # Remove from processing set
+            redis_client = await self._get_redis_client()
+            processing_jobs = await redis_client.smembers(self.processing_key)
+            for job_json in processing_jobs:
+                job_data = json.loads(job_json)
+                if job_data["job_id"] == job_id:
+                    await redis_client.srem(self.processing_key, job_json)
+                    break
+            
+            logger.info(f"Discarded transcoding job {job_id}: {reason}")
+            return result.rowcount > 0
+        except Exception as e:
+            logger.error(f"Failed to discard job {job_id}: {e}")
+            return False
+    
     async def fail_job(self, job_id: str, error_message: str, 
                       job_data: Optional[Dict[str, Any]] = None) -> bool:
         """Mark a job as failed and handle retry logic."""
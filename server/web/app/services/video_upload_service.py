@@ -2,28 +2,71 @@
 Video Upload Service
 
 Handles video file uploads with multipart upload support, validation, and S3 integration.
+
+Chunk bodies are streamed rather than buffered: with S3 each chunk either is a
+multipart part on its own or is staged at its offset in a part-sized spool
+file until the part is complete, and locally each chunk is written at its
+offset in the temp file. Chunks may therefore arrive out of order, be retried,
+and land on any worker, since session state lives in Redis.
 """
 import os
+import io
 import uuid
+import math
+import shutil
 import asyncio
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union, BinaryIO
 from datetime import datetime
 
 from sqlalchemy.ext.asyncio import AsyncSession
 from fastapi import UploadFile, HTTPException, Depends
-import aiofiles
 
 from server.web.app.models import User, Video, VideoStatus
+from server.web.app.read_routing import record_user_write
 from server.web.app.services.base_service import BaseService
 from server.web.app.services.video_analysis_service import VideoAnalysisService, VideoValidationError
-from server.web.app.services.video_s3_service import VideoS3Service, S3UploadSession
+from server.web.app.services.video_s3_service import VideoS3Service, S3UploadSession, S3_MIN_PART_SIZE
+from server.web.app.services.upload_session_store import UploadSessionStore
+from server.web.app.services.content_dedup_service import (
+    ContentDedupService, delete_released_objects
+)
 from server.web.app.services.video_metadata_service import VideoMetadataService, VideoMetadataInput
+from server.web.app.services.tag_index_service import TagIndexService
 from server.web.app.services.thumbnail_service import ThumbnailService
 from server.web.app.services.video_transcoding_service import VideoTranscodingService
 from server.web.app.services.quality_preset_service import QualityPresetService
 from server.web.app.db import get_db
 from server.web.app.config import settings
 
+COPY_BLOCK_SIZE = 1024 * 1024  # bytes copied per read while streaming a chunk
+
+_part_upload_semaphore: Optional[asyncio.Semaphore] = None
+
+
+def _get_part_upload_semaphore() -> asyncio.Semaphore:
+    """Bound concurrent S3 part uploads across all sessions in this worker"""
+    global _part_upload_semaphore
+    if _part_upload_semaphore is None:
+        _part_upload_semaphore = asyncio.Semaphore(max(1, settings.UPLOAD_PART_CONCURRENCY))
+    return _part_upload_semaphore
+
+
+def _stream_size(stream: BinaryIO) -> int:
+    """Bytes remaining in a seekable stream"""
+    position = stream.tell()
+    stream.seek(0, os.SEEK_END)
+    size = stream.tell() - position
+    stream.seek(position)
+    return size
+
+
+def _write_stream_at(path: str, stream: BinaryIO, offset: int):
+    """Copy a stream into a file at the given offset, one block at a time"""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    with os.fdopen(fd, 'r+b') as f:
+        f.seek(offset)
+        shutil.copyfileobj(stream, f, COPY_BLOCK_SIZE)
+
 
 class UploadSession:
     """Represents an active multipart upload session"""
@@ -39,6 +82,66 @@ class UploadSession:
         self.created_at = datetime.utcnow()
         self.s3_session: Optional[S3UploadSession] = None
         self.temp_file_path = None
+    
+    @property
+    def chunk_size(self) -> int:
+        """Size of every chunk except the last one"""
+        return self.metadata.get('chunk_size') or settings.CHUNK_SIZE
+    
+    @property
+    def chunks_per_part(self) -> int:
+        """Client chunks grouped into one S3 part so parts meet the S3 minimum"""
+        if self.total_chunks == 1:
+            return 1
+        part_size = max(settings.UPLOAD_PART_SIZE, S3_MIN_PART_SIZE)
+        return max(1, math.ceil(part_size / self.chunk_size))
+    
+    def part_number_for_chunk(self, chunk_number: int) -> int:
+        return (chunk_number - 1) // self.chunks_per_part + 1
+    
+    def chunks_in_part(self, part_number: int) -> int:
+        """Chunks expected in a part; the last part may be short"""
+        if not self.total_chunks:
+            return self.chunks_per_part
+        remaining = self.total_chunks - (part_number - 1) * self.chunks_per_part
+        return max(1, min(self.chunks_per_part, remaining))
+    
+    def to_dict(self) -> Dict[str, Any]:
+        s3_session = None
+        if self.s3_session:
+            s3_session = {
+                'upload_id': self.s3_session.upload_id,
+                'bucket': self.s3_session.bucket,
+                'key': self.s3_session.key,
+                'created_at': self.s3_session.created_at.isoformat(),
+                'expires_at': self.s3_session.expires_at.isoformat()
+            }
+        return {
+            'session_id': self.session_id,
+            'video_id': self.video_id,
+            'user_id': self.user_id,
+            'metadata': self.metadata,
+            'created_at': self.created_at.isoformat(),
+            's3_session': s3_session,
+            'temp_file_path': self.temp_file_path
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UploadSession':
+        session = cls(data['session_id'], data['video_id'], data['user_id'], data['metadata'])
+        session.created_at = datetime.fromisoformat(data['created_at'])
+        session.temp_file_path = data.get('temp_file_path')
+        s3_data = data.get('s3_session')
+        if s3_data:
+            session.s3_session = S3UploadSession(
+                upload_id=s3_data['upload_id'],
+                bucket=s3_data['bucket'],
+                key=s3_data['key'],
+                parts=[],
+                created_at=datetime.fromisoformat(s3_data['created_at']),
+                expires_at=datetime.fromisoformat(s3_data['expires_at'])
+            )
+        return session
 
 
 class VideoMetadata:
@@ -63,13 +166,15 @@ class VideoUploadService(BaseService):
     def __init__(self, db: AsyncSession):
         self.db = db
         self.active_sessions: Dict[str, UploadSession] = {}
+        self.session_store = UploadSessionStore(settings.REDIS_URL)
+        self.dedup_service = ContentDedupService(db)
+        self.tag_index = TagIndexService(db)
         self.analysis_service = VideoAnalysisService()
         self.s3_service = VideoS3Service()
         self.metadata_service = VideoMetadataService(db)
         self.thumbnail_service = ThumbnailService(db)
         self.transcoding_service = VideoTranscodingService(db, settings.REDIS_URL)
         self.quality_preset_service = QualityPresetService(db)
-
     
     async def initiate_upload(self, user_id: str, metadata: VideoMetadata, file_info: Dict[str, Any]) -> UploadSession:
         """Initialize multipart upload session"""
@@ -105,6 +210,7 @@ class VideoUploadService(BaseService):
         )
         
         self.db.add(video)
+        await self.tag_index.add_video(video)
         await self.db.commit()
         
         # Create upload session
@@ -116,6 +222,7 @@ class VideoUploadService(BaseService):
                 'filename': file_info['filename'],
                 'size': file_info['size'],
                 'total_chunks': file_info.get('total_chunks', 1),
+                'chunk_size': file_info.get('chunk_size', settings.CHUNK_SIZE),
                 'mime_type': file_info.get('mime_type', 'video/mp4')
             }
         )
@@ -140,8 +247,97 @@ class VideoUploadService(BaseService):
             session.temp_file_path = os.path.join(temp_dir, f"{session_id}.tmp")
         
         self.active_sessions[session_id] = session
+        await self.session_store.save(session_id, session.to_dict())
+        return session
+    
+    async def load_session(self, upload_id: str, refresh: bool = False) -> Optional[UploadSession]:
+        """
+        Get an upload session from this worker's cache or the session store.
+        
+        Sessions loaded from the store, or with ``refresh`` set, get their
+        progress counters from the store so they include chunks other
+        workers received.
+        """
+        session = self.active_sessions.get(upload_id)
+        if session is None:
+            data = await self.session_store.load(upload_id)
+            if data is None:
+                return None
+            session = UploadSession.from_dict(data)
+            self.active_sessions[upload_id] = session
+            refresh = True
+        
+        if refresh:
+            progress = await self.session_store.get_progress(upload_id)
+            session.chunks_received = progress['chunks_received']
+            session.uploaded_size = progress['uploaded_size']
+        
         return session
     
+    def _staging_dir(self, session: UploadSession) -> str:
+        base = settings.UPLOAD_STAGING_PATH or os.path.join(settings.MEDIA_STORAGE_PATH, 'temp', 'uploads')
+        return os.path.join(base, session.session_id)
+    
+    def _staged_part_path(self, session: UploadSession, part_number: int) -> str:
+        return os.path.join(self._staging_dir(session), f"part_{part_number:05d}")
+    
+    async def _upload_part(self, session: UploadSession, part_number: int, body: BinaryIO):
+        """Upload one multipart part and record its ETag for completion"""
+        async with _get_part_upload_semaphore():
+            part_info = await self.s3_service.upload_part(session.s3_session, part_number, body)
+        if part_info and part_info.get('ETag'):
+            await self.session_store.record_part(session.session_id, part_number, part_info['ETag'])
+    
+    async def _upload_staged_part(self, session: UploadSession, part_number: int):
+        part_path = self._staged_part_path(session, part_number)
+        with open(part_path, 'rb') as part_file:
+            await self._upload_part(session, part_number, part_file)
+        os.remove(part_path)
+    
+    async def _flush_staged_parts(self, session: UploadSession):
+        """Upload staged parts that never filled up, e.g. a short final part"""
+        staging_dir = self._staging_dir(session)
+        if not os.path.isdir(staging_dir):
+            return
+        
+        uploaded = {part['PartNumber'] for part in await self.session_store.get_parts(session.session_id)}
+        for name in sorted(os.listdir(staging_dir)):
+            part_number = int(name.split('_')[-1])
+            if part_number not in uploaded:
+                await self._upload_staged_part(session, part_number)
+    
+    async def _process_s3_chunk(self, session: UploadSession, stream: BinaryIO,
+                                chunk_number: int, size: int):
+        part_number = session.part_number_for_chunk(chunk_number)
+        
+        if session.chunks_per_part == 1:
+            # Chunk is a full part: stream it straight through to S3
+            await self._upload_part(session, part_number, stream)
+            await self._record_chunk(session, chunk_number, part_number, size)
+            return
+        
+        # Stage the chunk at its offset within its part, then upload the part
+        # once all of its chunks have arrived (whichever worker sees the last one)
+        part_path = self._staged_part_path(session, part_number)
+        offset = ((chunk_number - 1) % session.chunks_per_part) * session.chunk_size
+        os.makedirs(os.path.dirname(part_path), exist_ok=True)
+        await asyncio.to_thread(_write_stream_at, part_path, stream, offset)
+        
+        receipt = await self._record_chunk(session, chunk_number, part_number, size)
+        if receipt and receipt.part_chunks == session.chunks_in_part(part_number):
+            try:
+                await self._upload_staged_part(session, part_number)
+            except Exception:
+                await self.session_store.discard_chunk(session.session_id, chunk_number, part_number, size)
+                raise
+    
+    async def _record_chunk(self, session: UploadSession, chunk_number: int, part_number: int, size: int):
+        receipt = await self.session_store.add_chunk(session.session_id, chunk_number, part_number, size)
+        if receipt:
+            session.chunks_received = receipt.chunks_received
+            session.uploaded_size = receipt.uploaded_size
+        return receipt
+    
     async def create_video_from_file(self, file_path: str, original_filename: str, 
                                    creator_id: str, metadata: Dict[str, Any],
                                    quality_presets: List[str] = None) -> Video:
@@ -154,6 +350,9 @@ class VideoUploadService(BaseService):
             # Get file size
             file_size = os.path.getsize(file_path)
             
+            # Hash the original to find an identical stored copy
+            content_hash, existing_content = await self._find_existing_content(file_path)
+            
             # Analyze video file
             analysis_result = await self.analysis_service.analyze_video_file(file_path)
             
@@ -182,13 +381,22 @@ class VideoUploadService(BaseService):
             )
             
             self.db.add(video)
+            await self.tag_index.add_video(video)
             await self.db.commit()
             await self.db.refresh(video)
             
-            # Upload to S3
-            if self.s3_service.is_available():
+            # Upload to S3 unless an identical original is already stored
+            if self.s3_service.is_available() and existing_content is None:
                 await self.s3_service.upload_file(file_path, s3_key)
             
+            fingerprint = self.dedup_service.compute_fingerprint(
+                analysis_result.duration, analysis_result.resolution,
+                analysis_result.codec, file_size
+            )
+            remaining_presets = await self._dedup_original(
+                video, content_hash, existing_content, fingerprint, quality_presets
+            )
+            
             # Generate thumbnails
             try:
                 await self.thumbnail_service.generate_thumbnails(video_id, file_path)
@@ -196,16 +404,12 @@ class VideoUploadService(BaseService):
                 # Log error but don't fail the import
                 print(f"Failed to generate thumbnails for {video_id}: {e}")
             
-            # Queue transcoding jobs
-            if quality_presets:
-                for preset in quality_presets:
-                    try:
-                        await self.transcoding_service.queue_transcoding_job(video_id, preset)
-                    except Exception as e:
-                        print(f"Failed to queue transcoding job for {video_id}, preset {preset}: {e}")
+            # Queue transcoding jobs for renditions that could not be reused
+            if remaining_presets:
+                await self._queue_transcoding_jobs(video_id, remaining_presets)
             
             # Update video status
-            video.status = VideoStatus.ready if not quality_presets else VideoStatus.transcoding
+            video.status = VideoStatus.ready if not remaining_presets else VideoStatus.transcoding
             await self.db.commit()
             
             return video
@@ -213,33 +417,44 @@ class VideoUploadService(BaseService):
         except Exception as e:
             # Clean up on error
             if 'video' in locals():
+                # Drop any reference taken on a shared original, as deletes do
+                released_keys = await self.dedup_service.release(video)
+                await self.tag_index.remove_video(video)
                 await self.db.delete(video)
                 await self.db.commit()
+                if released_keys:
+                    await delete_released_objects(released_keys, self.s3_service)
             raise HTTPException(status_code=500, detail=f"Failed to create video from file: {str(e)}")
     
-    async def process_chunk(self, upload_id: str, chunk_data: bytes, chunk_number: int) -> ChunkResult:
-        """Process individual upload chunk"""
+    async def process_chunk(self, upload_id: str, chunk_data: Union[bytes, BinaryIO],
+                            chunk_number: int) -> ChunkResult:
+        """
+        Process individual upload chunk.
         
-        if upload_id not in self.active_sessions:
+        ``chunk_data`` may be bytes or a seekable file object (such as
+        ``UploadFile.file``), which is streamed without being read into memory.
+        Re-sent chunks are accepted and not counted twice.
+        """
+        
+        session = await self.load_session(upload_id)
+        if session is None:
             raise HTTPException(status_code=404, detail="Upload session not found")
         
-        session = self.active_sessions[upload_id]
+        stream = io.BytesIO(chunk_data) if isinstance(chunk_data, (bytes, bytearray)) else chunk_data
         
         try:
+            if chunk_number < 1:
+                raise ValueError("Chunk numbers start at 1")
+            
+            size = _stream_size(stream)
+            
             if self.s3_service.is_available() and session.s3_session:
-                # Upload chunk to S3
-                await self.s3_service.upload_part(
-                    session.s3_session,
-                    chunk_number,
-                    chunk_data
-                )
+                await self._process_s3_chunk(session, stream, chunk_number, size)
             else:
-                # Write chunk to temporary file
-                async with aiofiles.open(session.temp_file_path, 'ab') as f:
-                    await f.write(chunk_data)
-            
-            session.chunks_received += 1
-            session.uploaded_size += len(chunk_data)
+                # Write chunk at its offset so chunks may arrive in any order
+                offset = (chunk_number - 1) * session.chunk_size
+                await asyncio.to_thread(_write_stream_at, session.temp_file_path, stream, offset)
+                await self._record_chunk(session, chunk_number, chunk_number, size)
             
             return ChunkResult(
                 chunk_number=chunk_number,
@@ -257,20 +472,29 @@ class VideoUploadService(BaseService):
     async def complete_upload(self, upload_id: str, quality_presets: List[str]) -> Video:
         """Complete upload and initiate transcoding"""
         
-        if upload_id not in self.active_sessions:
+        session = await self.load_session(upload_id)
+        if session is None:
             raise HTTPException(status_code=404, detail="Upload session not found")
         
-        session = self.active_sessions[upload_id]
-        
         try:
             final_path = None
+            content_hash = None
+            existing_content = None
+            fingerprint = None
+            hash_source = False
             
             # Complete S3 multipart upload or move temp file
             if self.s3_service.is_available() and session.s3_session:
-                # Complete S3 multipart upload
+                # Upload any short trailing part, then complete with every worker's parts
+                await self._flush_staged_parts(session)
+                session.s3_session.parts = await self.session_store.get_parts(upload_id)
                 result = await self.s3_service.complete_multipart_upload(session.s3_session)
                 if not result.success:
                     raise Exception(result.error_message or "S3 upload completion failed")
+                
+                # Chunks land on any worker in any order, so no hash exists yet;
+                # the transcoding worker hashes the source it downloads and dedups it
+                hash_source = True
             else:
                 # Move temp file to final location
                 final_dir = os.path.join(settings.MEDIA_STORAGE_PATH, 'originals')
@@ -279,6 +503,8 @@ class VideoUploadService(BaseService):
                 
                 if os.path.exists(session.temp_file_path):
                     os.rename(session.temp_file_path, final_path)
+                
+                content_hash, existing_content = await self._find_existing_content(final_path)
             
             # Update video status and analyze video
             video = await self.db.get(Video, session.video_id)
@@ -295,8 +521,12 @@ class VideoUploadService(BaseService):
                             video.source_framerate = int(analysis.framerate)
                             video.source_codec = analysis.codec
                             video.source_bitrate = analysis.bitrate
+                            fingerprint = self.dedup_service.compute_fingerprint(
+                                analysis.duration_seconds, video.source_resolution,
+                                analysis.codec, video.file_size or 0
+                            )
                         else:
-                            video.status = VideoStatus.failed
+                            await self.tag_index.set_status(video, VideoStatus.failed)
                     except Exception as e:
                         print(f"Video analysis failed: {str(e)}")
                         # Continue without analysis data
@@ -314,12 +544,21 @@ class VideoUploadService(BaseService):
                         print(f"Thumbnail generation failed: {str(e)}")
                         # Continue without thumbnails
                 
+                # Reference an identical original and its renditions if one exists
+                remaining_presets = await self._dedup_original(
+                    video, content_hash, existing_content, fingerprint, quality_presets
+                )
+                
                 # Queue transcoding jobs for quality presets
-                if quality_presets:
-                    await self._queue_transcoding_jobs(session.video_id, quality_presets)
+                if remaining_presets:
+                    await self._queue_transcoding_jobs(session.video_id, remaining_presets, hash_source)
+                elif quality_presets:
+                    video.status = VideoStatus.ready
+                    await self.db.commit()
                 
             # Clean up session
-            del self.active_sessions[upload_id]
+            await self._discard_session(session)
+            await record_user_write(session.user_id)
             
             return video
             
@@ -331,11 +570,10 @@ class VideoUploadService(BaseService):
     async def cancel_upload(self, upload_id: str) -> bool:
         """Cancel upload and cleanup resources"""
         
-        if upload_id not in self.active_sessions:
+        session = await self.load_session(upload_id)
+        if session is None:
             return False
         
-        session = self.active_sessions[upload_id]
-        
         try:
             # Cancel S3 multipart upload
             if self.s3_service.is_available() and session.s3_session:
@@ -348,11 +586,11 @@ class VideoUploadService(BaseService):
             # Update video status to failed
             video = await self.db.get(Video, session.video_id)
             if video:
-                video.status = VideoStatus.failed
+                await self.tag_index.set_status(video, VideoStatus.failed)
                 await self.db.commit()
             
             # Clean up session
-            del self.active_sessions[upload_id]
+            await self._discard_session(session)
             
             return True
             
@@ -360,6 +598,53 @@ class VideoUploadService(BaseService):
             print(f"Error during upload cancellation: {str(e)}")
             return False
     
+    async def _lookup_content(self, content_hash: str):
+        try:
+            return await self.dedup_service.find_by_hash(content_hash)
+        except Exception as e:
+            print(f"Content hash lookup failed: {str(e)}")
+            return None
+    
+    async def _find_existing_content(self, file_path: str):
+        """Hash a local original and look up an identical stored copy"""
+        try:
+            content_hash = await self.dedup_service.hash_file(file_path)
+        except Exception as e:
+            print(f"Failed to hash {file_path}: {str(e)}")
+            return None, None
+        return content_hash, await self._lookup_content(content_hash)
+    
+    async def _dedup_original(self, video: Video, content_hash: Optional[str], existing_content,
+                              fingerprint: Optional[str], quality_presets: Optional[List[str]]) -> List[str]:
+        """
+        Register a new original or reference an identical one.
+        
+        Returns the quality presets that still need transcoding: for a
+        duplicate, completed renditions of the original are reused.
+        """
+        quality_presets = list(quality_presets or [])
+        if not content_hash:
+            return quality_presets
+        
+        try:
+            if existing_content is None:
+                await self.dedup_service.register(video, content_hash, fingerprint)
+                return quality_presets
+            
+            await self.dedup_service.add_reference(existing_content, video)
+            cloned = await self.dedup_service.clone_renditions(existing_content, video, quality_presets)
+            return [preset for preset in quality_presets if preset not in cloned]
+        except Exception as e:
+            await self.db.rollback()
+            print(f"Content dedup failed for video {video.id}: {str(e)}")
+            return quality_presets
+    
+    async def _discard_session(self, session: UploadSession):
+        """Drop cached and persisted session state and staged parts"""
+        shutil.rmtree(self._staging_dir(session), ignore_errors=True)
+        await self.session_store.delete(session.session_id)
+        self.active_sessions.pop(session.session_id, None)
+    
     def _validate_file_info(self, file_info: Dict[str, Any]) -> bool:
         """Validate file information"""
         
@@ -382,8 +667,15 @@ class VideoUploadService(BaseService):
         
         return True
     
-    async def _queue_transcoding_jobs(self, video_id: str, quality_presets: List[str]):
-        """Queue transcoding jobs for the uploaded video."""
+    async def _queue_transcoding_jobs(self, video_id: str, quality_presets: List[str],
+                                      hash_source: bool = False):
+        """Queue transcoding jobs for the uploaded video.
+        
+        With per-title encoding enabled, each job carries the whole ladder;
+        the transcoding worker probes the source once it has downloaded it
+        and may drop rungs that would add no quality. ``hash_source`` asks
+        the worker to hash and dedup an original the upload left unhashed.
+        """
         try:
             # Get video information for preset generation
             video = await self.db.get(Video, video_id)
@@ -392,20 +684,22 @@ class VideoUploadService(BaseService):
             
             # Generate quality presets based on source video
             available_presets = await self.quality_preset_service.get_available_presets_for_video(video_id)
+            presets = [
+                preset for preset_name in quality_presets
+                for preset in available_presets if preset["name"] == preset_name
+            ]
+            ladder_presets = [preset["name"] for preset in presets] if settings.PER_TITLE_ENCODING_ENABLED else None
             
-            for preset_name in quality_presets:
-                # Find matching preset
-                preset = next((p for p in available_presets if p["name"] == preset_name), None)
-                if not preset:
-                    continue
-                
+            for preset in presets:
                 # Queue transcoding job
                 await self.transcoding_service.queue_transcoding_job(
                     video_id=video_id,
-                    quality_preset=preset_name,
+                    quality_preset=preset["name"],
                     target_resolution=preset["resolution"],
                     target_framerate=preset["framerate"],
-                    target_bitrate=preset["bitrate"]
+                    target_bitrate=preset["bitrate"],
+                    ladder_presets=ladder_presets,
+                    hash_source=hash_source
                 )
             
             # Update video status to transcoding
@@ -11,6 +11,7 @@ import json
 
 from ..models import Video, ViewSession, User, VideoStatus, VideoVisibility
 from .base_service import BaseService
+from .pagination import KeysetPaginator, count_rows, default_count_mode
 
 class ViewingHistoryService(BaseService):
     """Service for managing user viewing history."""
@@ -23,9 +24,16 @@ class ViewingHistoryService(BaseService):
         user_id: uuid.UUID, 
         page: int = 1, 
         limit: int = 20,
-        public_only: bool = False
+        public_only: bool = False,
+        cursor: Optional[str] = None,
+        count_mode: Optional[str] = None
     ) -> Optional[Dict[str, Any]]:
-        """Get user's viewing history with pagination."""
+        """
+        Get user's viewing history with pagination.
+
+        Pass the previous response's next_cursor to continue; page is only
+        used when no cursor is given.
+        """
         # Check if user exists and get privacy settings
         user_result = await self.db.execute(
             select(User).where(User.id == user_id)
@@ -53,27 +61,26 @@ class ViewingHistoryService(BaseService):
                 ViewSession.completion_percentage >= 5,
                 ViewSession.ended_at.isnot(None)
             )
-        ).options(
-            selectinload(ViewSession.video).selectinload(Video.creator)
-        ).order_by(desc(ViewSession.last_heartbeat)).offset(offset).limit(limit)
-        
-        result = await self.db.execute(query)
-        sessions = result.scalars().all()
+        )
         
         # Get total count
-        count_query = select(func.count(ViewSession.id)).where(
-            and_(
-                ViewSession.user_id == user_id,
-                ViewSession.completion_percentage >= 5,
-                ViewSession.ended_at.isnot(None)
-            )
+        total_count, is_estimate = await count_rows(
+            self.db, query, count_mode or default_count_mode(cursor)
         )
-        count_result = await self.db.execute(count_query)
-        total_count = count_result.scalar() or 0
+        
+        paginator = KeysetPaginator("recent", ViewSession.last_heartbeat, ViewSession.id)
+        query = paginator.apply(
+            query.options(selectinload(ViewSession.video).selectinload(Video.creator)), cursor, limit
+        )
+        if not cursor:
+            query = query.offset(offset)
+        
+        result = await self.db.execute(query)
+        session_page = paginator.page(result.scalars().all(), limit)
         
         # Format history items
         history_items = []
-        for session in sessions:
+        for session in session_page.items:
             if session.video and session.video.status == VideoStatus.ready:
                 history_items.append({
                     "video_id": str(session.video.id),
@@ -101,7 +108,9 @@ class ViewingHistoryService(BaseService):
                 "page": page,
                 "limit": limit,
                 "total": total_count,
-                "pages": (total_count + limit - 1) // limit
+                "total_is_estimate": is_estimate,
+                "pages": (total_count + limit - 1) // limit if total_count is not None else None,
+                "next_cursor": session_page.next_cursor
             }
         }
     
@@ -31,6 +31,16 @@ class DatabaseConfig(BaseModel):
     password: str = Field(..., description="Database password")
     pool_size: int = Field(10, ge=1, le=100, description="Connection pool size")
     max_overflow: int = Field(20, ge=0, le=100, description="Max pool overflow")
+    pool_timeout: float = Field(10.0, gt=0, description="Seconds to wait for a pooled connection")
+    pool_recycle: int = Field(1800, ge=-1, description="Seconds before a connection is replaced (-1 disables)")
+    pool_pre_ping: bool = Field(True, description="Check connections are alive on checkout")
+    statement_timeout_ms: int = Field(30000, ge=0, description="Server-side statement timeout (0 disables)")
+    prepared_statement_cache_size: int = Field(256, ge=0, description="asyncpg prepared statements cached per connection (0 for PgBouncer transaction pooling)")
+    application_name: str = Field("meatlizard-web", description="Reported to Postgres in pg_stat_activity")
+    replica_urls: List[str] = Field(default_factory=list, description="Read replica connection URLs")
+    replica_max_lag_seconds: float = Field(5.0, ge=0, description="Replicas lagging more than this are skipped")
+    replica_lag_check_interval: float = Field(2.0, gt=0, description="Seconds between replica lag probes")
+    read_your_writes_seconds: float = Field(10.0, ge=0, description="Seconds a user's reads stay on the primary after a write")
     
     def get_url(self) -> str:
         """Get PostgreSQL connection URL."""
@@ -268,6 +278,14 @@ DATABASE__USERNAME=postgres
 DATABASE__PASSWORD=your_password_here
 DATABASE__POOL_SIZE=10
 DATABASE__MAX_OVERFLOW=20
+DATABASE__POOL_TIMEOUT=10
+DATABASE__POOL_RECYCLE=1800
+DATABASE__POOL_PRE_PING=true
+DATABASE__STATEMENT_TIMEOUT_MS=30000
+DATABASE__PREPARED_STATEMENT_CACHE_SIZE=256
+DATABASE__REPLICA_URLS=[]
+DATABASE__REPLICA_MAX_LAG_SECONDS=5
+DATABASE__READ_YOUR_WRITES_SECONDS=10
 
 # Redis Configuration  
 REDIS__HOST=localhost
@@ -1,5 +1,6 @@
 # shared_lib/db.py
 import os
+import threading
 from sqlalchemy import (
     create_engine,
     Column,
@@ -103,8 +104,29 @@ class AuditLog(Base):
     timestamp = Column(DateTime, default=datetime.utcnow)
 
 
-def get_db_session(db_url=os.getenv("DATABASE_URL")):
-    engine = create_engine(db_url)
-    Base.metadata.create_all(engine)
-    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
-    return SessionLocal()
+# One pooled engine and session factory per database URL; tables are created
+# the first time a URL is used rather than on every session
+_session_factories = {}
+_factory_lock = threading.Lock()
+
+
+def get_session_factory(db_url=None):
+    db_url = db_url or os.getenv("DATABASE_URL")
+    with _factory_lock:
+        factory = _session_factories.get(db_url)
+        if factory is None:
+            pool_args = {} if db_url.startswith("sqlite") else {
+                "pool_size": int(os.getenv("DATABASE_POOL_SIZE", "5")),
+                "max_overflow": int(os.getenv("DATABASE_MAX_OVERFLOW", "10")),
+                "pool_recycle": int(os.getenv("DATABASE_POOL_RECYCLE", "1800")),
+                "pool_pre_ping": True,
+            }
+            engine = create_engine(db_url, **pool_args)
+            Base.metadata.create_all(engine)
+            factory = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+            _session_factories[db_url] = factory
+        return factory
+
+
+def get_db_session(db_url=None):
+    return get_session_factory(db_url)()
@@ -1,12 +1,388 @@
 # shared_lib/moderation.py
+"""
+Rule-based text moderation shared by the chat bot, comments and video
+metadata scanning.
+
+Rules are grouped into named rule sets ("content", "comment", "prompt").
+Each rule set is compiled once into:
+
+- a multi-pattern automaton for literal terms (Aho-Corasick through
+  pyahocorasick when installed, otherwise a trie-shaped regex), and
+- a single alternation regex holding every pattern rule,
+
+so a text is scanned in one or two passes however many rules there are.
+`scan_many` joins a batch of texts and scans them in the same passes.
+
+Rules can be hot-reloaded from the JSON file named by MODERATION_RULES_PATH;
+it maps rule set names to lists of rule objects and replaces the built-in
+rules of the sets it names. Hits are counted per rule.
+"""
+import json
+import logging
+import os
+import re
+import threading
+import time
+from bisect import bisect_right
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import ahocorasick
+except ImportError:  # pragma: no cover - optional accelerator
+    ahocorasick = None
+
+logger = logging.getLogger(__name__)
+
+RISK_PRIORITY = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+
+# Joins texts in a batch; no rule can match across it without being noticed
+BATCH_SEPARATOR = "\x00"
+
+RELOAD_INTERVAL = 5.0  # seconds between rule file mtime checks
+
+
+@dataclass(frozen=True)
+class ModerationRule:
+    """
+    A named rule emitting `category` at `risk`. Give either literal `terms`
+    (matched case-insensitively, as whole words unless whole_word is False)
+    or a regex `pattern` (matched case-insensitively).
+    """
+    name: str
+    category: str
+    risk: str = "medium"
+    terms: Tuple[str, ...] = ()
+    pattern: Optional[str] = None
+    whole_word: bool = True
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> "ModerationRule":
+        rule = cls(
+            name=data["name"],
+            category=data["category"],
+            risk=data.get("risk", "medium"),
+            terms=tuple(term.lower() for term in data.get("terms", ())),
+            pattern=data.get("pattern"),
+            whole_word=data.get("whole_word", True)
+        )
+        if bool(rule.terms) == bool(rule.pattern):
+            raise ValueError(f"rule {rule.name!r} needs either terms or a pattern")
+        if rule.risk not in RISK_PRIORITY:
+            raise ValueError(f"rule {rule.name!r} has unknown risk {rule.risk!r}")
+        return rule
+
+    def as_regex(self) -> str:
+        """Equivalent standalone regex, for callers that still want one"""
+        if self.pattern:
+            return self.pattern
+        alternation = "|".join(re.escape(term) for term in self.terms)
+        return rf"\b({alternation})\b" if self.whole_word else f"({alternation})"
+
+
+@dataclass
+class ScanResult:
+    flags: List[str] = field(default_factory=list)
+    risk_level: str = "low"
+    rules: List[str] = field(default_factory=list)
+
+    @property
+    def clean(self) -> bool:
+        return not self.flags
+
+
+def _trie_regex(terms: Iterable[str]) -> str:
+    """Regex matching the longest of `terms` starting at a position"""
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for char in term:
+            node = node.setdefault(char, {})
+        node[""] = True
+
+    def build(node) -> str:
+        ends = "" in node
+        branches = [re.escape(char) + build(child) for char, child in sorted(node.items()) if char]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if ends:
+            # Greedy optional, so longer terms win over their prefixes
+            return f"(?:{body})?"
+        return body
+
+    return build(trie)
+
+
+def _standalone(pattern: str) -> bool:
+    """Patterns that cannot share a combined regex (backrefs, inline flags)"""
+    return bool(re.search(r"\\[1-9]|\(\?P=|\(\?[aiLmsux]+\)", pattern))
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == "_"
+
+
+class CompiledRuleSet:
+    """The rules of one rule set compiled for single-pass scanning"""
+
+    def __init__(self, name: str, rules: Sequence[ModerationRule]):
+        self.name = name
+        self.rules = list(rules)
+
+        # Literal terms -> (rule index, whole_word) entries
+        self._terms: Dict[str, List[Tuple[int, bool]]] = {}
+        for index, rule in enumerate(self.rules):
+            for term in rule.terms:
+                self._terms.setdefault(term.lower(), []).append((index, rule.whole_word))
+
+        self._automaton = None
+        self._term_regex = None
+        self._term_prefixes: Dict[str, List[str]] = {}
+        if self._terms:
+            if ahocorasick is not None:
+                automaton = ahocorasick.Automaton()
+                for term in self._terms:
+                    automaton.add_word(term, term)
+                automaton.make_automaton()
+                self._automaton = automaton
+            else:
+                # Zero-width lookahead so overlapping terms are all seen;
+                # terms that prefix the longest match are found via _term_prefixes
+                self._term_regex = re.compile(f"(?=({_trie_regex(self._terms)}))")
+                for term in self._terms:
+                    self._term_prefixes[term] = [t for t in self._terms if term.startswith(t)]
+
+        # Pattern rules; one combined lookahead finds the positions where any
+        # of them matches, then each is tried there so ties all count
+        pattern_rules = [index for index, rule in enumerate(self.rules) if rule.pattern]
+        self._standalone = [
+            (index, re.compile(self.rules[index].pattern, re.IGNORECASE))
+            for index in pattern_rules if _standalone(self.rules[index].pattern)
+        ]
+        self._combined = [
+            (index, re.compile(self.rules[index].pattern, re.IGNORECASE))
+            for index in pattern_rules if not _standalone(self.rules[index].pattern)
+        ]
+        alternation = "|".join(f"(?:{regex.pattern})" for _, regex in self._combined)
+        self._pattern_regex = re.compile(f"(?=(?:{alternation}))", re.IGNORECASE) if self._combined else None
+
+    def _literal_hits(self, text: str) -> Iterable[Tuple[int, int, int]]:
+        """(rule index, start, end) for literal matches in lower-cased text"""
+        if self._automaton is not None:
+            for end, term in self._automaton.iter(text):
+                yield from self._term_hits(text, term, end + 1 - len(term))
+        elif self._term_regex is not None:
+            for match in self._term_regex.finditer(text):
+                start = match.start()
+                for term in self._term_prefixes[match.group(1)]:
+                    yield from self._term_hits(text, term, start)
+
+    def _term_hits(self, text: str, term: str, start: int):
+        end = start + len(term)
+        for index, whole_word in self._terms[term]:
+            if whole_word and (
+                (start > 0 and _is_word_char(text[start - 1])) or
+                (end < len(text) and _is_word_char(text[end]))
+            ):
+                continue
+            yield index, start, end
+
+    def _pattern_hits(self, text: str) -> Iterable[Tuple[int, int, int]]:
+        if self._pattern_regex is not None:
+            for match in self._pattern_regex.finditer(text):
+                start = match.start()
+                for index, regex in self._combined:
+                    hit = regex.match(text, start)
+                    if hit:
+                        yield index, start, hit.end()
+        for index, regex in self._standalone:
+            for match in regex.finditer(text):
+                yield index, match.start(), match.end()
+
+    def hits(self, text: str) -> List[int]:
+        """Indexes of the rules matching a single text"""
+        found = {index for index, _, _ in self._literal_hits(text.lower())}
+        found.update(index for index, _, _ in self._pattern_hits(text))
+        return sorted(found)
+
+    def hits_many(self, texts: Sequence[str]) -> List[List[int]]:
+        """hits() for each text, scanning the whole batch in one pass per matcher"""
+        if not texts:
+            return []
+        if any(BATCH_SEPARATOR in text for text in texts):
+            return [self.hits(text) for text in texts]
+
+        found: List[set] = [set() for _ in texts]
+        spilled = set()
+        for source, matcher in (
+            ([text.lower() for text in texts], self._literal_hits),
+            (list(texts), self._pattern_hits),
+        ):
+            starts, offset = [], 0
+            for text in source:
+                starts.append(offset)
+                offset += len(text) + len(BATCH_SEPARATOR)
+            for index, start, end in matcher(BATCH_SEPARATOR.join(source)):
+                position = bisect_right(starts, start) - 1
+                if end > starts[position] + len(source[position]):
+                    # Match ran into the next text; redo this one alone
+                    spilled.add(position)
+                    continue
+                found[position].add(index)
+
+        for position in spilled:
+            found[position] = set(self.hits(texts[position]))
+        return [sorted(hits) for hits in found]
+
+
+class ModerationEngine:
+    """
+    Scans text against compiled rule sets. Reloading compiles the new rules
+    before swapping them in, so concurrent scans always see a complete set.
+    """
+
+    def __init__(
+        self,
+        rules: Optional[Dict[str, Sequence[ModerationRule]]] = None,
+        rules_path: Optional[str] = None,
+        reload_interval: float = RELOAD_INTERVAL
+    ):
+        self.rules_path = rules_path
+        self.reload_interval = reload_interval
+        self._defaults = dict(DEFAULT_RULES if rules is None else rules)
+        self._compiled: Dict[str, CompiledRuleSet] = {}
+        self._hits: Counter = Counter()
+        self._lock = threading.Lock()
+        self._rules_mtime: Optional[float] = None
+        self._next_reload_check = 0.0
+        self.load(self._defaults)
+        if rules_path:
+            self.reload_if_changed(force=True)
+
+    def load(self, rules: Dict[str, Sequence[ModerationRule]]):
+        """Compile and install rule sets, replacing the ones with the same name"""
+        compiled = dict(self._compiled)
+        for name, ruleset in rules.items():
+            compiled[name] = CompiledRuleSet(name, ruleset)
+        self._compiled = compiled
+
+    def reload_if_changed(self, force: bool = False) -> bool:
+        """Reload the rule file if it changed; invalid files keep the current rules"""
+        if not self.rules_path:
+            return False
+        now = time.monotonic()
+        if not force and now < self._next_reload_check:
+            return False
+        self._next_reload_check = now + self.reload_interval
+
+        try:
+            mtime = os.stat(self.rules_path).st_mtime
+        except OSError:
+            return False
+        if not force and mtime == self._rules_mtime:
+            return False
+
+        with self._lock:
+            try:
+                with open(self.rules_path) as f:
+                    data = json.load(f)
+                rules = {
+                    name: [ModerationRule.from_dict(rule) for rule in ruleset]
+                    for name, ruleset in data.items()
+                }
+                self.load({**self._defaults, **rules})
+            except (OSError, ValueError, KeyError, re.error) as e:
+                logger.error(f"Keeping previous moderation rules, failed to load {self.rules_path}: {e}")
+                return False
+            finally:
+                self._rules_mtime = mtime
+        logger.info(f"Loaded moderation rules from {self.rules_path}")
+        return True
+
+    def ruleset(self, name: str) -> CompiledRuleSet:
+        self.reload_if_changed()
+        try:
+            return self._compiled[name]
+        except KeyError:
+            raise ValueError(f"Unknown moderation rule set: {name}")
+
+    def _result(self, compiled: CompiledRuleSet, hits: List[int]) -> ScanResult:
+        result = ScanResult()
+        for index in hits:
+            rule = compiled.rules[index]
+            self._hits[f"{compiled.name}:{rule.name}"] += 1
+            result.rules.append(rule.name)
+            if rule.category not in result.flags:
+                result.flags.append(rule.category)
+            if RISK_PRIORITY[rule.risk] > RISK_PRIORITY[result.risk_level]:
+                result.risk_level = rule.risk
+        return result
+
+    def scan(self, text: str, ruleset: str = "content") -> ScanResult:
+        compiled = self.ruleset(ruleset)
+        if not text:
+            return ScanResult()
+        return self._result(compiled, compiled.hits(text))
+
+    def scan_many(self, texts: Sequence[str], ruleset: str = "content") -> List[ScanResult]:
+        """Scan a batch of texts, e.g. a comment backlog or every video title"""
+        compiled = self.ruleset(ruleset)
+        texts = [text or "" for text in texts]
+        return [self._result(compiled, hits) for hits in compiled.hits_many(texts)]
+
+    def hit_counts(self) -> Dict[str, int]:
+        """Matches per "ruleset:rule" since start-up"""
+        return dict(self._hits)
+
+    def reset_hit_counts(self):
+        self._hits.clear()
+
+
+DEFAULT_RULES: Dict[str, List[ModerationRule]] = {
+    # Video metadata and comments scanned by ContentModerationService
+    "content": [
+        ModerationRule("profanity", "profanity", "medium", terms=(
+            "fuck", "fucking", "fucked", "shit", "shitty", "damn", "hell", "bitch", "asshole"
+        )),
+        ModerationRule("insults", "profanity", "medium", terms=("stupid", "idiot", "moron", "retard")),
+        ModerationRule("spam_phrases", "spam", "medium", whole_word=False, terms=(
+            "click here", "buy now", "limited time", "act now", "free money", "make money",
+        )),
+        ModerationRule("spam_money", "spam", "medium", pattern=r"earn \$\d+"),
+        ModerationRule("spam_pharma", "spam", "medium", whole_word=False, terms=("viagra", "cialis", "pharmacy")),
+        ModerationRule("spam_links", "spam", "medium", whole_word=False, terms=("www.", "http://", "https://")),
+        ModerationRule("hate_targeting", "hate_speech", "high", pattern=r"\b(hate|kill|die|death)\s+(all|every)\s+\w+"),
+        ModerationRule("hate_terms", "hate_speech", "high", terms=("nazi", "hitler", "genocide", "terrorist", "terrorism")),
+        ModerationRule("ssn", "personal_info", "medium", pattern=r"\b\d{3}-\d{2}-\d{4}\b"),
+        ModerationRule("credit_card", "personal_info", "medium", pattern=r"\b\d{4}\s?\d{4}\s?\d{4}\s?\d{4}\b"),
+        ModerationRule("email", "personal_info", "medium", pattern=r"\b[A-Za-z0-9._%+-]+@[A-Za-z0-9.-]+\.[A-Za-z]{2,}\b"),
+    ],
+    # Hard blocks applied when a comment is posted
+    "comment": [
+        ModerationRule("blocked_terms", "inappropriate", "high", whole_word=False, terms=("spam", "scam")),
+    ],
+    # Hard blocks applied to chat prompts
+    "prompt": [
+        ModerationRule("banned_words", "blocked", "high", whole_word=False, terms=("badword1", "badword2")),
+    ],
+}
+
+
+_engine: Optional[ModerationEngine] = None
+
+
+def get_moderation_engine() -> ModerationEngine:
+    global _engine
+    if _engine is None:
+        _engine = ModerationEngine(rules_path=os.getenv("MODERATION_RULES_PATH"))
+    return _engine
+
 
 def moderate_prompt(prompt: str) -> bool:
     """
     A simple content moderation filter.
     Returns True if the prompt is clean, False otherwise.
     """
-    banned_words = ["badword1", "badword2"]
-    for word in banned_words:
-        if word in prompt.lower():
-            return False
-    return True
+    return get_moderation_engine().scan(prompt, "prompt").clean
@@ -0,0 +1,255 @@
+# shared_lib/system_sampler.py
+"""
+Background sampling of host and process metrics.
+
+psutil calls that block (`cpu_percent` with an interval) or are slow
+(walking disk partitions, shelling out to system tools) run on a daemon
+thread at a fixed cadence instead of inside request handlers or the
+Discord event loop. Samples go into a fixed-size ring buffer, so readers
+get the latest snapshot without a system call and can ask for counter
+rates and percentiles over a recent window.
+
+Extra probes (GPU or battery details) are plain callables returning a
+dict; each runs on its own, usually longer, interval and its last result
+is merged into every sample.
+"""
+import logging
+import math
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+# Monotonically increasing counters that `rates` turns into per-second values
+COUNTER_FIELDS = (
+    "net_bytes_sent",
+    "net_bytes_recv",
+    "net_packets_sent",
+    "net_packets_recv",
+    "disk_read_bytes",
+    "disk_write_bytes",
+)
+
+MB = 1024 * 1024
+GB = 1024 ** 3
+
+
+@dataclass
+class Probe:
+    collect: Callable[[], Dict[str, Any]]
+    interval: float
+    last_run: float = float("-inf")
+
+
+def percentile(sorted_values: List[float], q: float) -> float:
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return 0.0
+    rank = math.ceil(q / 100 * len(sorted_values))
+    return sorted_values[min(max(rank, 1), len(sorted_values)) - 1]
+
+
+class SystemSampler:
+    """
+    Usage:
+        sampler = SystemSampler(interval=1.0)
+        sampler.start()
+        sampler.latest()["cpu_percent"]
+        sampler.percentiles("cpu_percent", seconds=60)
+    """
+
+    def __init__(
+        self,
+        interval: float = 1.0,
+        history: int = 600,
+        disk_interval: float = 30.0,
+        probes: Optional[Dict[str, tuple]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.interval = interval
+        # Sample timestamps and the sampling cadence; injectable for tests
+        self.clock = clock
+        self.disk_interval = disk_interval
+        self.probes = {
+            name: Probe(collect, probe_interval)
+            for name, (collect, probe_interval) in (probes or {}).items()
+        }
+        self._samples: Deque[Dict[str, Any]] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self._process = psutil.Process()
+        self._disk_usage: Dict[str, Dict[str, float]] = {}
+        self._disk_checked = float("-inf")
+        self._probe_values: Dict[str, Dict[str, Any]] = {}
+        self.sample_errors = 0
+
+    def start(self):
+        """
+        Take a first sample on the calling thread, so readers never see an
+        empty buffer, then keep sampling in the background. Probes first
+        run on the sampling thread, as they may be slow.
+        """
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self.sample_now(run_probes=False)
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, name="system-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: Optional[float] = None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._stop.wait(self._sample_in_background())
+
+    def _sample_in_background(self) -> float:
+        """Take one sample; returns how long to wait before the next."""
+        started = self.clock()
+        try:
+            self.sample_now()
+        except Exception as e:
+            self.sample_errors += 1
+            logger.error(f"Error sampling system metrics: {e}")
+        # Fixed cadence: sleep what is left of the interval (clamped, in case the clock jumps)
+        return min(self.interval, max(0.0, self.interval - (self.clock() - started)))
+
+    def sample_now(self, run_probes: bool = True) -> Dict[str, Any]:
+        """Take one sample and append it to the ring buffer."""
+        now = self.clock()
+        memory = psutil.virtual_memory()
+        sample: Dict[str, Any] = {
+            "timestamp": now,
+            # Since the previous call, i.e. over the last interval
+            "cpu_percent": psutil.cpu_percent(interval=None),
+            "memory_percent": memory.percent,
+            "memory_used_mb": memory.used / MB,
+            "memory_total_mb": memory.total / MB,
+            "memory_available_mb": memory.available / MB,
+            "process_cpu_percent": self._process.cpu_percent(interval=None),
+            "process_rss_mb": self._process.memory_info().rss / MB,
+            "process_threads": self._process.num_threads(),
+        }
+
+        network = psutil.net_io_counters()
+        if network is not None:
+            sample.update({
+                "net_bytes_sent": network.bytes_sent,
+                "net_bytes_recv": network.bytes_recv,
+                "net_packets_sent": network.packets_sent,
+                "net_packets_recv": network.packets_recv,
+            })
+        disk_io = psutil.disk_io_counters()
+        if disk_io is not None:
+            sample.update({
+                "disk_read_bytes": disk_io.read_bytes,
+                "disk_write_bytes": disk_io.write_bytes,
+            })
+
+        if now - self._disk_checked >= self.disk_interval:
+            self._disk_usage = self._collect_disk_usage()
+            self._disk_checked = now
+        sample["disk_usage"] = self._disk_usage
+
+        for name, probe in self.probes.items():
+            if run_probes and now - probe.last_run >= probe.interval:
+                probe.last_run = now
+                try:
+                    self._probe_values[name] = probe.collect()
+                except Exception as e:
+                    logger.debug(f"System probe {name} failed: {e}")
+            sample.update(self._probe_values.get(name, {}))
+
+        with self._lock:
+            self._samples.append(sample)
+        return sample
+
+    @staticmethod
+    def _collect_disk_usage() -> Dict[str, Dict[str, float]]:
+        usage_by_mount = {}
+        for partition in psutil.disk_partitions():
+            try:
+                usage = psutil.disk_usage(partition.mountpoint)
+            except (PermissionError, OSError):
+                continue
+            usage_by_mount[partition.mountpoint] = {
+                "total_gb": round(usage.total / GB, 2),
+                "used_gb": round(usage.used / GB, 2),
+                "free_gb": round(usage.free / GB, 2),
+                "usage_percent": round(usage.used / usage.total * 100, 2) if usage.total else 0.0,
+            }
+        return usage_by_mount
+
+    def latest(self) -> Optional[Dict[str, Any]]:
+        """The most recent sample, or None before the first one."""
+        with self._lock:
+            return self._samples[-1] if self._samples else None
+
+    def window(self, seconds: float) -> List[Dict[str, Any]]:
+        """Samples taken within the last `seconds`, oldest first."""
+        with self._lock:
+            samples = list(self._samples)
+        if not samples:
+            return []
+        cutoff = samples[-1]["timestamp"] - seconds
+        return [sample for sample in samples if sample["timestamp"] >= cutoff]
+
+    def rates(self, seconds: float = 60.0, fields: Iterable[str] = COUNTER_FIELDS) -> Dict[str, float]:
+        """Per-second change of counter fields over the window."""
+        samples = self.window(seconds)
+        if len(samples) < 2:
+            return {}
+        first, last = samples[0], samples[-1]
+        elapsed = last["timestamp"] - first["timestamp"]
+        if elapsed <= 0:
+            return {}
+        return {
+            f"{field}_per_sec": max(0.0, (last[field] - first[field]) / elapsed)
+            for field in fields
+            if field in first and field in last
+        }
+
+    def percentiles(
+        self, field: str, seconds: float = 60.0, quantiles: Iterable[float] = (50, 95, 99)
+    ) -> Dict[str, float]:
+        """Percentiles, mean and max of a gauge field over the window."""
+        values = sorted(s[field] for s in self.window(seconds) if s.get(field) is not None)
+        if not values:
+            return {}
+        stats = {f"p{q:g}": percentile(values, q) for q in quantiles}
+        stats["mean"] = sum(values) / len(values)
+        stats["max"] = values[-1]
+        return stats
+
+    def summary(self, seconds: float = 60.0) -> Dict[str, Any]:
+        """Latest sample plus rates and CPU/memory percentiles over the window."""
+        return {
+            "latest": self.latest(),
+            "window_seconds": seconds,
+            "samples": len(self.window(seconds)),
+            "rates": self.rates(seconds),
+            "cpu_percent": self.percentiles("cpu_percent", seconds),
+            "memory_percent": self.percentiles("memory_percent", seconds),
+            "process_cpu_percent": self.percentiles("process_cpu_percent", seconds),
+        }
+
+
+_sampler: Optional[SystemSampler] = None
+
+
+def get_system_sampler() -> SystemSampler:
+    """The process-wide sampler, started on first use."""
+    global _sampler
+    if _sampler is None:
+        _sampler = SystemSampler()
+        _sampler.start()
+    return _sampler
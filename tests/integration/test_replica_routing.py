@@ -0,0 +1,76 @@
+"""
+Integration tests for replica read routing against a Postgres primary and a
+streaming replica. Set REPLICA_TEST_PRIMARY_URL and REPLICA_TEST_REPLICA_URL
+(asyncpg URLs) to run them.
+"""
+import asyncio
+import os
+import uuid
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from server.web.app.read_routing import ReadRouter
+
+PRIMARY_URL = os.getenv("REPLICA_TEST_PRIMARY_URL")
+REPLICA_URL = os.getenv("REPLICA_TEST_REPLICA_URL")
+
+pytestmark = pytest.mark.skipif(
+    not (PRIMARY_URL and REPLICA_URL),
+    reason="needs a Postgres primary and streaming replica"
+)
+
+
+@pytest.fixture
+async def router():
+    primary = create_async_engine(PRIMARY_URL)
+    replica = create_async_engine(REPLICA_URL)
+    async with primary.begin() as conn:
+        await conn.execute(text("CREATE TABLE IF NOT EXISTS replica_routing_probe (id text PRIMARY KEY)"))
+    yield ReadRouter(
+        primary=async_sessionmaker(primary, class_=AsyncSession),
+        replicas={"replica:0": async_sessionmaker(replica, class_=AsyncSession)},
+        max_lag_seconds=5.0,
+        pin_seconds=5.0,
+        lag_check_interval=0.0
+    )
+    await primary.dispose()
+    await replica.dispose()
+
+
+class TestReplicaRouting:
+
+    async def test_caught_up_replica_serves_reads(self, router):
+        assert await router.choose() == "replica:0"
+        assert router.status()["replica:0"]["lag_seconds"] < 5.0
+
+    async def test_replica_rejects_writes(self, router):
+        async with router.session() as session:
+            with pytest.raises(Exception):
+                await session.execute(text("INSERT INTO replica_routing_probe VALUES ('x')"))
+
+    async def test_read_your_writes(self, router):
+        row_id = str(uuid.uuid4())
+        async with router.primary() as session:
+            await session.execute(text("INSERT INTO replica_routing_probe VALUES (:id)"), {"id": row_id})
+            await session.commit()
+        await router.record_write("writer")
+
+        # Pinned reads see the row immediately, whatever the replica lag
+        async with router.session("writer") as session:
+            found = await session.scalar(
+                text("SELECT count(*) FROM replica_routing_probe WHERE id = :id"), {"id": row_id}
+            )
+        assert found == 1
+
+        # The replica catches up within the lag bound
+        for _ in range(50):
+            async with router.replicas["replica:0"]() as session:
+                found = await session.scalar(
+                    text("SELECT count(*) FROM replica_routing_probe WHERE id = :id"), {"id": row_id}
+                )
+            if found:
+                break
+            await asyncio.sleep(0.1)
+        assert found == 1
@@ -0,0 +1,178 @@
+"""
+Stand-in for the llama.cpp executables used by the client bot tests.
+
+Run with --port it behaves like `llama-server`: /health answers 503 while
+the "model" loads and 200 after, /completion returns JSON or an SSE token
+stream. Run without --port it behaves like `main`: loads, reads the prompt
+from stdin, prints the completion and exits.
+
+Each generated token is "tok{i} " and prompts are tokenized on whitespace.
+Every slot keeps the tokens of its last request as its "KV cache"; with
+cache_prompt only the tokens past the common prefix are evaluated, and
+/slots/{id}?action=save|restore|erase round-trips a slot through a file in
+--slot-save-path. Timings are controlled by the FAKE_LLAMA_LOAD_SECONDS,
+FAKE_LLAMA_TOKEN_SECONDS and FAKE_LLAMA_PROMPT_TOKEN_SECONDS environment
+variables, and reported the way llama.cpp does: a `timings` object in the
+server's final response, `llama_print_timings:` lines on stderr for `main`.
+"""
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+LOAD_SECONDS = float(os.environ.get("FAKE_LLAMA_LOAD_SECONDS", "0.2"))
+TOKEN_SECONDS = float(os.environ.get("FAKE_LLAMA_TOKEN_SECONDS", "0.001"))
+PROMPT_TOKEN_SECONDS = float(os.environ.get("FAKE_LLAMA_PROMPT_TOKEN_SECONDS", "0"))
+
+
+def generate(n_predict):
+    for i in range(n_predict):
+        time.sleep(TOKEN_SECONDS)
+        yield f"tok{i} "
+
+
+def common_prefix(a, b):
+    n = 0
+    while n < len(a) and n < len(b) and a[n] == b[n]:
+        n += 1
+    return n
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    ready = threading.Event()
+    slot_save_path = None
+    # slot id -> tokens held in its KV cache
+    slots = {}
+
+    def log_message(self, format, *args):
+        pass
+
+    def _json(self, status, body):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            return self._json(404, {"error": "not found"})
+        if not self.ready.is_set():
+            return self._json(503, {"error": {"message": "Loading model"}})
+        self._json(200, {"status": "ok"})
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        if self.path.startswith("/slots/"):
+            return self._slot_action(body)
+        if self.path != "/completion":
+            return self._json(404, {"error": "not found"})
+        n_predict = int(body.get("n_predict", 16))
+        slot = int(body.get("id_slot", 0))
+        started = time.perf_counter()
+
+        # Prompt evaluation, skipping the prefix already in the slot
+        prompt = body.get("prompt", "").split()
+        cached = common_prefix(self.slots.get(slot, []), prompt) if body.get("cache_prompt") else 0
+        time.sleep(PROMPT_TOKEN_SECONDS * (len(prompt) - cached))
+        prompt_ms = (time.perf_counter() - started) * 1000
+        final = {
+            "content": "",
+            "stop": True,
+            "id_slot": slot,
+            "tokens_evaluated": len(prompt),
+            "tokens_predicted": n_predict,
+            "timings": {"prompt_n": len(prompt) - cached, "prompt_ms": prompt_ms, "predicted_n": n_predict},
+        }
+        generated = []
+
+        if not body.get("stream"):
+            content = "".join(generate(n_predict))
+            self.slots[slot] = prompt + content.split()
+            final["content"] = content
+            final["timings"]["predicted_ms"] = (time.perf_counter() - started) * 1000 - prompt_ms
+            return self._json(200, final)
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        for token in generate(n_predict):
+            generated.append(token.strip())
+            self.wfile.write(f"data: {json.dumps({'content': token, 'stop': False})}\n\n".encode())
+            self.wfile.flush()
+        self.slots[slot] = prompt + generated
+        final["timings"]["predicted_ms"] = (time.perf_counter() - started) * 1000 - prompt_ms
+        self.wfile.write(f"data: {json.dumps(final)}\n\n".encode())
+        self.wfile.flush()
+        self.close_connection = True
+
+    def _slot_action(self, body):
+        slot = int(self.path.split("/")[2].split("?")[0])
+        action = self.path.split("action=")[-1]
+        if action == "erase":
+            self.slots.pop(slot, None)
+            return self._json(200, {"id_slot": slot})
+        if not self.slot_save_path:
+            return self._json(501, {"error": "slot save path not set"})
+        path = os.path.join(self.slot_save_path, body["filename"])
+        if action == "save":
+            with open(path, "w") as f:
+                json.dump(self.slots.get(slot, []), f)
+            return self._json(200, {"id_slot": slot, "n_saved": len(self.slots.get(slot, []))})
+        if action == "restore":
+            if not os.path.exists(path):
+                return self._json(400, {"error": "file not found"})
+            with open(path) as f:
+                self.slots[slot] = json.load(f)
+            return self._json(200, {"id_slot": slot, "n_restored": len(self.slots[slot])})
+        return self._json(400, {"error": f"unknown action {action}"})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m", "--model")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int)
+    parser.add_argument("-n", "--n-predict", type=int, default=16)
+    parser.add_argument("-np", "--parallel", type=int, default=1)
+    parser.add_argument("--slot-save-path")
+    args, _ = parser.parse_known_args()
+
+    if args.port is None:
+        started = time.perf_counter()
+        time.sleep(LOAD_SECONDS)
+        load_ms = (time.perf_counter() - started) * 1000
+        prompt = sys.stdin.read().split()
+        time.sleep(PROMPT_TOKEN_SECONDS * len(prompt))
+        prompt_ms = (time.perf_counter() - started) * 1000 - load_ms
+        sys.stdout.write("".join(generate(args.n_predict)))
+        total_ms = (time.perf_counter() - started) * 1000
+        eval_ms = total_ms - load_ms - prompt_ms
+        sys.stderr.write(
+            f"llama_print_timings:        load time = {load_ms:10.2f} ms\n"
+            f"llama_print_timings: prompt eval time = {prompt_ms:10.2f} ms / {len(prompt):5d} tokens\n"
+            f"llama_print_timings:        eval time = {eval_ms:10.2f} ms / {args.n_predict:5d} runs\n"
+            f"llama_print_timings:       total time = {total_ms:10.2f} ms / {len(prompt) + args.n_predict:5d} tokens\n"
+        )
+        return
+
+    Handler.slot_save_path = args.slot_save_path
+    server = ThreadingHTTPServer((args.host, args.port), Handler)
+    server.daemon_threads = True
+
+    def load():
+        time.sleep(LOAD_SECONDS)
+        Handler.ready.set()
+
+    threading.Thread(target=load, daemon=True).start()
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
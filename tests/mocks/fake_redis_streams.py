@@ -0,0 +1,204 @@
+"""
+In-memory stand-in for the Redis Streams commands used by the chat bus.
+
+Several FakeRedis clients can share one FakeRedisServer, the way separate
+web worker processes share a Redis instance. Reply shapes follow
+redis-py's RESP2 parsing with decode_responses=True.
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+
+def _parse_id(entry_id: str) -> Tuple[int, int]:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+class _Stream:
+
+    def __init__(self):
+        self.entries: List[Tuple[str, Dict[str, str]]] = []
+        # group -> {"last": id, "pending": {id: (consumer, delivered_at)}}
+        self.groups: Dict[str, Dict] = {}
+        self.last_id = (0, 0)
+
+
+class FakeRedisServer:
+
+    def __init__(self):
+        self.streams: Dict[str, _Stream] = {}
+        self.ttls: Dict[str, int] = {}
+        self.changed = asyncio.Condition()
+
+    def client(self) -> "FakeRedis":
+        return FakeRedis(self)
+
+
+class _Pipeline:
+
+    def __init__(self, client: "FakeRedis"):
+        self.client = client
+        self.calls = []
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def __getattr__(self, name):
+        def queue(*args, **kwargs):
+            self.calls.append((name, args, kwargs))
+        return queue
+
+    async def execute(self):
+        return [await getattr(self.client, name)(*args, **kwargs) for name, args, kwargs in self.calls]
+
+
+class FakeRedis:
+
+    def __init__(self, server: FakeRedisServer):
+        self.server = server
+        self.closed = False
+
+    def pipeline(self, transaction: bool = True) -> _Pipeline:
+        return _Pipeline(self)
+
+    async def close(self):
+        self.closed = True
+
+    async def xadd(self, name, fields, maxlen=None, approximate=True):
+        stream = self.server.streams.setdefault(name, _Stream())
+        ms = int(time.time() * 1000)
+        last_ms, last_seq = stream.last_id
+        new_id = (ms, 0) if ms > last_ms else (last_ms, last_seq + 1)
+        stream.last_id = new_id
+        entry_id = f"{new_id[0]}-{new_id[1]}"
+        stream.entries.append((entry_id, {k: str(v) for k, v in fields.items()}))
+        if maxlen is not None and len(stream.entries) > maxlen:
+            del stream.entries[:len(stream.entries) - maxlen]
+        async with self.server.changed:
+            self.server.changed.notify_all()
+        return entry_id
+
+    async def expire(self, name, seconds):
+        self.server.ttls[name] = seconds
+        return name in self.server.streams
+
+    async def delete(self, *names):
+        removed = 0
+        for name in names:
+            removed += self.server.streams.pop(name, None) is not None
+            self.server.ttls.pop(name, None)
+        return removed
+
+    async def xrevrange(self, name, max="+", min="-", count=None):
+        entries = list(reversed(self.server.streams.get(name, _Stream()).entries))
+        return entries[:count] if count else entries
+
+    async def _wait(self, read, block):
+        result = read()
+        if result or block is None:
+            return result
+        deadline = time.monotonic() + block / 1000
+        async with self.server.changed:
+            while not result:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    await asyncio.wait_for(self.server.changed.wait(), remaining)
+                except asyncio.TimeoutError:
+                    pass
+                result = read()
+        return result
+
+    async def xread(self, streams, count=None, block=None):
+        def read():
+            result = []
+            for name, last_id in streams.items():
+                stream = self.server.streams.get(name)
+                if stream is None:
+                    continue
+                after = stream.last_id if last_id == "$" else _parse_id(last_id)
+                entries = [e for e in stream.entries if _parse_id(e[0]) > after][:count]
+                if entries:
+                    result.append([name, entries])
+            return result
+        return await self._wait(read, block) or []
+
+    async def xgroup_create(self, name, groupname, id="$", mkstream=False):
+        if name not in self.server.streams:
+            if not mkstream:
+                raise ResponseError("ERR The XGROUP subcommand requires the key to exist")
+            self.server.streams[name] = _Stream()
+        stream = self.server.streams[name]
+        if groupname in stream.groups:
+            raise ResponseError("BUSYGROUP Consumer Group name already exists")
+        last = stream.last_id if id == "$" else _parse_id(id)
+        stream.groups[groupname] = {"last": last, "pending": {}}
+        return True
+
+    async def xreadgroup(self, groupname, consumername, streams, count=None, block=None, noack=False):
+        def read():
+            result = []
+            for name, last_id in streams.items():
+                stream = self.server.streams[name]
+                group = stream.groups[groupname]
+                entries = [e for e in stream.entries if _parse_id(e[0]) > group["last"]][:count]
+                if entries:
+                    group["last"] = _parse_id(entries[-1][0])
+                    for entry_id, _ in entries:
+                        group["pending"][entry_id] = (consumername, time.monotonic())
+                    result.append([name, entries])
+            return result
+        return await self._wait(read, block) or []
+
+    async def xack(self, name, groupname, *ids):
+        pending = self.server.streams[name].groups[groupname]["pending"]
+        return sum(pending.pop(entry_id, None) is not None for entry_id in ids)
+
+    async def xpending_range(self, name, groupname, min, max, count, consumername=None, idle=None):
+        pending = self.server.streams[name].groups[groupname]["pending"]
+        now = time.monotonic()
+        exclusive = min.startswith("(")
+        low = None if min == "-" else _parse_id(min.lstrip("("))
+        result = []
+        for entry_id, (consumer, delivered_at) in sorted(pending.items(), key=lambda item: _parse_id(item[0])):
+            key = _parse_id(entry_id)
+            if low is not None and (key <= low if exclusive else key < low):
+                continue
+            idle_ms = int((now - delivered_at) * 1000)
+            if (idle is not None and idle_ms < idle) or (consumername and consumer != consumername):
+                continue
+            result.append({
+                "message_id": entry_id, "consumer": consumer,
+                "time_since_delivered": idle_ms, "times_delivered": 1,
+            })
+            if len(result) == count:
+                break
+        return result
+
+    async def xclaim(self, name, groupname, consumername, min_idle_time, message_ids):
+        stream = self.server.streams[name]
+        pending = stream.groups[groupname]["pending"]
+        now = time.monotonic()
+        entries = dict(stream.entries)
+        claimed = []
+        for entry_id in message_ids:
+            if entry_id not in pending or (now - pending[entry_id][1]) * 1000 < min_idle_time:
+                continue
+            if entry_id not in entries:
+                # Trimmed while pending: Redis drops it from the pending list
+                del pending[entry_id]
+                continue
+            pending[entry_id] = (consumername, now)
+            claimed.append((entry_id, entries[entry_id]))
+        return claimed
+
+    def pending(self, name: str, groupname: str) -> Dict[str, str]:
+        """Pending entry id -> consumer (test helper)."""
+        return {k: v[0] for k, v in self.server.streams[name].groups[groupname]["pending"].items()}
@@ -7,6 +7,7 @@ from datetime import datetime, timedelta
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from server.web.app.services.admin_video_service import AdminVideoService
+from server.web.app.services.tag_index_service import TagIndexService
 from server.web.app.models import (
     User, Video, TranscodingJob, ViewSession, VideoComment, VideoLike,
     VideoStatus, TranscodingStatus, VideoVisibility
@@ -285,6 +286,24 @@ class TestAdminVideoService:
         await db_session.refresh(sample_video)
         assert sample_video.status == VideoStatus.deleted
     
+    async def test_bulk_delete_videos_updates_tag_index(
+        self, 
+        admin_service: AdminVideoService, 
+        db_session: AsyncSession,
+        sample_video: Video
+    ):
+        """Test bulk deleting videos removes their tags from the tag index."""
+        tag_index = TagIndexService(db_session)
+        sample_video.tags = ["gaming", "music"]
+        await tag_index.add_video(sample_video)
+        await db_session.commit()
+        
+        await admin_service.bulk_delete_videos(db_session, [sample_video.id])
+        await admin_service.bulk_delete_videos(db_session, [sample_video.id])
+        
+        assert await tag_index.get_popular_tags() == []
+        assert await tag_index.get_related_tags("gaming") == []
+    
     async def test_get_storage_usage_report(
         self, 
         admin_service: AdminVideoService, 
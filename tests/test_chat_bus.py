@@ -0,0 +1,222 @@
+"""
+Tests for the Redis Streams chat bus, with several web workers and server
+bot consumers sharing one in-memory Redis.
+"""
+import asyncio
+import uuid
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+from fastapi import WebSocketDisconnect
+
+from server.server_bot.session_dispatcher import SessionDispatcher
+from server.web.app.services.chat_bus import ChatBus, ChatResponseTimeout
+from server.web.app.services.chat_service import ChatService
+from shared_lib.schemas import Request
+from tests.mocks.fake_redis_streams import FakeRedisServer
+
+
+@pytest.fixture
+def redis_server():
+    return FakeRedisServer()
+
+
+def worker_bus(redis_server):
+    """A ChatBus as one web worker or bot process would open it."""
+    return ChatBus(redis_server.client())
+
+
+async def answer(bot_bus, consumer="bot", chunks=("Hel", "lo"), handled=None):
+    """Play the server bot: take one request and stream a response."""
+    while True:
+        entries = await bot_bus.read_requests(consumer, block_ms=50)
+        for entry_id, message in entries:
+            if handled is not None:
+                handled.append(message)
+            if message["action"] == "send_message":
+                for i, chunk in enumerate(chunks):
+                    await bot_bus.publish_response(message["session_id"], {
+                        "request_id": message["request_id"],
+                        "text": chunk,
+                        "is_complete": i == len(chunks) - 1,
+                    })
+            await bot_bus.ack_request(entry_id)
+            return message
+
+
+class TestChatBus:
+
+    async def test_request_and_response_across_workers(self, redis_server):
+        web_a, web_b, bot = worker_bus(redis_server), worker_bus(redis_server), worker_bus(redis_server)
+        after_id = await web_b.latest_response_id("s1")
+
+        await web_a.publish_request({"action": "send_message", "session_id": "s1", "request_id": "r1"})
+        await answer(bot)
+        frame = await web_b.wait_for_response("s1", "r1", after_id, timeout=1)
+
+        assert frame["text"] == "Hello" and frame["is_complete"]
+        assert redis_server.ttls["chat:responses:s1"] == ChatBus.RESPONSE_TTL
+
+    async def test_consumers_share_the_request_stream(self, redis_server):
+        web, bot_1, bot_2 = (worker_bus(redis_server) for _ in range(3))
+        for i in range(4):
+            await web.publish_request({"action": "create_session", "session_id": f"s{i}"})
+
+        first = await bot_1.read_requests("bot-1", count=2, block_ms=10)
+        second = await bot_2.read_requests("bot-2", count=2, block_ms=10)
+
+        sessions = [message["session_id"] for _, message in first + second]
+        assert sorted(sessions) == ["s0", "s1", "s2", "s3"]
+
+    async def test_unacknowledged_request_is_reclaimed(self, redis_server):
+        web, crashed, survivor = (worker_bus(redis_server) for _ in range(3))
+        await web.publish_request({"action": "create_session", "session_id": "s1"})
+        [(entry_id, _)] = await crashed.read_requests("bot-1", block_ms=10)
+
+        survivor.CLAIM_IDLE_MS = 0
+        reclaimed = await survivor.read_requests("bot-2", block_ms=10)
+        await survivor.ack_request(entry_id)
+
+        assert reclaimed == [(entry_id, {"action": "create_session", "session_id": "s1"})]
+        assert redis_server.client().pending(ChatBus.REQUEST_STREAM, ChatBus.CONSUMER_GROUP) == {}
+
+    async def test_slow_handler_not_redelivered_to_its_own_consumer(self, redis_server):
+        web, bot = worker_bus(redis_server), worker_bus(redis_server)
+        bot.CLAIM_IDLE_MS = 20
+        handled = []
+
+        async def handle(message):
+            # Blocks well past the claim idle time
+            await asyncio.sleep(0.15)
+            handled.append(message["session_id"])
+
+        dispatcher = SessionDispatcher(handle)
+        await web.publish_request({"action": "send_message", "session_id": "s1"})
+        # The server bot's read loop, reading on while the handler runs
+        deadline = asyncio.get_running_loop().time() + 0.3
+        while asyncio.get_running_loop().time() < deadline:
+            for entry_id, message in await bot.read_requests("bot-1", block_ms=10):
+                await dispatcher.submit(
+                    message["session_id"], message, on_done=lambda entry_id=entry_id: bot.ack_request(entry_id)
+                )
+        await dispatcher.close()
+
+        assert handled == ["s1"]
+        assert redis_server.client().pending(ChatBus.REQUEST_STREAM, ChatBus.CONSUMER_GROUP) == {}
+
+    async def test_resume_from_last_seen_id(self, redis_server):
+        bus = worker_bus(redis_server)
+        ids = [await bus.publish_response("s1", {"request_id": "r1", "text": t}) for t in "abc"]
+
+        resumed = await bus.read_responses("s1", ids[0], block_ms=None)
+
+        assert [frame["text"] for _, frame in resumed] == ["b", "c"]
+        assert await bus.latest_response_id("s1") == ids[-1]
+        assert await bus.latest_response_id("unknown") == "0-0"
+
+    async def test_close_closes_the_client(self, redis_server):
+        bus = worker_bus(redis_server)
+
+        await bus.close()
+
+        assert bus.client.closed
+
+    async def test_wait_for_response_skips_other_requests(self, redis_server):
+        bus = worker_bus(redis_server)
+        await bus.publish_response("s1", {"request_id": "other", "text": "x", "is_complete": True})
+        await bus.publish_response("s1", {"request_id": "r1", "text": "y", "is_complete": True})
+
+        frame = await bus.wait_for_response("s1", "r1", "0-0", timeout=1)
+
+        assert frame["text"] == "y"
+        with pytest.raises(ChatResponseTimeout):
+            await bus.wait_for_response("s1", "never", "0-0", timeout=0.05)
+
+
+class FakeWebSocket:
+    """Feeds prompts to ChatService and records what it sends back."""
+
+    def __init__(self, prompts=(), last_id=None):
+        self.prompts = asyncio.Queue()
+        for prompt in prompts:
+            self.prompts.put_nowait(prompt)
+        self.query_params = {"last_id": last_id} if last_id else {}
+        self.sent = []
+
+    async def accept(self):
+        pass
+
+    async def receive_text(self):
+        prompt = await self.prompts.get()
+        if prompt is None:
+            raise WebSocketDisconnect()
+        return prompt
+
+    async def send_json(self, data):
+        self.sent.append(data)
+
+    def disconnect(self):
+        self.prompts.put_nowait(None)
+
+
+@pytest.fixture
+def chat_service_for(redis_server, monkeypatch):
+    monkeypatch.setenv("PAYLOAD_ENCRYPTION_KEY", "00" * 32)
+
+    def make():
+        app = SimpleNamespace(state=SimpleNamespace(chat_bus=worker_bus(redis_server)))
+        return ChatService(SimpleNamespace(app=app))
+    return make
+
+
+async def wait_until(condition, timeout=2):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline
+        await asyncio.sleep(0.01)
+
+
+class TestChatServiceOnBus:
+
+    async def test_send_message_answered_through_another_worker(self, redis_server, chat_service_for):
+        service = chat_service_for()
+        bot = worker_bus(redis_server)
+        request = Request(session_id=uuid.uuid4(), request_id=uuid.uuid4(), prompt="hi")
+
+        bot_task = asyncio.create_task(answer(bot))
+        response = await service.send_message(MagicMock(), request)
+        message = await bot_task
+
+        assert response.response == "Hello"
+        assert message["request_id"] == str(request.request_id)
+        assert isinstance(message["prompt"], str)
+
+    async def test_websocket_fan_out_and_resume(self, redis_server, chat_service_for):
+        bot = worker_bus(redis_server)
+        sender = FakeWebSocket(prompts=["hi"])
+        watcher = FakeWebSocket()
+        sessions = [
+            asyncio.create_task(chat_service_for().handle_websocket(ws, "s1", MagicMock()))
+            for ws in (sender, watcher)
+        ]
+        await asyncio.sleep(0.05)
+
+        await answer(bot)
+        await wait_until(lambda: len(sender.sent) == 2 and len(watcher.sent) == 2)
+        for ws in (sender, watcher):
+            ws.disconnect()
+        await asyncio.gather(*sessions)
+
+        assert [f["content"] for f in sender.sent] == ["Hel", "lo"]
+        assert watcher.sent == sender.sent
+        assert sender.sent[-1]["is_complete"]
+
+        # A client that only saw the first frame reconnects and gets the rest
+        resumed = FakeWebSocket(last_id=sender.sent[0]["id"])
+        session = asyncio.create_task(chat_service_for().handle_websocket(resumed, "s1", MagicMock()))
+        await wait_until(lambda: len(resumed.sent) == 1)
+        resumed.disconnect()
+        await session
+
+        assert resumed.sent == sender.sent[1:]
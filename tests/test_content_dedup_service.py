@@ -0,0 +1,207 @@
+"""
+Tests for content-addressed deduplication of video originals.
+"""
+import io
+import hashlib
+import pytest
+import uuid
+from unittest.mock import AsyncMock, MagicMock
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.services.content_dedup_service import ContentDedupService, hash_stream
+from server.web.app.models import (
+    User, Video, VideoContent, TranscodingJob, VideoStatus, TranscodingStatus
+)
+
+CONTENT_HASH = hashlib.sha256(b"video bytes").hexdigest()
+
+
+@pytest.fixture
+async def dedup_service(db_session: AsyncSession):
+    return ContentDedupService(db_session)
+
+
+@pytest.fixture
+async def sample_user(db_session: AsyncSession):
+    user = User(
+        id=uuid.uuid4(),
+        display_label="Test Creator",
+        email="creator@example.com"
+    )
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+async def make_video(db_session: AsyncSession, user: User, s3_key: str) -> Video:
+    video = Video(
+        id=uuid.uuid4(),
+        creator_id=user.id,
+        title="Test Video",
+        original_filename="test.mp4",
+        original_s3_key=s3_key,
+        file_size=1024,
+        duration_seconds=60,
+        status=VideoStatus.processing
+    )
+    db_session.add(video)
+    await db_session.commit()
+    return video
+
+
+@pytest.fixture
+async def source_video(db_session: AsyncSession, sample_user: User, dedup_service: ContentDedupService):
+    video = await make_video(db_session, sample_user, "videos/original.mp4")
+    await dedup_service.register(video, CONTENT_HASH, fingerprint="fp")
+    db_session.add(TranscodingJob(
+        video_id=video.id,
+        quality_preset="720p_30fps",
+        target_resolution="1280x720",
+        target_framerate=30,
+        target_bitrate=2500,
+        status=TranscodingStatus.completed,
+        progress_percent=100,
+        output_s3_key=f"transcoded/{video.id}/720p_30fps/video.mp4",
+        hls_manifest_s3_key=f"transcoded/{video.id}/720p_30fps/segments/playlist.m3u8"
+    ))
+    await db_session.commit()
+    return video
+
+
+class TestContentDedupService:
+
+    def test_hash_stream_matches_sha256(self):
+        data = b"x" * (3 * 1024 * 1024 + 17)
+        assert hash_stream(io.BytesIO(data)).hexdigest() == hashlib.sha256(data).hexdigest()
+
+    def test_fingerprint_ignores_small_size_differences(self):
+        a = ContentDedupService.compute_fingerprint(120.2, "1920x1080", "H264", 50 * 1024 * 1024)
+        b = ContentDedupService.compute_fingerprint(119.8, "1920x1080", "h264", 50 * 1024 * 1024 + 10)
+        c = ContentDedupService.compute_fingerprint(120.0, "1280x720", "h264", 50 * 1024 * 1024)
+
+        assert a == b
+        assert a != c
+
+    async def test_register_and_find(self, dedup_service, source_video):
+        content = await dedup_service.find_by_hash(CONTENT_HASH)
+
+        assert content.ref_count == 1
+        assert content.source_video_id == source_video.id
+        assert content.original_s3_key == "videos/original.mp4"
+        assert source_video.content_hash == CONTENT_HASH
+        assert [c.id for c in await dedup_service.find_similar("fp")] == [content.id]
+
+    async def test_duplicate_reuses_original_and_renditions(
+        self, db_session, dedup_service, sample_user, source_video
+    ):
+        duplicate = await make_video(db_session, sample_user, "videos/duplicate.mp4")
+        content = await dedup_service.find_by_hash(CONTENT_HASH)
+
+        await dedup_service.add_reference(content, duplicate)
+        cloned = await dedup_service.clone_renditions(content, duplicate, ["720p_30fps", "1080p_30fps"])
+
+        await db_session.refresh(content)
+        assert content.ref_count == 2
+        assert duplicate.original_s3_key == "videos/original.mp4"
+        assert cloned == ["720p_30fps"]
+
+        jobs = (await db_session.execute(
+            select(TranscodingJob).where(TranscodingJob.video_id == duplicate.id)
+        )).scalars().all()
+        assert len(jobs) == 1
+        assert jobs[0].status == TranscodingStatus.completed
+        assert jobs[0].output_s3_key == f"transcoded/{source_video.id}/720p_30fps/video.mp4"
+
+    async def test_release_keeps_shared_objects(
+        self, db_session, dedup_service, sample_user, source_video
+    ):
+        duplicate = await make_video(db_session, sample_user, "videos/duplicate.mp4")
+        content = await dedup_service.find_by_hash(CONTENT_HASH)
+        await dedup_service.add_reference(content, duplicate)
+        await dedup_service.clone_renditions(content, duplicate, ["720p_30fps"])
+
+        # Releasing the source hands rendition reuse to the duplicate
+        source_video.status = VideoStatus.deleted
+        released = await dedup_service.release(source_video)
+
+        await db_session.refresh(content)
+        assert released == []
+        assert content.ref_count == 1
+        assert content.source_video_id == duplicate.id
+
+        # Releasing the last reference frees the original and renditions
+        released = await dedup_service.release(duplicate)
+
+        assert sorted(released) == sorted([
+            "videos/original.mp4",
+            f"transcoded/{source_video.id}/720p_30fps/video.mp4",
+            f"transcoded/{source_video.id}/720p_30fps/segments/playlist.m3u8",
+        ])
+        assert await dedup_service.find_by_hash(CONTENT_HASH) is None
+
+    async def test_release_unhashed_video(self, db_session, dedup_service, sample_user):
+        video = await make_video(db_session, sample_user, "videos/legacy.mp4")
+
+        assert await dedup_service.release(video) == ["videos/legacy.mp4"]
+
+    async def test_settle_hash_registers_new_original(self, db_session, dedup_service, sample_user):
+        video = await make_video(db_session, sample_user, "videos/new.mp4")
+
+        assert await dedup_service.settle_hash(video, CONTENT_HASH) is None
+
+        content = await dedup_service.find_by_hash(CONTENT_HASH)
+        assert content.source_video_id == video.id
+        assert await dedup_service.completed_rendition(content, video, "720p_30fps") is None
+
+    async def test_settle_hash_references_identical_original_once(
+        self, db_session, dedup_service, sample_user, source_video
+    ):
+        duplicate = await make_video(db_session, sample_user, "videos/duplicate.mp4")
+
+        # Two rungs of the duplicate hash the source; only the first settles it
+        assert await dedup_service.settle_hash(duplicate, CONTENT_HASH) == "videos/duplicate.mp4"
+        assert await dedup_service.settle_hash(duplicate, CONTENT_HASH) is None
+
+        content = await dedup_service.find_by_hash(CONTENT_HASH)
+        await db_session.refresh(content)
+        assert content.ref_count == 2
+        assert duplicate.original_s3_key == "videos/original.mp4"
+
+        rendition = await dedup_service.completed_rendition(content, duplicate, "720p_30fps")
+        assert rendition.video_id == source_video.id
+        assert await dedup_service.completed_rendition(content, duplicate, "1080p_30fps") is None
+
+    async def test_worker_reuses_rendition_of_identical_upload(
+        self, db_session, sample_user, source_video, tmp_path, monkeypatch
+    ):
+        transcoding_worker = pytest.importorskip(
+            "server.web.app.services.transcoding_worker", exc_type=ImportError
+        )
+        monkeypatch.setattr(transcoding_worker, "HLSService", MagicMock())
+        duplicate = await make_video(db_session, sample_user, "videos/duplicate.mp4")
+        worker = transcoding_worker.TranscodingWorker("sqlite+aiosqlite:///:memory:", temp_dir=str(tmp_path))
+        worker.async_session = lambda: _SessionContext(db_session)
+        worker.s3_service = AsyncMock()
+        source = tmp_path / "input.mp4"
+        source.write_bytes(b"video bytes")
+        job = {"job_id": "job-1", "video_id": duplicate.id, "quality_preset": "720p_30fps"}
+
+        assert await worker._dedup_source(job, str(source)) is None
+        rendition = await worker._dedup_source({**job, "hash_source": True}, str(source))
+
+        assert rendition.output_s3_key == f"transcoded/{source_video.id}/720p_30fps/video.mp4"
+        worker.s3_service.delete_video.assert_awaited_once_with("videos/duplicate.mp4")
+
+
+class _SessionContext:
+    """The test session standing in for a worker's sessionmaker context"""
+
+    def __init__(self, session):
+        self.session = session
+
+    async def __aenter__(self):
+        return self.session
+
+    async def __aexit__(self, *exc):
+        return False
@@ -0,0 +1,37 @@
+"""
+Tests for the shared FastAPI dependencies.
+"""
+import pytest
+from fastapi import HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from server.web.app.dependencies import require_admin_user
+from server.web.app.models import Base, User
+
+
+@pytest.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+class TestRequireAdminUser:
+
+    async def test_users_are_not_admins_by_default(self, db):
+        user = User(display_label="viewer")
+        db.add(user)
+        await db.commit()
+
+        with pytest.raises(HTTPException) as exc_info:
+            await require_admin_user(user)
+
+        assert exc_info.value.status_code == 403
+
+    async def test_admin_passes(self):
+        admin = User(display_label="admin", is_admin=True)
+
+        assert await require_admin_user(admin) is admin
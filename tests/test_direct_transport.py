@@ -0,0 +1,221 @@
+"""
+Loopback tests for the direct bot-to-bot link: both transport ends run in
+process over 127.0.0.1, without Discord.
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+
+import aiohttp
+import pytest
+from aiohttp import web
+
+from client_bot.direct_transport import DIRECT_FRAME_CHARS, DirectLinkClient
+from client_bot.stream_coalescer import StreamCoalescer
+from server.server_bot.direct_transport import DirectLinkServer
+from server.server_bot.stream_assembler import StreamAssembler
+
+
+class AESGCMEncryptor:
+    """The bots' payload framing: random nonce + AES-GCM, base64."""
+
+    def __init__(self, key=None):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.key = key or AESGCM.generate_key(bit_length=256)
+        self.aesgcm = AESGCM(self.key)
+
+    def encrypt(self, data):
+        nonce = os.urandom(12)
+        return base64.b64encode(nonce + self.aesgcm.encrypt(nonce, json.dumps(data).encode("utf-8"), None)).decode()
+
+    def decrypt(self, data):
+        raw = base64.b64decode(data)
+        return json.loads(self.aesgcm.decrypt(raw[:12], raw[12:], None))
+
+
+class Recorder:
+
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.frames = []
+        self.received = asyncio.Event()
+
+    async def __call__(self, kind, payload):
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.frames.append((kind, payload))
+        self.received.set()
+
+
+@pytest.fixture
+def key():
+    return AESGCMEncryptor()
+
+
+@pytest.fixture
+async def link(key):
+    server_frames = Recorder()
+    client_frames = Recorder()
+    server = DirectLinkServer(key, server_frames)
+    await server.start()
+    client = DirectLinkClient(AESGCMEncryptor(key.key), f"ws://127.0.0.1:{server.port}/bot-link", client_frames)
+    client.start()
+    await client.wait_connected(timeout=5)
+    yield server, client, server_frames, client_frames
+    await client.stop()
+    await server.stop()
+
+
+class TestDirectLink:
+
+    async def test_round_trip(self, link):
+        server, client, server_frames, client_frames = link
+
+        assert await server.send("request", {"request_id": "r1", "prompt": "hi"})
+        await asyncio.wait_for(client_frames.received.wait(), 5)
+        assert await client.send("response", {"request_id": "r1", "response": "hello"})
+        await asyncio.wait_for(server_frames.received.wait(), 5)
+
+        assert client_frames.frames == [("request", {"request_id": "r1", "prompt": "hi"})]
+        assert server_frames.frames == [("response", {"request_id": "r1", "response": "hello"})]
+        assert server.metrics()["direct_link_connected"]
+
+    async def test_streamed_response_reassembled(self, link):
+        server, client, server_frames, _ = link
+        assembler = StreamAssembler()
+        coalescer = StreamCoalescer(
+            lambda frame: client.send("response", frame),
+            {"session_id": "s1", "request_id": "r1"},
+            flush_interval=0.005,
+            max_chars=DIRECT_FRAME_CHARS
+        )
+        expected = "".join(f"tok{i} " for i in range(200))
+
+        for i in range(200):
+            await coalescer.add(f"tok{i} ")
+            if i % 20 == 0:
+                await asyncio.sleep(0.01)
+        await coalescer.close()
+        while not server_frames.frames or not server_frames.frames[-1][1]["is_complete"]:
+            await asyncio.sleep(0.01)
+
+        texts, full = [], None
+        for _, frame in server_frames.frames:
+            delivered, complete = assembler.add(frame)
+            texts.extend(delivered)
+            full = complete or full
+        assert "".join(texts) == full == expected
+
+    async def test_wrong_key_is_rejected(self, link):
+        server, _, _, _ = link
+        intruder = DirectLinkClient(AESGCMEncryptor(), f"ws://127.0.0.1:{server.port}/bot-link", Recorder())
+        intruder.start()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await intruder.wait_connected(timeout=0.5)
+        await intruder.stop()
+        assert server.rejected >= 1
+
+    async def test_replayed_hello_is_rejected(self, key):
+        server = DirectLinkServer(key, Recorder())
+        hello = {"kind": "hello", "payload": {"ts": time.time(), "nonce": "abc"}}
+
+        assert server._fresh_hello(hello)
+        assert not server._fresh_hello(hello)
+        assert not server._fresh_hello({"kind": "hello", "payload": {"ts": time.time() - 3600, "nonce": "def"}})
+
+    async def test_welcome_echoes_nonce_and_frames_are_sequenced(self, key):
+        handler = Recorder()
+        server = DirectLinkServer(key, handler)
+        await server.start()
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(f"ws://127.0.0.1:{server.port}/bot-link") as ws:
+                await ws.send_str(key.encrypt({"kind": "hello", "payload": {"ts": time.time(), "nonce": "n1"}}))
+                welcome = key.decrypt((await ws.receive(timeout=5)).data)
+                await ws.send_str(key.encrypt({"kind": "response", "payload": {"i": 1}, "link": "n1", "seq": 1}))
+                # Replayed
+                await ws.send_str(key.encrypt({"kind": "response", "payload": {"i": 1}, "link": "n1", "seq": 1}))
+                closed = await ws.receive(timeout=5)
+        await server.stop()
+
+        assert welcome == {"kind": "welcome", "payload": {"nonce": "n1"}}
+        assert closed.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED)
+        assert handler.frames == [("response", {"i": 1})]
+        assert server.rejected == 1
+
+    async def test_client_refuses_welcome_for_another_hello(self, key):
+        async def handle(request):
+            ws = web.WebSocketResponse()
+            await ws.prepare(request)
+            await ws.receive()
+            await ws.send_str(key.encrypt({"kind": "welcome", "payload": {"nonce": "captured"}}))
+            await ws.receive()
+            return ws
+
+        app = web.Application()
+        app.router.add_get("/bot-link", handle)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        await web.TCPSite(runner, "127.0.0.1", 0).start()
+        client = DirectLinkClient(key, f"ws://127.0.0.1:{runner.addresses[0][1]}/bot-link", Recorder())
+        client.start()
+
+        with pytest.raises(asyncio.TimeoutError):
+            await client.wait_connected(timeout=0.5)
+        await client.stop()
+        await runner.cleanup()
+        assert client.connects == 0
+
+    async def test_send_without_peer_falls_back(self, key):
+        server = DirectLinkServer(key, Recorder())
+        client = DirectLinkClient(key, "ws://127.0.0.1:9/bot-link", Recorder())
+
+        assert not await server.send("request", {})
+        assert not await client.send("response", {})
+
+    async def test_reconnects_after_server_restart(self, key):
+        server = DirectLinkServer(key, Recorder())
+        await server.start()
+        port = server.port
+        client = DirectLinkClient(key, f"ws://127.0.0.1:{port}/bot-link", Recorder(), reconnect_delay=0.05)
+        client.start()
+        await client.wait_connected(timeout=5)
+
+        await server.stop()
+        while client.connected:
+            await asyncio.sleep(0.01)
+        restarted = DirectLinkServer(key, Recorder(), port=port)
+        await restarted.start()
+        while not client.connected:
+            await asyncio.sleep(0.01)
+
+        assert client.connects == 2
+        await client.stop()
+        await restarted.stop()
+
+
+class TestBackpressure:
+
+    async def test_slow_receiver_holds_back_sender(self, key):
+        handler = Recorder(delay=0.01)
+        server = DirectLinkServer(key, handler, max_pending=2)
+        await server.start()
+        client = DirectLinkClient(key, f"ws://127.0.0.1:{server.port}/bot-link", Recorder())
+        client.start()
+        await client.wait_connected(timeout=5)
+        frames = 60
+        blob = "x" * (512 * 1024)
+
+        for i in range(frames):
+            await client.send("response", {"seq": i, "response": blob})
+        handled_when_sent = len(handler.frames)
+        while len(handler.frames) < frames:
+            await asyncio.sleep(0.01)
+
+        # The sender could only finish once most frames were consumed
+        assert handled_when_sent >= frames // 4
+        assert [payload["seq"] for _, payload in handler.frames] == list(range(frames))
+        await client.stop()
+        await server.stop()
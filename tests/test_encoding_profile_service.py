@@ -0,0 +1,176 @@
+"""
+Tests for the per-title encoding profile service.
+"""
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+
+from server.web.app.services.encoding_profile_service import (
+    EncodingProfileService, ComplexityProbe, EncodingRung
+)
+from server.web.app.services.ffmpeg_service import DEFAULT_CRF
+
+
+@pytest.fixture
+def ffmpeg_service():
+    """Create a mocked FFmpeg service."""
+    service = MagicMock()
+    service.measure_encoded_bitrate = AsyncMock()
+    service.analyze_video = AsyncMock()
+    return service
+
+
+@pytest.fixture
+def profile_service(ffmpeg_service):
+    """Create encoding profile service instance."""
+    return EncodingProfileService(ffmpeg_service, probe_samples=3, probe_sample_seconds=4)
+
+
+def make_probe(complexity: float) -> ComplexityProbe:
+    bpp = EncodingProfileService.REFERENCE_BPP * complexity
+    return ComplexityProbe(
+        sample_count=3, probe_width=640, probe_height=360,
+        bits_per_pixel=bpp, complexity=complexity
+    )
+
+
+class TestEncodingProfileService:
+    """Test cases for EncodingProfileService."""
+
+    def test_sample_offsets_short_video(self, profile_service):
+        """Short sources are probed with a single sample from the start."""
+        assert profile_service._sample_offsets(10.0) == [0.0]
+
+    def test_sample_offsets_long_video(self, profile_service):
+        """Long sources are sampled evenly inside the body of the video."""
+        offsets = profile_service._sample_offsets(600.0)
+
+        assert len(offsets) == 3
+        assert offsets == sorted(offsets)
+        assert offsets[0] > 600.0 * 0.05
+        assert offsets[-1] + 4 < 600.0 * 0.95
+
+    async def test_probe_complexity(self, profile_service, ffmpeg_service):
+        """Probe converts trial encode size into a normalised complexity score."""
+        # 120 frames at 640x360 and exactly the reference bits per pixel
+        frames = 120
+        reference_bytes = int(EncodingProfileService.REFERENCE_BPP * 640 * 360 * frames / 8)
+        ffmpeg_service.measure_encoded_bitrate.return_value = (reference_bytes, frames)
+
+        probe = await profile_service.probe_complexity("/input.mp4", 600.0, 1920, 1080)
+
+        assert ffmpeg_service.measure_encoded_bitrate.call_count == 3
+        assert probe.probe_width == 640
+        assert probe.probe_height == 360
+        assert probe.complexity == pytest.approx(1.0, rel=0.01)
+
+    def test_build_ladder_reference_content(self, profile_service):
+        """Typical content keeps the full ladder."""
+        ladder = profile_service.build_ladder(
+            ["480p_30fps", "720p_30fps", "1080p_30fps"], make_probe(1.0)
+        )
+
+        assert [r.quality_preset for r in ladder] == ["480p_30fps", "720p_30fps", "1080p_30fps"]
+        assert all(r.crf == DEFAULT_CRF for r in ladder)
+        bitrates = [r.max_bitrate_kbps for r in ladder]
+        assert bitrates == sorted(bitrates)
+
+    def test_build_ladder_skips_rungs_capped_by_source(self, profile_service):
+        """Rungs that cannot exceed a low source bitrate are dropped."""
+        ladder = profile_service.build_ladder(
+            ["480p_30fps", "720p_30fps", "1080p_30fps"], make_probe(1.0),
+            source_bitrate_kbps=1000
+        )
+
+        assert [r.quality_preset for r in ladder] == ["480p_30fps"]
+
+    def test_build_ladder_simple_content_uses_less_bitrate(self, profile_service):
+        """Low-complexity content gets smaller bitrate ceilings and a lower CRF."""
+        simple = profile_service.build_ladder(["1080p_30fps"], make_probe(0.4))
+        typical = profile_service.build_ladder(["1080p_30fps"], make_probe(1.0))
+
+        assert simple[0].max_bitrate_kbps < typical[0].max_bitrate_kbps
+        assert simple[0].crf < typical[0].crf
+
+    def test_build_ladder_ignores_unknown_presets(self, profile_service):
+        """Unknown preset names are ignored."""
+        ladder = profile_service.build_ladder(["bogus", "720p_30fps"], make_probe(1.0))
+
+        assert [r.quality_preset for r in ladder] == ["720p_30fps"]
+        assert ladder[0].resolution == "1280x720"
+
+    async def test_plan_ladder_falls_back_on_probe_failure(self, profile_service, ffmpeg_service):
+        """A failed probe yields the static ladder instead of raising."""
+        ffmpeg_service.analyze_video.side_effect = Exception("ffprobe missing")
+
+        ladder = await profile_service.plan_ladder("/input.mp4", ["480p_30fps", "720p_30fps"])
+
+        assert [r.quality_preset for r in ladder] == ["480p_30fps", "720p_30fps"]
+        assert all(r.crf == DEFAULT_CRF for r in ladder)
+
+    @pytest.mark.parametrize("queue_depth,expected", [
+        (0, "slow"),
+        (5, "medium"),
+        (25, "fast"),
+        (100, "veryfast"),
+    ])
+    def test_select_speed_preset(self, profile_service, queue_depth, expected):
+        """Encoder speed preset follows queue pressure."""
+        assert profile_service.select_speed_preset(queue_depth) == expected
+
+
+class TestTranscodingWorkerLadder:
+    """The transcoding worker plans the per-title ladder from the downloaded source."""
+
+    @pytest.fixture
+    def worker(self, tmp_path, monkeypatch):
+        transcoding_worker = pytest.importorskip(
+            "server.web.app.services.transcoding_worker", exc_type=ImportError
+        )
+        monkeypatch.setattr(transcoding_worker, "HLSService", MagicMock())
+
+        worker = transcoding_worker.TranscodingWorker("sqlite+aiosqlite:///:memory:", temp_dir=str(tmp_path))
+        worker.encoding_profile_service.plan_ladder = AsyncMock(return_value=[
+            EncodingRung("480p_30fps", 854, 480, 30, 24, 1100),
+        ])
+        return worker
+
+    def job(self, preset, ladder_presets=("480p_30fps", "720p_30fps")):
+        return {
+            "job_id": f"job-{preset}", "video_id": "video-1", "quality_preset": preset,
+            "target_resolution": "1280x720", "target_framerate": 30, "target_bitrate": 2500,
+            "ladder_presets": list(ladder_presets) if ladder_presets else None,
+        }
+
+    async def test_source_probed_once_per_video(self, worker):
+        first = await worker._per_title_ladder(self.job("480p_30fps"), "/tmp/a_input.mp4")
+        second = await worker._per_title_ladder(self.job("720p_30fps"), "/tmp/b_input.mp4")
+
+        assert first is second
+        assert list(first) == ["480p_30fps"]
+        worker.encoding_profile_service.plan_ladder.assert_awaited_once_with(
+            "/tmp/a_input.mp4", ["480p_30fps", "720p_30fps"]
+        )
+
+    async def test_jobs_without_ladder_keep_static_preset(self, worker):
+        assert await worker._per_title_ladder(self.job("720p_30fps", None), "/tmp/in.mp4") is None
+        worker.per_title_encoding = False
+        assert await worker._per_title_ladder(self.job("720p_30fps"), "/tmp/in.mp4") is None
+        worker.encoding_profile_service.plan_ladder.assert_not_awaited()
+
+    async def test_dropped_rung_is_discarded_without_encoding(self, worker):
+        video = MagicMock(original_s3_key="originals/video-1.mp4", duration_seconds=60)
+        db = MagicMock(get=AsyncMock(return_value=video))
+        session = MagicMock()
+        session.__aenter__ = AsyncMock(return_value=db)
+        session.__aexit__ = AsyncMock(return_value=False)
+        worker.async_session = MagicMock(return_value=session)
+        worker.s3_service = MagicMock(download_file=AsyncMock())
+        worker.ffmpeg_service.transcode_to_hls = MagicMock()
+        transcoding_service = AsyncMock()
+
+        await worker._process_job(self.job("720p_30fps"), transcoding_service)
+
+        transcoding_service.discard_job.assert_awaited_once()
+        assert transcoding_service.discard_job.await_args.args[0] == "job-720p_30fps"
+        worker.ffmpeg_service.transcode_to_hls.assert_not_called()
+        transcoding_service.fail_job.assert_not_awaited()
@@ -0,0 +1,182 @@
+"""
+Tests for denormalized engagement counters.
+"""
+import uuid
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.models import User, Video, VideoComment, VideoLike, VideoStatus, VideoVisibility
+from server.web.app.services.engagement_counters import (
+    adjust_like_counts, adjust_reply_count, load_like_counts, load_reply_counts, rebuild_counters
+)
+
+
+@pytest.fixture
+async def users(db_session: AsyncSession):
+    users = [User(id=uuid.uuid4(), display_label=f"User {i}", email=f"user{i}@example.com") for i in range(3)]
+    db_session.add_all(users)
+    await db_session.commit()
+    return users
+
+
+@pytest.fixture
+async def video(db_session: AsyncSession, users):
+    video = Video(
+        id=uuid.uuid4(),
+        creator_id=users[0].id,
+        title="Test Video",
+        original_filename="test.mp4",
+        original_s3_key="videos/test.mp4",
+        file_size=1000000,
+        duration_seconds=120,
+        status=VideoStatus.ready,
+        visibility=VideoVisibility.public
+    )
+    db_session.add(video)
+    await db_session.commit()
+    return video
+
+
+async def add_comment(db_session, video, user, parent=None, is_deleted=False):
+    comment = VideoComment(
+        id=uuid.uuid4(),
+        video_id=video.id,
+        user_id=user.id,
+        parent_comment_id=parent.id if parent else None,
+        content="hello",
+        is_deleted=is_deleted
+    )
+    db_session.add(comment)
+    await db_session.commit()
+    return comment
+
+
+class TestAdjustCounters:
+
+    async def test_new_video_starts_at_zero(self, db_session, video):
+        await db_session.refresh(video)
+
+        assert (video.like_count, video.dislike_count) == (0, 0)
+
+    async def test_like_deltas_accumulate(self, db_session, video):
+        await adjust_like_counts(db_session, video.id, likes=1)
+        await adjust_like_counts(db_session, video.id, likes=1)
+        counts = await adjust_like_counts(db_session, video.id, likes=-1, dislikes=1)
+        await db_session.commit()
+
+        assert counts == (1, 1)
+        await db_session.refresh(video)
+        assert (video.like_count, video.dislike_count) == (1, 1)
+
+    async def test_unknown_video_returns_zero(self, db_session):
+        assert await adjust_like_counts(db_session, uuid.uuid4(), likes=1) == (0, 0)
+
+    async def test_reply_count(self, db_session, video, users):
+        parent = await add_comment(db_session, video, users[0])
+
+        await adjust_reply_count(db_session, parent.id, 1)
+        await adjust_reply_count(db_session, parent.id, 1)
+        await adjust_reply_count(db_session, parent.id, -1)
+        await db_session.commit()
+
+        await db_session.refresh(parent)
+        assert parent.reply_count == 1
+
+    async def test_rollback_discards_delta(self, db_session, video):
+        await adjust_like_counts(db_session, video.id, likes=5)
+        await db_session.rollback()
+
+        await db_session.refresh(video)
+        assert video.like_count == 0
+
+
+class TestBatchedLoaders:
+
+    async def test_reply_counts_skip_deleted(self, db_session, video, users):
+        first = await add_comment(db_session, video, users[0])
+        second = await add_comment(db_session, video, users[1])
+        await add_comment(db_session, video, users[1], parent=first)
+        await add_comment(db_session, video, users[2], parent=first)
+        await add_comment(db_session, video, users[2], parent=first, is_deleted=True)
+
+        counts = await load_reply_counts(db_session, [first.id, second.id])
+
+        assert counts == {first.id: 2, second.id: 0}
+
+    async def test_like_counts(self, db_session, video, users):
+        db_session.add_all([
+            VideoLike(video_id=video.id, user_id=users[0].id, is_like=True),
+            VideoLike(video_id=video.id, user_id=users[1].id, is_like=True),
+            VideoLike(video_id=video.id, user_id=users[2].id, is_like=False),
+        ])
+        await db_session.commit()
+        missing = uuid.uuid4()
+
+        counts = await load_like_counts(db_session, [video.id, missing])
+
+        assert counts == {video.id: (2, 1), missing: (0, 0)}
+
+    async def test_empty_input(self, db_session):
+        assert await load_reply_counts(db_session, []) == {}
+        assert await load_like_counts(db_session, []) == {}
+
+
+class TestRebuildCounters:
+
+    async def test_repairs_drift(self, db_session, video, users):
+        parent = await add_comment(db_session, video, users[0])
+        await add_comment(db_session, video, users[1], parent=parent)
+        db_session.add(VideoLike(video_id=video.id, user_id=users[1].id, is_like=True))
+        await db_session.commit()
+
+        drifted = await rebuild_counters(db_session, [video.id])
+        await db_session.commit()
+
+        assert drifted == 2
+        await db_session.refresh(video)
+        await db_session.refresh(parent)
+        assert (video.like_count, video.dislike_count) == (1, 0)
+        assert parent.reply_count == 1
+
+    async def test_stale_counts_reset_to_zero(self, db_session, video, users):
+        parent = await add_comment(db_session, video, users[0])
+        await adjust_like_counts(db_session, video.id, likes=3, dislikes=1)
+        await adjust_reply_count(db_session, parent.id, 2)
+        await db_session.commit()
+
+        assert await rebuild_counters(db_session, [video.id]) == 2
+        await db_session.commit()
+
+        await db_session.refresh(video)
+        await db_session.refresh(parent)
+        assert (video.like_count, video.dislike_count) == (0, 0)
+        assert parent.reply_count == 0
+
+    async def test_one_update_per_table(self, db_session, video, users):
+        for user in users:
+            await add_comment(db_session, video, user, parent=await add_comment(db_session, video, user))
+        statements = []
+        engine = db_session.bind.sync_engine
+        listener = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(engine, "before_cursor_execute", listener)
+        try:
+            assert await rebuild_counters(db_session, [video.id]) == 3
+        finally:
+            event.remove(engine, "before_cursor_execute", listener)
+
+        assert [statement.split()[0] for statement in statements] == ["UPDATE", "UPDATE"]
+
+    async def test_consistent_counters_are_left_alone(self, db_session, video, users):
+        parent = await add_comment(db_session, video, users[0])
+        await add_comment(db_session, video, users[1], parent=parent)
+        await adjust_reply_count(db_session, parent.id, 1)
+        await db_session.commit()
+
+        assert await rebuild_counters(db_session, [video.id]) == 0
+        counts = (await db_session.execute(
+            select(VideoComment.reply_count).where(VideoComment.id == parent.id)
+        )).scalar_one()
+        assert counts == 1
+        assert await rebuild_counters(db_session, []) == 0
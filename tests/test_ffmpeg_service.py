@@ -3,7 +3,10 @@ Tests for FFmpeg service.
 """
 import pytest
 import asyncio
+import json
 import os
+import shutil
+import subprocess
 import tempfile
 from unittest.mock import AsyncMock, MagicMock, patch
 from pathlib import Path
@@ -118,6 +121,42 @@ class TestFFmpegService:
         assert "-r" in cmd
         assert "30" in cmd
     
+    def test_build_ffmpeg_command_hardware_encoder(self):
+        """Test encoder-specific rate control and preset mapping."""
+        service = FFmpegService(video_encoder="h264_nvenc")
+        cmd = service._build_ffmpeg_command(
+            input_path="/input.mp4",
+            output_path="/output.mp4",
+            target_resolution="1280x720",
+            target_framerate=30,
+            target_bitrate=2500,
+            preset="fast",
+            crf=26
+        )
+        
+        assert "h264_nvenc" in cmd
+        assert "libx264" not in cmd
+        assert cmd[cmd.index("-preset") + 1] == "p3"
+        assert cmd[cmd.index("-cq") + 1] == "26"
+    
+    def test_unsupported_encoder(self):
+        """Test unknown encoders are rejected."""
+        with pytest.raises(ValueError):
+            FFmpegService(video_encoder="h264_magic")
+    
+    def test_parse_encode_stats(self, ffmpeg_service):
+        """Test parsing of probe encode statistics."""
+        stderr_output = (
+            "frame=   60 fps=0.0 q=28.0 size=N/A time=00:00:02.00 bitrate=N/A\n"
+            "frame=  120 fps=0.0 q=-1.0 Lsize=N/A time=00:00:04.00 bitrate=N/A\n"
+            "video:215KiB audio:0KiB subtitle:0KiB other streams:0KiB\n"
+        )
+        
+        encoded_bytes, frames = ffmpeg_service._parse_encode_stats(stderr_output)
+        
+        assert encoded_bytes == 215 * 1024
+        assert frames == 120
+    
     @patch('asyncio.create_subprocess_exec')
     @patch('server.web.app.services.ffmpeg_service.FFmpegService.analyze_video')
     @patch('os.makedirs')
@@ -165,6 +204,81 @@ class TestFFmpegService:
         assert len(progress_values) > 0
         assert progress_values[-1] == 100  # Final progress should be 100%
     
+    def test_plan_chunks_keyframe_aligned(self, ffmpeg_service):
+        """Test chunk boundaries land on keyframes and cover the whole video."""
+        keyframes = [0.0, 2.0, 25.0, 61.0, 70.0, 122.0, 178.0]
+        
+        chunks = ffmpeg_service._plan_chunks(keyframes, 180.0, chunk_seconds=60)
+        
+        assert chunks[0][0] == 0.0
+        assert chunks[-1][1] == 180.0
+        for (_, end), (start, _) in zip(chunks, chunks[1:]):
+            assert end == start
+            assert start in keyframes
+        # 178.0 is too close to the end to start its own chunk
+        assert chunks == [(0.0, 61.0), (61.0, 122.0), (122.0, 180.0)]
+    
+    def test_plan_chunks_short_video(self, ffmpeg_service):
+        """Test short videos produce a single chunk."""
+        assert ffmpeg_service._plan_chunks([0.0, 2.0, 4.0], 10.0, chunk_seconds=60) == [(0.0, 10.0)]
+    
+    @patch('asyncio.create_subprocess_exec')
+    async def test_get_keyframe_times(self, mock_subprocess, ffmpeg_service):
+        """Test keyframe timestamps are parsed from ffprobe packet flags."""
+        mock_process = AsyncMock()
+        mock_process.returncode = 0
+        mock_process.communicate.return_value = (
+            b"0.000000,K_\n0.033333,__\n2.002000,K_\nN/A,__\n4.004000,K_\n",
+            b""
+        )
+        mock_subprocess.return_value = mock_process
+        
+        keyframes = await ffmpeg_service.get_keyframe_times("/input.mp4")
+        
+        assert keyframes == [0.0, 2.002, 4.004]
+    
+    async def test_transcode_video_chunked(self, ffmpeg_service, tmp_path, monkeypatch):
+        """Test chunked transcoding aggregates progress and concatenates chunks."""
+        output_path = str(tmp_path / "out" / "video.mp4")
+        commands = []
+        
+        async def fake_run_command(cmd, error_prefix):
+            commands.append(cmd)
+            if cmd[-1] == output_path:
+                with open(output_path, "wb") as f:
+                    f.write(b"video")
+        
+        async def fake_run_with_progress(cmd, total_duration):
+            commands.append(cmd)
+            yield 50
+        
+        monkeypatch.setattr(os, "cpu_count", lambda: 8)
+        ffmpeg_service.analyze_video = AsyncMock(return_value={"duration": 180.0, "has_audio": True})
+        ffmpeg_service.get_keyframe_times = AsyncMock(return_value=[0.0, 61.0, 122.0])
+        ffmpeg_service._run_command = fake_run_command
+        ffmpeg_service._run_with_progress = fake_run_with_progress
+        
+        progress_values = []
+        async for progress in ffmpeg_service.transcode_video_chunked(
+            "/input.mp4", output_path, "1280x720", 30, 2500, max_parallel=2
+        ):
+            progress_values.append(progress)
+        
+        assert progress_values == sorted(progress_values)
+        assert progress_values[-1] == 100
+        
+        split_cmd = commands[0]
+        assert split_cmd[split_cmd.index("-segment_times") + 1] == "61.000000,122.000000"
+        chunk_cmds = [c for c in commands if "-an" in c]
+        assert len(chunk_cmds) == 3
+        # Cores are shared between the two concurrent chunk encoders
+        assert all(c[c.index("-threads") + 1] == "4" for c in chunk_cmds)
+        concat_cmd = commands[-1]
+        assert "concat" in concat_cmd
+        assert concat_cmd[-1] == output_path
+        # Scratch chunks are removed afterwards
+        assert not os.path.exists(output_path + ".chunks")
+    
     def test_build_hls_command(self, ffmpeg_service):
         """Test HLS command generation."""
         cmd = ffmpeg_service._build_hls_command(
@@ -183,6 +297,90 @@ class TestFFmpegService:
         assert "6" in cmd
         assert "/output/playlist.m3u8" in cmd
     
+    def test_build_direct_hls_command_single_file(self, ffmpeg_service):
+        """Test direct fMP4 HLS command with byte-range single-file output."""
+        cmd = ffmpeg_service._build_direct_hls_command(
+            input_path="/input.mp4",
+            output_dir="/output",
+            target_resolution="1280x720",
+            target_framerate=30,
+            target_bitrate=2500,
+            segment_duration=6
+        )
+        
+        assert cmd[cmd.index("-f") + 1] == "hls"
+        assert cmd[cmd.index("-hls_segment_type") + 1] == "fmp4"
+        assert cmd[cmd.index("-hls_flags") + 1] == "single_file"
+        assert cmd[cmd.index("-hls_segment_filename") + 1] == "/output/stream.m4s"
+        assert cmd[cmd.index("-force_key_frames") + 1] == "expr:gte(t,n_forced*6)"
+        assert cmd[-1] == "/output/playlist.m3u8"
+        assert "libx264" in cmd
+    
+    def test_build_direct_hls_command_with_progressive_mp4(self, ffmpeg_service):
+        """Test direct HLS command tees a progressive MP4 from the same encode."""
+        cmd = ffmpeg_service._build_direct_hls_command(
+            input_path="/input.mp4",
+            output_dir="/output",
+            target_resolution="1280x720",
+            target_framerate=30,
+            target_bitrate=2500,
+            single_file=False,
+            mp4_output_path="/output.mp4"
+        )
+        
+        assert cmd[cmd.index("-f") + 1] == "tee"
+        tee_target = cmd[-1]
+        hls_part, mp4_part = tee_target.split("|")
+        assert hls_part.startswith("[f=hls:")
+        assert "hls_segment_type=fmp4" in hls_part
+        assert "single_file" not in hls_part
+        assert hls_part.endswith("]/output/playlist.m3u8")
+        assert mp4_part == "[f=mp4:movflags=+faststart]/output.mp4"
+        assert cmd[cmd.index("-flags") + 1] == "+global_header"
+        # One encode feeds both outputs
+        assert cmd.count("-c:v") == 1
+    
+    @pytest.mark.skipif(not (shutil.which("ffmpeg") and shutil.which("ffprobe")),
+                        reason="ffmpeg and ffprobe are not installed")
+    async def test_transcode_to_hls_with_progressive_mp4_is_playable(self, tmp_path):
+        """Test both tee outputs carry codec headers that ffprobe can read."""
+        ffmpeg_service = FFmpegService(ffmpeg_path=shutil.which("ffmpeg"),
+                                       ffprobe_path=shutil.which("ffprobe"))
+        source = tmp_path / "source.mp4"
+        subprocess.run([
+            ffmpeg_service.ffmpeg_path, "-v", "error", "-f", "lavfi", "-i", "testsrc=size=320x240:rate=30",
+            "-f", "lavfi", "-i", "sine=frequency=440", "-t", "3", "-c:v", "libx264", "-c:a", "aac",
+            "-shortest", "-y", str(source)
+        ], check=True)
+        mp4_path = tmp_path / "video.mp4"
+        
+        async for _ in ffmpeg_service.transcode_to_hls(
+            str(source), str(tmp_path / "hls"), "320x240", 30, 500,
+            preset="ultrafast", segment_duration=1, mp4_output_path=str(mp4_path)
+        ):
+            pass
+        
+        for output in (mp4_path, tmp_path / "hls" / "init.mp4"):
+            probe = subprocess.run([
+                ffmpeg_service.ffprobe_path, "-v", "error", "-print_format", "json",
+                "-show_streams", str(output)
+            ], check=True, capture_output=True, text=True)
+            streams = {stream["codec_type"]: stream for stream in json.loads(probe.stdout)["streams"]}
+            assert streams["video"]["codec_name"] == "h264"
+            assert streams["video"]["profile"] != "unknown"
+            assert streams["audio"]["codec_name"] == "aac"
+            assert int(streams["audio"]["sample_rate"]) > 0
+    
+    def test_collect_hls_outputs(self, ffmpeg_service, tmp_path):
+        """Test HLS output collection lists init segment first."""
+        for name in ["playlist.m3u8", "stream.m4s", "init.mp4"]:
+            (tmp_path / name).write_bytes(b"data")
+        
+        manifest_path, media_paths = ffmpeg_service.collect_hls_outputs(str(tmp_path))
+        
+        assert manifest_path == str(tmp_path / "playlist.m3u8")
+        assert [os.path.basename(p) for p in media_paths] == ["init.mp4", "stream.m4s"]
+    
     @patch('asyncio.create_subprocess_exec')
     @patch('os.makedirs')
     @patch('os.path.exists')
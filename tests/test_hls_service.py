@@ -155,6 +155,32 @@ segment_001.ts
         mock_s3.get_file_content.assert_called_once_with("test/manifest.m3u8")
         assert mock_s3.file_exists.call_count == 2  # 2 segments
     
+    async def test_validate_hls_segments_byte_range_fmp4(self, hls_service):
+        """Test validation of a single-file fMP4 byte-range manifest."""
+        mock_s3 = AsyncMock()
+        hls_service.s3_service = mock_s3
+        
+        manifest_content = """#EXTM3U
+#EXT-X-VERSION:7
+#EXT-X-TARGETDURATION:6
+#EXT-X-MAP:URI="init.mp4"
+#EXTINF:6.0,
+#EXT-X-BYTERANGE:102400@0
+stream.m4s
+#EXTINF:6.0,
+#EXT-X-BYTERANGE:98304@102400
+stream.m4s
+#EXT-X-ENDLIST"""
+        
+        mock_s3.get_file_content.return_value = manifest_content
+        mock_s3.file_exists.return_value = True
+        
+        result = await hls_service.validate_hls_segments("test/manifest.m3u8")
+        
+        assert result is True
+        checked = [call.args[0] for call in mock_s3.file_exists.call_args_list]
+        assert checked == ["test/init.mp4", "test/stream.m4s"]
+    
     async def test_validate_hls_segments_missing_segment(self, hls_service):
         """Test HLS segment validation with missing segment."""
         # Mock S3 service
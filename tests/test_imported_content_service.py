@@ -4,7 +4,9 @@ Tests for Imported Content Service.
 import pytest
 from datetime import datetime, timedelta
 
+from server.web.app.services import video_access_cache
 from server.web.app.services.imported_content_service import ImportedContentService
+from server.web.app.services.video_access_cache import VideoAccessCache, VideoAccessPolicy
 from server.web.app.models import User, Video, ImportJob, VideoStatus, VideoVisibility, ImportStatus
 
 
@@ -16,6 +18,13 @@ class TestImportedContentService:
         """Create ImportedContentService instance"""
         return ImportedContentService(db_session)
     
+    @pytest.fixture
+    def access_cache(self, monkeypatch):
+        """In-process access cache shared with the service"""
+        cache = VideoAccessCache()
+        monkeypatch.setattr(video_access_cache, "_video_access_cache", cache)
+        return cache
+    
     @pytest.fixture
     async def test_user(self, db_session):
         """Create test user"""
@@ -191,6 +200,29 @@ class TestImportedContentService:
         assert updated_video["visibility"] == VideoVisibility.public
         assert updated_video["category"] == "entertainment"
     
+    async def test_visibility_update_invalidates_access_cache(self, service, test_video_with_import, access_cache):
+        """Test a visibility change drops the cached access policy"""
+        video, import_job = test_video_with_import
+        await access_cache.set_policy(VideoAccessPolicy.from_video(video))
+        
+        assert await service.update_imported_video_metadata(
+            video_id=video.id, visibility=VideoVisibility.public, user_id=video.creator_id
+        )
+        
+        assert await access_cache.get_policy(video.id) is None
+    
+    async def test_bulk_visibility_update_invalidates_access_cache(self, service, test_video_with_import, access_cache):
+        """Test a bulk visibility change drops the cached access policies"""
+        video, import_job = test_video_with_import
+        await access_cache.set_policy(VideoAccessPolicy.from_video(video))
+        
+        updated_count = await service.bulk_update_imported_videos(
+            video_ids=[video.id], visibility=VideoVisibility.public, user_id=video.creator_id
+        )
+        
+        assert updated_count == 1
+        assert await access_cache.get_policy(video.id) is None
+    
     async def test_delete_imported_video(self, service, test_video_with_import):
         """Test deleting imported video"""
         video, import_job = test_video_with_import
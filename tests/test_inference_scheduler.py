@@ -0,0 +1,143 @@
+"""
+Tests for the client bot's slot scheduler.
+"""
+import asyncio
+
+import pytest
+
+from client_bot.inference_scheduler import InferenceCancelled, InferenceScheduler, SchedulerFullError
+
+
+class FakeBackend:
+    """Streams `max_tokens` chunks, recording concurrency and start order."""
+
+    def __init__(self, token_delay=0.001):
+        self.token_delay = token_delay
+        self.started = []
+        self.in_flight = 0
+        self.peak = 0
+
+    async def generate_stream(self, prompt, max_tokens=3, **params):
+        self.started.append(prompt)
+        self.in_flight += 1
+        self.peak = max(self.peak, self.in_flight)
+        try:
+            for i in range(max_tokens):
+                await asyncio.sleep(self.token_delay)
+                yield f"{prompt}:{i} "
+        finally:
+            self.in_flight -= 1
+
+
+class TestInferenceScheduler:
+
+    async def test_generate(self):
+        scheduler = InferenceScheduler(FakeBackend(), slots=2)
+
+        assert await scheduler.generate("s1", "p", max_tokens=2) == "p:0 p:1 "
+        assert scheduler.metrics()["completed"] == 1
+        assert scheduler.idle
+
+    async def test_slots_bound_concurrency(self):
+        backend = FakeBackend()
+        scheduler = InferenceScheduler(backend, slots=3)
+
+        await asyncio.gather(*(scheduler.generate(f"s{i}", f"p{i}", max_tokens=5) for i in range(8)))
+
+        assert backend.peak == 3
+        assert scheduler.metrics()["completed"] == 8
+
+    async def test_round_robin_between_sessions(self):
+        backend = FakeBackend()
+        scheduler = InferenceScheduler(backend, slots=1)
+        blocker = asyncio.create_task(scheduler.generate("x", "blocker", max_tokens=5))
+        await asyncio.sleep(0)
+
+        # A busy session queues first; a second session must not wait behind all of it
+        requests = [scheduler.generate("busy", f"busy{i}") for i in range(3)]
+        requests.append(scheduler.generate("quiet", "quiet"))
+        await asyncio.gather(blocker, *requests)
+
+        assert backend.started == ["blocker", "busy0", "quiet", "busy1", "busy2"]
+
+    async def test_priority_first(self):
+        backend = FakeBackend()
+        scheduler = InferenceScheduler(backend, slots=1)
+        blocker = asyncio.create_task(scheduler.generate("x", "blocker", max_tokens=5))
+        await asyncio.sleep(0)
+
+        await asyncio.gather(
+            blocker,
+            scheduler.generate("a", "low", priority=5),
+            scheduler.generate("b", "high", priority=0),
+        )
+
+        assert backend.started == ["blocker", "high", "low"]
+
+    async def test_admission_control(self):
+        scheduler = InferenceScheduler(FakeBackend(), slots=1, max_queue_depth=2)
+        running = [asyncio.create_task(scheduler.generate(f"s{i}", "p", max_tokens=5)) for i in range(3)]
+        await asyncio.sleep(0)
+
+        with pytest.raises(SchedulerFullError):
+            await scheduler.generate("late", "p")
+
+        await asyncio.gather(*running)
+        assert scheduler.metrics()["rejected"] == 1
+
+    async def test_cancel_session_drops_queued_and_running(self):
+        backend = FakeBackend(token_delay=0.01)
+        scheduler = InferenceScheduler(backend, slots=1)
+        running = asyncio.create_task(scheduler.generate("closed", "first", max_tokens=100))
+        await asyncio.sleep(0.02)
+        queued = asyncio.create_task(scheduler.generate("closed", "second"))
+        other = asyncio.create_task(scheduler.generate("open", "other"))
+        await asyncio.sleep(0)
+
+        assert scheduler.cancel_session("closed") == 2
+
+        with pytest.raises(asyncio.CancelledError):
+            await running
+        with pytest.raises(InferenceCancelled):
+            await queued
+        assert await other == "other:0 other:1 other:2 "
+        assert backend.started == ["first", "other"]
+        assert scheduler.idle
+
+    async def test_cancelled_waiter_leaves_queue(self):
+        scheduler = InferenceScheduler(FakeBackend(), slots=1)
+        running = asyncio.create_task(scheduler.generate("a", "p", max_tokens=5))
+        await asyncio.sleep(0)
+        waiter = asyncio.create_task(scheduler.generate("b", "p"))
+        await asyncio.sleep(0)
+
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await running
+
+        assert scheduler.idle
+
+    async def test_backend_error_frees_slot(self):
+        class FailingBackend:
+            async def generate_stream(self, prompt, **params):
+                raise RuntimeError("server died")
+                yield
+
+        scheduler = InferenceScheduler(FailingBackend(), slots=1)
+
+        with pytest.raises(RuntimeError):
+            await scheduler.generate("s", "p")
+        assert scheduler.idle
+        assert scheduler.metrics()["failed"] == 1
+
+    async def test_metrics(self):
+        scheduler = InferenceScheduler(FakeBackend(), slots=1)
+
+        await asyncio.gather(*(scheduler.generate(f"s{i}", "p", max_tokens=4) for i in range(3)))
+        metrics = scheduler.metrics()
+
+        assert metrics["total_tokens"] == 12
+        assert metrics["avg_tokens_per_second"] > 0
+        # The later requests waited for the first ones
+        assert metrics["p95_queue_wait_ms"] > 0
+        assert metrics["queued"] == 0 and metrics["active"] == 0
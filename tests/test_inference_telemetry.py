@@ -0,0 +1,240 @@
+"""
+Tests for llama.cpp timing parsing and the client bot's inference
+telemetry, partly against the fake llama.cpp in tests/mocks.
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+
+from client_bot.inference_scheduler import InferenceScheduler
+from client_bot.inference_telemetry import Histogram, InferenceTelemetry, request_metrics
+from client_bot.llama_cpp_wrapper import (
+    InferenceRequest,
+    LlamaCppConfig,
+    LlamaCppWrapper,
+    LlamaServerBackend,
+    parse_llama_timings,
+    server_timings,
+)
+
+FAKE_LLAMA = os.path.join(os.path.dirname(__file__), "mocks", "fake_llama_server.py")
+
+LEGACY_OUTPUT = """\
+llama_print_timings:        load time =     812.40 ms
+llama_print_timings:      sample time =      12.34 ms /    64 runs   (    0.19 ms per token,  5186.93 tokens per second)
+llama_print_timings: prompt eval time =     240.00 ms /    12 tokens (   20.00 ms per token,    50.00 tokens per second)
+llama_print_timings:        eval time =    1260.00 ms /    63 runs   (   20.00 ms per token,    50.00 tokens per second)
+llama_print_timings:       total time =    2400.00 ms /    75 tokens
+"""
+
+PERF_OUTPUT = """\
+some model loading chatter
+llama_perf_sampler_print:    sampling time =       5.00 ms /    20 runs   (    0.25 ms per token,  4000.00 tokens per second)
+llama_perf_context_print:        load time =     500.00 ms
+llama_perf_context_print: prompt eval time =     100.00 ms /    40 tokens (    2.50 ms per token,   400.00 tokens per second)
+llama_perf_context_print:        eval time =     400.00 ms /    19 runs   (   21.05 ms per token,    47.50 tokens per second)
+llama_perf_context_print:       total time =    1010.00 ms /    59 tokens
+"""
+
+
+class TestTimingParsing:
+
+    def test_legacy_timing_lines(self):
+        timings = parse_llama_timings(LEGACY_OUTPUT)
+
+        assert timings == {
+            "load_ms": 812.40,
+            "sample_ms": 12.34,
+            "sampled_tokens": 64,
+            "prompt_ms": 240.0,
+            "prompt_eval_tokens": 12,
+            "predicted_ms": 1260.0,
+            "predicted_tokens": 63,
+            "total_ms": 2400.0,
+        }
+
+    def test_perf_timing_lines(self):
+        timings = parse_llama_timings(PERF_OUTPUT)
+
+        assert (timings["prompt_eval_tokens"], timings["prompt_ms"]) == (40, 100.0)
+        assert (timings["predicted_tokens"], timings["predicted_ms"]) == (19, 400.0)
+        assert timings["total_ms"] == 1010.0
+        assert (timings["sampled_tokens"], timings["sample_ms"]) == (20, 5.0)
+        assert parse_llama_timings("no timings here") == {}
+
+    def test_server_timings(self):
+        data = {"timings": {"prompt_n": 8, "prompt_ms": 16.0, "predicted_n": 4, "predicted_ms": 80.0, "extra": 1}}
+
+        assert server_timings(data) == {
+            "prompt_eval_tokens": 8, "prompt_ms": 16.0, "predicted_tokens": 4, "predicted_ms": 80.0
+        }
+        assert server_timings({}) == {}
+
+
+class TestHistogram:
+
+    def test_quantiles_within_buckets(self):
+        histogram = Histogram((10, 20, 50, 100))
+        for value in range(1, 101):
+            histogram.observe(value)
+
+        assert histogram.counts == [10, 10, 30, 50, 0]
+        assert histogram.quantile(0.5) == pytest.approx(50)
+        assert histogram.quantile(0.95) == pytest.approx(95)
+        assert histogram.quantile(1.0) == 100
+
+    def test_quantiles_clamped_to_observed_range(self):
+        histogram = Histogram((10, 100))
+        for _ in range(5):
+            histogram.observe(48.8)
+
+        # Interpolating across (10, 100] alone would give 55 and 95.5
+        assert histogram.quantile(0.5) == 48.8
+        assert histogram.quantile(0.95) == 48.8
+
+        histogram.observe(500)
+        assert histogram.quantile(0.99) <= 500
+        assert histogram.to_dict(buckets=False).keys() == {"count", "mean", "max", "p50", "p95", "p99"}
+
+
+class TestInferenceTelemetry:
+
+    def test_rates_from_llama_timings(self):
+        stats = {
+            "queue_wait_ms": 12.0, "time_to_first_token_ms": 150.0, "total_ms": 1400.0,
+            "prompt_tokens": 120, "cached_tokens": 20, "prompt_eval_tokens": 100, "prompt_ms": 125.0,
+            "predicted_tokens": 50, "predicted_ms": 1000.0, "generated_tokens": 50,
+        }
+
+        metrics = request_metrics(stats)
+
+        assert metrics["prompt_tokens_per_second"] == 800.0
+        assert metrics["generation_tokens_per_second"] == 50.0
+        assert metrics["generated_tokens"] == 50
+
+    def test_rate_falls_back_to_wall_clock(self):
+        metrics = request_metrics({"time_to_first_token_ms": 100.0, "total_ms": 600.0, "generated_tokens": 10})
+
+        assert metrics["generation_tokens_per_second"] == 20.0
+        assert metrics["prompt_tokens_per_second"] == 0.0
+
+    def test_snapshot_totals(self):
+        telemetry = InferenceTelemetry()
+        for ttft in (100.0, 200.0, 300.0):
+            telemetry.record({
+                "queue_wait_ms": 1.0, "time_to_first_token_ms": ttft, "total_ms": ttft + 500,
+                "prompt_tokens": 10, "generated_tokens": 5, "predicted_tokens": 5, "predicted_ms": 100.0,
+            })
+
+        snapshot = telemetry.snapshot()
+
+        assert (snapshot["requests"], snapshot["prompt_tokens"], snapshot["generated_tokens"]) == (3, 30, 15)
+        assert snapshot["time_to_first_token_ms"]["count"] == 3
+        assert snapshot["time_to_first_token_ms"]["max"] == 300.0
+        assert snapshot["generation_tokens_per_second"]["mean"] == 50.0
+        # Prompt timings were never reported
+        assert snapshot["prompt_tokens_per_second"]["count"] == 0
+
+
+class SlowStartBackend:
+    """First token after `first_token_delay`, then one per `token_delay`."""
+
+    def __init__(self, first_token_delay=0.05, token_delay=0.005):
+        self.first_token_delay = first_token_delay
+        self.token_delay = token_delay
+
+    async def generate_stream(self, prompt, max_tokens=3, stats=None, **params):
+        await asyncio.sleep(self.first_token_delay)
+        for i in range(max_tokens):
+            if i:
+                await asyncio.sleep(self.token_delay)
+            yield f"t{i} "
+
+
+class TestSchedulerTelemetry:
+
+    async def test_queue_wait_and_time_to_first_token(self):
+        telemetry = InferenceTelemetry()
+        scheduler = InferenceScheduler(SlowStartBackend(), slots=1, telemetry=telemetry)
+        first, second = {}, {}
+
+        await asyncio.gather(
+            scheduler.generate("s1", "a", stats=first, max_tokens=4),
+            scheduler.generate("s2", "b", stats=second, max_tokens=4),
+        )
+
+        assert first["queue_wait_ms"] < 20
+        assert second["queue_wait_ms"] >= first["total_ms"] - 20
+        assert second["time_to_first_token_ms"] >= second["queue_wait_ms"] + 45
+        assert first["generated_tokens"] == 4
+        assert telemetry.snapshot()["requests"] == 2
+
+    async def test_failed_requests_not_recorded(self):
+        class FailingBackend:
+            async def generate_stream(self, prompt, **params):
+                yield "x"
+                raise RuntimeError("server died")
+
+        telemetry = InferenceTelemetry()
+        scheduler = InferenceScheduler(FailingBackend(), telemetry=telemetry)
+
+        with pytest.raises(RuntimeError):
+            await scheduler.generate("s1", "p")
+
+        assert telemetry.requests == 0
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_LOAD_SECONDS", "0.1")
+    monkeypatch.setenv("FAKE_LLAMA_TOKEN_SECONDS", "0.005")
+    monkeypatch.setenv("FAKE_LLAMA_PROMPT_TOKEN_SECONDS", "0.002")
+    executable = tmp_path / "llama"
+    executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_LLAMA}" "$@"\n')
+    executable.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_text("weights")
+    return LlamaCppConfig(
+        executable_path=str(executable),
+        server_executable_path=str(executable),
+        default_model_path=str(model),
+        startup_timeout=10
+    )
+
+
+class TestLlamaCppTelemetry:
+
+    async def test_server_timings_reach_telemetry(self, config):
+        backend = LlamaServerBackend(config)
+        await backend.start()
+        telemetry = InferenceTelemetry()
+        scheduler = InferenceScheduler(backend, slots=2, telemetry=telemetry)
+        stats = {}
+        try:
+            await scheduler.generate("s1", "one two three four five", stats=stats, max_tokens=10)
+        finally:
+            await backend.stop()
+
+        assert (stats["prompt_eval_tokens"], stats["predicted_tokens"]) == (5, 10)
+        metrics = request_metrics(stats)
+        # 2 ms per prompt token and 5 ms per generated token, plus overhead
+        assert 100 < metrics["prompt_tokens_per_second"] <= 500
+        assert 50 < metrics["generation_tokens_per_second"] <= 200
+        assert telemetry.snapshot()["generation_tokens_per_second"]["count"] == 1
+
+    async def test_executable_timings_fill_inference_result(self, config):
+        wrapper = LlamaCppWrapper(config)
+        wrapper.start()
+        try:
+            result = await asyncio.to_thread(
+                wrapper.submit_request(InferenceRequest(prompt="a b c d", max_tokens=20)).get
+            )
+        finally:
+            wrapper.stop()
+
+        assert result.text.startswith("tok0")
+        assert (result.prompt_tokens, result.generated_tokens) == (4, 20)
+        assert 50 < result.tokens_per_second <= 200
+        assert result.inference_time_ms >= 100 + 20 * 5
@@ -0,0 +1,131 @@
+"""
+Tests for the persistent llama.cpp server backend, run against the fake
+llama.cpp executables in tests/mocks/fake_llama_server.py.
+"""
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+from client_bot.llama_cpp_wrapper import LlamaCppConfig, LlamaCppWrapper, LlamaServerBackend
+
+FAKE_LLAMA = os.path.join(os.path.dirname(__file__), "mocks", "fake_llama_server.py")
+LOAD_SECONDS = 0.3
+
+
+@pytest.fixture
+def config(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_LOAD_SECONDS", str(LOAD_SECONDS))
+    executable = tmp_path / "llama"
+    executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_LLAMA}" "$@"\n')
+    executable.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_text("weights")
+    return LlamaCppConfig(
+        executable_path=str(executable),
+        server_executable_path=str(executable),
+        default_model_path=str(model),
+        startup_timeout=10
+    )
+
+
+@pytest.fixture
+async def backend(config):
+    backend = LlamaServerBackend(config)
+    await backend.start()
+    yield backend
+    await backend.stop()
+
+
+class TestLlamaServerBackend:
+
+    async def test_generate(self, backend):
+        text = await backend.generate("hello", max_tokens=3)
+
+        assert text == "tok0 tok1 tok2 "
+
+    async def test_generate_stream(self, backend):
+        chunks = [chunk async for chunk in backend.generate_stream("hello", max_tokens=4)]
+
+        assert chunks == ["tok0 ", "tok1 ", "tok2 ", "tok3 "]
+
+    async def test_process_is_reused(self, backend):
+        pid = backend.process.pid
+
+        await backend.generate("one", max_tokens=1)
+        await backend.generate("two", max_tokens=1)
+
+        assert backend.process.pid == pid
+
+    async def test_concurrent_streams_interleave(self, backend):
+        order = []
+
+        async def consume(name):
+            async for _ in backend.generate_stream(name, max_tokens=50):
+                order.append(name)
+
+        await asyncio.gather(consume("a"), consume("b"))
+
+        # With one serialized worker every "a" would precede every "b"
+        assert order.index("b") < len(order) - order[::-1].index("a") - 1
+
+    async def test_restarts_after_stop(self, backend):
+        await backend.stop()
+
+        assert not backend.is_running
+        assert await backend.generate("again", max_tokens=1) == "tok0 "
+        assert backend.is_running
+
+    async def test_missing_executable(self, config):
+        config.server_executable_path = "/nonexistent/llama-server"
+
+        with pytest.raises(FileNotFoundError):
+            await LlamaServerBackend(config).start()
+
+    async def test_server_exit_during_startup(self, config, tmp_path):
+        broken = tmp_path / "broken"
+        broken.write_text("#!/bin/sh\nexit 3\n")
+        broken.chmod(0o755)
+        config.server_executable_path = str(broken)
+        backend = LlamaServerBackend(config)
+
+        with pytest.raises(RuntimeError, match="code 3"):
+            await backend.start()
+        assert backend.process is None
+
+
+class TestTimeToFirstTokenBenchmark:
+    """Warm server against spawning llama.cpp per request"""
+
+    REQUESTS = 5
+
+    async def test_time_to_first_token(self, config, backend):
+        wrapper = LlamaCppWrapper(config)
+        wrapper.start()
+        try:
+            spawn = []
+            for _ in range(self.REQUESTS):
+                start = time.perf_counter()
+                async for _ in wrapper.generate_stream("hello", max_tokens=8):
+                    spawn.append(time.perf_counter() - start)
+                    break
+        finally:
+            wrapper.stop()
+
+        warm = []
+        for _ in range(self.REQUESTS):
+            start = time.perf_counter()
+            stream = backend.generate_stream("hello", max_tokens=8)
+            async for _ in stream:
+                warm.append(time.perf_counter() - start)
+                break
+            await stream.aclose()
+
+        spawn_ms = sum(spawn) / len(spawn) * 1000
+        warm_ms = sum(warm) / len(warm) * 1000
+        print(f"\ntime to first token: spawn-per-request {spawn_ms:.0f} ms, warm server {warm_ms:.1f} ms")
+        # Every spawned request pays the model load
+        assert min(spawn) >= LOAD_SECONDS
+        assert warm_ms * 5 < spawn_ms
@@ -0,0 +1,301 @@
+"""
+Tests for the resumable moderation backfill job.
+"""
+import asyncio
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from server.web.app.models import (
+    Base, ModerationScanJob, ModerationScanResult, User, Video, VideoComment, VideoStatus, VideoVisibility
+)
+from server.web.app.services import moderation_backfill
+from server.web.app.services.moderation_backfill import ModerationBackfillService
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    # A file database so every session the job opens sees the same data
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'backfill.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+async def video(sessions):
+    async with sessions() as db:
+        user = User(id=uuid.uuid4(), display_label="Creator", email="creator@example.com")
+        video = Video(
+            id=uuid.uuid4(),
+            creator_id=user.id,
+            title="Test Video",
+            tags=[],
+            original_filename="test.mp4",
+            original_s3_key="videos/test.mp4",
+            file_size=1000,
+            duration_seconds=60,
+            status=VideoStatus.ready,
+            visibility=VideoVisibility.public
+        )
+        db.add_all([user, video])
+        await db.commit()
+        return video
+
+
+async def add_comments(sessions, video, count, flag_every=5):
+    start = datetime(2024, 1, 1)
+    async with sessions() as db:
+        for i in range(count):
+            content = "buy now at www.example.com" if i % flag_every == 0 else f"nice video {i}"
+            db.add(VideoComment(
+                video_id=video.id,
+                user_id=video.creator_id,
+                content=content,
+                created_at=start + timedelta(seconds=i)
+            ))
+        await db.commit()
+
+
+async def result_count(sessions):
+    async with sessions() as db:
+        return await db.scalar(select(func.count(ModerationScanResult.id)))
+
+
+def make_service(sessions, **kwargs):
+    return ModerationBackfillService(session_factory=sessions, db_duty_cycle=1.0, **kwargs)
+
+
+class TestModerationBackfill:
+
+    async def test_scans_every_comment(self, sessions, video):
+        await add_comments(sessions, video, 25)
+        service = make_service(sessions)
+
+        job = await service.create_job("comment", batch_size=7)
+        progress = await service.run_job(uuid.UUID(job["job_id"]))
+
+        assert progress["status"] == "completed"
+        assert progress["scanned"] == 25
+        assert progress["flagged"] == 5
+        assert progress["percent"] == 100.0
+        assert progress["eta_seconds"] == 0.0
+        assert await result_count(sessions) == 5
+
+    async def test_one_active_job_per_content_type(self, sessions, video):
+        service = make_service(sessions)
+
+        first = await service.create_job("comment")
+        second = await service.create_job("comment")
+
+        assert first["job_id"] == second["job_id"]
+        with pytest.raises(ValueError):
+            await service.create_job("channel")
+
+    async def test_pause_and_resume_from_checkpoint(self, sessions, video):
+        await add_comments(sessions, video, 25)
+        calls = []
+
+        async def pause_after_first_batch():
+            if not calls:
+                await service.request_status(job_id, "paused")
+            calls.append(1)
+            return 0.0
+
+        service = make_service(sessions, load_probe=pause_after_first_batch)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=7))["job_id"])
+
+        paused = await service.run_job(job_id)
+
+        assert paused["status"] == "paused"
+        assert paused["scanned"] == 14
+        assert paused["eta_seconds"] is not None
+
+        resumed = await service.run_job(job_id)
+
+        assert resumed["status"] == "completed"
+        assert resumed["scanned"] == 25
+        assert await result_count(sessions) == 5
+
+    async def test_failed_batch_resumes_after_last_commit(self, sessions, video, monkeypatch):
+        await add_comments(sessions, video, 20)
+        service = make_service(sessions)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+
+        real_scan = moderation_backfill.scan_comment_rows
+        calls = []
+
+        def flaky_scan(texts):
+            calls.append(1)
+            if len(calls) == 3:
+                raise RuntimeError("scanner crashed")
+            return real_scan(texts)
+
+        monkeypatch.setattr(moderation_backfill, "scan_comment_rows", flaky_scan)
+        failed = await service.run_job(job_id)
+
+        assert failed["status"] == "failed"
+        assert failed["scanned"] == 10
+        assert "scanner crashed" in failed["error"]
+
+        resumed = await service.run_job(job_id)
+
+        assert resumed["status"] == "completed"
+        assert resumed["scanned"] == 20
+        assert await result_count(sessions) == 4
+
+    async def test_running_job_is_not_claimed_twice(self, sessions, video):
+        service = make_service(sessions)
+        job_id = uuid.UUID((await service.create_job("comment"))["job_id"])
+        async with sessions() as db:
+            job = await db.get(ModerationScanJob, job_id)
+            job.status = "running"
+            job.updated_at = datetime.utcnow()
+            await db.commit()
+
+        progress = await service.run_job(job_id)
+
+        assert progress["status"] == "running"
+        assert progress["scanned"] == 0
+
+    async def test_waiting_on_load_keeps_job_claimed(self, sessions, video, monkeypatch):
+        await add_comments(sessions, video, 10)
+        monkeypatch.setattr(moderation_backfill, "STALE_AFTER", timedelta(seconds=0.1))
+        second_runner = []
+
+        async def busy_then_idle():
+            # Load stays high for longer than STALE_AFTER; another runner tries to take over
+            if len(second_runner) < 3:
+                second_runner.append(await make_service(sessions).run_job(job_id))
+                return 1.0
+            return 0.0
+
+        service = make_service(sessions, load_probe=busy_then_idle, load_backoff=0.15)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+
+        progress = await service.run_job(job_id)
+
+        assert [p["status"] for p in second_runner] == ["running"] * 3
+        assert progress["status"] == "completed"
+        assert progress["scanned"] == 10
+        assert await result_count(sessions) == 2
+
+    async def test_pause_while_waiting_on_load(self, sessions, video):
+        await add_comments(sessions, video, 10)
+
+        async def busy():
+            await service.request_status(job_id, "paused")
+            return 1.0
+
+        service = make_service(sessions, load_probe=busy, load_backoff=0.01)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+
+        progress = await service.run_job(job_id)
+
+        assert progress["status"] == "paused"
+        assert progress["scanned"] == 5
+
+    async def test_cancelled_job_stops(self, sessions, video):
+        await add_comments(sessions, video, 10)
+        service = make_service(sessions)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+
+        await service.request_status(job_id, "cancelled")
+
+        assert (await service.run_job(job_id))["status"] == "cancelled"
+
+    async def test_running_job_without_heartbeat_is_resumable(self, sessions, video):
+        await add_comments(sessions, video, 10)
+        service = make_service(sessions)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+        async with sessions() as db:
+            job = await db.get(ModerationScanJob, job_id)
+            job.status = "running"
+            job.updated_at = datetime.utcnow()
+            await db.commit()
+        assert not (await service.get_progress(job_id))["resumable"]
+
+        # The worker running it died
+        async with sessions() as db:
+            job = await db.get(ModerationScanJob, job_id)
+            job.updated_at = datetime.utcnow() - moderation_backfill.STALE_AFTER - timedelta(seconds=1)
+            await db.commit()
+        assert (await service.get_progress(job_id))["resumable"]
+
+        progress = await service.run_job(job_id)
+
+        assert (progress["status"], progress["scanned"]) == ("completed", 10)
+        assert not progress["resumable"]
+
+    async def test_cancel_survives_runner_cancellation(self, sessions, video):
+        await add_comments(sessions, video, 10)
+        waiting = asyncio.Event()
+
+        async def busy():
+            waiting.set()
+            return 1.0
+
+        service = make_service(sessions, load_probe=busy, load_backoff=60)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+        runner = asyncio.create_task(service.run_job(job_id))
+        await waiting.wait()
+
+        await service.request_status(job_id, "cancelled")
+        runner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await runner
+
+        assert (await service.get_progress(job_id))["status"] == "cancelled"
+
+    async def test_shutdown_pauses_running_job(self, sessions, video):
+        await add_comments(sessions, video, 10)
+        waiting = asyncio.Event()
+
+        async def busy():
+            waiting.set()
+            return 1.0
+
+        service = make_service(sessions, load_probe=busy, load_backoff=60)
+        job_id = uuid.UUID((await service.create_job("comment", batch_size=5))["job_id"])
+        runner = asyncio.create_task(service.run_job(job_id))
+        await waiting.wait()
+
+        runner.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await runner
+
+        assert (await service.get_progress(job_id))["status"] == "paused"
+
+    async def test_video_metadata_in_process_pool(self, sessions, video):
+        async with sessions() as db:
+            db.add(Video(
+                id=uuid.uuid4(),
+                creator_id=video.creator_id,
+                title="Click here to earn $500",
+                tags=["nazi"],
+                original_filename="spam.mp4",
+                original_s3_key="videos/spam.mp4",
+                file_size=1000,
+                duration_seconds=60,
+                status=VideoStatus.ready,
+                visibility=VideoVisibility.public
+            ))
+            await db.commit()
+
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            service = make_service(sessions, executor=executor)
+            job = await service.create_job("video")
+            progress = await service.run_job(uuid.UUID(job["job_id"]))
+
+        assert progress["status"] == "completed"
+        assert progress["scanned"] == 2
+        async with sessions() as db:
+            result = (await db.execute(select(ModerationScanResult))).scalar_one()
+        assert result.risk_level == "high"
+        assert result.recommended_action == "hidden"
+        assert set(result.flags) == {"title_spam", "tag_hate_speech"}
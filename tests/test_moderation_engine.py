@@ -0,0 +1,208 @@
+"""
+Tests for the compiled moderation engine, including a comparison with the
+previous per-pattern scan.
+"""
+import json
+import os
+import random
+import re
+
+import pytest
+
+from shared_lib.moderation import (
+    DEFAULT_RULES, ModerationEngine, ModerationRule, moderate_prompt
+)
+
+
+@pytest.fixture
+def engine():
+    return ModerationEngine()
+
+
+class TestScan:
+
+    @pytest.mark.parametrize("text, flag, risk", [
+        ("This is a fucking terrible video", "profanity", "medium"),
+        ("Click here to buy now! Limited time offer!", "spam", "medium"),
+        ("Earn $500 a day", "spam", "medium"),
+        ("I hate all people from that country", "hate_speech", "high"),
+        ("My email is test@example.com and SSN is 123-45-6789", "personal_info", "medium"),
+    ])
+    def test_flags(self, engine, text, flag, risk):
+        result = engine.scan(text)
+
+        assert flag in result.flags
+        assert result.risk_level == risk
+
+    def test_clean_text(self, engine):
+        result = engine.scan("This is a perfectly normal and appropriate comment")
+
+        assert result.clean
+        assert result.risk_level == "low"
+
+    def test_whole_word_terms_ignore_substrings(self, engine):
+        assert engine.scan("hello there, shell script").clean
+        assert not engine.scan("what the hell").clean
+
+    def test_highest_risk_wins(self, engine):
+        result = engine.scan("nazi spam at test@example.com")
+
+        assert result.risk_level == "high"
+        assert set(result.flags) == {"hate_speech", "personal_info"}
+
+    def test_overlapping_terms_all_match(self):
+        engine = ModerationEngine({"content": [
+            ModerationRule("short", "a", terms=("scam",), whole_word=False),
+            ModerationRule("long", "b", terms=("scammer",), whole_word=False),
+        ]})
+
+        assert engine.scan("a scammer").rules == ["short", "long"]
+
+    def test_patterns_matching_at_same_position_all_match(self):
+        engine = ModerationEngine({"content": [
+            ModerationRule("digits", "a", pattern=r"\d{3}-\d{2}"),
+            ModerationRule("ssn", "b", "high", pattern=r"\d{3}-\d{2}-\d{4}"),
+        ]})
+
+        result = engine.scan("id 123-45-6789")
+
+        assert result.rules == ["digits", "ssn"]
+        assert result.risk_level == "high"
+        assert [r.rules for r in engine.scan_many(["123-45-6789", "123-45"])] == [["digits", "ssn"], ["digits"]]
+
+    def test_backreference_patterns(self):
+        engine = ModerationEngine({"content": [
+            ModerationRule("repeats", "spam", pattern=r"(.)\1{4,}"),
+            ModerationRule("links", "spam", pattern=r"(https?)://"),
+        ]})
+
+        assert engine.scan("noooooo").rules == ["repeats"]
+        assert engine.scan("see http://x").rules == ["links"]
+
+    def test_comment_and_prompt_rule_sets(self, engine):
+        assert not engine.scan("total scam", "comment").clean
+        assert engine.scan("total scam", "prompt").clean
+        assert moderate_prompt("say badword1") is False
+        assert moderate_prompt("hello") is True
+
+    def test_unknown_rule_set(self, engine):
+        with pytest.raises(ValueError):
+            engine.scan("text", "nope")
+
+
+class TestScanMany:
+
+    def test_matches_single_scans(self, engine):
+        texts = [
+            "buy now", "", "clean text", "hell", "contact me at a@b.io", "kill all bugs",
+            "shitty", "www.example.com", "fine", "HELL NO",
+        ]
+
+        batch = engine.scan_many(texts)
+
+        assert [r.rules for r in batch] == [engine.scan(t).rules for t in texts]
+
+    def test_match_spanning_texts_is_not_attributed(self):
+        engine = ModerationEngine({"content": [
+            ModerationRule("pair", "x", pattern=r"foo[^!]*bar"),
+        ]})
+
+        results = engine.scan_many(["foo", "bar", "foo bar"])
+
+        assert [r.clean for r in results] == [True, True, False]
+
+    def test_separator_in_text(self, engine):
+        results = engine.scan_many(["a\x00buy now", "fine"])
+
+        assert results[0].flags == ["spam"]
+        assert results[1].clean
+
+
+class TestHitCounters:
+
+    def test_counts_per_rule(self, engine):
+        engine.scan_many(["buy now", "click here", "nazi"])
+
+        counts = engine.hit_counts()
+
+        assert counts["content:spam_phrases"] == 2
+        assert counts["content:hate_terms"] == 1
+
+        engine.reset_hit_counts()
+        assert engine.hit_counts() == {}
+
+
+class TestReload:
+
+    def write_rules(self, path, terms, mtime):
+        path.write_text(json.dumps({"comment": [
+            {"name": "custom", "category": "inappropriate", "terms": terms, "whole_word": False}
+        ]}))
+        os.utime(path, (mtime, mtime))
+
+    def test_file_replaces_named_rule_sets(self, tmp_path):
+        path = tmp_path / "rules.json"
+        self.write_rules(path, ["pineapple"], 1000)
+
+        engine = ModerationEngine(rules_path=str(path), reload_interval=0)
+
+        assert not engine.scan("pineapple pizza", "comment").clean
+        assert engine.scan("total scam", "comment").clean
+        # Sets missing from the file keep the built-in rules
+        assert not engine.scan("buy now").clean
+
+    def test_reloads_on_change(self, tmp_path):
+        path = tmp_path / "rules.json"
+        self.write_rules(path, ["pineapple"], 1000)
+        engine = ModerationEngine(rules_path=str(path), reload_interval=0)
+
+        self.write_rules(path, ["anchovy"], 2000)
+
+        assert not engine.scan("anchovy pizza", "comment").clean
+        assert engine.scan("pineapple pizza", "comment").clean
+
+    def test_invalid_file_keeps_rules(self, tmp_path):
+        path = tmp_path / "rules.json"
+        self.write_rules(path, ["pineapple"], 1000)
+        engine = ModerationEngine(rules_path=str(path), reload_interval=0)
+
+        path.write_text(json.dumps({"comment": [{"name": "broken", "category": "x"}]}))
+        os.utime(path, (2000, 2000))
+
+        assert engine.reload_if_changed() is False
+        assert not engine.scan("pineapple pizza", "comment").clean
+
+
+class TestLegacyEquivalence:
+    """Compiled batch scanning against the previous per-pattern re.search loop"""
+
+    TEXTS = 2000
+
+    LEGACY = [(rule.name, re.compile(rule.as_regex())) for rule in DEFAULT_RULES["content"]]
+
+    def legacy_scan(self, text):
+        text_lower = text.lower()
+        return [name for name, regex in self.LEGACY if regex.search(text_lower)]
+
+    def make_texts(self):
+        rng = random.Random(0)
+        words = (
+            "the video was great and i loved the editing but the audio could be better "
+            "thanks for sharing this tutorial about cooking pasta at home with friends"
+        ).split()
+        samples = ["buy now", "test@example.com", "idiot", "www.site.com", "nazi", "123-45-6789", "kill all bugs"]
+        texts = []
+        for i in range(self.TEXTS):
+            text = " ".join(rng.choice(words) for _ in range(rng.randint(5, 40)))
+            if i % 10 == 0:
+                text += " " + rng.choice(samples)
+            texts.append(text)
+        return texts
+
+    def test_same_rules_as_legacy_scan(self, engine):
+        texts = self.make_texts()
+
+        results = engine.scan_many(texts)
+
+        assert [r.rules for r in results] == [self.legacy_scan(text) for text in texts]
+        assert sum(1 for r in results if not r.clean) >= self.TEXTS // 10
@@ -0,0 +1,228 @@
+"""
+Tests for keyset pagination, including a page-depth benchmark that only
+runs with RUN_BENCHMARKS=1.
+"""
+import os
+import time
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.models import User, Video, VideoStatus, VideoVisibility
+from server.web.app.services.admin_video_service import AdminVideoService
+from server.web.app.services.pagination import (
+    CountMode, KeysetPaginator, count_rows, decode_cursor, encode_cursor
+)
+
+
+@pytest.fixture
+async def creator(db_session: AsyncSession):
+    user = User(id=uuid.uuid4(), display_label="Creator", email="creator@example.com")
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+def video_id(i: int) -> uuid.UUID:
+    # Fixed ids; random ones occasionally look numeric to SQLite and collide
+    return uuid.uuid5(uuid.NAMESPACE_URL, f"video/{i}")
+
+
+async def insert_videos(db_session: AsyncSession, creator: User, count: int, first: int = 0):
+    start = datetime(2024, 1, 1)
+    rows = [
+        {
+            'id': video_id(i),
+            'creator_id': creator.id,
+            'title': f"Video {i:06d}",
+            'tags': [],
+            'original_filename': "video.mp4",
+            'original_s3_key': f"videos/{i}.mp4",
+            'file_size': 1024,
+            'duration_seconds': 60,
+            'status': VideoStatus.ready,
+            'visibility': VideoVisibility.public,
+            # Pairs share a timestamp so ties are broken by id
+            'created_at': start + timedelta(seconds=i // 2),
+            'updated_at': start,
+        }
+        for i in range(first, first + count)
+    ]
+    for i in range(0, count, 10000):
+        await db_session.execute(Video.__table__.insert(), rows[i:i + 10000])
+    await db_session.commit()
+
+
+class TestCursors:
+
+    def test_round_trip(self):
+        video_id = uuid.uuid4()
+        created = datetime(2024, 1, 1, 12, 30)
+
+        cursor = encode_cursor("newest", (created, video_id))
+
+        assert decode_cursor(cursor, "newest") == [created, video_id]
+
+    def test_rejects_other_sort(self):
+        cursor = encode_cursor("newest", (1, 2))
+
+        with pytest.raises(HTTPException) as exc:
+            decode_cursor(cursor, "oldest")
+        assert exc.value.status_code == 400
+
+    def test_rejects_garbage(self):
+        with pytest.raises(HTTPException):
+            decode_cursor("not-a-cursor", "newest")
+
+
+class TestKeysetPaginator:
+
+    @pytest.mark.parametrize("descending", [True, False])
+    async def test_walks_every_row_once(self, db_session, creator, descending):
+        await insert_videos(db_session, creator, 25)
+        paginator = KeysetPaginator("created", Video.created_at, Video.id, descending=descending)
+
+        seen, cursor = [], None
+        while True:
+            result = await db_session.execute(paginator.apply(select(Video), cursor, 7))
+            page = paginator.page(result.scalars().all(), 7)
+            seen.extend(video.id for video in page.items)
+            cursor = page.next_cursor
+            if cursor is None:
+                break
+
+        order = (Video.created_at.desc(), Video.id.desc()) if descending else (Video.created_at, Video.id)
+        expected = await db_session.scalars(select(Video.id).order_by(*order))
+        assert seen == list(expected)
+
+    async def test_last_page_has_no_cursor(self, db_session, creator):
+        await insert_videos(db_session, creator, 5)
+        paginator = KeysetPaginator("created", Video.created_at, Video.id)
+
+        result = await db_session.execute(paginator.apply(select(Video), None, 5))
+        page = paginator.page(result.scalars().all(), 5)
+
+        assert len(page.items) == 5
+        assert page.next_cursor is None
+
+    async def test_count_modes(self, db_session, creator):
+        await insert_videos(db_session, creator, 12)
+        query = select(Video).where(Video.creator_id == creator.id)
+
+        assert await count_rows(db_session, query, CountMode.EXACT) == (12, False)
+        assert await count_rows(db_session, query, CountMode.NONE) == (None, False)
+        # Planner estimates are Postgres only; elsewhere the exact count is used
+        assert await count_rows(db_session, query, CountMode.ESTIMATE) == (12, False)
+
+    async def test_cached_count_dropped_on_write(self, db_session, creator):
+        await insert_videos(db_session, creator, 12)
+        query = select(Video).where(Video.creator_id == creator.id)
+        assert await count_rows(db_session, query) == (12, False)
+
+        await insert_videos(db_session, creator, 3, first=12)
+        assert await count_rows(db_session, query) == (15, False)
+
+        video = await db_session.get(Video, video_id(0))
+        await db_session.delete(video)
+        await db_session.commit()
+        assert await count_rows(db_session, query) == (14, False)
+
+
+class TestAdminVideoListPagination:
+
+    async def test_cursor_continues_listing(self, db_session, creator):
+        await insert_videos(db_session, creator, 30)
+        service = AdminVideoService()
+
+        first = await service.get_videos_list(db_session, per_page=20)
+        second = await service.get_videos_list(
+            db_session, per_page=20, cursor=first['pagination']['next_cursor']
+        )
+
+        assert first['pagination']['total_count'] == 30
+        assert len(first['videos']) == 20
+        assert len(second['videos']) == 10
+        assert second['pagination']['next_cursor'] is None
+        ids = [v['id'] for v in first['videos'] + second['videos']]
+        assert len(set(ids)) == 30
+
+    async def test_deep_cursor_matches_offset(self, db_session, creator):
+        await insert_videos(db_session, creator, 95)
+        service = AdminVideoService()
+
+        last_before = (await db_session.execute(
+            select(Video.created_at, Video.id)
+            .order_by(Video.created_at.desc(), Video.id.desc())
+            .offset(79).limit(1)
+        )).one()
+        keyset = await service.get_videos_list(
+            db_session, per_page=10, cursor=encode_cursor("created_at:desc", tuple(last_before)),
+            count_mode=CountMode.NONE
+        )
+        offset = await service.get_videos_list(db_session, page=9, per_page=10, count_mode=CountMode.NONE)
+
+        assert [v['id'] for v in keyset['videos']] == [v['id'] for v in offset['videos']]
+        assert len(keyset['videos']) == 10
+
+
+@pytest.mark.skipif(not os.getenv("RUN_BENCHMARKS"), reason="benchmark; set RUN_BENCHMARKS=1 to run")
+class TestPaginationBenchmark:
+    """Page 10,000 through a cursor should cost about the same as page 1"""
+
+    ROWS = 100_000
+    PER_PAGE = 10
+    RUNS = 5
+
+    async def _time(self, fetch) -> float:
+        timings = []
+        for _ in range(self.RUNS):
+            start = time.perf_counter()
+            await fetch()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
+
+    async def test_deep_page_latency_is_flat(self, db_session, creator):
+        await insert_videos(db_session, creator, self.ROWS)
+        service = AdminVideoService()
+        deep_page = self.ROWS // self.PER_PAGE
+
+        # Cursor pointing just before the last page, as a client walking the
+        # list would hold after 9,999 pages
+        last_before = (await db_session.execute(
+            select(Video.created_at, Video.id)
+            .order_by(Video.created_at.desc(), Video.id.desc())
+            .offset((deep_page - 1) * self.PER_PAGE - 1).limit(1)
+        )).one()
+        deep_cursor = encode_cursor("created_at:desc", tuple(last_before))
+
+        async def page_one():
+            return await service.get_videos_list(db_session, per_page=self.PER_PAGE, count_mode=CountMode.NONE)
+
+        async def keyset_deep():
+            return await service.get_videos_list(
+                db_session, per_page=self.PER_PAGE, cursor=deep_cursor, count_mode=CountMode.NONE
+            )
+
+        async def offset_deep():
+            return await service.get_videos_list(
+                db_session, page=deep_page, per_page=self.PER_PAGE, count_mode=CountMode.NONE
+            )
+
+        keyset_result = await keyset_deep()
+        offset_result = await offset_deep()
+        assert [v['id'] for v in keyset_result['videos']] == [v['id'] for v in offset_result['videos']]
+
+        first = await self._time(page_one)
+        keyset = await self._time(keyset_deep)
+        offset = await self._time(offset_deep)
+        print(
+            f"\npage 1: {first * 1000:.2f}ms, page {deep_page} keyset: {keyset * 1000:.2f}ms, "
+            f"page {deep_page} offset: {offset * 1000:.2f}ms"
+        )
+
+        assert keyset < first * 3 + 0.005
+        assert keyset < offset
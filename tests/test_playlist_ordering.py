@@ -0,0 +1,298 @@
+"""
+Tests for rank-key playlist ordering.
+"""
+import asyncio
+import random
+import time
+import uuid
+
+import pytest
+from sqlalchemy import event, select
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from server.web.app.models import Base, User, Video, VideoPlaylist, VideoPlaylistItem, VideoStatus, VideoVisibility
+from server.web.app.services import playlist_service
+from server.web.app.services.playlist_service import PlaylistService, rank_update_statements
+from server.web.app.services.rank_keys import FIRST_KEY, key_between, keys_between, spread_keys
+
+
+class TestRankKeys:
+
+    def test_first_and_appended_keys(self):
+        assert key_between(None, None) == FIRST_KEY
+        assert key_between("a0", None) == "a1"
+        assert key_between("az", None) == "b00"
+        assert key_between(None, "a0") == "Zz"
+
+    def test_key_between_neighbours(self):
+        assert "a0" < key_between("a0", "a1") < "a1"
+        assert "a0" < key_between("a0", "a0V") < "a0V"
+
+    def test_rejects_unordered_and_invalid(self):
+        with pytest.raises(ValueError):
+            key_between("a1", "a0")
+        with pytest.raises(ValueError):
+            key_between("a10", None)
+
+    def test_random_inserts_stay_ordered_and_short(self):
+        rng = random.Random(0)
+        keys = []
+        for _ in range(2000):
+            i = rng.randint(0, len(keys))
+            keys.insert(i, key_between(keys[i - 1] if i else None, keys[i] if i < len(keys) else None))
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == len(keys)
+        assert max(len(k) for k in keys) <= 8
+
+    def test_keys_between(self):
+        keys = keys_between("a0", "a1", 50)
+
+        assert keys == sorted(keys)
+        assert "a0" < keys[0] and keys[-1] < "a1"
+        assert len(set(keys)) == 50
+
+    def test_spread_keys(self):
+        keys = spread_keys(10000)
+
+        assert keys == sorted(keys)
+        assert len(set(keys)) == 10000
+        assert max(len(k) for k in keys) <= 4
+
+
+class TestRankUpdateStatement:
+
+    def test_postgres_single_update_from_values(self):
+        ranks = [(uuid.uuid4(), "a0"), (uuid.uuid4(), "a1")]
+        statement, params = rank_update_statements("postgresql", ranks)
+
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+
+        assert params is None
+        assert "UPDATE video_playlist_items SET rank=new_ranks.rank" in sql
+        assert "FROM (VALUES" in sql
+        assert "WHERE video_playlist_items.id = new_ranks.id" in sql
+
+    def test_other_dialects_update_by_primary_key(self):
+        item_id = uuid.uuid4()
+
+        _, params = rank_update_statements("sqlite", [(item_id, "a0")])
+
+        assert params == [{"id": item_id, "rank": "a0"}]
+
+    def test_postgres_rank_column_uses_byte_order(self):
+        rank_type = VideoPlaylistItem.__table__.c.rank.type
+
+        assert rank_type.compile(dialect=postgresql.dialect()) == 'VARCHAR(255) COLLATE "C"'
+
+
+@pytest.fixture
+async def sessions(tmp_path):
+    # A file database so every session the service opens sees the same data
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'playlists.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    factory.engine = engine
+    yield factory
+    await engine.dispose()
+
+
+@pytest.fixture
+def service(sessions):
+    service = PlaylistService()
+    service.get_db_session = lambda role="primary": sessions()
+    return service
+
+
+async def make_playlist(sessions, count):
+    """A playlist with `count` videos, returning (owner id, playlist id, video ids in order)"""
+    async with sessions() as db:
+        user_id = uuid.uuid4()
+        user = User(id=user_id, display_label="Creator", email=f"{user_id}@example.com")
+        playlist = VideoPlaylist(id=uuid.uuid4(), creator_id=user.id, name="Mix")
+        videos = [
+            Video(
+                id=uuid.uuid4(),
+                creator_id=user.id,
+                title=f"Video {i}",
+                original_filename="test.mp4",
+                original_s3_key=f"videos/{uuid.uuid4()}.mp4",
+                file_size=1000,
+                duration_seconds=60,
+                status=VideoStatus.ready,
+                visibility=VideoVisibility.public
+            )
+            for i in range(count)
+        ]
+        items = [
+            VideoPlaylistItem(playlist_id=playlist.id, video_id=video.id, rank=rank)
+            for video, rank in zip(videos, spread_keys(count))
+        ]
+        db.add_all([user, playlist] + videos + items)
+        await db.commit()
+        return user.id, playlist.id, [video.id for video in videos]
+
+
+async def ordered_video_ids(sessions, playlist_id):
+    async with sessions() as db:
+        result = await db.execute(
+            select(VideoPlaylistItem.video_id)
+            .where(VideoPlaylistItem.playlist_id == playlist_id)
+            .order_by(VideoPlaylistItem.rank, VideoPlaylistItem.id)
+        )
+        return result.scalars().all()
+
+
+def count_updates(sessions):
+    statements = []
+
+    @event.listens_for(sessions.engine.sync_engine, "before_cursor_execute")
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE"):
+            statements.append(len(parameters) if executemany else 1)
+
+    return statements
+
+
+class TestPlaylistOrdering:
+
+    async def test_add_at_end_position_and_after(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 3)
+        async with sessions() as db:
+            new = [
+                Video(
+                    id=uuid.uuid4(), creator_id=owner, title=f"New {i}", original_filename="n.mp4",
+                    original_s3_key=f"videos/new{i}.mp4", file_size=1, duration_seconds=1,
+                    status=VideoStatus.ready, visibility=VideoVisibility.public
+                )
+                for i in range(3)
+            ]
+            db.add_all(new)
+            await db.commit()
+        new_ids = [video.id for video in new]
+
+        appended = await service.add_video_to_playlist(playlist_id, new_ids[0], owner)
+        first = await service.add_video_to_playlist(playlist_id, new_ids[1], owner, position=1)
+        after = await service.add_video_to_playlist(playlist_id, new_ids[2], owner, after_video_id=videos[0])
+
+        assert appended.position == 4
+        assert first.position == 1
+        assert after.position == 3
+        assert await ordered_video_ids(sessions, playlist_id) == [
+            new_ids[1], videos[0], new_ids[2], videos[1], videos[2], new_ids[0]
+        ]
+
+    async def test_move_writes_one_row(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 5)
+        updates = count_updates(sessions)
+
+        moved = await service.move_playlist_item(playlist_id, videos[4], owner, after_video_id=videos[0])
+        await service.move_playlist_item(playlist_id, videos[0], owner, before_video_id=videos[3])
+        await service.move_playlist_item(playlist_id, videos[2], owner)
+
+        assert moved.position == 2
+        assert updates == [1, 1, 1]
+        assert await ordered_video_ids(sessions, playlist_id) == [
+            videos[2], videos[4], videos[1], videos[0], videos[3]
+        ]
+
+    async def test_remove_leaves_other_rows(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 4)
+        updates = count_updates(sessions)
+
+        assert await service.remove_video_from_playlist(playlist_id, videos[1], owner)
+
+        assert updates == []
+        assert await ordered_video_ids(sessions, playlist_id) == [videos[0], videos[2], videos[3]]
+
+    async def test_reorder_updates_only_moved_items_in_one_statement(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 8)
+        updates = count_updates(sessions)
+
+        assert await service.reorder_playlist_items(playlist_id, owner, [
+            {"video_id": str(videos[7]), "position": 1},
+            {"video_id": str(videos[0]), "position": 5},
+            {"video_id": str(videos[1]), "position": 6},
+        ])
+
+        assert updates == [3]
+        assert await ordered_video_ids(sessions, playlist_id) == [
+            videos[7], videos[2], videos[3], videos[4], videos[0], videos[1], videos[5], videos[6]
+        ]
+
+    async def test_items_and_next_video_follow_rank(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 3)
+        await service.move_playlist_item(playlist_id, videos[2], owner)
+
+        items = await service.get_playlist_items(playlist_id, owner)
+        following = await service.get_next_video_in_playlist(playlist_id, videos[2])
+
+        assert [(item.video_id, item.position) for item in items] == [
+            (videos[2], 1), (videos[0], 2), (videos[1], 3)
+        ]
+        assert following.video_id == videos[0]
+
+    async def test_duplicate_ranks_rebalance_before_insert(self, sessions, service):
+        owner, playlist_id, _ = await make_playlist(sessions, 3)
+        async with sessions() as db:
+            for item in (await db.execute(select(VideoPlaylistItem))).scalars():
+                item.rank = "a0"
+            await db.commit()
+        first, second, third = await ordered_video_ids(sessions, playlist_id)
+
+        # The neighbours of the new spot share a rank
+        await service.move_playlist_item(playlist_id, third, owner, after_video_id=first)
+
+        async with sessions() as db:
+            ranks = (await db.execute(select(VideoPlaylistItem.rank))).scalars().all()
+        assert await ordered_video_ids(sessions, playlist_id) == [first, third, second]
+        assert len(set(ranks)) == 3
+
+    async def test_rebalance(self, sessions, service):
+        owner, playlist_id, videos = await make_playlist(sessions, 3)
+        for _ in range(40):
+            await service.move_playlist_item(playlist_id, videos[2], owner, after_video_id=videos[0])
+            await service.move_playlist_item(playlist_id, videos[1], owner, after_video_id=videos[0])
+        order = await ordered_video_ids(sessions, playlist_id)
+
+        assert await service.rebalance_playlist(playlist_id) == 3
+
+        async with sessions() as db:
+            ranks = (await db.execute(select(VideoPlaylistItem.rank))).scalars().all()
+        assert await ordered_video_ids(sessions, playlist_id) == order
+        assert max(len(rank) for rank in ranks) == 2
+
+    async def test_long_keys_schedule_background_rebalance(self, sessions, service, monkeypatch):
+        monkeypatch.setattr(playlist_service, "MAX_KEY_LENGTH", 2)
+        owner, playlist_id, videos = await make_playlist(sessions, 3)
+        for _ in range(4):
+            await service.move_playlist_item(playlist_id, videos[2], owner, after_video_id=videos[0])
+            await service.move_playlist_item(playlist_id, videos[1], owner, after_video_id=videos[0])
+
+        assert playlist_service._rebalance_tasks
+        await asyncio.gather(*playlist_service._rebalance_tasks)
+        assert not playlist_service._pending_rebalances
+        assert not playlist_service._rebalance_tasks
+
+        async with sessions() as db:
+            ranks = (await db.execute(select(VideoPlaylistItem.rank))).scalars().all()
+        assert max(len(rank) for rank in ranks) == 2
+
+    async def test_move_time_independent_of_playlist_size(self, sessions, service):
+        async def time_moves(count, moves=20):
+            owner, playlist_id, videos = await make_playlist(sessions, count)
+            rng = random.Random(count)
+            start = time.perf_counter()
+            for _ in range(moves):
+                video, anchor = rng.sample(videos, 2)
+                await service.move_playlist_item(playlist_id, video, owner, after_video_id=anchor)
+            return (time.perf_counter() - start) / moves
+
+        small = await time_moves(100)
+        large = await time_moves(10000)
+
+        print(f"\nper move: {small * 1000:.2f} ms at 100 items, {large * 1000:.2f} ms at 10k items")
+        # Renumbering would write ~5k rows per move at 10k items
+        assert large < small * 5
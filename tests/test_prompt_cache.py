@@ -0,0 +1,188 @@
+"""
+Tests for session-affine prompt caching, against the fake llama.cpp server.
+"""
+import os
+import sys
+
+import pytest
+
+from client_bot.inference_scheduler import InferenceScheduler
+from client_bot.llama_cpp_wrapper import LlamaCppConfig, LlamaServerBackend
+from client_bot.prompt_cache import CacheBudget, CachedPrefix, PromptCache
+
+FAKE_LLAMA = os.path.join(os.path.dirname(__file__), "mocks", "fake_llama_server.py")
+
+
+class FileBackend:
+    """save_slot writes `size` bytes, restore_slot records the call."""
+
+    def __init__(self, path, size=100):
+        self.slot_save_path = str(path)
+        self.size = size
+        self.restored = []
+
+    async def save_slot(self, slot, filename):
+        with open(os.path.join(self.slot_save_path, filename), "wb") as f:
+            f.write(b"x" * self.size)
+
+    async def restore_slot(self, slot, filename):
+        self.restored.append((slot, filename))
+
+
+class TestCachedPrefix:
+
+    def test_is_prefix_of(self):
+        cached = CachedPrefix.of("user: hi\nbot: hello\n")
+
+        assert cached.is_prefix_of("user: hi\nbot: hello\nuser: more\n")
+        assert cached.is_prefix_of("user: hi\nbot: hello\n")
+        assert not cached.is_prefix_of("user: hi\nbot: bye\nuser: more\n")
+        assert not cached.is_prefix_of("user: hi")
+
+
+class TestPromptCache:
+
+    async def test_slot_affinity(self, tmp_path):
+        cache = PromptCache(FileBackend(tmp_path), CacheBudget(10_000))
+        for slot, session_id in ((1, "a"), (0, "b")):
+            await cache.prepare(slot, session_id, "turn one ")
+            await cache.store(slot, session_id, "turn one ")
+
+        assert cache.choose_slot("a", [0, 1]) == 1
+        assert cache.choose_slot("c", [0, 1]) == 1  # slot 0 was used more recently
+
+    async def test_resident_hit_then_restore(self, tmp_path):
+        backend = FileBackend(tmp_path)
+        cache = PromptCache(backend, CacheBudget(10_000))
+        await cache.store(0, "a", "turn one ")
+
+        assert await cache.prepare(0, "a", "turn one turn two ")
+        # Another session takes the slot; "a" comes back on slot 1
+        assert not await cache.prepare(0, "b", "unrelated ")
+        assert await cache.prepare(1, "a", "turn one turn two ")
+
+        assert backend.restored == [(1, "a.bin")]
+        assert cache.metrics()["prompt_cache_hit_ratio"] == pytest.approx(2 / 3)
+        # Transfer files are removed once the state is in memory
+        assert os.listdir(tmp_path) == []
+
+    async def test_session_keeping_its_slot_is_never_saved(self, tmp_path):
+        budget = CacheBudget(10_000)
+        cache = PromptCache(FileBackend(tmp_path), budget)
+        conversation = ""
+        for turn in range(3):
+            conversation += f"turn {turn} "
+            await cache.prepare(0, "a", conversation)
+            await cache.store(0, "a", conversation)
+
+        assert cache.metrics()["prompt_cache_saves"] == 0
+        assert budget.used_bytes == 0
+
+    async def test_diverged_prompt_misses(self, tmp_path):
+        cache = PromptCache(FileBackend(tmp_path), CacheBudget(10_000))
+        await cache.store(0, "a", "turn one ")
+
+        assert not await cache.prepare(0, "a", "edited history ")
+
+    async def test_budget_evicts_least_recently_used_across_models(self, tmp_path):
+        budget = CacheBudget(250)
+        first = PromptCache(FileBackend(tmp_path), budget)
+        second = PromptCache(FileBackend(tmp_path), budget)
+
+        # Each session is saved when the next one takes its slot
+        await first.store(0, "a", "a ")
+        await first.prepare(0, "x", "x ")
+        await second.store(0, "b", "b ")
+        await second.prepare(0, "c", "c ")
+        await first.prepare(1, "a", "a more ")  # "a" is now the most recent
+        await second.store(0, "c", "c ")
+        await second.prepare(0, "y", "y ")
+
+        assert budget.used_bytes == 200
+        assert first.metrics()["prompt_cache_sessions"] == 1
+        assert not await second.prepare(1, "b", "b more ")
+        assert await second.prepare(2, "c", "c more ")
+
+    async def test_drop_session_releases_state(self, tmp_path):
+        budget = CacheBudget(10_000)
+        cache = PromptCache(FileBackend(tmp_path), budget)
+        await cache.store(0, "a", "turn one ")
+        await cache.prepare(0, "b", "other ")
+        assert budget.used_bytes == 100
+
+        cache.drop_session("a")
+
+        assert budget.used_bytes == 0
+        assert not await cache.prepare(0, "a", "turn one turn two ")
+
+    async def test_session_ids_are_safe_filenames(self, tmp_path):
+        backend = FileBackend(tmp_path)
+        cache = PromptCache(backend, CacheBudget(10_000))
+
+        await cache.store(0, "../../etc/passwd", "x ")
+        await cache.prepare(0, "b", "other ")
+        await cache.prepare(1, "../../etc/passwd", "x y ")
+
+        assert backend.restored == [(1, ".._.._etc_passwd.bin")]
+
+
+@pytest.fixture
+async def server(tmp_path, monkeypatch):
+    monkeypatch.setenv("FAKE_LLAMA_LOAD_SECONDS", "0.05")
+    monkeypatch.setenv("FAKE_LLAMA_PROMPT_TOKEN_SECONDS", "0.002")
+    executable = tmp_path / "llama-server"
+    executable.write_text(f'#!/bin/sh\nexec "{sys.executable}" "{FAKE_LLAMA}" "$@"\n')
+    executable.chmod(0o755)
+    model = tmp_path / "model.gguf"
+    model.write_text("weights")
+    backend = LlamaServerBackend(LlamaCppConfig(
+        server_executable_path=str(executable),
+        default_model_path=str(model),
+        prompt_cache_dir=str(tmp_path / "cache"),
+        startup_timeout=10
+    ))
+    await backend.start()
+    yield backend
+    await backend.stop()
+
+
+class TestPromptCacheWithServer:
+
+    async def chat(self, scheduler, session_id, turns, history):
+        for turn in range(turns):
+            history[session_id] += f"{session_id} says {' '.join(['word'] * 40)} turn {turn} "
+            reply = await scheduler.generate(session_id, history[session_id], max_tokens=4)
+            history[session_id] += reply
+
+    async def test_interleaved_sessions_skip_prompt_tokens(self, server):
+        cache = PromptCache(server, CacheBudget(1024 * 1024))
+        scheduler = InferenceScheduler(server, slots=1, prompt_cache=cache)
+        history = {"a": "", "b": ""}
+
+        # One slot shared by two sessions forces save/restore every turn
+        for _ in range(3):
+            await self.chat(scheduler, "a", 1, history)
+            await self.chat(scheduler, "b", 1, history)
+        metrics = scheduler.metrics()
+
+        assert metrics["prompt_cache_restores"] == 4
+        # Saved whenever the other session takes the slot
+        assert metrics["prompt_cache_saves"] == 5
+        assert metrics["prompt_cache_hit_ratio"] == pytest.approx(4 / 6)
+        # Turns 2 and 3 of each session only evaluate the new message
+        assert metrics["prompt_tokens_skipped"] == 2 * (48 + 96)
+        assert metrics["prompt_cache_sessions"] == 2
+        assert os.listdir(server.slot_save_path) == []
+
+    async def test_same_slot_needs_no_restore(self, server):
+        cache = PromptCache(server, CacheBudget(1024 * 1024))
+        scheduler = InferenceScheduler(server, slots=2, prompt_cache=cache)
+        history = {"a": ""}
+
+        await self.chat(scheduler, "a", 3, history)
+        metrics = scheduler.metrics()
+
+        assert metrics["prompt_cache_slot_hits"] == 2
+        assert metrics["prompt_cache_restores"] == 0
+        assert metrics["prompt_cache_saves"] == 0
+        assert metrics["prompt_tokens_skipped"] == 48 + 96
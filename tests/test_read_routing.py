@@ -0,0 +1,104 @@
+"""
+Tests for replica read routing.
+"""
+import pytest
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+
+from server.web.app.read_routing import ReadRouter
+
+
+@pytest.fixture
+async def factories():
+    engines = {name: create_async_engine("sqlite+aiosqlite:///:memory:") for name in ("primary", "replica:0", "replica:1")}
+    yield {name: async_sessionmaker(engine, class_=AsyncSession) for name, engine in engines.items()}
+    for engine in engines.values():
+        await engine.dispose()
+
+
+def make_router(factories, lags, **kwargs):
+    router = ReadRouter(
+        primary=factories["primary"],
+        replicas={"replica:0": factories["replica:0"], "replica:1": factories["replica:1"]},
+        max_lag_seconds=5.0,
+        **kwargs
+    )
+
+    async def measure_lag(name):
+        return lags[name]
+
+    router._measure_lag = measure_lag
+    return router
+
+
+class TestReadRouter:
+
+    async def test_round_robin_over_healthy_replicas(self, factories):
+        router = make_router(factories, {"replica:0": 0.1, "replica:1": 0.2})
+
+        assert [await router.choose() for _ in range(4)] == ["replica:0", "replica:1", "replica:0", "replica:1"]
+
+    async def test_skips_lagging_replica(self, factories):
+        router = make_router(factories, {"replica:0": 30.0, "replica:1": 0.2})
+
+        assert {await router.choose() for _ in range(3)} == {"replica:1"}
+
+    async def test_falls_back_to_primary_when_no_replica_usable(self, factories):
+        router = make_router(factories, {"replica:0": 30.0, "replica:1": None})
+
+        assert await router.choose() == "primary"
+
+    async def test_lag_is_rechecked_after_interval(self, factories):
+        lags = {"replica:0": 30.0, "replica:1": 30.0}
+        router = make_router(factories, lags, lag_check_interval=0.0)
+        assert await router.choose() == "primary"
+
+        lags["replica:0"] = 0.0
+
+        assert await router.choose() == "replica:0"
+
+    async def test_lag_probe_is_cached(self, factories):
+        lags = {"replica:0": 30.0, "replica:1": 30.0}
+        router = make_router(factories, lags, lag_check_interval=60.0)
+        await router.choose()
+
+        lags["replica:0"] = 0.0
+
+        assert await router.choose() == "primary"
+
+    async def test_pins_user_to_primary_after_write(self, factories):
+        router = make_router(factories, {"replica:0": 0.0, "replica:1": 0.0}, pin_seconds=60.0)
+
+        await router.record_write("user-1")
+
+        assert await router.choose("user-1") == "primary"
+        assert await router.choose("user-2") != "primary"
+
+    async def test_pin_expires(self, factories):
+        router = make_router(factories, {"replica:0": 0.0, "replica:1": 0.0}, pin_seconds=0.0)
+
+        await router.record_write("user-1")
+
+        assert await router.choose("user-1") != "primary"
+
+    async def test_session_uses_chosen_factory(self, factories):
+        router = make_router(factories, {"replica:0": 30.0, "replica:1": 0.0})
+
+        async with router.session() as session:
+            assert session.bind is factories["replica:1"].kw["bind"]
+
+    async def test_without_replicas_reads_go_to_primary(self, factories):
+        router = ReadRouter(primary=factories["primary"])
+        await router.record_write("user-1")
+
+        async with router.session("user-1") as session:
+            assert session.bind is factories["primary"].kw["bind"]
+
+    async def test_failed_probe_marks_replica_unhealthy(self, factories):
+        router = ReadRouter(
+            primary=factories["primary"],
+            replicas={"replica:0": factories["replica:0"]}
+        )
+
+        # sqlite has no replication functions, so the probe fails
+        assert await router.choose() == "primary"
+        assert router.status()["replica:0"]["healthy"] is False
@@ -0,0 +1,139 @@
+"""
+Tests for the server bot's per-session web message dispatch and warm
+session channel pool.
+"""
+import asyncio
+import time
+
+from server.server_bot.session_dispatcher import SessionDispatcher, WarmChannelPool
+
+
+class RecordingHandler:
+    """Sleeps `delays[action]` per message, recording order and concurrency."""
+
+    def __init__(self, delays=None):
+        self.delays = delays or {}
+        self.handled = []
+        self.running = 0
+        self.peak = 0
+
+    async def __call__(self, message):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        try:
+            await asyncio.sleep(self.delays.get(message["action"], 0.001))
+            if message["action"] == "fail":
+                raise RuntimeError("boom")
+            self.handled.append((message["session_id"], message["n"]))
+        finally:
+            self.running -= 1
+
+
+class TestSessionDispatcher:
+
+    async def test_session_order_kept(self):
+        handler = RecordingHandler()
+        dispatcher = SessionDispatcher(handler)
+
+        for n in range(5):
+            for session_id in ("a", "b"):
+                await dispatcher.submit(session_id, {"action": "send", "session_id": session_id, "n": n})
+        await dispatcher.drain()
+
+        for session_id in ("a", "b"):
+            assert [n for s, n in handler.handled if s == session_id] == list(range(5))
+
+    async def test_slow_session_does_not_block_others(self):
+        handler = RecordingHandler(delays={"create_session": 0.2})
+        dispatcher = SessionDispatcher(handler)
+        start = time.monotonic()
+
+        await dispatcher.submit("slow", {"action": "create_session", "session_id": "slow", "n": 0})
+        await dispatcher.submit("slow", {"action": "send", "session_id": "slow", "n": 1})
+        for session_id in "bcd":
+            await dispatcher.submit(session_id, {"action": "send", "session_id": session_id, "n": 0})
+        while len(handler.handled) < 3:
+            await asyncio.sleep(0.005)
+        others_done = time.monotonic() - start
+        await dispatcher.drain()
+
+        assert others_done < 0.1
+        assert handler.handled[-2:] == [("slow", 0), ("slow", 1)]
+
+    async def test_concurrency_bounded(self):
+        handler = RecordingHandler(delays={"send": 0.01})
+        dispatcher = SessionDispatcher(handler, max_concurrency=3)
+
+        for i in range(12):
+            await dispatcher.submit(f"s{i}", {"action": "send", "session_id": f"s{i}", "n": 0})
+        await dispatcher.drain()
+
+        assert handler.peak == 3
+        assert dispatcher.metrics()["dispatch_handled"] == 12
+
+    async def test_submit_waits_when_full(self):
+        handler = RecordingHandler(delays={"send": 0.05})
+        dispatcher = SessionDispatcher(handler, max_pending=2)
+        await dispatcher.submit("a", {"action": "send", "session_id": "a", "n": 0})
+        await dispatcher.submit("b", {"action": "send", "session_id": "b", "n": 0})
+
+        third = asyncio.create_task(dispatcher.submit("c", {"action": "send", "session_id": "c", "n": 0}))
+        await asyncio.sleep(0.01)
+        assert not third.done()
+
+        await third
+        await dispatcher.drain()
+        assert dispatcher.metrics()["dispatch_pending"] == 0
+
+    async def test_on_done_runs_after_failures(self):
+        handler = RecordingHandler()
+        dispatcher = SessionDispatcher(handler)
+        acked = []
+
+        async def ack(n):
+            acked.append(n)
+
+        await dispatcher.submit("a", {"action": "fail", "session_id": "a", "n": 0}, on_done=lambda: ack(0))
+        await dispatcher.submit("a", {"action": "send", "session_id": "a", "n": 1}, on_done=lambda: ack(1))
+        await dispatcher.drain()
+
+        assert acked == [0, 1]
+        assert handler.handled == [("a", 1)]
+        assert dispatcher.metrics()["dispatch_failed"] == 1
+
+
+class TestWarmChannelPool:
+
+    async def test_acquire_refills_in_background(self):
+        created = []
+
+        async def create_channel():
+            await asyncio.sleep(0.01)
+            created.append(f"warm-{len(created)}")
+            return created[-1]
+
+        pool = WarmChannelPool(create_channel, size=2)
+        pool.start()
+        while len(pool) < 2:
+            await asyncio.sleep(0.005)
+
+        first = pool.acquire()
+        assert first in created and len(pool) == 1
+        while len(pool) < 2:
+            await asyncio.sleep(0.005)
+
+        assert len(created) == 3
+        assert pool.hits == 1
+        await pool.close()
+
+    async def test_empty_pool_and_adopted_channels(self):
+        async def create_channel():
+            raise RuntimeError("missing permissions")
+
+        pool = WarmChannelPool(create_channel, size=1)
+
+        assert pool.acquire() is None
+        pool.adopt(["left-over"])
+        assert pool.acquire() == "left-over"
+        assert (pool.hits, pool.misses) == (1, 1)
+        await pool.close()
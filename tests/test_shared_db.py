@@ -0,0 +1,29 @@
+"""
+Tests for the shared_lib session factory.
+"""
+from shared_lib.db import get_db_session, get_session_factory
+
+
+class TestSessionFactory:
+
+    def test_factory_is_shared_per_url(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'shared.db'}"
+
+        assert get_session_factory(url) is get_session_factory(url)
+
+    def test_sessions_share_engine(self, tmp_path):
+        url = f"sqlite:///{tmp_path / 'sessions.db'}"
+
+        first, second = get_db_session(url), get_db_session(url)
+        try:
+            assert first is not second
+            assert first.get_bind() is second.get_bind()
+        finally:
+            first.close()
+            second.close()
+
+    def test_separate_urls_get_separate_engines(self, tmp_path):
+        first = get_session_factory(f"sqlite:///{tmp_path / 'a.db'}")
+        second = get_session_factory(f"sqlite:///{tmp_path / 'b.db'}")
+
+        assert first.kw["bind"] is not second.kw["bind"]
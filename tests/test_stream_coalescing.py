@@ -0,0 +1,233 @@
+"""
+Tests for coalesced response streaming between the client and server bots.
+"""
+import asyncio
+import base64
+import json
+import os
+import time
+
+from client_bot.stream_coalescer import MAX_FRAME_CHARS, StreamCoalescer, split_text
+from server.server_bot.stream_assembler import StreamAssembler
+
+ENVELOPE = {
+    "session_id": "3f1c2e9a-5b7d-4c8e-9f0a-1b2c3d4e5f60",
+    "request_id": "7a8b9c0d-1e2f-4a3b-8c4d-5e6f7a8b9c0d",
+}
+
+
+class RateLimitedChannel:
+    """Token bucket standing in for Discord's per-channel message limit."""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.allowance = burst
+        self.burst = burst
+        self.updated = time.monotonic()
+        self.frames = []
+        self.delivered_at = []
+
+    async def send(self, frame):
+        while True:
+            now = time.monotonic()
+            self.allowance = min(self.burst, self.allowance + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.allowance >= 1:
+                break
+            await asyncio.sleep((1 - self.allowance) / self.rate)
+        self.allowance -= 1
+        self.frames.append(frame)
+        self.delivered_at.append(time.monotonic())
+
+
+async def generate(tokens, delay=0.001):
+    for i in range(tokens):
+        await asyncio.sleep(delay)
+        yield f"tok{i} "
+
+
+class TestStreamCoalescer:
+
+    async def test_time_based_flush(self):
+        frames = []
+        coalescer = StreamCoalescer(_collector(frames), ENVELOPE, flush_interval=0.02)
+
+        for text in ("a", "b", "c"):
+            await coalescer.add(text)
+        await asyncio.sleep(0.05)
+        await coalescer.add("d")
+        await coalescer.close({"total_tokens": coalescer.tokens})
+
+        assert [f["response"] for f in frames] == ["abc", "d"]
+        assert [f["seq"] for f in frames] == [0, 1]
+        assert [f["is_complete"] for f in frames] == [False, True]
+        assert frames[-1]["metrics"] == {"total_tokens": 4}
+        assert frames[0]["request_id"] == ENVELOPE["request_id"]
+
+    async def test_size_based_flush(self):
+        frames = []
+        coalescer = StreamCoalescer(_collector(frames), ENVELOPE, flush_interval=10, max_chars=10)
+
+        for _ in range(4):
+            await coalescer.add("abcd")
+        await coalescer.close()
+
+        assert [f["response"] for f in frames] == ["abcdabcdab", "cd", "abcd"]
+
+    async def test_empty_stream_sends_final_frame(self):
+        frames = []
+        coalescer = StreamCoalescer(_collector(frames), ENVELOPE)
+
+        await coalescer.close()
+
+        assert len(frames) == 1
+        assert frames[0]["response"] == "" and frames[0]["is_complete"]
+
+    async def test_cancel_stops_pending_flush(self):
+        frames = []
+        coalescer = StreamCoalescer(_collector(frames), ENVELOPE, flush_interval=0.01)
+
+        await coalescer.add("lost")
+        coalescer.cancel()
+        await asyncio.sleep(0.03)
+
+        assert frames == []
+
+    async def test_frames_fit_in_a_discord_message(self):
+        key = AESGCMEncryptor()
+        frames = []
+        coalescer = StreamCoalescer(_collector(frames), ENVELOPE, flush_interval=10)
+
+        for text in ("x" * 700, "\U0001F600" * 200, "é" * 300, '"quoted"\n' * 100):
+            await coalescer.add(text)
+        await coalescer.close({"total_tokens": coalescer.tokens, "frames": coalescer.frames_sent + 1})
+
+        assert all(len(key.encrypt(frame)) <= 2000 for frame in frames)
+        assert "".join(f["response"] for f in frames) == (
+            "x" * 700 + "\U0001F600" * 200 + "é" * 300 + '"quoted"\n' * 100
+        )
+
+    async def test_dropped_link_falls_back_mid_stream(self):
+        direct, channel = [], []
+
+        async def send_direct(frame):
+            if len(direct) == 2:
+                raise ConnectionError("direct link to server bot is down")
+            direct.append(frame)
+
+        coalescer = StreamCoalescer(
+            send_direct, ENVELOPE, flush_interval=10, max_chars=5000, fallback=_collector(channel)
+        )
+        for _ in range(3):
+            await coalescer.add("x" * 3000)
+        await coalescer.close({"total_tokens": coalescer.tokens})
+
+        assembler = StreamAssembler()
+        texts = [text for frame in direct + channel for text in assembler.add(frame)[0]]
+        assert "".join(texts) == "x" * 9000
+        assert all(len(frame["response"]) <= MAX_FRAME_CHARS for frame in channel)
+        assert [f["seq"] for f in direct + channel] == list(range(len(direct) + len(channel)))
+        assert channel[-1]["is_complete"] and channel[-1]["metrics"] == {"total_tokens": 3}
+
+    def test_split_text_counts_escaped_characters(self):
+        pieces = split_text("é" * 10, 12)
+
+        assert pieces == ["éé"] * 5
+        assert split_text("", MAX_FRAME_CHARS) == [""]
+
+
+class TestStreamAssembler:
+
+    def frame(self, seq, text, is_complete=False, request_id="r1"):
+        return {"session_id": "s1", "request_id": request_id, "seq": seq, "response": text, "is_complete": is_complete}
+
+    def test_in_order(self):
+        assembler = StreamAssembler()
+
+        assert assembler.add(self.frame(0, "a")) == (["a"], None)
+        assert assembler.add(self.frame(1, "b", is_complete=True)) == (["b"], "ab")
+        assert len(assembler) == 0
+
+    def test_out_of_order_and_duplicates(self):
+        assembler = StreamAssembler()
+
+        assert assembler.add(self.frame(2, "c", is_complete=True)) == ([], None)
+        assert assembler.add(self.frame(1, "b")) == ([], None)
+        assert assembler.add(self.frame(1, "b")) == ([], None)
+        assert assembler.add(self.frame(0, "a")) == (["a", "b", "c"], "abc")
+
+    def test_frames_without_seq_in_arrival_order(self):
+        assembler = StreamAssembler()
+        legacy = [{"request_id": "r1", "response": t, "is_complete": False} for t in ("a", "b")]
+
+        assert assembler.add(legacy[0]) == (["a"], None)
+        assert assembler.add(legacy[1]) == (["b"], None)
+        assert assembler.add({"request_id": "r1", "response": "", "is_complete": True}) == ([""], "ab")
+
+    def test_discard_session_and_expire(self):
+        assembler = StreamAssembler()
+        assembler.add(self.frame(0, "a", request_id="r1"))
+        assembler.add({**self.frame(0, "b", request_id="r2"), "session_id": "s2"})
+
+        assembler.discard_session("s1")
+        assert len(assembler) == 1
+        assert assembler.expire(max_age=0) == [("r2", "s2", "b")]
+        assert len(assembler) == 0
+
+
+class TestRateLimitedThroughput:
+
+    async def stream(self, channel, tokens, coalesce):
+        assembler = StreamAssembler()
+        received = []
+        if coalesce:
+            coalescer = StreamCoalescer(channel.send, ENVELOPE, flush_interval=0.02)
+            async for chunk in generate(tokens):
+                await coalescer.add(chunk)
+            await coalescer.close()
+        else:
+            seq = 0
+            async for chunk in generate(tokens):
+                await channel.send({**ENVELOPE, "seq": seq, "response": chunk, "is_complete": False})
+                seq += 1
+            await channel.send({**ENVELOPE, "seq": seq, "response": "", "is_complete": True})
+        for frame in channel.frames:
+            texts, full = assembler.add(frame)
+            received.extend(texts)
+        return "".join(received), full
+
+    async def test_coalescing_beats_per_token_messages(self):
+        tokens = 60
+        expected = "".join(f"tok{i} " for i in range(tokens))
+        results = {}
+        for coalesce in (False, True):
+            channel = RateLimitedChannel(rate=100, burst=5)
+            start = time.monotonic()
+            text, full = await self.stream(channel, tokens, coalesce)
+            elapsed = channel.delivered_at[-1] - start
+            assert text == full == expected
+            results[coalesce] = (tokens / elapsed, len(channel.frames))
+
+        per_token_rate, per_token_frames = results[False]
+        coalesced_rate, coalesced_frames = results[True]
+        assert per_token_frames == tokens + 1
+        assert coalesced_frames < per_token_frames / 5
+        assert coalesced_rate > 3 * per_token_rate
+
+
+class AESGCMEncryptor:
+    """The client bot's frame encryption: random nonce + AES-GCM, base64."""
+
+    def __init__(self):
+        from cryptography.hazmat.primitives.ciphers.aead import AESGCM
+        self.aesgcm = AESGCM(AESGCM.generate_key(bit_length=256))
+
+    def encrypt(self, data):
+        nonce = os.urandom(12)
+        return base64.b64encode(nonce + self.aesgcm.encrypt(nonce, json.dumps(data).encode("utf-8"), None)).decode()
+
+
+def _collector(frames):
+    async def send(frame):
+        frames.append(frame)
+    return send
@@ -4,13 +4,13 @@ Tests for system configuration service.
 import pytest
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from server.web.app.services.system_config_service import SystemConfigService
+from server.web.app.services.system_config_service import SystemConfigService, ConfigSnapshotStore
 from server.web.app.models import SystemConfig
 
 
 @pytest.fixture
 async def config_service():
-    return SystemConfigService()
+    return SystemConfigService(snapshot_store=ConfigSnapshotStore())
 
 
 class TestSystemConfigService:
@@ -315,4 +315,64 @@ class TestSystemConfigService:
         )
         
         assert result2['success'] is False
-        assert 'validation_failed' in result2['error']
\ No newline at end of file
+        assert 'validation_failed' in result2['error']
+    
+    async def test_reads_served_from_snapshot(
+        self, 
+        config_service: SystemConfigService, 
+        db_session: AsyncSession
+    ):
+        """Test repeated reads do not query the database until a write."""
+        await config_service.get_all_config(db_session)
+        
+        calls = []
+        original_load = config_service._load_config
+        
+        async def counting_load(db):
+            calls.append(db)
+            return await original_load(db)
+        
+        config_service._load_config = counting_load
+        
+        await config_service.get_config_section(db_session, 'transcoding')
+        await config_service.get_config_value(db_session, 'upload_limits.max_file_size_gb')
+        assert calls == []
+        
+        await config_service.set_config_value(db_session, 'transcoding.max_concurrent_jobs', 4)
+        assert await config_service.get_config_value(db_session, 'transcoding.max_concurrent_jobs') == 4
+        assert len(calls) == 1
+    
+    async def test_snapshot_is_read_only(
+        self, 
+        config_service: SystemConfigService, 
+        db_session: AsyncSession
+    ):
+        """Test callers cannot mutate the shared snapshot or the defaults."""
+        config = await config_service.get_all_config(db_session)
+        config['transcoding']['max_concurrent_jobs'] = 99
+        
+        snapshot = await config_service.get_snapshot(db_session)
+        assert snapshot.get('transcoding.max_concurrent_jobs') == 3
+        with pytest.raises(TypeError):
+            snapshot.config['transcoding']['max_concurrent_jobs'] = 99
+        
+        await config_service.set_config_value(db_session, 'transcoding.max_concurrent_jobs', 5)
+        await config_service.get_all_config(db_session)
+        assert SystemConfigService.DEFAULT_CONFIG['transcoding']['max_concurrent_jobs'] == 3
+    
+    async def test_change_listeners_notified(
+        self, 
+        config_service: SystemConfigService, 
+        db_session: AsyncSession
+    ):
+        """Test subscribers see the new snapshot after a config change."""
+        await config_service.get_snapshot(db_session)
+        
+        seen = []
+        config_service.subscribe(lambda snapshot: seen.append(snapshot.get('transcoding.max_concurrent_jobs')))
+        
+        await config_service.set_config_value(db_session, 'transcoding.max_concurrent_jobs', 6)
+        await config_service.get_snapshot(db_session)
+        await config_service.get_snapshot(db_session)
+        
+        assert seen == [6]
@@ -0,0 +1,130 @@
+"""
+Tests for the background system metrics sampler.
+"""
+import threading
+import time
+
+import pytest
+
+from shared_lib.system_sampler import SystemSampler, percentile
+
+
+def synthetic_samples(sampler, count, step=1.0, start=1000.0):
+    """Fill the ring buffer with evenly spaced samples."""
+    for i in range(count):
+        sampler._samples.append({
+            "timestamp": start + i * step,
+            "cpu_percent": float(i),
+            "memory_percent": 50.0,
+            "net_bytes_sent": 1000 * i,
+            "net_bytes_recv": 500 * i,
+        })
+
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+        return {}
+
+
+class TestSystemSampler:
+
+    def test_background_sampling_at_fixed_cadence(self):
+        clock = FakeClock()
+        # A sample that takes 0.3 s of the 1 s interval
+        sampler = SystemSampler(interval=1.0, probes={"slow": (lambda: clock.advance(0.3), 0)}, clock=clock)
+
+        waits = []
+        for _ in range(5):
+            waits.append(sampler._sample_in_background())
+            clock.advance(waits[-1])
+
+        assert waits == [pytest.approx(0.7)] * 5
+        timestamps = [sample["timestamp"] for sample in sampler.window(60)]
+        assert timestamps == [pytest.approx(1000.0 + i) for i in range(5)]
+        assert {"cpu_percent", "memory_percent", "process_rss_mb", "disk_usage"} <= sampler.latest().keys()
+        assert sampler.sample_errors == 0
+
+    def test_overrunning_sample_starts_the_next_at_once(self):
+        clock = FakeClock()
+        sampler = SystemSampler(interval=1.0, probes={"slow": (lambda: clock.advance(2.5), 0)}, clock=clock)
+
+        assert sampler._sample_in_background() == 0.0
+        assert sampler._sample_in_background() == 0.0
+        assert [sample["timestamp"] for sample in sampler.window(60)] == [1000.0, 1002.5]
+
+    def test_readers_do_not_block(self):
+        probe_entered, release, probe_finished = threading.Event(), threading.Event(), threading.Event()
+
+        def gpu_probe():
+            probe_entered.set()
+            release.wait(5)
+            probe_finished.set()
+            return {"gpu_name": "Apple M2"}
+
+        sampler = SystemSampler(interval=0.01, probes={"gpu": (gpu_probe, 3600)})
+        sampler.start()
+        try:
+            assert probe_entered.wait(5)
+            # The sampling thread is mid-sample; readers get the buffered one
+            latest = sampler.latest()
+            summary = sampler.summary(60)
+            assert not probe_finished.is_set()
+        finally:
+            release.set()
+            sampler.stop(timeout=1)
+
+        assert summary["samples"] == 1
+        assert summary["latest"] is latest
+        assert "gpu_name" not in latest
+
+    def test_ring_buffer_is_bounded(self):
+        sampler = SystemSampler(history=5)
+        for _ in range(12):
+            sampler.sample_now()
+
+        assert len(sampler.window(3600)) == 5
+
+    def test_rates_and_percentiles_over_window(self):
+        sampler = SystemSampler()
+        synthetic_samples(sampler, 101)
+
+        rates = sampler.rates(seconds=10)
+        stats = sampler.percentiles("cpu_percent", seconds=100)
+
+        assert rates["net_bytes_sent_per_sec"] == 1000
+        assert rates["net_bytes_recv_per_sec"] == 500
+        assert "disk_read_bytes_per_sec" not in rates
+        assert (stats["p50"], stats["p95"], stats["p99"], stats["max"]) == (50.0, 95.0, 99.0, 100.0)
+        assert sampler.percentiles("cpu_percent", seconds=9)["p50"] == 95.0
+
+    def test_slow_probe_runs_on_its_own_interval(self):
+        calls = []
+        blocker = threading.Event()
+
+        def gpu_probe():
+            calls.append(time.monotonic())
+            blocker.wait(0.05)
+            return {"gpu_name": "Apple M2"}
+
+        sampler = SystemSampler(interval=0.01, probes={"gpu": (gpu_probe, 3600)})
+        sampler.start()
+        assert calls == []  # not run on the starting thread
+        time.sleep(0.2)
+        sampler.stop(timeout=1)
+
+        assert len(calls) == 1
+        assert sampler.latest()["gpu_name"] == "Apple M2"
+
+    def test_percentile_nearest_rank(self):
+        assert percentile([], 50) == 0.0
+        assert percentile([3.0], 99) == 3.0
+        assert percentile([1.0, 2.0, 3.0, 4.0], 50) == 2.0
+        assert percentile([1.0, 2.0, 3.0, 4.0], 100) == 4.0
@@ -0,0 +1,163 @@
+"""
+Tests for the maintained tag usage and co-occurrence index.
+"""
+import pytest
+import uuid
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from server.web.app.services.tag_index_service import TagIndexService
+from server.web.app.models import User, Video, VideoStatus
+
+
+@pytest.fixture
+async def tag_index(db_session: AsyncSession):
+    return TagIndexService(db_session)
+
+
+@pytest.fixture
+async def sample_user(db_session: AsyncSession):
+    user = User(
+        id=uuid.uuid4(),
+        display_label="Test Creator",
+        email="creator@example.com"
+    )
+    db_session.add(user)
+    await db_session.commit()
+    return user
+
+
+async def make_video(db_session: AsyncSession, tag_index: TagIndexService, user: User, tags) -> Video:
+    video = Video(
+        id=uuid.uuid4(),
+        creator_id=user.id,
+        title="Test Video",
+        tags=tags,
+        original_filename="test.mp4",
+        original_s3_key=f"videos/{uuid.uuid4()}.mp4",
+        file_size=1024,
+        duration_seconds=60,
+        status=VideoStatus.ready
+    )
+    db_session.add(video)
+    await tag_index.add_video(video)
+    await db_session.commit()
+    return video
+
+
+class TestTagIndexService:
+
+    async def test_popular_tags(self, db_session, tag_index, sample_user):
+        await make_video(db_session, tag_index, sample_user, ["gaming", "speedrun"])
+        await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+        await make_video(db_session, tag_index, sample_user, ["gaming", "music", "live"])
+
+        assert await tag_index.get_popular_tags(limit=2) == [("gaming", 3), ("music", 2)]
+
+    async def test_related_tags(self, db_session, tag_index, sample_user):
+        await make_video(db_session, tag_index, sample_user, ["gaming", "speedrun"])
+        await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+        await make_video(db_session, tag_index, sample_user, ["gaming", "music", "live"])
+
+        assert await tag_index.get_related_tags("gaming") == [("music", 2), ("live", 1), ("speedrun", 1)]
+        assert await tag_index.get_related_tags("live") == [("gaming", 1), ("music", 1)]
+
+    async def test_apply_change_moves_counts(self, db_session, tag_index, sample_user):
+        video = await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+        await make_video(db_session, tag_index, sample_user, ["gaming"])
+
+        await tag_index.apply_change(video.tags, ["gaming", "live"])
+        video.tags = ["gaming", "live"]
+        await db_session.commit()
+
+        assert await tag_index.get_popular_tags() == [("gaming", 2), ("live", 1)]
+        assert await tag_index.get_related_tags("gaming") == [("live", 1)]
+        assert await tag_index.get_related_tags("music") == []
+
+    async def test_remove_video(self, db_session, tag_index, sample_user):
+        video = await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+
+        await tag_index.remove_video(video)
+        await db_session.commit()
+
+        assert await tag_index.get_popular_tags() == []
+        assert await tag_index.get_related_tags("gaming") == []
+
+    async def test_rebuild_matches_incremental(self, db_session, tag_index, sample_user):
+        await make_video(db_session, tag_index, sample_user, ["gaming", "speedrun"])
+        await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+        deleted = await make_video(db_session, tag_index, sample_user, ["gaming", "live"])
+        await tag_index.remove_video(deleted)
+        deleted.status = VideoStatus.deleted
+        await db_session.commit()
+
+        popular = await tag_index.get_popular_tags()
+        related = await tag_index.get_related_tags("gaming")
+
+        assert await tag_index.rebuild() == 3
+        assert await tag_index.get_popular_tags() == popular
+        assert await tag_index.get_related_tags("gaming") == related
+
+    async def test_rebuild_skips_failed_uploads(self, db_session, tag_index, sample_user):
+        await make_video(db_session, tag_index, sample_user, ["gaming"])
+        failed = await make_video(db_session, tag_index, sample_user, ["gaming", "live"])
+        await tag_index.set_status(failed, VideoStatus.failed)
+        await db_session.commit()
+
+        assert await tag_index.get_popular_tags() == [("gaming", 1)]
+        assert await tag_index.rebuild() == 1
+        assert await tag_index.get_popular_tags() == [("gaming", 1)]
+
+    async def test_set_status_moves_video_in_and_out(self, db_session, tag_index, sample_user):
+        video = await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+
+        await tag_index.set_status(video, VideoStatus.failed)
+        await tag_index.set_status(video, VideoStatus.deleted)
+        await db_session.commit()
+        assert await tag_index.get_popular_tags() == []
+
+        await tag_index.set_status(video, VideoStatus.ready)
+        await tag_index.set_status(video, VideoStatus.transcoding)
+        await db_session.commit()
+        assert await tag_index.get_popular_tags() == [("gaming", 1), ("music", 1)]
+
+    async def test_set_tags_on_failed_video_leaves_index(self, db_session, tag_index, sample_user):
+        video = await make_video(db_session, tag_index, sample_user, ["gaming"])
+        await tag_index.set_status(video, VideoStatus.failed)
+
+        await tag_index.set_tags(video, ["music"])
+        await db_session.commit()
+
+        assert video.tags == ["music"]
+        assert await tag_index.get_popular_tags() == []
+
+    async def test_imported_video_tag_update_maintains_index(self, db_session, tag_index, sample_user):
+        imported_content = pytest.importorskip(
+            "server.web.app.services.imported_content_service", exc_type=ImportError
+        )
+        video = await make_video(db_session, tag_index, sample_user, ["gaming", "music"])
+        service = imported_content.ImportedContentService(db_session)
+
+        assert await service.update_imported_video_metadata(
+            video.id, tags=["gaming", "live"], user_id=sample_user.id
+        )
+        assert not await service.update_imported_video_metadata(
+            video.id, tags=["other"], user_id=uuid.uuid4()
+        )
+
+        assert await tag_index.get_popular_tags() == [("gaming", 1), ("live", 1)]
+        assert await tag_index.get_related_tags("gaming") == [("live", 1)]
+
+
+def test_migration_backfill_skips_unindexed_statuses():
+    import importlib.util
+    from pathlib import Path
+    from server.web.app.services.tag_index_service import UNINDEXED_STATUSES
+
+    path = Path(__file__).parents[1] / "server/web/alembic/versions/013_add_tag_stats_index.py"
+    spec = importlib.util.spec_from_file_location("migration_013", path)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+
+    assert migration.UNINDEXED_STATUSES == "({})".format(
+        ", ".join(f"'{status.value}'" for status in UNINDEXED_STATUSES)
+    )
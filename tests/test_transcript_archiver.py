@@ -0,0 +1,238 @@
+"""
+Tests for streaming transcript archival from the database to S3.
+"""
+import asyncio
+import gzip
+import json
+import os
+import uuid
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+
+from server.server_bot.transcript_archiver import (
+    TranscriptArchiver,
+    archive_session,
+    log_chat_message,
+    open_compressor,
+)
+from server.web.app.models import AIChatMessage, Base, Transcript
+
+
+class FakeS3Client:
+    """Records multipart uploads the way a boto3 S3 client receives them."""
+
+    def __init__(self, fail_on_part=None):
+        self.fail_on_part = fail_on_part
+        self.uploads = {}
+        self.objects = {}
+        self.aborted = []
+
+    def create_multipart_upload(self, Bucket, Key):
+        upload_id = uuid.uuid4().hex
+        self.uploads[upload_id] = {"key": Key, "parts": {}}
+        return {"UploadId": upload_id}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body):
+        if PartNumber == self.fail_on_part:
+            raise ConnectionError("connection reset")
+        self.uploads[UploadId]["parts"][PartNumber] = Body
+        return {"ETag": f'"{PartNumber}-{len(Body)}"'}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload):
+        parts = self.uploads.pop(UploadId)["parts"]
+        numbers = [part["PartNumber"] for part in MultipartUpload["Parts"]]
+        assert numbers == sorted(parts)
+        self.objects[Key] = [parts[n] for n in numbers]
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId):
+        self.uploads.pop(UploadId)
+        self.aborted.append(Key)
+
+
+@pytest.fixture
+async def session_factory(tmp_path):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'archive.db'}")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    await engine.dispose()
+
+
+async def add_messages(session_factory, session_id, count, size=200):
+    """Alternating user/assistant messages with incompressible content."""
+    start = datetime(2026, 1, 1)
+    async with session_factory() as db:
+        for i in range(count):
+            db.add(AIChatMessage(
+                session_id=session_id,
+                request_id=uuid.uuid4(),
+                role="user" if i % 2 == 0 else "assistant",
+                content=f"{i}:" + os.urandom(size // 2).hex(),
+                timestamp=start + timedelta(seconds=i),
+            ))
+        await db.commit()
+
+
+async def stored_transcripts(session_factory):
+    async with session_factory() as db:
+        return (await db.execute(select(Transcript))).scalars().all()
+
+
+class TestArchiveSession:
+
+    async def test_gzip_transcript_round_trip(self, session_factory):
+        session_id = uuid.uuid4()
+        await add_messages(session_factory, session_id, 50)
+        await add_messages(session_factory, uuid.uuid4(), 5)
+        s3 = FakeS3Client()
+
+        transcript = await archive_session(session_factory, s3, "bucket", str(session_id), codec="gz")
+
+        assert transcript.s3_key == f"transcripts/{session_id}.jsonl.gz"
+        lines = gzip.decompress(b"".join(s3.objects[transcript.s3_key])).decode().splitlines()
+        messages = [json.loads(line) for line in lines]
+        assert [m["content"].split(":")[0] for m in messages] == [str(i) for i in range(50)]
+        assert messages[1]["role"] == "assistant"
+
+        [row] = await stored_transcripts(session_factory)
+        assert (row.session_id, row.format) == (session_id, "gz")
+
+    async def test_parts_cut_at_part_size(self, session_factory):
+        session_id = uuid.uuid4()
+        await add_messages(session_factory, session_id, 400, size=1000)
+        s3 = FakeS3Client()
+
+        transcript = await archive_session(
+            session_factory, s3, "bucket", str(session_id), codec="gz", part_size=64 * 1024, batch_size=50
+        )
+
+        parts = s3.objects[transcript.s3_key]
+        assert len(parts) > 3
+        assert all(len(part) >= 64 * 1024 for part in parts[:-1])
+        lines = gzip.decompress(b"".join(parts)).splitlines()
+        assert len(lines) == 400
+
+    async def test_buffer_does_not_grow_with_session_length(self, session_factory, monkeypatch):
+        from server.server_bot import transcript_archiver
+
+        peaks = []
+        original_finish = transcript_archiver.MultipartWriter.finish
+
+        async def finish(writer):
+            peaks.append(writer.peak_buffer)
+            await original_finish(writer)
+
+        monkeypatch.setattr(transcript_archiver.MultipartWriter, "finish", finish)
+        short, long = uuid.uuid4(), uuid.uuid4()
+        await add_messages(session_factory, short, 200, size=1000)
+        await add_messages(session_factory, long, 1000, size=1000)
+
+        for session_id in (short, long):
+            await archive_session(
+                session_factory, FakeS3Client(), "bucket", str(session_id), codec="gz", part_size=32 * 1024
+            )
+
+        # One part plus at most one compressor chunk, whatever the length
+        assert all(peak < 2 * 32 * 1024 for peak in peaks)
+
+    async def test_failed_upload_is_aborted(self, session_factory):
+        session_id = uuid.uuid4()
+        await add_messages(session_factory, session_id, 200, size=1000)
+        s3 = FakeS3Client(fail_on_part=2)
+
+        with pytest.raises(ConnectionError):
+            await archive_session(
+                session_factory, s3, "bucket", str(session_id), codec="gz", part_size=32 * 1024
+            )
+
+        assert s3.aborted == [f"transcripts/{session_id}.jsonl.gz"]
+        assert s3.uploads == {} and s3.objects == {}
+        assert await stored_transcripts(session_factory) == []
+
+    async def test_empty_session_still_uploads_one_part(self, session_factory):
+        session_id = uuid.uuid4()
+        s3 = FakeS3Client()
+
+        transcript = await archive_session(session_factory, s3, "bucket", str(session_id), codec="gz")
+
+        assert gzip.decompress(b"".join(s3.objects[transcript.s3_key])) == b""
+
+    async def test_user_and_assistant_turns_of_one_request(self, session_factory):
+        session_id, request_id = str(uuid.uuid4()), str(uuid.uuid4())
+        s3 = FakeS3Client()
+
+        await log_chat_message(session_factory, session_id, "user", "What is a lizard?")
+        await log_chat_message(session_factory, session_id, "assistant", "A reptile.", request_id)
+        transcript = await archive_session(session_factory, s3, "bucket", session_id, codec="gz")
+
+        lines = gzip.decompress(b"".join(s3.objects[transcript.s3_key])).decode("utf-8").splitlines()
+        turns = [json.loads(line) for line in lines]
+        assert [(t["role"], t["content"], t["request_id"]) for t in turns] == [
+            ("user", "What is a lizard?", None),
+            ("assistant", "A reptile.", request_id),
+        ]
+
+    def test_unknown_codec(self):
+        with pytest.raises(ValueError):
+            open_compressor("bz2")
+
+
+class TestTranscriptArchiver:
+
+    async def test_background_archival(self, session_factory):
+        sessions = [uuid.uuid4() for _ in range(4)]
+        for session_id in sessions:
+            await add_messages(session_factory, session_id, 10)
+        s3 = FakeS3Client()
+        archiver = TranscriptArchiver(session_factory, s3, "bucket", codec="gz", workers=2)
+        archiver.start()
+
+        for session_id in sessions:
+            await archiver.enqueue(str(session_id))
+        await asyncio.wait_for(archiver.drain(), timeout=5)
+        await archiver.close()
+
+        assert len(s3.objects) == 4
+        assert {row.session_id for row in await stored_transcripts(session_factory)} == set(sessions)
+        assert archiver.metrics() == {"archive_pending": 0, "archive_done": 4, "archive_failed": 0}
+
+    async def test_failure_does_not_stop_worker(self, session_factory):
+        s3 = FakeS3Client()
+        archiver = TranscriptArchiver(session_factory, s3, "bucket", codec="gz", workers=1)
+        archiver.start()
+
+        await archiver.enqueue("not-a-uuid")
+        await archiver.enqueue(str(uuid.uuid4()))
+        await asyncio.wait_for(archiver.drain(), timeout=5)
+        await archiver.close()
+
+        assert (archiver.archived, archiver.failed) == (1, 1)
+
+    async def test_close_archives_queued_sessions(self, session_factory):
+        sessions = [uuid.uuid4() for _ in range(3)]
+        for session_id in sessions:
+            await add_messages(session_factory, session_id, 4)
+        s3 = FakeS3Client()
+        archiver = TranscriptArchiver(session_factory, s3, "bucket", codec="gz", workers=1)
+        archiver.start()
+
+        for session_id in sessions:
+            await archiver.enqueue(str(session_id))
+        unarchived = await archiver.close(timeout=5)
+
+        assert unarchived == []
+        assert archiver.archived == 3
+        assert {row.session_id for row in await stored_transcripts(session_factory)} == set(sessions)
+
+    async def test_close_reports_sessions_it_could_not_archive(self, session_factory):
+        archiver = TranscriptArchiver(session_factory, FakeS3Client(), "bucket", codec="gz")
+
+        await archiver.enqueue("s1")
+        await archiver.enqueue("s2")
+
+        assert await archiver.close() == ["s1", "s2"]
+        assert archiver.metrics()["archive_pending"] == 0
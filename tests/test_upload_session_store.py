@@ -0,0 +1,89 @@
+"""
+Tests for the upload session store.
+"""
+import pytest
+from unittest.mock import AsyncMock, patch
+
+from server.web.app.services.upload_session_store import UploadSessionStore
+
+
+@pytest.fixture
+def store():
+    """Create a process-local upload session store."""
+    return UploadSessionStore()
+
+
+class TestUploadSessionStore:
+    """Test cases for UploadSessionStore."""
+
+    async def test_save_and_load(self, store):
+        """Saved session data is loaded back."""
+        await store.save("session-1", {'video_id': 'video-1'})
+
+        assert await store.load("session-1") == {'video_id': 'video-1'}
+        assert await store.load("missing") is None
+
+    async def test_add_chunk_counts_per_part(self, store):
+        """Receipts track chunks per part and overall progress."""
+        first = await store.add_chunk("session-1", 1, 1, 100)
+        second = await store.add_chunk("session-1", 2, 1, 50)
+        other = await store.add_chunk("session-1", 3, 2, 10)
+
+        assert first.part_chunks == 1
+        assert second.part_chunks == 2
+        assert other.part_chunks == 1
+        assert other.chunks_received == 3
+        assert other.uploaded_size == 160
+
+    async def test_add_chunk_duplicate(self, store):
+        """Re-recording a chunk is reported as a duplicate."""
+        await store.add_chunk("session-1", 1, 1, 100)
+
+        assert await store.add_chunk("session-1", 1, 1, 100) is None
+        assert await store.get_progress("session-1") == {'chunks_received': 1, 'uploaded_size': 100}
+
+    async def test_discard_chunk_allows_retry(self, store):
+        """A discarded chunk can be recorded again."""
+        await store.add_chunk("session-1", 1, 1, 100)
+        await store.discard_chunk("session-1", 1, 1, 100)
+
+        receipt = await store.add_chunk("session-1", 1, 1, 100)
+
+        assert receipt.part_chunks == 1
+        assert receipt.uploaded_size == 100
+
+    async def test_get_parts_sorted(self, store):
+        """Parts are returned sorted in CompleteMultipartUpload form."""
+        await store.record_part("session-1", 2, '"b"')
+        await store.record_part("session-1", 1, '"a"')
+
+        assert await store.get_parts("session-1") == [
+            {'ETag': '"a"', 'PartNumber': 1},
+            {'ETag': '"b"', 'PartNumber': 2},
+        ]
+
+    async def test_delete(self, store):
+        """Deleting a session clears all of its state."""
+        await store.save("session-1", {'video_id': 'video-1'})
+        await store.add_chunk("session-1", 1, 1, 100)
+        await store.record_part("session-1", 1, '"a"')
+
+        await store.delete("session-1")
+
+        assert await store.load("session-1") is None
+        assert await store.get_parts("session-1") == []
+        assert await store.get_progress("session-1") == {'chunks_received': 0, 'uploaded_size': 0}
+
+    async def test_redis_failure_falls_back_to_local_state(self):
+        """Redis errors degrade to process-local state and back off."""
+        store = UploadSessionStore("redis://localhost:6379")
+        client = AsyncMock()
+        client.set.side_effect = ConnectionError("redis down")
+
+        with patch('server.web.app.services.upload_session_store.redis.from_url', return_value=client):
+            await store.save("session-1", {'video_id': 'video-1'})
+            loaded = await store.load("session-1")
+
+        assert loaded == {'video_id': 'video-1'}
+        # Backing off: load did not hit Redis after the failed save
+        client.get.assert_not_called()
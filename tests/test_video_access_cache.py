@@ -0,0 +1,98 @@
+"""
+Tests for the video access policy and grant cache.
+"""
+import pytest
+import uuid
+from datetime import datetime, timedelta
+
+from server.web.app.services.video_access_cache import VideoAccessCache, VideoAccessPolicy
+from server.web.app.models import Video, Channel, VideoStatus, VideoVisibility
+
+
+@pytest.fixture
+def cache():
+    return VideoAccessCache()
+
+
+@pytest.fixture
+def policy():
+    return VideoAccessPolicy(
+        id=uuid.uuid4(),
+        status=VideoStatus.ready,
+        visibility=VideoVisibility.private,
+        creator_id=uuid.uuid4(),
+        channel_id=uuid.uuid4(),
+        channel_owner_id=uuid.uuid4()
+    )
+
+
+class TestVideoAccessCache:
+
+    def test_policy_round_trip(self, policy):
+        assert VideoAccessPolicy.from_dict(policy.to_dict()) == policy
+
+    def test_policy_from_video(self):
+        owner_id = uuid.uuid4()
+        video = Video(
+            id=uuid.uuid4(),
+            creator_id=uuid.uuid4(),
+            channel_id=uuid.uuid4(),
+            status=VideoStatus.ready,
+            visibility=VideoVisibility.unlisted
+        )
+        video.channel = Channel(creator_id=owner_id)
+
+        policy = VideoAccessPolicy.from_video(video)
+
+        assert policy.visibility == VideoVisibility.unlisted
+        assert policy.channel_owner_id == owner_id
+
+    @pytest.mark.asyncio
+    async def test_policy_set_get_invalidate(self, cache, policy):
+        assert await cache.get_policy(policy.id) is None
+
+        await cache.set_policy(policy)
+        assert await cache.get_policy(policy.id) == policy
+
+        await cache.invalidate_policy([policy.id])
+        assert await cache.get_policy(policy.id) is None
+
+    @pytest.mark.asyncio
+    async def test_grants(self, cache):
+        video_id, user_id = uuid.uuid4(), uuid.uuid4()
+        assert await cache.get_grant(video_id, user_id) is None
+
+        await cache.set_grant(video_id, user_id, False)
+        assert await cache.get_grant(video_id, user_id) is False
+
+        await cache.set_grant(video_id, user_id, True)
+        assert await cache.get_grant(video_id, user_id) is True
+
+        await cache.invalidate_grant(video_id, user_id)
+        assert await cache.get_grant(video_id, user_id) is None
+
+    @pytest.mark.asyncio
+    async def test_grant_expiry_applies_while_cached(self, cache):
+        video_id, user_id = uuid.uuid4(), uuid.uuid4()
+
+        await cache.set_grant(video_id, user_id, True, datetime.utcnow() - timedelta(seconds=1))
+
+        assert await cache.get_grant(video_id, user_id) is False
+
+    @pytest.mark.asyncio
+    async def test_local_entries_expire(self, cache, policy, monkeypatch):
+        await cache.set_policy(policy)
+        monkeypatch.setattr(cache, "LOCAL_TTL", -1)
+        await cache.set_policy(policy)
+
+        assert await cache.get_policy(policy.id) is None
+
+    @pytest.mark.asyncio
+    async def test_local_cache_is_bounded(self, cache, monkeypatch):
+        monkeypatch.setattr(cache, "LOCAL_MAX_ENTRIES", 2)
+        video_ids = [uuid.uuid4() for _ in range(3)]
+        for video_id in video_ids:
+            await cache.set_grant(video_id, "user", True)
+
+        assert await cache.get_grant(video_ids[0], "user") is None
+        assert await cache.get_grant(video_ids[2], "user") is True
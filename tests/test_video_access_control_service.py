@@ -4,9 +4,11 @@ Tests for Video Access Control Service
 import pytest
 import uuid
 from datetime import datetime, timedelta
-from unittest.mock import AsyncMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
-from server.web.app.services.video_access_control_service import VideoAccessControlService
+from server.web.app.services import video_access_control_service
+from server.web.app.services.video_access_control_service import VideoAccessControlService, AccessLogSink
+from server.web.app.services.video_access_cache import VideoAccessCache, VideoAccessPolicy
 from server.web.app.models import Video, VideoVisibility, VideoStatus, User, VideoPermission
 
 
@@ -14,7 +16,7 @@ class TestVideoAccessControlService:
     
     @pytest.fixture
     def service(self):
-        return VideoAccessControlService()
+        return VideoAccessControlService(access_cache=VideoAccessCache(), log_sample_rate=1.0)
     
     @pytest.fixture
     def mock_video(self):
@@ -336,4 +338,82 @@ class TestVideoAccessControlService:
         
         # Same IP should produce same hash
         hashed2 = service._hash_ip_address(ip)
-        assert hashed == hashed2
\ No newline at end of file
+        assert hashed == hashed2
+    
+    @pytest.mark.asyncio
+    async def test_check_video_access_public_video_cached(self, mock_video, monkeypatch):
+        """Test cached public video access does not touch the database"""
+        monkeypatch.setattr(video_access_control_service, '_access_log_sink', None)
+        cache = VideoAccessCache()
+        await cache.set_policy(VideoAccessPolicy.from_video(mock_video))
+        service = VideoAccessControlService(access_cache=cache, log_sample_rate=0.0)
+        
+        # No get_db_session patched: any database access would raise
+        result = await service.check_video_access(video_id=mock_video.id, user_id=None)
+        
+        assert result["has_access"] is True
+        assert result["reason"] == "public_video"
+        assert video_access_control_service._access_log_sink is None
+    
+    @pytest.mark.asyncio
+    async def test_check_video_access_cached_grant(self, service, mock_video):
+        """Test private video access from a cached explicit grant"""
+        mock_video.visibility = VideoVisibility.private
+        viewer_id = uuid.uuid4()
+        await service.access_cache.set_policy(VideoAccessPolicy.from_video(mock_video))
+        await service.access_cache.set_grant(mock_video.id, viewer_id, True, datetime.utcnow() + timedelta(hours=1))
+        
+        with patch.object(service, '_log_access_attempt'):
+            result = await service.check_video_access(video_id=mock_video.id, user_id=viewer_id)
+        
+        assert result["has_access"] is True
+        assert result["reason"] == "explicit_permission"
+    
+    @pytest.mark.asyncio
+    async def test_log_access_attempt_samples_grants(self, service, monkeypatch):
+        """Test granted attempts are sampled while denials are always queued"""
+        sink = AccessLogSink(session_factory=None)
+        sink.record = lambda event: recorded.append(event)
+        recorded = []
+        monkeypatch.setattr(video_access_control_service, '_access_log_sink', sink)
+        service.log_sample_rate = 0.0
+        
+        await service._log_access_attempt(uuid.uuid4(), None, "10.0.0.1", True)
+        await service._log_access_attempt(uuid.uuid4(), None, "10.0.0.1", False)
+        
+        assert len(recorded) == 1
+        assert recorded[0]["data"]["access_granted"] is False
+        assert recorded[0]["data"]["sample_rate"] == 1.0
+    
+    @pytest.mark.asyncio
+    async def test_access_log_sink_flush_batches(self):
+        """Test the sink writes buffered events in one session per batch"""
+        mock_session = AsyncMock()
+        mock_session.add_all = MagicMock()
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = mock_session
+        sink = AccessLogSink(session_factory)
+        
+        for _ in range(3):
+            sink._pending.append({"event_type": "video_access_attempt", "data": {}})
+        await sink.flush()
+        
+        session_factory.assert_called_once()
+        assert len(mock_session.add_all.call_args[0][0]) == 3
+        mock_session.commit.assert_called_once()    
+    @pytest.mark.asyncio
+    async def test_access_log_sink_close_flushes_pending(self):
+        """Test closing the sink writes buffered events without waiting for the interval"""
+        mock_session = AsyncMock()
+        mock_session.add_all = MagicMock()
+        session_factory = MagicMock()
+        session_factory.return_value.__aenter__.return_value = mock_session
+        sink = AccessLogSink(session_factory)
+        
+        sink.record({"event_type": "video_access_attempt", "data": {}})
+        sink.record({"event_type": "video_access_attempt", "data": {}})
+        await sink.close()
+        
+        assert sink._task is None
+        assert not sink._pending
+        assert len(mock_session.add_all.call_args[0][0]) == 2
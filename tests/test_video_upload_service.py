@@ -3,6 +3,7 @@ Comprehensive unit tests for VideoUploadService.
 """
 import pytest
 import asyncio
+import io
 import os
 import tempfile
 import uuid
@@ -17,10 +18,33 @@ from server.web.app.services.video_upload_service import (
     VideoMetadata, 
     ChunkResult
 )
+from server.web.app.services.upload_session_store import UploadSessionStore
+from server.web.app.services.video_s3_service import S3UploadSession
 from server.web.app.models import Video, VideoStatus
 from server.web.app.services.video_analysis_service import VideoValidationError
 
 
+class FakeS3Service:
+    """Multipart uploads kept in memory and assembled on completion"""
+    
+    def __init__(self):
+        self.parts = {}
+        self.objects = {}
+    
+    def is_available(self):
+        return True
+    
+    async def upload_part(self, s3_session, part_number, body):
+        self.parts[part_number] = body.read()
+        return {'ETag': f'"etag-{part_number}"', 'PartNumber': part_number}
+    
+    async def complete_multipart_upload(self, s3_session):
+        parts = sorted(part['PartNumber'] for part in s3_session.parts)
+        self.objects[s3_session.key] = b"".join(self.parts[n] for n in parts)
+        return MagicMock(success=True)
+    
+
+
 @pytest.fixture
 async def mock_db():
     """Mock database session."""
@@ -60,6 +84,9 @@ async def upload_service(mock_db, mock_services):
     for service_name, mock_service in mock_services.items():
         setattr(service, service_name, mock_service)
     
+    # Keep session state process-local
+    service.session_store = UploadSessionStore()
+    
     return service
 
 
@@ -173,7 +200,7 @@ class TestVideoUploadService:
         
         # Enable S3
         upload_service.s3_service.is_available.return_value = True
-        upload_service.s3_service.upload_part = AsyncMock()
+        upload_service.s3_service.upload_part = AsyncMock(return_value={'ETag': '"etag-1"', 'PartNumber': 1})
         
         # Call the method
         chunk_data = b"test chunk data"
@@ -184,20 +211,25 @@ class TestVideoUploadService:
         assert result.success is True
         assert result.chunk_number == 1
         
-        # Verify S3 upload
-        upload_service.s3_service.upload_part.assert_called_once_with(mock_s3_session, 1, chunk_data)
+        # Verify S3 upload streams the chunk as part 1
+        upload_service.s3_service.upload_part.assert_called_once()
+        s3_session, part_number, body = upload_service.s3_service.upload_part.call_args.args
+        assert s3_session is mock_s3_session
+        assert part_number == 1
+        assert await upload_service.session_store.get_parts(session_id) == [
+            {'ETag': '"etag-1"', 'PartNumber': 1}
+        ]
         
         # Verify session updates
         assert session.chunks_received == 1
         assert session.uploaded_size == len(chunk_data)
     
-    @patch('aiofiles.open', new_callable=mock_open)
-    async def test_process_chunk_success_local(self, mock_file, upload_service):
+    async def test_process_chunk_success_local(self, upload_service, tmp_path):
         """Test successful chunk processing with local storage."""
         # Create mock session without S3
         session_id = str(uuid.uuid4())
         session = UploadSession(session_id, str(uuid.uuid4()), str(uuid.uuid4()), {})
-        session.temp_file_path = "/tmp/test.tmp"
+        session.temp_file_path = str(tmp_path / "test.tmp")
         upload_service.active_sessions[session_id] = session
         
         # Disable S3
@@ -211,8 +243,89 @@ class TestVideoUploadService:
         assert result.success is True
         assert result.chunk_number == 1
         
-        # Verify file operations
-        mock_file.assert_called_once_with("/tmp/test.tmp", 'ab')
+        # Verify file contents
+        assert (tmp_path / "test.tmp").read_bytes() == chunk_data
+    
+    async def test_process_chunk_local_out_of_order(self, upload_service, tmp_path):
+        """Chunks arriving out of order are written at their offsets."""
+        session_id = str(uuid.uuid4())
+        session = UploadSession(session_id, str(uuid.uuid4()), str(uuid.uuid4()),
+                                {'chunk_size': 4, 'total_chunks': 3})
+        session.temp_file_path = str(tmp_path / "test.tmp")
+        upload_service.active_sessions[session_id] = session
+        upload_service.s3_service.is_available.return_value = False
+        
+        for chunk_number, data in [(3, b"ij"), (1, b"abcd"), (2, b"efgh")]:
+            result = await upload_service.process_chunk(session_id, io.BytesIO(data), chunk_number)
+            assert result.success is True
+        
+        assert (tmp_path / "test.tmp").read_bytes() == b"abcdefghij"
+        assert session.chunks_received == 3
+        assert session.uploaded_size == 10
+    
+    async def test_process_chunk_duplicate_not_counted(self, upload_service, tmp_path):
+        """A re-sent chunk is accepted without double counting progress."""
+        session_id = str(uuid.uuid4())
+        session = UploadSession(session_id, str(uuid.uuid4()), str(uuid.uuid4()), {'chunk_size': 4})
+        session.temp_file_path = str(tmp_path / "test.tmp")
+        upload_service.active_sessions[session_id] = session
+        upload_service.s3_service.is_available.return_value = False
+        
+        await upload_service.process_chunk(session_id, b"abcd", 1)
+        result = await upload_service.process_chunk(session_id, b"abcd", 1)
+        
+        assert result.success is True
+        assert session.chunks_received == 1
+        assert session.uploaded_size == 4
+    
+    @patch('server.web.app.services.video_upload_service.settings')
+    async def test_process_chunk_s3_stages_small_chunks(self, mock_settings, upload_service, tmp_path):
+        """Chunks below the S3 part minimum are staged and uploaded as whole parts."""
+        mock_settings.UPLOAD_PART_SIZE = 0
+        mock_settings.UPLOAD_PART_CONCURRENCY = 2
+        mock_settings.UPLOAD_STAGING_PATH = str(tmp_path)
+        
+        chunk_size = 2 * 1024 * 1024  # three chunks per 5MB part
+        session_id = str(uuid.uuid4())
+        session = UploadSession(session_id, str(uuid.uuid4()), str(uuid.uuid4()),
+                                {'chunk_size': chunk_size, 'total_chunks': 4})
+        session.s3_session = MagicMock()
+        upload_service.active_sessions[session_id] = session
+        
+        uploaded = {}
+        async def fake_upload_part(s3_session, part_number, body):
+            uploaded[part_number] = body.read()
+            return {'ETag': f'"etag-{part_number}"', 'PartNumber': part_number}
+        
+        upload_service.s3_service.is_available.return_value = True
+        upload_service.s3_service.upload_part = AsyncMock(side_effect=fake_upload_part)
+        
+        chunks = {n: bytes([n]) * (chunk_size if n < 4 else 10) for n in range(1, 5)}
+        for chunk_number in [2, 4, 1]:
+            await upload_service.process_chunk(session_id, chunks[chunk_number], chunk_number)
+        
+        # Part 2 (just the short final chunk) is complete, part 1 is not
+        assert list(uploaded) == [2]
+        
+        await upload_service.process_chunk(session_id, chunks[3], 3)
+        
+        assert uploaded[1] == chunks[1] + chunks[2] + chunks[3]
+        assert uploaded[2] == chunks[4]
+        assert [p['PartNumber'] for p in await upload_service.session_store.get_parts(session_id)] == [1, 2]
+        assert not os.listdir(tmp_path / session_id)
+    
+    async def test_process_chunk_loads_session_from_store(self, upload_service, tmp_path):
+        """Sessions created on another worker are loaded from the session store."""
+        session_id = str(uuid.uuid4())
+        session = UploadSession(session_id, str(uuid.uuid4()), str(uuid.uuid4()), {'chunk_size': 4})
+        session.temp_file_path = str(tmp_path / "test.tmp")
+        await upload_service.session_store.save(session_id, session.to_dict())
+        upload_service.s3_service.is_available.return_value = False
+        
+        result = await upload_service.process_chunk(session_id, b"abcd", 1)
+        
+        assert result.success is True
+        assert upload_service.active_sessions[session_id].video_id == session.video_id
     
     async def test_process_chunk_session_not_found(self, upload_service):
         """Test chunk processing with invalid session ID."""
@@ -286,6 +399,56 @@ class TestVideoUploadService:
         # Verify session cleanup
         assert session_id not in upload_service.active_sessions
     
+    @patch('server.web.app.services.video_upload_service.settings')
+    async def test_chunked_upload_across_requests_defers_dedup(self, mock_settings, mock_db,
+                                                               mock_services, tmp_path):
+        """Chunks sent to different workers are assembled; the transcoding worker hashes the source."""
+        mock_settings.UPLOAD_PART_SIZE = 0
+        mock_settings.UPLOAD_PART_CONCURRENCY = 2
+        mock_settings.UPLOAD_STAGING_PATH = str(tmp_path)
+        
+        s3 = FakeS3Service()
+        store = UploadSessionStore()
+        
+        def new_worker():
+            """A fresh service per request, as get_video_upload_service builds them"""
+            service = VideoUploadService(mock_db)
+            for service_name, mock_service in mock_services.items():
+                setattr(service, service_name, mock_service)
+            service.s3_service = s3
+            service.session_store = store
+            service.dedup_service.find_by_hash = AsyncMock()
+            return service
+        
+        chunk_size = 2 * 1024 * 1024  # three chunks per 5MB part
+        chunks = {n: os.urandom(chunk_size if n < 4 else 1000) for n in range(1, 5)}
+        session_id = str(uuid.uuid4())
+        video_id = str(uuid.uuid4())
+        session = UploadSession(session_id, video_id, str(uuid.uuid4()),
+                                {'filename': 'test.mp4', 'chunk_size': chunk_size, 'total_chunks': 4})
+        session.s3_session = S3UploadSession(
+            upload_id="upload-1", bucket="bucket", key="originals/test.mp4", parts=[],
+            created_at=datetime.utcnow(), expires_at=datetime.utcnow()
+        )
+        await store.save(session_id, session.to_dict())
+        
+        for chunk_number in [3, 1, 4, 2]:
+            result = await new_worker().process_chunk(session_id, chunks[chunk_number], chunk_number)
+            assert result.success is True
+        
+        mock_video = Video(id=video_id, status=VideoStatus.uploading)
+        mock_db.get.return_value = mock_video
+        finishing_worker = new_worker()
+        finishing_worker._queue_transcoding_jobs = AsyncMock()
+        
+        result = await finishing_worker.complete_upload(session_id, ["720p_30fps"])
+        
+        assert result == mock_video
+        assert s3.objects["originals/test.mp4"] == b"".join(chunks[n] for n in range(1, 5))
+        # The assembled object is not read back inside the request
+        finishing_worker.dedup_service.find_by_hash.assert_not_called()
+        finishing_worker._queue_transcoding_jobs.assert_awaited_once_with(video_id, ["720p_30fps"], True)
+    
     @patch('os.path.exists')
     @patch('os.rename')
     @patch('os.makedirs')
@@ -340,6 +503,34 @@ class TestVideoUploadService:
         upload_service.analysis_service.analyze_video_file.assert_called_once()
         upload_service.thumbnail_service.generate_thumbnails_for_video.assert_called_once()
     
+    async def test_create_video_from_file_failure_releases_original(self, upload_service, mock_db, tmp_path):
+        """A failed import drops the reference it took on an identical stored original."""
+        source = tmp_path / "import.mp4"
+        source.write_bytes(b"video bytes")
+        existing_content = MagicMock()
+        upload_service.tag_index = AsyncMock()
+        upload_service.s3_service.delete_video = AsyncMock()
+        upload_service.analysis_service.analyze_video_file = AsyncMock(return_value=MagicMock(
+            duration=60.0, resolution="1280x720", framerate=30.0, codec="h264", bitrate=2500
+        ))
+        upload_service.dedup_service.find_by_hash = AsyncMock(return_value=existing_content)
+        upload_service.dedup_service.add_reference = AsyncMock()
+        upload_service.dedup_service.clone_renditions = AsyncMock(return_value=[])
+        upload_service.dedup_service.release = AsyncMock(return_value=["videos/orphan.mp4"])
+        upload_service.thumbnail_service.generate_thumbnails = AsyncMock()
+        upload_service._queue_transcoding_jobs = AsyncMock(side_effect=Exception("queue down"))
+        
+        with pytest.raises(HTTPException) as exc_info:
+            await upload_service.create_video_from_file(
+                str(source), "import.mp4", str(uuid.uuid4()), {'title': 'Imported'}, ["720p_30fps"]
+            )
+        
+        assert exc_info.value.status_code == 500
+        video = upload_service.dedup_service.add_reference.await_args.args[1]
+        upload_service.dedup_service.release.assert_awaited_once_with(video)
+        mock_db.delete.assert_awaited_once_with(video)
+        upload_service.s3_service.delete_video.assert_awaited_once_with("videos/orphan.mp4")
+    
     async def test_complete_upload_s3_failure(self, upload_service):
         """Test upload completion with S3 failure."""
         # Create mock session with S3
@@ -575,6 +766,32 @@ class TestUploadSession:
         assert session.s3_session is None
         assert session.temp_file_path is None
         assert isinstance(session.created_at, datetime)
+    
+    def test_upload_session_round_trip(self):
+        """Sessions survive serialization for the session store."""
+        session = UploadSession(str(uuid.uuid4()), str(uuid.uuid4()), str(uuid.uuid4()),
+                                {'filename': 'test.mp4', 'chunk_size': 1024})
+        session.s3_session = S3UploadSession(
+            upload_id="upload-1", bucket="bucket", key="videos/test.mp4", parts=[],
+            created_at=datetime.utcnow(), expires_at=datetime.utcnow()
+        )
+        
+        restored = UploadSession.from_dict(session.to_dict())
+        
+        assert restored.session_id == session.session_id
+        assert restored.metadata == session.metadata
+        assert restored.created_at == session.created_at
+        assert restored.s3_session.upload_id == "upload-1"
+        assert restored.s3_session.key == "videos/test.mp4"
+    
+    def test_chunks_per_part_meets_s3_minimum(self):
+        """Small client chunks are grouped so every part but the last is at least 5MB."""
+        session = UploadSession("s", "v", "u", {'chunk_size': 1024 * 1024, 'total_chunks': 12})
+        
+        assert session.chunks_per_part == 5
+        assert session.part_number_for_chunk(5) == 1
+        assert session.part_number_for_chunk(6) == 2
+        assert session.chunks_in_part(3) == 2
 
 
 class TestVideoMetadata: